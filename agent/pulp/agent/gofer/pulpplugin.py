@@ -21,11 +21,12 @@ from gofer.messaging.auth import ValidationFailed
 
 from pulp.common.bundle import Bundle
 from pulp.common.config import parse_bool
+from pulp.common.profile import calculate_delta, calculate_hash
 from pulp.agent.lib.dispatcher import Dispatcher
 from pulp.agent.lib.conduit import Conduit as HandlerConduit
 from pulp.bindings.server import PulpConnection
 from pulp.bindings.bindings import Bindings
-from pulp.bindings.exceptions import NotFoundException
+from pulp.bindings.exceptions import ConflictException, NotFoundException
 from pulp.client.consumer.config import read_config
 
 
@@ -46,6 +47,10 @@ plugin = Plugin.find(__name__)
 # registration status
 registered = False
 
+# the hash and content of the profiles last reported, keyed by (consumer_id, type_id),
+# so that only the changes to them need to be reported
+reported_profiles = {}
+
 
 @initializer
 def init_plugin():
@@ -496,9 +501,51 @@ class Profile(object):
                 continue
 
             details = profile_report['details']
-            http = bindings.profile.send(consumer_id, type_id, details)
+            http = self._send(bindings, consumer_id, type_id, details)
 
             msg = _('profile (%(t)s), reported: %(r)s')
             log.info(msg, {'t': type_id, 'r': http.response_code})
 
         return report.dict()
+
+    @staticmethod
+    def _send(bindings, consumer_id, type_id, profile):
+        """
+        Send a content profile to the server.
+        Only the changes to the profile last reported are sent, unless the server
+        does not have that profile or the changes are not smaller than the profile.
+        The server stores profiles as altered by the profiler of their type, if any.
+        A profile the server did not store as sent is not the base of the next report,
+        since the server would reject the changes to it.
+        :param bindings: The pulp bindings.
+        :type bindings: PulpBindings
+        :param consumer_id: The consumer ID.
+        :type consumer_id: str
+        :param type_id: The profile (content) type ID.
+        :type type_id: str
+        :param profile: The content profile.
+        :type profile: object
+        :return: The http response.
+        :rtype: pulp.bindings.responses.Response
+        """
+        key = (consumer_id, type_id)
+        profile_hash = calculate_hash(profile)
+        http = None
+        reported = reported_profiles.get(key)
+        if reported is not None:
+            base_hash, base = reported
+            delta = calculate_delta(base, profile)
+            if delta is not None and len(delta['added']) + len(delta['removed']) < len(profile):
+                try:
+                    http = bindings.profile.send_delta(
+                        consumer_id, type_id, base_hash, delta, profile_hash)
+                except ConflictException:
+                    msg = _('profile (%(t)s), delta rejected, sending full profile')
+                    log.info(msg, {'t': type_id})
+        if http is None:
+            http = bindings.profile.send(consumer_id, type_id, profile)
+        if http.response_body.get('profile_hash') == profile_hash:
+            reported_profiles[key] = (profile_hash, profile)
+        else:
+            reported_profiles.pop(key, None)
+        return http
@@ -21,6 +21,7 @@ from M2Crypto import RSA, BIO
 
 from gofer.messaging.auth import ValidationFailed
 
+from pulp.bindings.responses import Response
 from pulp.common.config import Config
 
 TEST_HOST = 'test-host'
@@ -762,6 +763,15 @@ class TestContent(PluginTest):
 
 class TestProfile(PluginTest):
 
+    def stored_as_sent(self, mock_bindings):
+        # The server answers with the hash of the profile it stored, which is the one sent
+        mock_bindings().profile.send.side_effect = \
+            lambda consumer_id, type_id, profile: Response(
+                201, {'profile_hash': self.plugin.calculate_hash(profile)})
+        mock_bindings().profile.send_delta.side_effect = \
+            lambda consumer_id, type_id, base_hash, delta, profile_hash: Response(
+                201, {'profile_hash': profile_hash})
+
     @patch('pulp.agent.gofer.pulpplugin.ConsumerX509Bundle')
     @patch('pulp.agent.gofer.pulpplugin.Conduit')
     @patch('pulp.agent.gofer.pulpplugin.Dispatcher')
@@ -798,6 +808,72 @@ class TestProfile(PluginTest):
         mock_dispatcher().profile.assert_called_with(mock_conduit())
         mock_bindings().profile.send.assert_called_once_with(TEST_CN, 'BB', 5678)
 
+    @patch('pulp.agent.gofer.pulpplugin.ConsumerX509Bundle')
+    @patch('pulp.agent.gofer.pulpplugin.Conduit')
+    @patch('pulp.agent.gofer.pulpplugin.Dispatcher')
+    @patch('pulp.agent.gofer.pulpplugin.PulpBindings')
+    def test_send_delta(self, mock_bindings, mock_dispatcher, mock_conduit, mock_bundle):
+        mock_bundle().cn = Mock(return_value=TEST_CN)
+        self.stored_as_sent(mock_bindings)
+        profiles = [['a', 'b', 'c', 'd'], ['a', 'b', 'd', 'e']]
+        _report = Mock()
+        mock_dispatcher().profile.return_value = _report
+
+        # test
+        for details in profiles:
+            _report.details = {'rpm': {'succeeded': True, 'details': details}}
+            self.plugin.Profile().send()
+
+        # validation
+        mock_bindings().profile.send.assert_called_once_with(TEST_CN, 'rpm', profiles[0])
+        mock_bindings().profile.send_delta.assert_called_once_with(
+            TEST_CN, 'rpm', self.plugin.calculate_hash(profiles[0]),
+            {'added': [[3, 'e']], 'removed': ['c']}, self.plugin.calculate_hash(profiles[1]))
+
+    @patch('pulp.agent.gofer.pulpplugin.ConsumerX509Bundle')
+    @patch('pulp.agent.gofer.pulpplugin.Conduit')
+    @patch('pulp.agent.gofer.pulpplugin.Dispatcher')
+    @patch('pulp.agent.gofer.pulpplugin.PulpBindings')
+    def test_send_delta_rejected(self, mock_bindings, mock_dispatcher, mock_conduit, mock_bundle):
+        mock_bundle().cn = Mock(return_value=TEST_CN)
+        self.stored_as_sent(mock_bindings)
+        mock_bindings().profile.send_delta.side_effect = self.plugin.ConflictException({})
+        profiles = [['a', 'b', 'c', 'd'], ['a', 'b', 'd', 'e']]
+        _report = Mock()
+        mock_dispatcher().profile.return_value = _report
+
+        # test
+        for details in profiles:
+            _report.details = {'rpm': {'succeeded': True, 'details': details}}
+            self.plugin.Profile().send()
+
+        # validation
+        self.assertEqual(mock_bindings().profile.send_delta.call_count, 1)
+        self.assertEqual(mock_bindings().profile.send.call_args_list[1][0],
+                         (TEST_CN, 'rpm', profiles[1]))
+
+    @patch('pulp.agent.gofer.pulpplugin.ConsumerX509Bundle')
+    @patch('pulp.agent.gofer.pulpplugin.Conduit')
+    @patch('pulp.agent.gofer.pulpplugin.Dispatcher')
+    @patch('pulp.agent.gofer.pulpplugin.PulpBindings')
+    def test_send_altered_profile(self, mock_bindings, mock_dispatcher, mock_conduit,
+                                  mock_bundle):
+        mock_bundle().cn = Mock(return_value=TEST_CN)
+        # The profiler of the type alters the profile before the server stores it
+        mock_bindings().profile.send.return_value = Response(201, {'profile_hash': 'altered'})
+        profiles = [['a', 'b', 'c', 'd'], ['a', 'b', 'd', 'e']]
+        _report = Mock()
+        mock_dispatcher().profile.return_value = _report
+
+        # test
+        for details in profiles:
+            _report.details = {'rpm': {'succeeded': True, 'details': details}}
+            self.plugin.Profile().send()
+
+        # validation
+        self.assertFalse(mock_bindings().profile.send_delta.called)
+        self.assertEqual(mock_bindings().profile.send.call_count, 2)
+
 
 class TestAttach(PluginTest):
 
@@ -186,6 +186,17 @@ class ProfilesAPI(PulpAPI):
         data = { 'content_type':content_type, 'profile':profile }
         return self.server.POST(path, data)
 
+    def send_delta(self, id, content_type, base_hash, delta, profile_hash):
+        """
+        Send the changes made to the profile with the hash base_hash, as calculated by
+        pulp.common.profile.calculate_delta(). A ConflictException is raised when the server
+        does not have the base profile, in which case the whole profile must be sent.
+        """
+        path = self.BASE_PATH % id
+        data = {'content_type': content_type, 'base_hash': base_hash, 'delta': delta,
+                'profile_hash': profile_hash}
+        return self.server.POST(path, data)
+
 
 class ConsumerHistoryAPI(PulpAPI):
     """
@@ -15,7 +15,7 @@ import unittest
 
 import mock
 
-from pulp.bindings.consumer import ConsumerSearchAPI
+from pulp.bindings.consumer import ConsumerSearchAPI, ProfilesAPI
 
 
 class TestConsumerSearchAPI(unittest.TestCase):
@@ -24,3 +24,15 @@ class TestConsumerSearchAPI(unittest.TestCase):
         self.assertTrue(api.PATH is not None)
         self.assertTrue(len(api.PATH) > 0)
 
+
+class TestProfilesAPI(unittest.TestCase):
+    def test_send_delta(self):
+        api = ProfilesAPI(mock.MagicMock())
+        delta = {'added': [[0, 'a']], 'removed': ['b']}
+
+        response = api.send_delta('consumer-1', 'rpm', 'h1', delta, 'h2')
+
+        api.server.POST.assert_called_once_with(
+            '/v2/consumers/consumer-1/profiles/',
+            {'content_type': 'rpm', 'base_hash': 'h1', 'delta': delta, 'profile_hash': 'h2'})
+        self.assertEqual(response, api.server.POST.return_value)
@@ -80,6 +80,10 @@ PLP0029 = Error("PLP0029",
 PLP0030 = Error("PLP0030", _("Authentication with username %(user)s failed: invalid username or password"), ['user'])
 PLP0031 = Error("PLP0031", _("Content source %(id)s could not be found at %(url)s"), ['id', 'url'])
 PLP0032 = Error("PLP0032", _("Task %(task_id)s encountered one or more failures during execution."), ['task_id'])
+PLP0033 = Error("PLP0033",
+                _("The profile delta of type %(content_type)s for consumer %(consumer_id)s does "
+                  "not apply to the stored profile; the full profile must be sent."),
+                ['consumer_id', 'content_type'])
 # Create a section for general validation errors (PLP1000 - PLP2999)
 # Validation problems should be reported with a general PLP1000 error with a more specific
 # error message nested inside of it.
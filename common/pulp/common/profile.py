@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Hashing of consumer unit profiles, and the deltas used by consumers to report the changes to a
+profile the server already has instead of the whole profile.
+
+A delta is a dictionary with 'added' and 'removed' keys. For profiles that are lists, 'added' is
+a list of [index, entry] pairs giving the position of each added entry in the new profile, and
+'removed' is a list of the entries removed from the base profile. For profiles that are
+dictionaries, 'added' is a dictionary of the added and changed items and 'removed' is a list of
+the removed keys.
+"""
+
+import hashlib
+import json
+
+
+def calculate_hash(profile):
+    """
+    Return a hash of profile. This hash is useful for quickly comparing profiles to determine if
+    they are the same.
+
+    :param profile: The profile structure you wish to hash
+    :type  profile: object
+    :return:        Hash of profile
+    :rtype:         basestring
+    """
+    # Don't use any whitespace in the json separators, and sort dictionary keys to be repeatable
+    hasher = hashlib.sha256(_serialize(profile))
+    return hasher.hexdigest()
+
+
+def calculate_delta(base, profile):
+    """
+    Calculate the delta that turns the base profile into the given profile.
+
+    :param base:    the profile the delta applies to
+    :type  base:    list or dict
+    :param profile: the profile the delta results in
+    :type  profile: list or dict
+    :return:        the delta, or None if the profiles cannot be described by a delta
+    :rtype:         dict
+    """
+    if isinstance(base, list) and isinstance(profile, list):
+        # Match the entries by value, counting duplicates
+        remaining = {}
+        for entry in base:
+            key = _serialize(entry)
+            remaining[key] = remaining.get(key, 0) + 1
+        added = []
+        for index, entry in enumerate(profile):
+            key = _serialize(entry)
+            if remaining.get(key):
+                remaining[key] -= 1
+            else:
+                added.append([index, entry])
+        removed = []
+        for entry in base:
+            key = _serialize(entry)
+            if remaining.get(key):
+                remaining[key] -= 1
+                removed.append(entry)
+        delta = dict(added=added, removed=removed)
+    elif isinstance(base, dict) and isinstance(profile, dict):
+        added = dict((k, v) for k, v in profile.items() if k not in base or base[k] != v)
+        removed = [k for k in base if k not in profile]
+        delta = dict(added=added, removed=removed)
+    else:
+        return None
+
+    # The entries kept in both profiles must be in the same order
+    if apply_delta(base, delta) != profile:
+        return None
+    return delta
+
+
+def apply_delta(base, delta):
+    """
+    Apply a delta calculated by calculate_delta() to the base profile.
+
+    :param base:  the profile the delta applies to
+    :type  base:  list or dict
+    :param delta: the delta
+    :type  delta: dict
+    :return:      the resulting profile
+    :rtype:       list or dict
+    :raise ValueError: if the delta does not apply to the base profile
+    """
+    try:
+        added = delta['added']
+        removed = delta['removed']
+        if isinstance(base, list):
+            profile = list(base)
+            for entry in removed:
+                profile.remove(entry)
+            for index, entry in sorted(added, key=lambda a: a[0]):
+                if index > len(profile):
+                    raise ValueError(index)
+                profile.insert(index, entry)
+        elif isinstance(base, dict):
+            profile = dict(base)
+            for key in removed:
+                del profile[key]
+            profile.update(added)
+        else:
+            raise ValueError(type(base))
+    except (KeyError, TypeError), e:
+        raise ValueError(e)
+    return profile
+
+
+def _serialize(profile):
+    """
+    :param profile: a profile, or one of its entries
+    :type  profile: object
+    :return:        the repeatable json serialization of the profile
+    :rtype:         str
+    """
+    return json.dumps(profile, separators=(',', ':'), sort_keys=True)
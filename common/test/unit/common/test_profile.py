@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import unittest
+
+from pulp.common import profile
+
+
+ZSH_1 = {'name': 'zsh', 'version': '1.0'}
+ZSH_2 = {'name': 'zsh', 'version': '2.0'}
+KSH = {'name': 'ksh', 'version': '1.0'}
+BASH = {'name': 'bash', 'version': '4.2'}
+
+
+class TestCalculateHash(unittest.TestCase):
+
+    def test_key_order(self):
+        self.assertEqual(profile.calculate_hash({'a': 1, 'b': [1, 2]}),
+                         profile.calculate_hash({'b': [1, 2], 'a': 1}))
+
+    def test_list_order(self):
+        self.assertNotEqual(profile.calculate_hash([ZSH_1, KSH]),
+                            profile.calculate_hash([KSH, ZSH_1]))
+
+
+class TestDelta(unittest.TestCase):
+
+    def test_list(self):
+        base = [BASH, KSH, ZSH_1]
+        new = [BASH, ZSH_2, {'name': 'tcsh', 'version': '6.0'}]
+
+        delta = profile.calculate_delta(base, new)
+
+        self.assertEqual(delta['removed'], [KSH, ZSH_1])
+        self.assertEqual(delta['added'], [[1, ZSH_2], [2, {'name': 'tcsh', 'version': '6.0'}]])
+        self.assertEqual(profile.apply_delta(base, delta), new)
+
+    def test_list_insert_sorted(self):
+        base = [BASH, ZSH_1]
+        new = [BASH, KSH, ZSH_1]
+
+        delta = profile.calculate_delta(base, new)
+
+        self.assertEqual(delta, {'added': [[1, KSH]], 'removed': []})
+        self.assertEqual(profile.apply_delta(base, delta), new)
+
+    def test_list_duplicates(self):
+        base = [BASH, BASH, KSH]
+        new = [BASH, KSH, KSH]
+
+        delta = profile.calculate_delta(base, new)
+
+        self.assertEqual(delta, {'added': [[2, KSH]], 'removed': [BASH]})
+        self.assertEqual(profile.apply_delta(base, delta), new)
+
+    def test_list_reordered(self):
+        self.assertEqual(profile.calculate_delta([BASH, KSH], [KSH, BASH]), None)
+
+    def test_dict(self):
+        base = {'zsh': ZSH_1, 'ksh': KSH}
+        new = {'zsh': ZSH_2, 'bash': BASH}
+
+        delta = profile.calculate_delta(base, new)
+
+        self.assertEqual(delta, {'added': {'zsh': ZSH_2, 'bash': BASH}, 'removed': ['ksh']})
+        self.assertEqual(profile.apply_delta(base, delta), new)
+
+    def test_unsupported(self):
+        self.assertEqual(profile.calculate_delta([BASH], {'bash': BASH}), None)
+        self.assertEqual(profile.calculate_delta('a', 'b'), None)
+
+    def test_apply_base_not_modified(self):
+        base = [BASH, KSH]
+
+        profile.apply_delta(base, {'added': [[0, ZSH_1]], 'removed': [KSH]})
+
+        self.assertEqual(base, [BASH, KSH])
+
+    def test_apply_invalid(self):
+        base = [BASH, KSH]
+
+        self.assertRaises(ValueError, profile.apply_delta, base, {'added': [], 'removed': [ZSH_1]})
+        self.assertRaises(ValueError, profile.apply_delta, base, {'added': [[5, ZSH_1]],
+                                                                  'removed': []})
+        self.assertRaises(ValueError, profile.apply_delta, base, {'added': []})
+        self.assertRaises(ValueError, profile.apply_delta, {'a': 1}, {'added': {},
+                                                                      'removed': ['b']})
+        self.assertRaises(ValueError, profile.apply_delta, 'a', {'added': [], 'removed': []})
@@ -15,6 +15,8 @@ from logging import getLogger
 from operator import itemgetter
 
 from pulp_node import constants
+from pulp_node import resources
+from pulp_node.poller import MultiTaskPoller
 from pulp_node.handlers.model import *
 from pulp_node.handlers.validation import Validator
 from pulp_node.error import NodeError, CaughtException
@@ -147,27 +149,24 @@ class HandlerStrategy(object):
         Add or update repositories based on bindings.
           - Merge repositories found in BOTH parent and child.
           - Add repositories found in the parent but NOT in the child.
+        Repositories are synchronized concurrently when the request
+        options permit more than one synchronization at a time.
         :param request: A synchronization request.
         :type request: SyncRequest
         """
+        limit = request.options.get(constants.MAX_SYNC_CONCURRENCY_KEYWORD)
+        limit = limit or constants.DEFAULT_SYNC_CONCURRENCY
+        skip = request.options.get(constants.SKIP_CONTENT_UPDATE_KEYWORD, False)
+        if limit > 1 and not skip:
+            self._merge_repositories_concurrently(request, limit)
+            return
         for bind in request.bindings:
             try:
                 repo_id = bind['repo_id']
-                details = bind['details']
                 if request.cancelled():
                     request.summary[repo_id].action = RepositoryReport.CANCELLED
                     continue
-                parent = Repository(repo_id, details)
-                child = Repository.fetch(repo_id)
-                progress = request.progress.find_report(repo_id)
-                progress.begin_merging()
-                if child:
-                    request.summary[repo_id].action = RepositoryReport.MERGED
-                    child.merge(parent)
-                else:
-                    child = Repository(repo_id, parent.details)
-                    request.summary[repo_id].action = RepositoryReport.ADDED
-                    child.add()
+                self._merge_repository(request, bind)
                 self._synchronize_repository(request, repo_id)
             except NodeError, ne:
                 request.summary.errors.append(ne)
@@ -176,6 +175,78 @@ class HandlerStrategy(object):
                 error = CaughtException(e, repo_id)
                 request.summary.errors.append(error)
 
+    def _merge_repositories_concurrently(self, request, limit):
+        """
+        Add or update repositories based on bindings and synchronize them
+        concurrently.  Repositories are merged and their synchronization
+        started as others complete so that no more than (limit) are
+        synchronized at a time.  All of the sync tasks are polled together.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :param limit: The maximum number of concurrent synchronizations.
+        :type limit: int
+        """
+        pending = list(request.bindings)
+        running = {}
+        poller = MultiTaskPoller(resources.pulp_bindings())
+        while pending or running:
+            if request.cancelled():
+                for bind in pending:
+                    request.summary[bind['repo_id']].action = RepositoryReport.CANCELLED
+                for repo_id, task in sorted(running.values(), key=itemgetter(0)):
+                    request.summary[repo_id].action = RepositoryReport.CANCELLED
+                    Repository(repo_id).cancel_synchronization(task)
+                break
+            while pending and len(running) < limit:
+                bind = pending.pop(0)
+                repo_id = bind['repo_id']
+                try:
+                    self._merge_repository(request, bind)
+                    task = Repository(repo_id).start_synchronization(request.options)
+                    poller.add(task.task_id, request.progress.find_report(repo_id))
+                    running[task.task_id] = (repo_id, task)
+                except NodeError, ne:
+                    request.summary.errors.append(ne)
+                except Exception, e:
+                    log.exception(repo_id)
+                    error = CaughtException(e, repo_id)
+                    request.summary.errors.append(error)
+            for task_id, importer_report, exception in poller.poll():
+                repo_id = running.pop(task_id)[0]
+                if exception is not None:
+                    log.error('%s: %s', repo_id, exception)
+                    error = CaughtException(exception, repo_id)
+                    request.summary.errors.append(error)
+                    continue
+                try:
+                    self._finish_synchronization(request, repo_id, importer_report)
+                except Exception, e:
+                    log.exception(repo_id)
+                    error = CaughtException(e, repo_id)
+                    request.summary.errors.append(error)
+
+    def _merge_repository(self, request, bind):
+        """
+        Add or update the repository of a binding.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :param bind: A consumer binding payload.
+        :type bind: dict
+        """
+        repo_id = bind['repo_id']
+        details = bind['details']
+        parent = Repository(repo_id, details)
+        child = Repository.fetch(repo_id)
+        progress = request.progress.find_report(repo_id)
+        progress.begin_merging()
+        if child:
+            request.summary[repo_id].action = RepositoryReport.MERGED
+            child.merge(parent)
+        else:
+            child = Repository(repo_id, parent.details)
+            request.summary[repo_id].action = RepositoryReport.ADDED
+            child.add()
+
     def _synchronize_repository(self, request, repo_id):
         """
         Run synchronization on a repository by ID.
@@ -194,6 +265,19 @@ class HandlerStrategy(object):
         if request.cancelled():
             request.summary[repo_id].action = RepositoryReport.CANCELLED
             return
+        self._finish_synchronization(request, repo_id, importer_report)
+
+    def _finish_synchronization(self, request, repo_id, importer_report):
+        """
+        Record the outcome of a completed repository synchronization.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :param repo_id: A repository ID.
+        :type repo_id: str
+        :param importer_report: The result of the sync task.
+        :type importer_report: dict
+        """
+        progress = request.progress.find_report(repo_id)
         progress.finished()
         details = importer_report['details']
         for _dict in details['errors']:
@@ -9,66 +9,70 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from operator import itemgetter
+
 from pulp_node import constants
+from pulp_node.manifest import UnitIndex, unit_hash
 
 
-class UniqueKey(object):
+def unique(entries):
     """
-    A unique unit key consisting of a unit's type_id & unit_key.
-    The unit key is sorted to ensure consistency.
-    :ivar uid: The unique ID.
-    :type uid: A tuple of: (type_id, unit_key)
+    Skip entries with the same unit hash as the entry that follows.
+    :param entries: Entries sorted by unit hash.  The 1st item of each is the hash.
+    :type entries: iterable
+    :return: A generator of the last of each run of entries with the same hash.
+    :rtype: generator
     """
-
-    def __init__(self, unit):
-        """
-        :param unit: A content unit.
-        :type unit: dict
-        """
-        type_id = unit['type_id']
-        unit_key = tuple(sorted(unit['unit_key'].items()))
-        self.uid = (type_id, unit_key)
-
-    def __hash__(self):
-        return hash(self.uid)
-
-    def __eq__(self, other):
-        return self.uid == other.uid
-
-    def __ne__(self, other):
-        return self.uid != other.uid
+    last = None
+    for entry in entries:
+        if last is not None and last[0] != entry[0]:
+            yield last
+        last = entry
+    if last is not None:
+        yield last
 
 
 class UnitInventory(object):
     """
     The unit inventory contains both the parent and child inventory
-    of content units associated with a specific repository.  Each is contained
-    within a dictionary keyed by {UnitKey} to ensure uniqueness.
+    of content units associated with a specific repository.  Each is sorted
+    by the hash of the unit's type_id & unit_key and the two are compared by
+    merging them.  The parent inventory is kept as a compact index and the parent
+    units are only read (using their reference) when listed.
     """
 
     @staticmethod
     def _import_parent_units(units):
-        _units = {}
+        if isinstance(units, UnitIndex):
+            return units
+        _units = []
         for unit, ref in units:
-            unit.pop('metadata', None)
-            key = UniqueKey(unit)
-            _units[key] = (unit, ref)
+            last_updated = unit.get(constants.LAST_UPDATED, 0)
+            _units.append((unit_hash(unit), last_updated, ref))
+        _units.sort(key=itemgetter(0))
         return _units
 
     @staticmethod
     def _import_child_units(units):
-        _units = {}
+        _units = []
         for unit in units:
             unit.pop('metadata', None)
-            key = UniqueKey(unit)
-            _units[key] = unit
+            _units.append((unit_hash(unit), unit))
+        _units.sort(key=itemgetter(0))
         return _units
 
+    @staticmethod
+    def _fetch_parent_unit(ref):
+        unit = ref.fetch()
+        unit.pop('metadata', None)
+        return unit, ref
+
     def __init__(self, base_URL, parent_units, child_units):
         """
         :param base_URL: The base URL for downloading parent units.
-        :param parent_units: The content units in the parent node.
-        :type parent_units: iterable
+        :param parent_units: The content units in the parent node.  Either
+            an index or an iterable of: (unit, ref).
+        :type parent_units: pulp_node.manifest.UnitIndex|iterable
         :param child_units: The content units in the child node.
         :type child_units: iterable
         """
@@ -76,6 +80,14 @@ class UnitInventory(object):
         self.parent_units = self._import_parent_units(parent_units)
         self.child_units = self._import_child_units(child_units)
 
+    def close(self):
+        """
+        Release the parent index, which is no longer needed once the
+        units have been added, updated and deleted.
+        """
+        if isinstance(self.parent_units, UnitIndex):
+            self.parent_units.close()
+
     def units_on_parent_only(self):
         """
         Listing of units contained in the parent inventory
@@ -83,7 +95,7 @@ class UnitInventory(object):
         :return: List of (unit, ref).
         :rtype: list
         """
-        return [r for k, r in self.parent_units.items() if k not in self.child_units]
+        return [self._fetch_parent_unit(p[2]) for p, c in self._merge() if c is None]
 
     def units_on_child_only(self):
         """
@@ -92,7 +104,7 @@ class UnitInventory(object):
         :return: List of units that need to be purged.
         :rtype: list
         """
-        return [u for k, u in self.child_units.items() if k not in self.parent_units]
+        return [c[1] for p, c in self._merge() if p is None]
 
     def updated_units(self):
         """
@@ -101,12 +113,35 @@ class UnitInventory(object):
         :rtype: list
         """
         updated = []
-        for key, (unit, ref) in self.parent_units.items():
-            child_unit = self.child_units.get(key)
-            if child_unit is None:
+        for parent, child in self._merge():
+            if parent is None or child is None:
                 continue
-            parent_last_updated = unit.get(constants.LAST_UPDATED, 0)
-            child_last_updated = child_unit.get(constants.LAST_UPDATED, 0)
+            parent_last_updated = parent[1]
+            child_last_updated = child[1].get(constants.LAST_UPDATED, 0)
             if parent_last_updated > child_last_updated:
-                updated.append((unit, ref))
-        return updated
\ No newline at end of file
+                updated.append(self._fetch_parent_unit(parent[2]))
+        return updated
+
+    def _merge(self):
+        """
+        Merge the parent and child inventories in unit hash order.
+        :return: A generator of: (parent, child) for each unit.  The parent is
+            a tuple of: (hash, last_updated, ref) and the child is a tuple of: (hash, unit).
+            Either is None when the unit is not contained in that inventory.
+        :rtype: generator
+        """
+        parent_units = unique(self.parent_units)
+        child_units = unique(self.child_units)
+        parent = next(parent_units, None)
+        child = next(child_units, None)
+        while parent is not None or child is not None:
+            if child is None or (parent is not None and parent[0] < child[0]):
+                yield (parent, None)
+                parent = next(parent_units, None)
+            elif parent is None or child[0] < parent[0]:
+                yield (None, child)
+                child = next(child_units, None)
+            else:
+                yield (parent, child)
+                parent = next(parent_units, None)
+                child = next(child_units, None)
@@ -185,8 +185,12 @@ class ImporterStrategy(object):
             fetched_manifest.fetch()
             if manifest != fetched_manifest or \
                     not manifest.is_valid() or not manifest.has_valid_units():
-                fetched_manifest.write()
-                fetched_manifest.fetch_units()
+                # apply the deltas published since the last synchronization when
+                # possible, else fetch all of the units
+                valid = manifest.is_valid() and manifest.has_valid_units()
+                if not (valid and fetched_manifest.fetch_deltas(manifest)):
+                    fetched_manifest.write()
+                    fetched_manifest.fetch_units()
                 manifest = fetched_manifest
             if not manifest.is_valid():
                 raise InvalidManifestError()
@@ -197,7 +201,7 @@ class ImporterStrategy(object):
             raise GetParentUnitsError(request.repo_id)
 
         # build the inventory
-        parent_units = manifest.get_units()
+        parent_units = manifest.get_index()
         base_URL = manifest.publishing_details[constants.BASE_URL]
         inventory = UnitInventory(base_URL, parent_units, child_units)
         return inventory
@@ -353,9 +357,12 @@ class Mirror(ImporterStrategy):
         :type request: SyncRequest
         """
         unit_inventory = self._unit_inventory(request)
-        self._add_units(request, unit_inventory)
-        self._update_units(request, unit_inventory)
-        self._delete_units(request, unit_inventory)
+        try:
+            self._add_units(request, unit_inventory)
+            self._update_units(request, unit_inventory)
+            self._delete_units(request, unit_inventory)
+        finally:
+            unit_inventory.close()
 
 
 class Additive(ImporterStrategy):
@@ -376,8 +383,11 @@ class Additive(ImporterStrategy):
         :type request: SyncRequest
         """
         unit_inventory = self._unit_inventory(request)
-        self._add_units(request, unit_inventory)
-        self._update_units(request, unit_inventory)
+        try:
+            self._add_units(request, unit_inventory)
+            self._update_units(request, unit_inventory)
+        finally:
+            unit_inventory.close()
 
 
 STRATEGIES = {
@@ -41,6 +41,7 @@ PURGE_ORPHANS_KEYWORD = 'purge_orphans'
 
 MAX_DOWNLOAD_BANDWIDTH_KEYWORD = 'max_download_bandwidth'
 MAX_DOWNLOAD_CONCURRENCY_KEYWORD = 'max_download_concurrency'
+MAX_SYNC_CONCURRENCY_KEYWORD = 'max_sync_concurrency'
 
 SKIP_CONTENT_UPDATE_KEYWORD = 'skip_content_update'
 
@@ -67,6 +68,10 @@ STRATEGY_NOTE_KEY = '_node-update-strategy'
 
 DEFAULT_DOWNLOAD_CONCURRENCY = 20
 
+# The number of repositories synchronized at the same time during a node update.
+# The default of 1 synchronizes them one after another.
+DEFAULT_SYNC_CONCURRENCY = 1
+
 
 # --- profiling --------------------------------------------------------------
 
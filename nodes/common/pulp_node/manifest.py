@@ -14,11 +14,19 @@ Provides classes for managing the content unit manifest.
 The manifest is a json encoded file that defines content units
 associated with repository.  The units themselves are stored in a separate
 json encoded file.  For performance reasons, the unit files are compressed.
+Each published manifest also references a chain of delta files listing the
+units added, updated and removed since the previously published manifests.
+A child that has the units of one of those manifests applies the deltas to
+its copy of the units file instead of downloading the whole file again.
 """
 
 import os
 import gzip
+import mmap
 import errno
+import hashlib
+
+from array import array
 
 from logging import getLogger
 
@@ -27,6 +35,7 @@ from nectar.listener import AggregatingEventListener
 
 from pulp.server.compat import json
 
+from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.error import ManifestDownloadError
 
@@ -49,6 +58,20 @@ UNITS_PATH = 'path'
 UNITS_TOTAL = 'total'
 UNITS_SIZE = 'size'
 
+DELTAS_DIR_NAME = 'deltas'
+DELTAS = 'deltas'
+DELTA_BASE_ID = 'base_id'
+DELTA_PATH = 'path'
+DELTA_SIZE = 'size'
+DELTA_ACTION = 'action'
+DELTA_UNIT = 'unit'
+UNIT_ADDED = 'added'
+UNIT_REMOVED = 'removed'
+
+# The number of delta files referenced by a published manifest.
+# A child more than this many publishes behind downloads the whole units file.
+MAX_DELTAS = 10
+
 
 # --- utils -----------------------------------------------------------------------------
 
@@ -76,6 +99,66 @@ def unzip(path, destination, bfrlen=65535):
         fp_in.close()
 
 
+def unit_identity(unit):
+    """
+    Get a string that uniquely identifies a content unit by type_id and unit_key.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: The unit identity.
+    :rtype: str
+    """
+    return json.dumps([unit['type_id'], unit['unit_key']], sort_keys=True)
+
+
+def unit_hash(unit):
+    """
+    Get a compact hash of the unit identity.
+    Used to index and sort content units by type_id and unit_key.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: The (binary) hash.
+    :rtype: str
+    """
+    return hashlib.sha1(unit_identity(unit)).digest()
+
+
+def unit_digest(unit):
+    """
+    Get a digest of all of the content unit's published properties.
+    Used to detect that a unit has been updated.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: The unit digest.
+    :rtype: str
+    """
+    return hashlib.sha1(json.dumps(unit, sort_keys=True)).digest()
+
+
+def read_units(path):
+    """
+    Read the content units in a (compressed) units file.
+    :param path: The absolute path to the units file.
+    :type path: str
+    :return: A generator of the json decoded units.
+    :rtype: generator
+    :raise IOError: on I/O errors.
+    :raise ValueError: json decoding errors
+    """
+    if path.endswith('.gz'):
+        fp = gzip.open(path)
+    else:
+        fp = open(path)
+    try:
+        while True:
+            json_unit = fp.readline()
+            if json_unit:
+                yield json.loads(json_unit)
+            else:
+                break
+    finally:
+        fp.close()
+
+
 # --- manifest --------------------------------------------------------------------------
 
 
@@ -90,6 +173,10 @@ class Manifest(object):
     :type total_units: int
     :param publishing_details: Details of how units have been published.
     :type publishing_details: dict
+    :ivar deltas: The chain of deltas leading to this manifest, oldest first.
+        Each is a dictionary of: the ID of the manifest it applies to (base_id), the ID
+        of the resulting manifest (id), the relative path (path) and size of the delta file.
+    :type deltas: list
     """
 
     def __init__(self, path, manifest_id=None):
@@ -104,6 +191,7 @@ class Manifest(object):
         self.version = MANIFEST_VERSION
         self.units = {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0}
         self.publishing_details = {}
+        self.deltas = []
         if os.path.isdir(path):
             path = pathlib.join(path, MANIFEST_FILE_NAME)
         self.path = path
@@ -118,7 +206,8 @@ class Manifest(object):
             ID: self.id,
             VERSION: self.version,
             UNITS: self.units,
-            PUBLISHING_DETAILS: self.publishing_details
+            PUBLISHING_DETAILS: self.publishing_details,
+            DELTAS: self.deltas
         }
         with open(self.path, 'w+') as fp:
             json.dump(state, fp, indent=2)
@@ -138,6 +227,7 @@ class Manifest(object):
         self.version = d.get(VERSION, 0)
         self.units = d.get(UNITS, {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0})
         self.publishing_details = d.get(PUBLISHING_DETAILS, {})
+        self.deltas = d.get(DELTAS, [])
 
     def get_units(self):
         """
@@ -155,6 +245,22 @@ class Manifest(object):
         else:
             return []
 
+    def get_index(self):
+        """
+        Get an index of the content units referenced in the manifest.
+        :return: The index of the downloaded content units.
+        :rtype: UnitIndex
+        :raise IOError: on I/O errors.
+        :raise ValueError: json decoding errors
+        """
+        total = self.units[UNITS_TOTAL]
+        if total:
+            path = self.units_path()
+            path = self.unzip_units(path)
+            return UnitIndex(UnitsFile(path))
+        else:
+            return UnitIndex()
+
     def units_published(self, unit_writer):
         """
         Update the manifest publishing information.
@@ -164,6 +270,44 @@ class Manifest(object):
         self.units[UNITS_TOTAL] = unit_writer.total_units
         self.units[UNITS_SIZE] = unit_writer.bytes_written
 
+    def deltas_published(self, deltas, delta_writer):
+        """
+        Update the manifest delta chain.
+        :param deltas: The deltas of the previously published manifest.
+        :type deltas: list
+        :param delta_writer: A writer used to publish the delta from the previously
+            published manifest to this one.
+        :type delta_writer: DeltaWriter
+        """
+        delta = {
+            ID: self.id,
+            DELTA_BASE_ID: delta_writer.base_id,
+            DELTA_PATH: pathlib.join(DELTAS_DIR_NAME, os.path.basename(delta_writer.path)),
+            DELTA_SIZE: delta_writer.bytes_written,
+        }
+        self.deltas = (deltas + [delta])[-MAX_DELTAS:]
+
+    def delta_chain(self, base_id):
+        """
+        Get the chain of deltas leading from the manifest with the specified ID to this one.
+        :param base_id: The ID of a previously published manifest.
+        :type base_id: str
+        :return: The deltas to be applied in order, or None when there is no complete chain.
+        :rtype: list
+        """
+        for i, delta in enumerate(self.deltas):
+            if delta[DELTA_BASE_ID] == base_id:
+                chain = self.deltas[i:]
+                break
+        else:
+            return None
+        for previous, delta in zip(chain, chain[1:]):
+            if delta[DELTA_BASE_ID] != previous[ID]:
+                return None
+        if chain[-1][ID] != self.id:
+            return None
+        return chain
+
     def published(self, details):
         """
         Update the publishing details.
@@ -292,6 +436,101 @@ class RemoteManifest(Manifest):
             report = listener.failed_reports[0]
             raise ManifestDownloadError(self.url, report.error_msg)
 
+    def fetch_deltas(self, manifest):
+        """
+        Update the units file of a previously fetched manifest by fetching and applying
+        the chain of deltas leading from it to this manifest.  On success, this manifest
+        references the updated units file and is written.
+        :param manifest: The previously fetched manifest with valid units.
+        :type manifest: Manifest
+        :return: True if the deltas have been applied.  False when there is no complete
+            chain of deltas, a delta file does not have the published size or the deltas
+            cannot be applied, in which case the units file must be fetched using
+            fetch_units().
+        :rtype: bool
+        """
+        chain = self.delta_chain(manifest.id)
+        if chain is None:
+            return False
+        base_url = self.url.rsplit('/', 1)[0]
+        working_dir = os.path.dirname(self.path)
+        pathlib.mkdir(pathlib.join(working_dir, DELTAS_DIR_NAME))
+        paths = []
+        request_list = []
+        for delta in chain:
+            url = pathlib.join(base_url, delta[DELTA_PATH])
+            destination = pathlib.join(working_dir, delta[DELTA_PATH])
+            request_list.append(DownloadRequest(str(url), destination))
+            paths.append(destination)
+        listener = AggregatingEventListener()
+        self.downloader.event_listener = listener
+        self.downloader.download(request_list)
+        try:
+            if listener.failed_reports:
+                report = listener.failed_reports[0]
+                log.info('fetch delta: %s failed: %s', report.url, report.error_msg)
+                return False
+            for delta, path in zip(chain, paths):
+                size = os.path.getsize(path)
+                if size != delta[DELTA_SIZE]:
+                    log.info('fetch delta: %s size %d, expected %d', path, size, delta[DELTA_SIZE])
+                    return False
+            return self._apply_deltas(manifest, paths)
+        except (OSError, IOError, ValueError, KeyError):
+            log.exception(self.url)
+            return False
+        finally:
+            for path in paths:
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def _apply_deltas(self, manifest, paths):
+        """
+        Apply the downloaded delta files to the units file of the previously fetched manifest.
+        :param manifest: The previously fetched manifest with valid units.
+        :type manifest: Manifest
+        :param paths: The absolute paths to the delta files in the order they are applied.
+        :type paths: list
+        :return: True if the deltas have been applied.
+        :rtype: bool
+        :raise IOError: on I/O errors.
+        :raise ValueError: json decoding errors
+        """
+        changes = {}
+        for path in paths:
+            for entry in read_units(path):
+                unit = entry[DELTA_UNIT]
+                if entry[DELTA_ACTION] == UNIT_ADDED:
+                    changes[unit_identity(unit)] = unit
+                else:
+                    changes[unit_identity(unit)] = None
+        units_path = manifest.unzip_units(manifest.units_path())
+        tmp_path = units_path + '.tmp'
+        total = 0
+        with open(units_path) as fp_in:
+            with open(tmp_path, 'w+') as fp_out:
+                for json_unit in fp_in:
+                    if unit_identity(json.loads(json_unit)) in changes:
+                        continue
+                    fp_out.write(json_unit)
+                    total += 1
+                for unit in changes.values():
+                    if unit is None:
+                        continue
+                    fp_out.write(json.dumps(unit))
+                    fp_out.write('\n')
+                    total += 1
+        if total != self.units[UNITS_TOTAL]:
+            log.info('delta for manifest %s produced %d units, expected %d',
+                     self.id, total, self.units[UNITS_TOTAL])
+            os.unlink(tmp_path)
+            return False
+        os.rename(tmp_path, units_path)
+        self.units[UNITS_PATH] = units_path
+        self.units[UNITS_SIZE] = os.path.getsize(units_path)
+        self.write()
+        return True
+
 
 class UnitWriter(object):
     """
@@ -369,6 +608,124 @@ class UnitWriter(object):
         return False
 
 
+class DeltaWriter(UnitWriter):
+    """
+    Writes the json encoded content units added, updated and removed since
+    a previously published manifest to a (delta) file.
+    Added and updated units are written in full.  Removed units are written
+    with only their type_id and unit_key.
+    :ivar base_id: The ID of the previously published manifest.
+    :type base_id: str
+    """
+
+    def __init__(self, path, base_id):
+        """
+        :param path: The absolute path to the delta file.
+        :type path: str
+        :param base_id: The ID of the previously published manifest.
+        :type base_id: str
+        :raise IOError: on I/O errors
+        """
+        pathlib.mkdir(os.path.dirname(path))
+        UnitWriter.__init__(self, path)
+        self.base_id = base_id
+
+    def add(self, unit):
+        """
+        Add (write) the specified added or updated unit to the file.
+        :param unit: A content unit.
+        :type unit: dict
+        :raise IOError: on I/O errors.
+        :raise ValueError: json encoding errors
+        """
+        UnitWriter.add(self, {DELTA_ACTION: UNIT_ADDED, DELTA_UNIT: unit})
+
+    def remove(self, unit):
+        """
+        Add (write) the specified removed unit to the file.
+        :param unit: A content unit.
+        :type unit: dict
+        :raise IOError: on I/O errors.
+        :raise ValueError: json encoding errors
+        """
+        unit = dict(type_id=unit['type_id'], unit_key=unit['unit_key'])
+        UnitWriter.add(self, {DELTA_ACTION: UNIT_REMOVED, DELTA_UNIT: unit})
+
+
+class UnitsFile(object):
+    """
+    A memory mapped (uncompressed) units file.
+    The file is mapped once and units are read as slices of the map instead
+    of opening and seeking the file for each unit.  The map is released
+    by close() and may be used as a context manager.
+    :ivar path: The absolute path to the units file.
+    :type path: str
+    :ivar closed: The file has been unmapped.
+    :type closed: bool
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The absolute path to the units file.
+        :type path: str
+        :raise IOError: on I/O errors.
+        """
+        self.path = path
+        self.closed = False
+        with open(path, 'rb') as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if size:
+                self.map = mmap.mmap(fp.fileno(), size, access=mmap.ACCESS_READ)
+            else:
+                # empty files cannot be mapped
+                self.map = ''
+
+    def read(self, offset, length):
+        """
+        Read the json encoded unit at the specified offset.
+        :param offset: The offset of the unit within the file.
+        :type offset: int
+        :param length: The length of the unit within the file.
+        :type length: int
+        :return: The json encoded unit.
+        :rtype: str
+        """
+        return self.map[offset:offset + length]
+
+    def __iter__(self):
+        """
+        Iterate the units in the file.
+        :return: A generator of: (offset, length, json encoded unit).
+        :rtype: generator
+        """
+        begin = 0
+        size = len(self.map)
+        while begin < size:
+            end = self.map.find('\n', begin)
+            if end < 0:
+                end = size
+            else:
+                end += 1
+            yield (begin, end - begin, self.map[begin:end])
+            begin = end
+
+    def close(self):
+        """
+        Unmap the file.  This method is idempotent.
+        """
+        if not self.closed:
+            if isinstance(self.map, mmap.mmap):
+                self.map.close()
+            self.map = ''
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused):
+        self.close()
+
+
 class UnitIterator:
     """
     Used to iterate content units inventory file associated with a manifest.
@@ -378,18 +735,15 @@ class UnitIterator:
 
     @staticmethod
     def get_units(path):
-        with open(path) as fp:
-            while True:
-                begin = fp.tell()
-                json_unit = fp.readline()
-                end = fp.tell()
-                if json_unit:
-                    unit = json.loads(json_unit)
-                    length = (end - begin)
-                    ref = UnitRef(path, begin, length)
-                    yield (unit, ref)
-                else:
-                    break
+        units_file = UnitsFile(path)
+        try:
+            for offset, length, json_unit in units_file:
+                unit = json.loads(json_unit)
+                ref = UnitRef(path, offset, length, units_file)
+                yield (unit, ref)
+        finally:
+            # the references read the file once it is unmapped
+            units_file.close()
 
     def __init__(self, path, total_units):
         """
@@ -411,6 +765,64 @@ class UnitIterator:
         return self.total_units
 
 
+class UnitIndex(object):
+    """
+    A compact index of the content units in a units file sorted by unit hash.
+    For each unit, only the hash, the location within the (memory mapped) file
+    and the last_updated timestamp are kept.  The units themselves are read
+    from the file using references as needed.
+    :ivar units_file: The indexed units file.
+    :type units_file: UnitsFile
+    :ivar hashes: The sorted unit hashes.
+    :type hashes: list
+    :ivar offsets: The offset of each unit within the file.
+    :type offsets: array
+    :ivar lengths: The length of each unit within the file.
+    :type lengths: array
+    :ivar last_updated: The last_updated timestamp of each unit.
+    :type last_updated: array
+    """
+
+    def __init__(self, units_file=None):
+        """
+        :param units_file: The units file to be indexed.  None for an empty index.
+        :type units_file: UnitsFile
+        :raise ValueError: json decoding errors
+        """
+        entries = []
+        if units_file is not None:
+            for offset, length, json_unit in units_file:
+                unit = json.loads(json_unit)
+                last_updated = unit.get(constants.LAST_UPDATED) or 0
+                entries.append((unit_hash(unit), offset, length, last_updated))
+            entries.sort()
+        self.units_file = units_file
+        self.hashes = [e[0] for e in entries]
+        self.offsets = array('l', [e[1] for e in entries])
+        self.lengths = array('l', [e[2] for e in entries])
+        self.last_updated = array('d', [e[3] for e in entries])
+
+    def __iter__(self):
+        """
+        Iterate the index in unit hash order.
+        :return: A generator of: (unit_hash, last_updated, unit_ref).
+        :rtype: generator
+        """
+        for i, _hash in enumerate(self.hashes):
+            ref = UnitRef(self.units_file.path, self.offsets[i], self.lengths[i], self.units_file)
+            yield (_hash, self.last_updated[i], ref)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def close(self):
+        """
+        Close the indexed units file.
+        """
+        if self.units_file is not None:
+            self.units_file.close()
+
+
 class UnitRef(object):
     """
     Reference to a unit within the downloaded units file.
@@ -420,9 +832,12 @@ class UnitRef(object):
     :type offset: int
     :ivar length: The length of a specific unit within the file.
     :type length: int
+    :ivar units_file: The optional memory mapped units file.  Once it is
+        closed, the unit is read by opening the file.
+    :type units_file: UnitsFile
     """
 
-    def __init__(self, path, offset, length):
+    def __init__(self, path, offset, length, units_file=None):
         """
         :param path: The absolute path to the units file.
         :type path: str
@@ -430,10 +845,13 @@ class UnitRef(object):
         :type offset: int
         :param length: The length of a specific unit within the file.
         :type length: int
+        :param units_file: The optional memory mapped units file.
+        :type units_file: UnitsFile
         """
         self.path = path
         self.offset = offset
         self.length = length
+        self.units_file = units_file
 
     def fetch(self):
         """
@@ -443,6 +861,8 @@ class UnitRef(object):
         :raise IOError: on I/O errors.
         :raise ValueError: json decoding errors
         """
+        if self.units_file is not None and not self.units_file.closed:
+            return json.loads(self.units_file.read(self.offset, self.length))
         with open(self.path) as fp:
             fp.seek(self.offset)
             json_unit = fp.read(self.length)
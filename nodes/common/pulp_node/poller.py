@@ -119,3 +119,85 @@ class TaskPoller(object):
                 progress.__dict__.update(reported)
                 progress.updated()
         return _hash
+
+
+class MultiTaskPoller(TaskPoller):
+    """
+    The multi-task poller is used to poll many running tasks together, each
+    round of polling fetching all of the tracked tasks after a single delay.
+    :ivar tasks: The tracked tasks.  Maps task ID to a list of: the
+        progress reporting object and the hash of the last reported progress.
+    :type tasks: dict
+    """
+
+    def __init__(self, binding, delay=TaskPoller.DELAY):
+        """
+        :param binding: A pulp API binding.
+        :type binding: pulp_node.handlers.model.PulpBinding
+        :param delay: The delay in seconds between each poll.
+        :type delay: int
+        """
+        super(MultiTaskPoller, self).__init__(binding, delay)
+        self.tasks = {}
+
+    def add(self, task_id, progress):
+        """
+        Begin tracking the specified task.
+        :param task_id: A task ID.
+        :type task_id: str
+        :param progress: A progress reporting object.
+        :type progress: pulp_node.progress.RepositoryProgress
+        """
+        self.tasks[task_id] = [progress, 0]
+
+    def remove(self, task_id):
+        """
+        Stop tracking the specified task.
+        :param task_id: A task ID.
+        :type task_id: str
+        """
+        self.tasks.pop(task_id, None)
+
+    def poll(self):
+        """
+        Poll all of the tracked tasks once.
+        Tasks that have completed or failed are no longer tracked.
+        :return: A list of (task_id, result, exception) for each task that has
+            completed or failed.  The exception is the PollingFailed or
+            TaskFailed raised for a task that failed and is None otherwise.
+        :rtype: list
+        """
+        finished = []
+        if not self.tasks:
+            return finished
+
+        sleep(self.delay)
+
+        for task_id in sorted(self.tasks):
+            tracked = self.tasks[task_id]
+            try:
+                http = self.binding.tasks.get_task(task_id)
+                if http.response_code != httplib.OK:
+                    msg = FETCH_TASK_FAILED % {'t': task_id, 'c': http.response_code}
+                    raise PollingFailed(msg)
+
+                task = http.response_body
+
+                if task.state == CALL_ERROR_STATE:
+                    msg = TASK_FAILED % {'t': task_id, 's': task.state}
+                    raise TaskFailed(msg, task.exception, task.traceback)
+
+                tracked[1] = self._report_progress(tracked[0], task, tracked[1])
+
+                if task.state in CALL_COMPLETE_STATES:
+                    finished.append((task_id, task.result, None))
+            except (PollingFailed, TaskFailed), e:
+                finished.append((task_id, None, e))
+
+        for task_id, result, exception in finished:
+            self.remove(task_id)
+
+        return finished
+
+    def __len__(self):
+        return len(self.tasks)
@@ -17,7 +17,8 @@ from pulp.client.commands.schedule import (
     UpdateScheduleCommand, NextRunCommand, ScheduleStrategy)
 
 from pulp_node import constants
-from pulp_node.extensions.admin.options import NODE_ID_OPTION, MAX_BANDWIDTH_OPTION, MAX_CONCURRENCY_OPTION
+from pulp_node.extensions.admin.options import (NODE_ID_OPTION, MAX_BANDWIDTH_OPTION,
+                                                MAX_CONCURRENCY_OPTION, MAX_SYNC_CONCURRENCY_OPTION)
 
 
 # -- constants ----------------------------------------------------------------
@@ -48,6 +49,7 @@ class NodeCreateScheduleCommand(CreateScheduleCommand):
         self.add_option(NODE_ID_OPTION)
         self.add_option(MAX_BANDWIDTH_OPTION)
         self.add_option(MAX_CONCURRENCY_OPTION)
+        self.add_option(MAX_SYNC_CONCURRENCY_OPTION)
 
 
 class NodeDeleteScheduleCommand(DeleteScheduleCommand):
@@ -86,10 +88,12 @@ class NodeSyncScheduleStrategy(ScheduleStrategy):
         node_id = kwargs[NODE_ID_OPTION.keyword]
         max_bandwidth = kwargs[MAX_BANDWIDTH_OPTION.keyword]
         max_concurrency = kwargs[MAX_CONCURRENCY_OPTION.keyword]
+        max_sync_concurrency = kwargs[MAX_SYNC_CONCURRENCY_OPTION.keyword]
         units = [dict(type_id='node', unit_key=None)]
         options = {
             constants.MAX_DOWNLOAD_BANDWIDTH_KEYWORD: max_bandwidth,
             constants.MAX_DOWNLOAD_CONCURRENCY_KEYWORD: max_concurrency,
+            constants.MAX_SYNC_CONCURRENCY_KEYWORD: max_sync_concurrency,
         }
         return self.api.add_schedule(
             SYNC_OPERATION,
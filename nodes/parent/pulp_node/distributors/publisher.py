@@ -10,6 +10,8 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import os
+import json
+import shutil
 import tarfile
 
 from uuid import uuid4
@@ -18,7 +20,8 @@ from logging import getLogger
 
 from pulp_node import constants
 from pulp_node import pathlib
-from pulp_node.manifest import Manifest, UnitWriter
+from pulp_node.manifest import (Manifest, UnitWriter, DeltaWriter, read_units, unit_identity,
+                                unit_digest, DELTAS_DIR_NAME, DELTA_PATH)
 
 
 log = getLogger(__name__)
@@ -116,6 +119,8 @@ class FilePublisher(Publisher):
         Writes the units.json file and symlinks each of the files associated
         to the unit.storage_path.  Publishing is staged in a temporary directory and
         must use commit() to make the publishing permanent.
+        When the repository has been published before, the delta of the units
+        since then is written and added to the chain of deltas in the manifest.
         :param units: A list of units to publish.
         :type units: iterable
         :return: The absolute path to the manifest.
@@ -123,17 +128,73 @@ class FilePublisher(Publisher):
         """
         pathlib.mkdir(self.publish_dir)
         self.tmp_dir = mkdtemp(dir=self.publish_dir)
-        with UnitWriter(self.tmp_dir) as writer:
-            for unit in units:
-                self.publish_unit(unit)
-                writer.add(unit)
         manifest_id = str(uuid4())
         manifest = Manifest(self.tmp_dir, manifest_id)
+        previous = self.previous_manifest()
+        if previous is None:
+            with UnitWriter(self.tmp_dir) as writer:
+                for unit in units:
+                    self.publish_unit(unit)
+                    writer.add(unit)
+        else:
+            digests = {}
+            for unit in read_units(previous.units_path()):
+                digests[unit_identity(unit)] = unit_digest(unit)
+            delta_path = pathlib.join(self.tmp_dir, DELTAS_DIR_NAME, manifest_id + '.json.gz')
+            with DeltaWriter(delta_path, previous.id) as delta_writer:
+                with UnitWriter(self.tmp_dir) as writer:
+                    for unit in units:
+                        self.publish_unit(unit)
+                        writer.add(unit)
+                        if digests.pop(unit_identity(unit), None) != unit_digest(unit):
+                            delta_writer.add(unit)
+                for identity in digests:
+                    type_id, unit_key = json.loads(identity)
+                    delta_writer.remove(dict(type_id=type_id, unit_key=unit_key))
+            manifest.deltas_published(previous.deltas, delta_writer)
+            self.copy_deltas(previous, manifest)
         manifest.units_published(writer)
         manifest.write()
         self.staged = True
         return manifest.path
 
+    def previous_manifest(self):
+        """
+        Get the manifest of the currently published repository.
+        :return: The manifest or None when the repository has not been
+            published or its units cannot be read.
+        :rtype: Manifest
+        """
+        dir_path = pathlib.join(self.publish_dir, self.repo_id)
+        if not os.path.isdir(dir_path):
+            return None
+        manifest = Manifest(dir_path)
+        try:
+            manifest.read()
+        except (IOError, ValueError):
+            log.exception(manifest.path)
+            return None
+        if not manifest.is_valid() or not manifest.has_valid_units():
+            return None
+        return manifest
+
+    def copy_deltas(self, previous, manifest):
+        """
+        Copy the delta files of the currently published repository that are
+        still referenced by the manifest being published.  A missing delta file
+        breaks the chain and children fall back to downloading all of the units.
+        :param previous: The manifest of the currently published repository.
+        :type previous: Manifest
+        :param manifest: The manifest being published.
+        :type manifest: Manifest
+        """
+        src_dir = os.path.dirname(previous.path)
+        dst_dir = os.path.dirname(manifest.path)
+        for delta in manifest.deltas[:-1]:
+            path = pathlib.join(src_dir, delta[DELTA_PATH])
+            if os.path.exists(path):
+                shutil.copy(path, pathlib.join(dst_dir, delta[DELTA_PATH]))
+
     def publish_unit(self, unit):
         """
         Publish the file associated with the unit into the publish directory.
@@ -16,6 +16,7 @@ from mock import Mock, patch
 from base import Task as TestTask, TaskResult as TestReport
 from pulp_node.handlers.strategies import *
 from pulp_node.error import *
+from pulp_node.poller import TaskFailed
 from pulp_node.handlers.model import Repository
 from pulp_node.handlers.reports import SummaryReport, HandlerProgress
 
@@ -48,6 +49,7 @@ class TestRepo:
 
 
 REPO_ID = 'foo'
+REPO_IDS = ['repo_1', 'repo_2', 'repo_3']
 TYPE_ID = 'random_importer'
 TASK_ID = 'test_task'
 
@@ -69,7 +71,7 @@ PARENT_SETTINGS = {
 
 class TestBase(TestCase):
 
-    def request(self, cancel_on=0):
+    def request(self, cancel_on=0, repo_ids=(REPO_ID,), max_sync_concurrency=None):
         conduit = TestConduit(cancel_on)
         progress = HandlerProgress(conduit)
         summary = SummaryReport()
@@ -77,12 +79,22 @@ class TestBase(TestCase):
             conduit=conduit,
             progress=progress,
             summary=summary,
-            bindings=[dict(repo_id=REPO_ID, details={})],
+            bindings=[dict(repo_id=repo_id, details={}) for repo_id in repo_ids],
             scope=constants.NODE_SCOPE,
-            options={constants.PARENT_SETTINGS: PARENT_SETTINGS}
+            options={
+                constants.PARENT_SETTINGS: PARENT_SETTINGS,
+                constants.MAX_SYNC_CONCURRENCY_KEYWORD: max_sync_concurrency,
+            }
         )
         return request
 
+    def importer_report(self, added=0, updated=0, removed=0):
+        return dict(
+            added_count=added,
+            updated_count=updated,
+            removed_count=removed,
+            details=dict(errors=[], sources={}))
+
     def test_abstract(self):
         # Test
         strategy = HandlerStrategy()
@@ -219,6 +231,81 @@ class TestBase(TestCase):
         # Verify
         mock_cancel.assert_called_with(TASK_ID)
 
+    @patch('pulp_node.resources.pulp_bindings')
+    @patch('pulp_node.handlers.model.Repository.fetch', return_value=None)
+    @patch('pulp_node.handlers.model.Repository.add')
+    @patch('pulp_node.handlers.model.Repository.start_synchronization',
+           side_effect=[TestTask(repo_id) for repo_id in REPO_IDS])
+    @patch('pulp_node.poller.MultiTaskPoller.poll')
+    def test_merge_repositories_concurrently(self, mock_poll, mock_start, *unused):
+        # Setup
+        request = self.request(repo_ids=REPO_IDS, max_sync_concurrency=2)
+        request.started()
+        mock_poll.side_effect = [
+            [('repo_2', self.importer_report(added=2), None)],
+            [],
+            [('repo_1', self.importer_report(updated=1), None),
+             ('repo_3', self.importer_report(removed=3), None)],
+        ]
+        # Test
+        strategy = HandlerStrategy()
+        strategy._merge_repositories(request)
+        # Verify
+        self.assertEqual(len(request.summary.errors), 0)
+        self.assertEqual(mock_start.call_count, 3)
+        self.assertEqual(mock_poll.call_count, 3)
+        for repo_id in REPO_IDS:
+            self.assertEqual(request.summary[repo_id].action, RepositoryReport.ADDED)
+        self.assertEqual(request.summary['repo_1'].units.updated, 1)
+        self.assertEqual(request.summary['repo_2'].units.added, 2)
+        self.assertEqual(request.summary['repo_3'].units.removed, 3)
+
+    @patch('pulp_node.resources.pulp_bindings')
+    @patch('pulp_node.handlers.model.Repository.fetch', return_value=None)
+    @patch('pulp_node.handlers.model.Repository.add')
+    @patch('pulp_node.handlers.model.Repository.start_synchronization',
+           side_effect=[TestTask(repo_id) for repo_id in REPO_IDS])
+    @patch('pulp_node.poller.MultiTaskPoller.poll')
+    def test_merge_repositories_concurrently_failed(self, mock_poll, *unused):
+        # Setup
+        request = self.request(repo_ids=REPO_IDS, max_sync_concurrency=3)
+        request.started()
+        mock_poll.side_effect = [
+            [('repo_1', None, TaskFailed('failed')),
+             ('repo_2', self.importer_report(added=2), None),
+             ('repo_3', self.importer_report(added=3), None)],
+        ]
+        # Test
+        strategy = HandlerStrategy()
+        strategy._merge_repositories(request)
+        # Verify
+        self.assertEqual(len(request.summary.errors), 1)
+        self.assertEqual(request.summary.errors[0].error_id, CaughtException.ERROR_ID)
+        self.assertEqual(request.summary.errors[0].details['repo_id'], 'repo_1')
+        self.assertEqual(request.summary['repo_2'].units.added, 2)
+        self.assertEqual(request.summary['repo_3'].units.added, 3)
+
+    @patch('pulp_node.resources.pulp_bindings')
+    @patch('pulp_node.handlers.model.Repository.fetch', return_value=None)
+    @patch('pulp_node.handlers.model.Repository.add')
+    @patch('pulp_node.handlers.model.Repository.start_synchronization',
+           side_effect=[TestTask(repo_id) for repo_id in REPO_IDS])
+    @patch('pulp_node.handlers.model.Repository.cancel_synchronization')
+    @patch('pulp_node.poller.MultiTaskPoller.poll', return_value=[])
+    def test_merge_repositories_concurrently_cancelled(self, mock_poll, mock_cancel, *unused):
+        # Setup
+        request = self.request(cancel_on=2, repo_ids=REPO_IDS, max_sync_concurrency=2)
+        request.started()
+        # Test
+        strategy = HandlerStrategy()
+        strategy._merge_repositories(request)
+        # Verify
+        self.assertEqual(len(request.summary.errors), 0)
+        self.assertEqual(mock_poll.call_count, 1)
+        self.assertEqual(mock_cancel.call_count, 2)
+        for repo_id in REPO_IDS:
+            self.assertEqual(request.summary[repo_id].action, RepositoryReport.CANCELLED)
+
     def test_strategy_factory(self):
         for name, strategy in STRATEGIES.items():
             self.assertEqual(find_strategy(name), strategy)
@@ -22,6 +22,7 @@ from pulp.server.config import config as pulp_conf
 
 from pulp_node.importers.strategies import *
 from pulp_node.importers.inventory import UnitInventory
+from pulp_node.manifest import UnitIndex
 from pulp_node.importers.reports import SummaryReport, ProgressListener
 from pulp_node.reports import RepositoryProgress
 from pulp_node.error import *
@@ -272,3 +273,49 @@ class TestBase(TestCase):
         for name, strategy in STRATEGIES.items():
             self.assertEqual(find_strategy(name), strategy)
         self.assertRaises(StrategyUnsupported, find_strategy, '---')
+
+
+class TestUnitInventory(TestCase):
+
+    def parent_units(self, units):
+        return [(u, TestUnitRef(u)) for u in units]
+
+    def test_merge(self):
+        # Setup
+        parent_units = [
+            dict(unit_id='1', type_id='T', unit_key={'n': 1}, last_updated=1),
+            dict(unit_id='2', type_id='T', unit_key={'n': 2}, last_updated=2),
+            dict(unit_id='3', type_id='T', unit_key={'n': 3}, last_updated=1),
+        ]
+        child_units = [
+            dict(unit_id='2', type_id='T', unit_key={'n': 2}, last_updated=1, metadata={}),
+            dict(unit_id='3', type_id='T', unit_key={'n': 3}, last_updated=1, metadata={}),
+            dict(unit_id='4', type_id='T', unit_key={'n': 4}, last_updated=1, metadata={}),
+        ]
+        # Test
+        inventory = UnitInventory(BASE_URL, self.parent_units(parent_units), child_units)
+        # Verify
+        parent_only = inventory.units_on_parent_only()
+        self.assertEqual([u['unit_id'] for u, ref in parent_only], ['1'])
+        self.assertEqual(parent_only[0][1].fetch(), parent_units[0])
+        self.assertEqual([u['unit_id'] for u in inventory.units_on_child_only()], ['4'])
+        self.assertEqual([u['unit_id'] for u, ref in inventory.updated_units()], ['2'])
+
+    def test_merge_duplicates(self):
+        # Setup
+        parent_units = [
+            dict(unit_id='1', type_id='T', unit_key={'n': 1}),
+            dict(unit_id='2', type_id='T', unit_key={'n': 1}),
+        ]
+        # Test
+        inventory = UnitInventory(BASE_URL, self.parent_units(parent_units), [])
+        # Verify
+        self.assertEqual([u['unit_id'] for u, ref in inventory.units_on_parent_only()], ['2'])
+
+    def test_close(self):
+        parent_units = Mock(spec=UnitIndex)
+        inventory = UnitInventory(BASE_URL, parent_units, [])
+        # Test
+        inventory.close()
+        # Verify
+        parent_units.close.assert_called_once_with()
@@ -131,4 +131,206 @@ class TestManifest(TestCase):
             units_in.append(unit)
             _unit = ref.fetch()
             self.assertEqual(unit, _unit)
-        self.verify(units, units_in)
\ No newline at end of file
+        self.verify(units, units_in)
+
+    def test_delta_chain(self):
+        # Setup
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        manifest = Manifest(manifest_path, '3')
+        manifest.deltas = [
+            {ID: '1', DELTA_BASE_ID: '0'},
+            {ID: '2', DELTA_BASE_ID: '1'},
+            {ID: '3', DELTA_BASE_ID: '2'},
+        ]
+        # Test & Verify
+        self.assertEqual(manifest.delta_chain('1'), manifest.deltas[1:])
+        self.assertEqual(manifest.delta_chain('0'), manifest.deltas)
+        self.assertEqual(manifest.delta_chain('3'), None)
+        self.assertEqual(manifest.delta_chain(None), None)
+        manifest.deltas[1][ID] = '4'
+        self.assertEqual(manifest.delta_chain('0'), None)
+
+    def test_delta_round_trip(self):
+        # Setup
+        units = []
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        for i in range(0, self.NUM_UNITS):
+            unit = dict(unit_id=i, type_id='T', unit_key={'n': i})
+            units.append(unit)
+        units_path = os.path.join(self.tmp_dir, UNITS_FILE_NAME)
+        writer = UnitWriter(units_path)
+        for u in units:
+            writer.add(u)
+        writer.close()
+        manifest = Manifest(manifest_path, self.MANIFEST_ID)
+        manifest.units_published(writer)
+        manifest.write()
+        cfg = DownloaderConfig()
+        downloader = LocalFileDownloader(cfg)
+        working_dir = os.path.join(self.tmp_dir, 'working_dir')
+        os.makedirs(working_dir)
+        url = 'file://%s' % manifest_path
+        fetched = RemoteManifest(url, downloader, working_dir)
+        fetched.fetch()
+        fetched.write()
+        fetched.fetch_units()
+        list(fetched.get_units())
+        # Test
+        # update unit 0, remove unit 1 and add a unit
+        units[0]['unit_id'] = 'updated'
+        removed = units.pop(1)
+        units.append(dict(unit_id='added', type_id='T', unit_key={'n': self.NUM_UNITS}))
+        delta_path = os.path.join(self.tmp_dir, DELTAS_DIR_NAME, '456.json.gz')
+        delta_writer = DeltaWriter(delta_path, self.MANIFEST_ID)
+        delta_writer.add(units[0])
+        delta_writer.remove(removed)
+        delta_writer.add(units[-1])
+        delta_writer.close()
+        writer = UnitWriter(units_path)
+        for u in units:
+            writer.add(u)
+        writer.close()
+        manifest = Manifest(manifest_path, '456')
+        manifest.units_published(writer)
+        manifest.deltas_published([], delta_writer)
+        manifest.write()
+        previous = Manifest(working_dir)
+        previous.read()
+        fetched = RemoteManifest(url, downloader, working_dir)
+        fetched.fetch()
+        applied = fetched.fetch_deltas(previous)
+        # Verify
+        self.assertTrue(applied)
+        self.assertTrue(fetched.has_valid_units())
+        self.assertEqual(fetched.deltas[0][DELTA_BASE_ID], self.MANIFEST_ID)
+        units_in = sorted([u for u, ref in fetched.get_units()], key=lambda u: u['unit_key']['n'])
+        self.verify(units, units_in)
+
+    def test_delta_broken_chain(self):
+        # Setup
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        manifest = Manifest(manifest_path, '456')
+        manifest.deltas = [{ID: '456', DELTA_BASE_ID: self.MANIFEST_ID, DELTA_PATH: 'none'}]
+        manifest.write()
+        working_dir = os.path.join(self.tmp_dir, 'working_dir')
+        os.makedirs(working_dir)
+        url = 'file://%s' % manifest_path
+        fetched = RemoteManifest(url, LocalFileDownloader(DownloaderConfig()), working_dir)
+        fetched.fetch()
+        # Test & Verify
+        # no delta from the previous manifest
+        self.assertFalse(fetched.fetch_deltas(Manifest(working_dir, '123456')))
+        # the delta file cannot be downloaded
+        self.assertFalse(fetched.fetch_deltas(Manifest(working_dir, self.MANIFEST_ID)))
+
+    def test_delta_size_mismatch(self):
+        # Setup
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        delta_path = os.path.join(self.tmp_dir, DELTAS_DIR_NAME, '456.json.gz')
+        os.makedirs(os.path.dirname(delta_path))
+        with open(delta_path, 'w') as fp:
+            fp.write('truncated')
+        manifest = Manifest(manifest_path, '456')
+        manifest.deltas = [{ID: '456', DELTA_BASE_ID: self.MANIFEST_ID,
+                            DELTA_PATH: os.path.join(DELTAS_DIR_NAME, '456.json.gz'),
+                            DELTA_SIZE: 100}]
+        manifest.write()
+        working_dir = os.path.join(self.tmp_dir, 'working_dir')
+        os.makedirs(working_dir)
+        url = 'file://%s' % manifest_path
+        fetched = RemoteManifest(url, LocalFileDownloader(DownloaderConfig()), working_dir)
+        fetched.fetch()
+        # Test & Verify
+        self.assertFalse(fetched.fetch_deltas(Manifest(working_dir, self.MANIFEST_ID)))
+        self.assertFalse(os.path.exists(os.path.join(working_dir, DELTAS_DIR_NAME, '456.json.gz')))
+
+    def test_index(self):
+        # Setup
+        units = []
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        for i in range(0, self.NUM_UNITS):
+            unit = dict(unit_id=i, type_id='T', unit_key={'n': i}, last_updated=i)
+            units.append(unit)
+        units_path = os.path.join(self.tmp_dir, UNITS_FILE_NAME)
+        writer = UnitWriter(units_path)
+        for u in units:
+            writer.add(u)
+        writer.close()
+        manifest = Manifest(manifest_path, self.MANIFEST_ID)
+        manifest.units_published(writer)
+        manifest.write()
+        # Test
+        index = manifest.get_index()
+        # Verify
+        self.assertEqual(len(index), self.NUM_UNITS)
+        self.assertEqual(index.hashes, sorted(index.hashes))
+        self.assertFalse(manifest.units_path().endswith('.gz'))
+        units_in = []
+        for _hash, last_updated, ref in index:
+            unit = ref.fetch()
+            self.assertEqual(_hash, unit_hash(unit))
+            self.assertEqual(last_updated, unit['last_updated'])
+            self.assertTrue(ref.units_file is index.units_file)
+            units_in.append(unit)
+        units_in.sort(key=lambda u: u['unit_id'])
+        self.verify(units, units_in)
+
+    def test_empty_index(self):
+        # Setup
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        manifest = Manifest(manifest_path, self.MANIFEST_ID)
+        # Test
+        index = manifest.get_index()
+        # Verify
+        self.assertEqual(len(index), 0)
+        self.assertEqual(list(index), [])
+
+    def test_units_file(self):
+        # Setup
+        path = os.path.join(self.tmp_dir, 'units.json')
+        lines = ['{"a": 1}\n', '{"b": 22}\n', '{"c": 333}']
+        with open(path, 'w') as fp:
+            fp.write(''.join(lines))
+        # Test
+        units_file = UnitsFile(path)
+        entries = list(units_file)
+        # Verify
+        self.assertEqual([e[2] for e in entries], lines)
+        for offset, length, json_unit in entries:
+            self.assertEqual(units_file.read(offset, length), json_unit)
+            ref = UnitRef(path, offset, length)
+            self.assertEqual(ref.fetch(), json.loads(json_unit))
+
+    def test_units_file_closed(self):
+        # Setup
+        path = os.path.join(self.tmp_dir, 'units.json')
+        with open(path, 'w') as fp:
+            fp.write('{"a": 1}\n')
+        # Test
+        with UnitsFile(path) as units_file:
+            ref = UnitRef(path, 0, 9, units_file)
+            self.assertEqual(ref.fetch(), {'a': 1})
+        units_file.close()
+        # Verify
+        self.assertTrue(units_file.closed)
+        self.assertEqual(list(units_file), [])
+        # the unit is read from the file instead
+        self.assertEqual(ref.fetch(), {'a': 1})
+
+    def test_unit_iterator_closed(self):
+        # Setup
+        path = os.path.join(self.tmp_dir, 'units.json')
+        with open(path, 'w') as fp:
+            fp.write('{"a": 1}\n{"b": 2}\n')
+        # Test
+        units = list(UnitIterator.get_units(path))
+        # Verify
+        self.assertEqual([u for u, ref in units], [{'a': 1}, {'b': 2}])
+        self.assertTrue(units[0][1].units_file.closed)
+        self.assertEqual([ref.fetch() for u, ref in units], [{'a': 1}, {'b': 2}])
+        # a partly read iterator unmaps the file when closed
+        generator = UnitIterator.get_units(path)
+        unit, ref = generator.next()
+        self.assertFalse(ref.units_file.closed)
+        generator.close()
+        self.assertTrue(ref.units_file.closed)
@@ -0,0 +1,112 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import httplib
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from pulp.common.constants import CALL_RUNNING_STATE, CALL_FINISHED_STATE, CALL_ERROR_STATE
+
+from pulp_node.poller import MultiTaskPoller, PollingFailed, TaskFailed
+
+
+class TestResponse:
+
+    def __init__(self, http_code, body=None):
+        self.response_code = http_code
+        self.response_body = body
+
+
+class TestTask:
+
+    def __init__(self, state, progress_report=None, result=None):
+        self.state = state
+        self.progress_report = progress_report or {}
+        self.result = result
+        self.exception = None
+        self.traceback = None
+
+
+class TestMultiTaskPoller(TestCase):
+
+    def binding(self, responses):
+        binding = Mock()
+        binding.tasks.get_task.side_effect = lambda task_id: responses[task_id]
+        return binding
+
+    @patch('pulp_node.poller.sleep')
+    def test_poll(self, mock_sleep):
+        # Setup
+        progress_1 = Mock()
+        progress_2 = Mock()
+        responses = {
+            'task_1': TestResponse(httplib.OK, TestTask(CALL_FINISHED_STATE, result={'a': 1})),
+            'task_2': TestResponse(httplib.OK, TestTask(CALL_RUNNING_STATE, {'x': {'state': 1}})),
+        }
+        poller = MultiTaskPoller(self.binding(responses))
+        poller.add('task_1', progress_1)
+        poller.add('task_2', progress_2)
+        # Test
+        finished = poller.poll()
+        # Verify
+        mock_sleep.assert_called_once_with(MultiTaskPoller.DELAY)
+        self.assertEqual(finished, [('task_1', {'a': 1}, None)])
+        self.assertEqual(len(poller), 1)
+        self.assertFalse(progress_1.updated.called)
+        self.assertEqual(progress_2.state, 1)
+        progress_2.updated.assert_called_once_with()
+
+    @patch('pulp_node.poller.sleep')
+    def test_poll_progress_unchanged(self, *unused):
+        # Setup
+        progress = Mock()
+        responses = {
+            'task_1': TestResponse(httplib.OK, TestTask(CALL_RUNNING_STATE, {'x': {'state': 1}})),
+        }
+        poller = MultiTaskPoller(self.binding(responses))
+        poller.add('task_1', progress)
+        # Test
+        poller.poll()
+        poller.poll()
+        # Verify
+        self.assertEqual(progress.updated.call_count, 1)
+
+    @patch('pulp_node.poller.sleep')
+    def test_poll_failed(self, *unused):
+        # Setup
+        responses = {
+            'task_1': TestResponse(httplib.NOT_FOUND),
+            'task_2': TestResponse(httplib.OK, TestTask(CALL_ERROR_STATE)),
+            'task_3': TestResponse(httplib.OK, TestTask(CALL_RUNNING_STATE)),
+        }
+        poller = MultiTaskPoller(self.binding(responses))
+        for task_id in responses:
+            poller.add(task_id, Mock())
+        # Test
+        finished = poller.poll()
+        # Verify
+        self.assertEqual(len(finished), 2)
+        self.assertEqual(finished[0][0], 'task_1')
+        self.assertTrue(isinstance(finished[0][2], PollingFailed))
+        self.assertEqual(finished[1][0], 'task_2')
+        self.assertTrue(isinstance(finished[1][2], TaskFailed))
+        self.assertEqual(poller.tasks.keys(), ['task_3'])
+
+    @patch('pulp_node.poller.sleep')
+    def test_poll_nothing(self, mock_sleep):
+        # Test
+        poller = MultiTaskPoller(Mock())
+        finished = poller.poll()
+        # Verify
+        self.assertEqual(finished, [])
+        self.assertFalse(mock_sleep.called)
@@ -21,7 +21,8 @@ from nectar.config import DownloaderConfig
 from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.distributors.http.publisher import HttpPublisher
-from pulp_node.manifest import RemoteManifest
+from pulp_node.manifest import (Manifest, RemoteManifest, read_units, DELTA_PATH, DELTA_ACTION,
+                                DELTA_UNIT, UNIT_REMOVED)
 
 
 class TestHttp(TestCase):
@@ -154,3 +155,32 @@ class TestHttp(TestCase):
             p.publish(units)
         # verify
         self.assertFalse(os.path.exists(p.tmp_dir))
+
+    def test_publish_delta(self):
+        # setup
+        units = self.populate()
+        repo_id = 'test_repo'
+        base_url = 'file://'
+        publish_dir = os.path.join(self.tmpdir, 'nodes/repos')
+        virtual_host = (publish_dir, publish_dir)
+        with HttpPublisher(base_url, virtual_host, repo_id) as p:
+            p.publish([dict(u) for u in units])
+            p.commit()
+        first = Manifest(pathlib.join(publish_dir, repo_id))
+        first.read()
+        # test
+        removed = units.pop(1)
+        with HttpPublisher(base_url, virtual_host, repo_id) as p:
+            p.publish([dict(u) for u in units])
+            p.commit()
+        # verify
+        manifest = Manifest(pathlib.join(publish_dir, repo_id))
+        manifest.read()
+        self.assertEqual(first.deltas, [])
+        self.assertEqual(manifest.delta_chain(first.id), manifest.deltas)
+        self.assertEqual(len(manifest.deltas), 1)
+        path = pathlib.join(publish_dir, repo_id, manifest.deltas[0][DELTA_PATH])
+        entries = list(read_units(path))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0][DELTA_ACTION], UNIT_REMOVED)
+        self.assertEqual(entries[0][DELTA_UNIT]['unit_key'], removed['unit_key'])
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Compares the batched orphan search in OrphanManager against the original
+approach of issuing one repo_content_units query per content unit.
+
+The script creates a throwaway content type and removes it when it is done:
+
+    python benchmark_orphans.py --units 100000 --associated 50
+"""
+
+from optparse import OptionParser
+import time
+import uuid
+
+from pulp.plugins.types import database as content_types_db
+from pulp.plugins.types.model import TypeDefinition
+from pulp.server.db import connection
+from pulp.server.db.model.content import ContentType
+from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.managers.content.orphan import OrphanManager
+
+
+TYPE_ID = 'orphan_benchmark'
+REPO_ID = 'orphan-benchmark-repo'
+
+
+def per_unit_orphan_count(content_type_id):
+    """
+    The original implementation: one count() query per content unit.
+    """
+    content_units_collection = content_types_db.type_units_collection(content_type_id)
+    repo_content_units_collection = RepoContentUnit.get_collection()
+
+    count = 0
+    for content_unit in content_units_collection.find({}, fields=['_id']):
+        if repo_content_units_collection.find({'unit_id': content_unit['_id']}).count() > 0:
+            continue
+        count += 1
+    return count
+
+
+def populate(num_units, percent_associated):
+    content_types_db.update_database([TypeDefinition(TYPE_ID, TYPE_ID, None, 'name', [], [])])
+    units_collection = content_types_db.type_units_collection(TYPE_ID)
+    associations_collection = RepoContentUnit.get_collection()
+
+    units = []
+    associations = []
+    for i in xrange(num_units):
+        unit_id = str(uuid.uuid4())
+        units.append({'_id': unit_id, 'name': 'unit-%d' % i, '_content_type_id': TYPE_ID})
+        if i % 100 < percent_associated:
+            associations.append(RepoContentUnit(REPO_ID, unit_id, TYPE_ID,
+                                                RepoContentUnit.OWNER_TYPE_USER, 'benchmark'))
+        if len(units) >= 1000:
+            units_collection.insert(units, safe=True)
+            units = []
+        if len(associations) >= 1000:
+            associations_collection.insert(associations, safe=True)
+            associations = []
+    if units:
+        units_collection.insert(units, safe=True)
+    if associations:
+        associations_collection.insert(associations, safe=True)
+
+
+def cleanup():
+    RepoContentUnit.get_collection().remove({'repo_id': REPO_ID}, safe=True)
+    content_types_db.type_units_collection(TYPE_ID).drop()
+    ContentType.get_collection().remove({'id': TYPE_ID}, safe=True)
+
+
+def timed(label, func, *args):
+    start = time.time()
+    result = func(*args)
+    print '%-12s %8d orphans in %8.2f seconds' % (label, result, time.time() - start)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--units', type='int', default=100000,
+                      help='number of content units to create')
+    parser.add_option('--associated', type='int', default=50,
+                      help='percentage of units associated with a repository')
+    options, args = parser.parse_args()
+
+    connection.initialize()
+    populate(options.units, options.associated)
+    try:
+        timed('per-unit', per_unit_orphan_count, TYPE_ID)
+        timed('batched', OrphanManager().orphans_count_by_type, TYPE_ID)
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Counts the progress report writes made while publishing units through a step tree, with the
+throttled reports that only write the values that changed, and with a report written in whole
+for every unit as the steps used to do.
+
+The conduit only counts the writes, so no database is needed:
+
+    python benchmark_progress.py --units 100000 --steps 3
+"""
+
+from optparse import OptionParser
+import json
+import time
+
+from pulp.plugins.util.publish_step import PROGRESS_REPORT_INTERVAL, Step
+
+
+class CountingConduit(object):
+    """
+    A status conduit that counts the writes made to it and the size of what they write. Like
+    the conduits the steps used to report to, it can only write whole reports.
+    """
+
+    def __init__(self):
+        self.writes = 0
+        self.size = 0
+
+    def set_progress(self, status):
+        self.writes += 1
+        self.size += len(json.dumps(status))
+
+
+class UpdatingConduit(CountingConduit):
+    """
+    A counting conduit that also writes the values of a report that changed.
+    """
+
+    def update_progress(self, status, changes):
+        self.writes += 1
+        self.size += len(json.dumps(changes))
+
+
+class UnitStep(Step):
+
+    def __init__(self, step_type, num_units):
+        super(UnitStep, self).__init__(step_type)
+        self.num_units = num_units
+
+    def _get_total(self):
+        return self.num_units
+
+    def get_iterator(self):
+        return xrange(self.num_units)
+
+    def process_main(self, item=None):
+        pass
+
+
+def publish(conduit, num_units, num_steps, interval):
+    root = Step('publish', status_conduit=conduit)
+    root.progress_report_interval = interval
+    for i in range(num_steps):
+        root.add_child(UnitStep('step-%d' % i, num_units / num_steps))
+
+    start = time.time()
+    root.process_lifecycle()
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--units', type='int', default=100000,
+                      help='number of units published')
+    parser.add_option('--steps', type='int', default=3,
+                      help='number of steps the units are divided between')
+    options, args = parser.parse_args()
+
+    for label, conduit, interval in (('per-unit', CountingConduit(), 0),
+                                     ('throttled', UpdatingConduit(), PROGRESS_REPORT_INTERVAL)):
+        duration = publish(conduit, options.units, options.steps, interval)
+        print '%-10s %8d writes %12d bytes in %8.2f seconds' % (
+            label, conduit.writes, conduit.size, duration)
+
+
+if __name__ == '__main__':
+    main()
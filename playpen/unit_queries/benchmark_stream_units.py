@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Compares the time to the first unit and to the last unit of a repository when
+generating its units with RepoUnitAssociationQueryManager.get_units and with
+stream_units.
+
+The script creates a throwaway content type and repository and removes them
+when it is done:
+
+    python benchmark_stream_units.py --units 200000 --batch-size 1000
+"""
+
+from optparse import OptionParser
+import time
+import uuid
+
+from pulp.plugins.types import database as content_types_db
+from pulp.plugins.types.model import TypeDefinition
+from pulp.server.db import connection
+from pulp.server.db.model.content import ContentType
+from pulp.server.db.model.criteria import UnitAssociationCriteria
+from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.managers.repo.unit_association_query import RepoUnitAssociationQueryManager
+
+
+TYPE_ID = 'stream_benchmark'
+REPO_ID = 'stream-benchmark-repo'
+
+
+def populate(num_units):
+    content_types_db.update_database([TypeDefinition(TYPE_ID, TYPE_ID, None, 'name', [], [])])
+    units_collection = content_types_db.type_units_collection(TYPE_ID)
+    associations_collection = RepoContentUnit.get_collection()
+
+    units = []
+    associations = []
+    for i in xrange(num_units):
+        unit_id = str(uuid.uuid4())
+        units.append({'_id': unit_id, 'name': 'unit-%d' % i, 'description': 'x' * 200,
+                      '_content_type_id': TYPE_ID})
+        associations.append(RepoContentUnit(REPO_ID, unit_id, TYPE_ID,
+                                            RepoContentUnit.OWNER_TYPE_USER, 'benchmark'))
+        if len(units) >= 1000:
+            units_collection.insert(units, safe=True)
+            associations_collection.insert(associations, safe=True)
+            units = []
+            associations = []
+    if units:
+        units_collection.insert(units, safe=True)
+        associations_collection.insert(associations, safe=True)
+
+
+def cleanup():
+    RepoContentUnit.get_collection().remove({'repo_id': REPO_ID}, safe=True)
+    content_types_db.type_units_collection(TYPE_ID).drop()
+    ContentType.get_collection().remove({'id': TYPE_ID}, safe=True)
+
+
+def timed(label, func, *args, **kwargs):
+    start = time.time()
+    first = None
+    count = 0
+    for unit in func(*args, **kwargs):
+        if first is None:
+            first = time.time() - start
+        count += 1
+    print '%-10s %8d units, first after %8.3f seconds, last after %8.2f seconds' % (
+        label, count, first or 0, time.time() - start)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--units', type='int', default=200000,
+                      help='number of units associated with the repository')
+    parser.add_option('--batch-size', type='int', default=1000,
+                      help='number of units stream_units reads at once')
+    options, args = parser.parse_args()
+
+    connection.initialize()
+    populate(options.units)
+    manager = RepoUnitAssociationQueryManager()
+    try:
+        criteria = UnitAssociationCriteria(type_ids=[TYPE_ID], unit_fields=['name'])
+        timed('get_units', manager.get_units, REPO_ID, criteria, as_generator=True)
+        criteria = UnitAssociationCriteria(type_ids=[TYPE_ID], unit_fields=['name'])
+        timed('streamed', manager.stream_units, REPO_ID, criteria,
+              batch_size=options.batch_size)
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
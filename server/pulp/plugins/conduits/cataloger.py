@@ -16,6 +16,11 @@ from pulp.server.managers import factory as managers
 class CatalogerConduit(object):
     """
     Provides access to pulp platform API.
+    Between begin_refresh() and commit_refresh() or abort_refresh(), entries
+    are written in bulk as a new generation of the content source's entries,
+    which replaces the current one when committed.
+    :ivar writer: The catalog writer used during a bulk refresh.
+    :type writer: pulp.server.managers.content.catalog.CatalogWriter
     """
 
     def __init__(self, source_id, expires):
@@ -30,6 +35,34 @@ class CatalogerConduit(object):
         self.expires = expires
         self.added_count = 0
         self.deleted_count = 0
+        self.writer = None
+
+    def begin_refresh(self):
+        """
+        Begin a bulk refresh of the content source's entries.
+        """
+        manager = managers.content_catalog_manager()
+        self.writer = manager.writer(self.source_id, self.expires)
+
+    def commit_refresh(self):
+        """
+        Replace the content source's entries with those added since
+        begin_refresh() was called.
+        """
+        self.writer.commit()
+        # Once committed, the entries can no longer be aborted
+        self.writer = None
+
+    def abort_refresh(self):
+        """
+        Discard the entries added since begin_refresh() was called, unless
+        they were committed already.
+        """
+        if self.writer is None:
+            return
+        writer = self.writer
+        self.writer = None
+        writer.abort()
 
     def add_entry(self, type_id, unit_key, url):
         """
@@ -41,8 +74,11 @@ class CatalogerConduit(object):
         :param url: The URL used to download content associated with the unit.
         :type url: str
         """
-        manager = managers.content_catalog_manager()
-        manager.add_entry(self.source_id, self.expires, type_id, unit_key, url)
+        if self.writer is not None:
+            self.writer.add_entry(type_id, unit_key, url)
+        else:
+            manager = managers.content_catalog_manager()
+            manager.add_entry(self.source_id, self.expires, type_id, unit_key, url)
         self.added_count += 1
 
     def delete_entry(self, type_id, unit_key):
@@ -53,8 +89,11 @@ class CatalogerConduit(object):
         :param unit_key: The content unit key.
         :type unit_key: dict
         """
-        manager = managers.content_catalog_manager()
-        manager.delete_entry(self.source_id, type_id, unit_key)
+        if self.writer is not None:
+            self.writer.delete_entry(type_id, unit_key)
+        else:
+            manager = managers.content_catalog_manager()
+            manager.delete_entry(self.source_id, type_id, unit_key)
         self.deleted_count += 1
 
     def reset(self):
@@ -14,12 +14,14 @@
 from gettext import gettext as _
 import logging
 import sys
+import uuid
 
 from pymongo.errors import DuplicateKeyError
 
 import pulp.plugins.conduits._common as common_utils
 from pulp.plugins.model import Unit, PublishReport
 from pulp.plugins.types import database as types_db
+from pulp.plugins.util.misc import paginate, DEFAULT_PAGE_SIZE
 from pulp.server.async.tasks import get_current_task_id
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.exceptions import MissingResource
@@ -151,7 +153,7 @@ class SingleRepoUnitsMixin(object):
         self.repo_id = repo_id
         self.exception_class = exception_class
 
-    def get_units(self, criteria=None, as_generator=False):
+    def get_units(self, criteria=None, as_generator=False, streamed=False):
         """
         Returns the collection of content units associated with the repository
         being operated on.
@@ -163,10 +165,19 @@ class SingleRepoUnitsMixin(object):
                the Criteria class can be imported from this module
         :type  criteria: UnitAssociationCriteria
 
+        :param as_generator: if true, return a generator; if false, a list
+        :type  as_generator: bool
+
+        :param streamed: if true, return a generator that reads the units from the
+               database in batches, by type and in order of unit id, as they are
+               needed; the criteria may not specify sorts
+        :type  streamed: bool
+
         :return: list of unit instances
         :rtype:  list or generator of AssociatedUnit
         """
-        return do_get_repo_units(self.repo_id, criteria, self.exception_class, as_generator)
+        return do_get_repo_units(self.repo_id, criteria, self.exception_class, as_generator,
+                                 streamed)
 
 
 class MultipleRepoUnitsMixin(object):
@@ -174,7 +185,7 @@ class MultipleRepoUnitsMixin(object):
     def __init__(self, exception_class):
         self.exception_class = exception_class
 
-    def get_units(self, repo_id, criteria=None, as_generator=False):
+    def get_units(self, repo_id, criteria=None, as_generator=False, streamed=False):
         """
         Returns the collection of content units associated with the given
         repository.
@@ -186,10 +197,19 @@ class MultipleRepoUnitsMixin(object):
                the Criteria class can be imported from this module
         :type  criteria: UnitAssociationCriteria
 
+        :param as_generator: if true, return a generator; if false, a list
+        :type  as_generator: bool
+
+        :param streamed: if true, return a generator that reads the units from the
+               database in batches, by type and in order of unit id, as they are
+               needed; the criteria may not specify sorts
+        :type  streamed: bool
+
         :return: list of unit instances
         :rtype:  list or generator of AssociatedUnit
         """
-        return do_get_repo_units(repo_id, criteria, self.exception_class, as_generator)
+        return do_get_repo_units(repo_id, criteria, self.exception_class, as_generator,
+                                 streamed)
 
 
 class SearchUnitsMixin(object):
@@ -516,6 +536,114 @@ class AddUnitMixin(object):
             logger.exception(_('Content unit association failed [%s]' % str(unit)))
             raise ImporterConduitException(e), None, sys.exc_info()[2]
 
+    def save_units(self, units, batch_size=DEFAULT_PAGE_SIZE):
+        """
+        Performs the same steps as save_unit for many units, but does the work
+        for a batch of units at a time:
+        - Existing units are looked up with a single query per content type.
+        - New units are inserted with a single insert per content type.
+        - Associations to the repository are created with a single insert and
+          the repository's unit counts are updated once per content type.
+
+        Importers that call save_unit for each unit can opt in to this by
+        collecting the units returned from init_unit and passing them here.
+        The id field of each unit is populated by this call.
+
+        :param units:      unit objects returned from the init_unit call
+        :type  units:      iterable of Unit
+        :param batch_size: maximum number of units saved per batch
+        :type  batch_size: int
+        """
+        try:
+            for page in paginate(units, batch_size):
+                units_by_type = {}
+                for unit in page:
+                    units_by_type.setdefault(unit.type_id, []).append(unit)
+
+                for type_id, type_units in units_by_type.items():
+                    self._save_unit_batch(type_id, type_units)
+        except Exception, e:
+            logger.exception(_('Content unit association failed for repository [%s]') %
+                             self.repo_id)
+            raise ImporterConduitException(e), None, sys.exc_info()[2]
+
+    def _save_unit_batch(self, type_id, units):
+        """
+        Create or update a batch of units of the same type and associate them
+        with the repository.
+
+        :param type_id: content type of every unit in the batch
+        :type  type_id: str
+        :param units:   units to save
+        :type  units:   list of pulp.plugins.model.Unit
+        """
+        content_query_manager = manager_factory.content_query_manager()
+        content_manager = manager_factory.content_manager()
+        association_manager = manager_factory.repo_unit_association_manager()
+
+        key_fields = types_db.type_units_unit_key(type_id)
+        existing_units = content_query_manager.get_multiple_units_by_keys_dicts(
+            type_id, [unit.unit_key for unit in units], ['_id'] + list(key_fields))
+
+        # The spec used for the lookup may match more units than were asked for,
+        # so the results are matched back to the batch by unit key.
+        existing_ids = {}
+        for existing_unit in existing_units:
+            key = tuple(existing_unit.get(k) for k in key_fields)
+            existing_ids[key] = existing_unit['_id']
+
+        new_units = []
+        for unit in units:
+            unit_id = existing_ids.get(tuple(unit.unit_key.get(k) for k in key_fields))
+            if unit_id is None:
+                new_units.append(unit)
+                continue
+            content_manager.update_content_unit(type_id, unit_id, common_utils.to_pulp_unit(unit))
+            unit.id = unit_id
+            self._updated_count += 1
+
+        if new_units:
+            self._add_unit_batch(type_id, new_units)
+
+        association_manager.bulk_associate(self.repo_id, type_id, [unit.id for unit in units],
+                                           self.association_owner_type,
+                                           self.association_owner_id)
+
+    def _add_unit_batch(self, type_id, units):
+        """
+        Add a batch of units that were not found in the database. Units that
+        are added by another workflow before the insert, or that appear twice
+        in the same batch, are saved one at a time through _update_unit instead.
+
+        :param type_id: content type of every unit in the batch
+        :type  type_id: str
+        :param units:   units to add
+        :type  units:   list of pulp.plugins.model.Unit
+        """
+        content_query_manager = manager_factory.content_query_manager()
+        content_manager = manager_factory.content_manager()
+
+        unit_ids = [str(uuid.uuid4()) for unit in units]
+        pulp_units = [common_utils.to_pulp_unit(unit) for unit in units]
+        try:
+            content_manager.add_content_units(type_id, zip(unit_ids, pulp_units))
+        except DuplicateKeyError:
+            logger.debug(_('cannot add some units; already exist. updating instead.'))
+        else:
+            for unit, unit_id in zip(units, unit_ids):
+                unit.id = unit_id
+            self._added_count += len(units)
+            return
+
+        inserted = content_query_manager.get_multiple_units_by_ids(type_id, unit_ids, ['_id'])
+        inserted_ids = set(u['_id'] for u in inserted)
+        for unit, unit_id, pulp_unit in zip(units, unit_ids, pulp_units):
+            if unit_id in inserted_ids:
+                unit.id = unit_id
+                self._added_count += 1
+            else:
+                unit.id = self._update_unit(unit, pulp_unit)
+
     def _update_unit(self, unit, pulp_unit):
         """
         Update a unit. If it is not found, add it.
@@ -626,14 +754,52 @@ class StatusMixin(object):
             self.progress_report[self.report_id] = status
             TaskStatus.objects(task_id=self.task_id).update_one(set__progress_report=self.progress_report)
         except Exception, e:
-            logger.exception('Exception from server setting progress for report [%s]' % self.report_id)
-            try:
-                logger.error('Progress value: %s' % str(status))
-            except Exception:
-                # Best effort to print this, but if its that grossly unserializable
-                # the log will tank and we don't want that exception to bubble up
-                pass
-            raise self.exception_class(e), None, sys.exc_info()[2]
+            self._raise_progress_exception(e, status)
+
+    def update_progress(self, status, changes):
+        """
+        Informs the server of the parts of the progress report that changed since it was last
+        set. Only the changed values are written, where set_progress rewrites the progress
+        reports of the whole task.
+
+        @param status: the whole progress report, as would be passed to set_progress
+        @param changes: maps the dotted paths within status of the values that changed to
+               those values, such as {'0.num_processed': 10}; the empty path stands for the
+               whole report
+        @type  changes: dict
+        """
+
+        if self.task_id is None:
+            # not running within a task
+            return
+
+        if self.report_id not in self.progress_report or '' in changes:
+            # There is no earlier report to update
+            self.set_progress(status)
+            return
+
+        try:
+            self.progress_report[self.report_id] = status
+            prefix = 'progress_report.%s.' % self.report_id
+            updates = dict((prefix + path, value) for path, value in changes.iteritems())
+            TaskStatus._get_collection().update({'task_id': self.task_id}, {'$set': updates},
+                                                safe=True)
+        except Exception, e:
+            self._raise_progress_exception(e, status)
+
+    def _raise_progress_exception(self, e, status):
+        """
+        Log the failure to write a progress report and raise it as the exception class of this
+        conduit. This must be called from the except block that caught the failure.
+        """
+        logger.exception('Exception from server setting progress for report [%s]' % self.report_id)
+        try:
+            logger.error('Progress value: %s' % str(status))
+        except Exception:
+            # Best effort to print this, but if its that grossly unserializable
+            # the log will tank and we don't want that exception to bubble up
+            pass
+        raise self.exception_class(e), None, sys.exc_info()[2]
 
 
 class PublishReportMixin(object):
@@ -685,15 +851,21 @@ class PublishReportMixin(object):
         return r
 
 
-def do_get_repo_units(repo_id, criteria, exception_class, as_generator=False):
+def do_get_repo_units(repo_id, criteria, exception_class, as_generator=False, streamed=False):
     """
     Performs a repo unit association query. This is split apart so we can have
-    custom mixins with different signatures.
+    custom mixins with different signatures. Streamed queries always return a
+    generator.
     """
     try:
         association_query_manager = manager_factory.repo_unit_association_query_manager()
-        # Use a get_units as_generator here and cast to a list later, if necessary.
-        units = association_query_manager.get_units(repo_id, criteria=criteria, as_generator=True)
+        if streamed:
+            units = association_query_manager.stream_units(repo_id, criteria=criteria)
+            as_generator = True
+        else:
+            # Use a get_units as_generator here and cast to a list later, if necessary.
+            units = association_query_manager.get_units(repo_id, criteria=criteria,
+                                                        as_generator=True)
 
         # Load all type definitions so we don't hammer the database.
         type_defs = dict((t['id'], t) for t in types_db.all_type_definitions())
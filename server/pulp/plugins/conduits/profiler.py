@@ -15,6 +15,7 @@
 Profiler conduits.
 """
 from gettext import gettext as _
+from threading import RLock
 
 import logging
 import sys
@@ -22,10 +23,144 @@ import sys
 from pulp.plugins.conduits.mixins import MultipleRepoUnitsMixin, ProfilerConduitException, UnitAssociationCriteria
 from pulp.plugins.model import Unit
 from pulp.plugins.types import database as types_db
+from pulp.server.db.model.repository import Repo
 from pulp.server.managers import factory as managers
 
 _LOG = logging.getLogger(__name__)
 
+# Maximum number of repository unit indexes kept in memory by each process
+UNIT_INDEX_CACHE_SIZE = 10
+
+
+class RepoUnitIndex(object):
+    """
+    The units of one content type in a repository, indexed by unit field values.
+    Indexes are built the first time a field is queried and kept with the units.
+
+    Instances are shared between calls, so the units must not be modified.
+
+    :ivar units: all the units of the content type in the repository
+    :type units: list of pulp.plugins.model.Unit
+    """
+
+    def __init__(self, units):
+        self.units = units
+        self._indexes = {}
+        self._lock = RLock()
+
+    def find(self, **fields):
+        """
+        Find the units whose unit key or metadata has the given values, for example
+        index.find(name='zsh', arch='x86_64').
+
+        :param fields: field names mapped to the values the units must have
+        :type  fields: dict
+        :return: list of matching units, in the order they were loaded in
+        :rtype:  list of pulp.plugins.model.Unit
+        """
+        if not fields:
+            return list(self.units)
+        matches = None
+        for field, value in sorted(fields.items()):
+            units = self._index(field).get(value, [])
+            if matches is None:
+                matches = units
+            else:
+                ids = set(id(u) for u in units)
+                matches = [u for u in matches if id(u) in ids]
+            if not matches:
+                return []
+        return list(matches)
+
+    def _index(self, field):
+        """
+        Get the index for the given field, building it if needed.
+
+        :param field: a unit key or metadata field name
+        :type  field: str
+        :return: field values mapped to lists of units
+        :rtype:  dict
+        """
+        with self._lock:
+            index = self._indexes.get(field)
+            if index is None:
+                index = {}
+                for unit in self.units:
+                    if field in unit.unit_key:
+                        value = unit.unit_key[field]
+                    else:
+                        value = unit.metadata.get(field)
+                    try:
+                        index.setdefault(value, []).append(unit)
+                    except TypeError:
+                        # Values such as lists cannot be looked up
+                        continue
+                self._indexes[field] = index
+            return index
+
+
+class UnitIndexCache(object):
+    """
+    A least recently used cache of repository unit indexes. Each entry is stored with the
+    repository's last_unit_added and last_unit_removed values at the time it was loaded, and
+    is discarded when either of them has changed since.
+    """
+
+    def __init__(self, max_size=UNIT_INDEX_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = {}
+        # The keys of the entries, from the least to the most recently used
+        self._order = []
+        self._lock = RLock()
+
+    def get(self, key, stamp):
+        """
+        :param key:   identifies the index
+        :type  key:   tuple
+        :param stamp: the current (last_unit_added, last_unit_removed) of the repository
+        :type  stamp: tuple
+        :return: the cached index, or None if it is missing or stale
+        :rtype:  RepoUnitIndex
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._order.remove(key)
+            if entry[0] != stamp:
+                del self._entries[key]
+                return None
+            # Move the key to the end to mark the entry as the most recently used
+            self._order.append(key)
+            return entry[1]
+
+    def put(self, key, stamp, index):
+        """
+        :param key:   identifies the index
+        :type  key:   tuple
+        :param stamp: the (last_unit_added, last_unit_removed) of the repository the index was
+                      loaded with
+        :type  stamp: tuple
+        :param index: the index to cache
+        :type  index: RepoUnitIndex
+        """
+        with self._lock:
+            if key in self._entries:
+                self._order.remove(key)
+            self._entries[key] = (stamp, index)
+            self._order.append(key)
+            while len(self._order) > self.max_size:
+                del self._entries[self._order.pop(0)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            del self._order[:]
+
+
+_unit_index_cache = UnitIndexCache()
+
+
 class ProfilerConduit(MultipleRepoUnitsMixin):
 
     def __init__(self):
@@ -99,3 +234,42 @@ class ProfilerConduit(MultipleRepoUnitsMixin):
         except Exception, e:
             _LOG.exception(_('Exception from server getting units from repo [%s]' % repo_id))
             raise self.exception_class(e), None, sys.exc_info()[2]
+
+    def get_repo_unit_index(self, repo_id, content_type_id, additional_unit_fields=None):
+        """
+        Returns an index of the units in the given repository with given content type,
+        containing the same units as get_repo_units. Indexes are cached per process and
+        reloaded only when units have been added to or removed from the repository since, so
+        that a repository is loaded once while applicability is calculated for many profiles.
+
+        Cached indexes are shared, so the returned index and its units must not be modified.
+
+        :param repo_id: repo id
+        :type  repo_id: str
+
+        :param content_type_id: content type id of the units
+        :type  content_type_id: str
+
+        :param additional_unit_fields: additional fields from the unit metadata to be added
+                                       in the result
+        :type additional_unit_fields: list of str
+
+        :return: index of the units
+        :rtype:  RepoUnitIndex
+        """
+        additional_unit_fields = sorted(set(additional_unit_fields or []))
+        key = (repo_id, content_type_id, tuple(additional_unit_fields))
+        try:
+            repo = Repo.get_collection().find_one(
+                {'id': repo_id}, fields=['last_unit_added', 'last_unit_removed']) or {}
+        except Exception, e:
+            _LOG.exception(_('Exception from server getting units from repo [%s]' % repo_id))
+            raise self.exception_class(e), None, sys.exc_info()[2]
+        stamp = (repo.get('last_unit_added'), repo.get('last_unit_removed'))
+
+        index = _unit_index_cache.get(key, stamp)
+        if index is None:
+            units = self.get_repo_units(repo_id, content_type_id, additional_unit_fields)
+            index = RepoUnitIndex(units)
+            _unit_index_cache.put(key, stamp, index)
+        return index
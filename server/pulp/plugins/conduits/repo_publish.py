@@ -19,6 +19,7 @@ interacting with the Pulp server during a repo publish.
 import logging
 import sys
 
+from pulp.common import dateutils
 from pulp.plugins.conduits.mixins import (DistributorConduitException, RepoScratchPadMixin,
     RepoScratchpadReadMixin, DistributorScratchPadMixin,
     RepoGroupDistributorScratchPadMixin, StatusMixin,
@@ -84,6 +85,88 @@ class RepoPublishConduit(RepoScratchPadMixin, DistributorScratchPadMixin, Status
             _LOG.exception('Error getting last publish time for repo [%s]' % self.repo_id)
             raise DistributorConduitException(e), None, sys.exc_info()[2]
 
+    def last_successful_publish(self):
+        """
+        Returns the timestamp at which the last successful publish of this repo
+        started, along with the digest of the configuration it was run with, as
+        returned by PluginCallConfiguration.digest. If the repo was never
+        published successfully, both are None.
+
+        @return: timestamp of the last successful publish and digest of its
+                 configuration
+        @rtype:  tuple of (datetime.datetime or None, str or None)
+        """
+        try:
+            repo_publish_manager = manager_factory.repo_publish_manager()
+            return repo_publish_manager.last_successful_publish(self.repo_id,
+                                                                self.distributor_id)
+        except Exception, e:
+            _LOG.exception('Error getting last successful publish for repo [%s]' % self.repo_id)
+            raise DistributorConduitException(e), None, sys.exc_info()[2]
+
+    def removals_retained_since(self):
+        """
+        Returns the earliest time since which the units removed from this repo
+        are sure to still be returned by get_removed_units. The records of
+        older removals may have been reaped.
+
+        @return: timestamp since which the removals are complete
+        @rtype:  datetime.datetime
+        """
+        try:
+            query_manager = manager_factory.repo_unit_association_query_manager()
+            return dateutils.parse_iso8601_datetime(query_manager.removals_retained_since())
+        except Exception, e:
+            _LOG.exception('Error getting removal retention for repo [%s]' % self.repo_id)
+            raise DistributorConduitException(e), None, sys.exc_info()[2]
+
+    def get_removed_units(self, since, type_ids=None):
+        """
+        Returns the units that stopped being associated with this repo since
+        the given time. The units themselves may no longer exist, so only their
+        IDs are returned.
+
+        @param since: timestamp of the earliest removal to return
+        @type  since: datetime.datetime
+
+        @param type_ids: if specified, only units of these types are returned
+        @type  type_ids: list of str
+
+        @return: generator of dicts with the unit_id, unit_type_id and removed
+                 timestamp of the removed units
+        @rtype:  generator
+        """
+        try:
+            query_manager = manager_factory.repo_unit_association_query_manager()
+            return query_manager.get_removed_units(
+                self.repo_id, dateutils.format_iso8601_datetime(since), type_ids)
+        except Exception, e:
+            _LOG.exception('Error getting removed units for repo [%s]' % self.repo_id)
+            raise DistributorConduitException(e), None, sys.exc_info()[2]
+
+    def get_updated_unit_ids(self, since, type_ids=None):
+        """
+        Returns the IDs of the units associated with this repo whose metadata
+        was updated in place since the given time, without their association
+        changing.
+
+        @param since: timestamp of the earliest update to return
+        @type  since: datetime.datetime
+
+        @param type_ids: if specified, only units of these types are returned
+        @type  type_ids: list of str
+
+        @return: dict mapping unit type IDs to lists of IDs of the updated units
+        @rtype:  dict
+        """
+        try:
+            query_manager = manager_factory.repo_unit_association_query_manager()
+            return query_manager.get_updated_unit_ids(
+                self.repo_id, dateutils.format_iso8601_datetime(since), type_ids)
+        except Exception, e:
+            _LOG.exception('Error getting updated units for repo [%s]' % self.repo_id)
+            raise DistributorConduitException(e), None, sys.exc_info()[2]
+
 
 class RepoGroupPublishConduit(RepoGroupDistributorScratchPadMixin, StatusMixin,
                               MultipleRepoUnitsMixin, PublishReportMixin,
@@ -35,6 +35,10 @@ different configuration types as well as accessing an individual configuration
 area.
 """
 
+import hashlib
+import json
+
+
 class PluginCallConfiguration:
     """
     Provides APIs for retrieving values used to drive how a plugin should
@@ -143,6 +147,16 @@ class PluginCallConfiguration:
         map(flattened.update, ordered_configs)
         return flattened
 
+    def digest(self):
+        """
+        Returns a digest of the values of the flattened configuration, which only changes when
+        one of those values does.
+
+        :rtype: str
+        """
+        flattened = json.dumps(self.flatten(), sort_keys=True, default=repr)
+        return hashlib.sha256(flattened).hexdigest()
+
     def _all_configs(self):
         """
         Returns a single ordered list of all configurations to use in a lookup.
@@ -35,6 +35,13 @@ class Importer(object):
         * types - List of all content type IDs that may be imported using this
                importer.
 
+        The following keys are optional:
+
+        * import_associates_only - True if import_units does nothing more than
+               associate the given units with the destination repository. Pulp
+               then copies units between repositories by associating them in bulk
+               itself, without calling import_units. Defaults to False.
+
         This method call may be made multiple times during the course of a
         running Pulp server and thus should not be used for initialization
         purposes.
@@ -240,6 +240,11 @@ class Profiler(object):
         bound repository. The definition of "applicable" is content type specific and up to the
         profiler.
 
+        This is called for every profile that applicability is calculated for, so rather than
+        loading the repository's units each time, profilers should look them up through the
+        conduit's get_repo_unit_index, which keeps the units of recently used repositories in
+        memory.
+
         :param unit_profile:  a consumer unit profile
         :type  unit_profile:  object
         :param bound_repo_id: repo id of a repository to be used to calculate applicability
@@ -253,3 +258,35 @@ class Profiler(object):
         :rtype:               list of str
         """
         raise NotImplementedError()
+
+    def calculate_applicable_units_subset(self, unit_profile, bound_repo_id, unit_ids, config,
+                                          conduit):
+        """
+        Calculate and return the content unit ids applicable to consumers with given unit_profile,
+        considering only the given units of the bound repository. This is used to update existing
+        applicability data after units are added to a repository, without recalculating the
+        applicability of every unit in it.
+
+        Profilers should only implement this if the applicability of a unit does not depend on
+        which other units are in the repository. Otherwise, the applicability data is rebuilt
+        with calculate_applicable_units.
+
+        The units can be retrieved from the conduit's get_units method with a criteria that
+        filters the associations by unit_id.
+
+        :param unit_profile:  a consumer unit profile
+        :type  unit_profile:  object
+        :param bound_repo_id: repo id of a repository to be used to calculate applicability
+                              against the given consumer profile
+        :type  bound_repo_id: str
+        :param unit_ids:      dictionary mapping content type ids to lists of ids of the units
+                              to consider
+        :type  unit_ids:      dict
+        :param config:        plugin configuration
+        :type  config:        pulp.server.plugins.config.PluginCallConfiguration
+        :param conduit:       provides access to relevant Pulp functionality
+        :type  conduit:       pulp.plugins.conduits.profile.ProfilerConduit
+        :return:              dictionary mapping content type ids to lists of applicable unit ids
+        :rtype:               dict
+        """
+        raise NotImplementedError()
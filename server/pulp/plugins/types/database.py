@@ -114,6 +114,13 @@ def update_database(definitions, error_on_missing_definitions=False):
             error_defs.append(type_def)
             continue
 
+        try:
+            _update_last_updated_index(type_def)
+        except Exception:
+            _logger.exception('Exception updating last updated index for type [%s]' % type_def.id)
+            error_defs.append(type_def)
+            continue
+
     if len(error_defs) > 0:
         raise UpdateFailed(error_defs)
 
@@ -314,6 +321,19 @@ def _update_search_indexes(type_def):
     _update_indexes(type_def, False)
 
 
+def _update_last_updated_index(type_def):
+    """
+    Index the time the units were last updated, so that the units updated since a given time can
+    be found without reading the whole collection.
+
+    :param type_def: the type definition of the units
+    :type  type_def: ContentType
+    """
+    collection_name = unit_collection_name(type_def.id)
+    collection = pulp_db.get_collection(collection_name, create=False)
+    collection.ensure_index('_last_updated', unique=False, drop_dups=False)
+
+
 def _drop_indexes(type_def):
     collection_name = unit_collection_name(type_def.id)
     collection = pulp_db.get_collection(collection_name, create=False)
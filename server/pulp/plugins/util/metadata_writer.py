@@ -15,14 +15,72 @@ from verification import CHECKSUM_FUNCTIONS
 
 _LOG = logging.getLogger(__name__)
 BUFFER_SIZE = 1024
+# The number of bytes read at a time when checksumming a metadata file that was not written
+# through a HashingFileWrapper
+CHECKSUM_BUFFER_SIZE = 1024 * 1024
+
+
+class HashingFileWrapper(object):
+    """
+    Wraps a file object opened for writing, and computes the size and checksums of what is
+    written through it. All other attributes are those of the wrapped file object.
+    """
+
+    def __init__(self, file_object, checksum_types=(), underlying_file=None):
+        """
+        :param file_object: file object to write to
+        :type  file_object: file
+        :param checksum_types: checksum types to compute, as found in CHECKSUM_FUNCTIONS
+        :type  checksum_types: iterable of str
+        :param underlying_file: file object that file_object writes to, if it does not close it
+                                itself, such as the file of a GzipFile; it is closed along with
+                                file_object
+        :type  underlying_file: file
+        """
+        self.file_object = file_object
+        self.underlying_file = underlying_file
+        self.size = 0
+        self._hashers = dict((t, CHECKSUM_FUNCTIONS[t]()) for t in checksum_types)
+
+    def write(self, data):
+        """
+        :param data: data to write to the file
+        :type  data: str
+        """
+        self.file_object.write(data)
+        self.size += len(data)
+        for hasher in self._hashers.itervalues():
+            hasher.update(data)
+
+    def close(self):
+        """
+        Close the file object, and the underlying file if any.
+        """
+        self.file_object.close()
+        if self.underlying_file is not None:
+            self.underlying_file.close()
+
+    def hexdigests(self):
+        """
+        :return: checksum types mapped to the checksum of what was written so far
+        :rtype:  dict
+        """
+        return dict((t, hasher.hexdigest()) for t, hasher in self._hashers.iteritems())
+
+    def __getattr__(self, name):
+        return getattr(self.file_object, name)
 
 
 class MetadataFileContext(object):
     """
     Context manager class for metadata file generation.
+
+    The size and checksums of the file are computed as it is written. Once finalized, they are
+    available in the size and checksums attributes, and the size and checksums of its
+    uncompressed content in open_size and open_checksums.
     """
 
-    def __init__(self, metadata_file_path, checksum_type=None):
+    def __init__(self, metadata_file_path, checksum_type=None, checksum_types=None):
         """
         :param metadata_file_path: full path to metadata file to be generated
         :type  metadata_file_path: str
@@ -30,18 +88,31 @@ class MetadataFileContext(object):
                               to the file names of files. If checksum_type is None,
                               no checksum is added to the filename
         :type checksum_type: str or None
+        :param checksum_types: additional checksum types to compute while the file is written
+        :type  checksum_types: list of str or None
         """
 
         self.metadata_file_path = metadata_file_path
         self.metadata_file_handle = None
         self.checksum_type = checksum_type
         self.checksum = None
-        if self.checksum_type is not None:
-            checksum_function = CHECKSUM_FUNCTIONS.get(checksum_type)
-            if not checksum_function:
+        self.checksum_types = list(checksum_types or [])
+        if self.checksum_type is not None and self.checksum_type not in self.checksum_types:
+            self.checksum_types.insert(0, self.checksum_type)
+        for t in self.checksum_types:
+            if t not in CHECKSUM_FUNCTIONS:
                 raise PulpCodedValidationException(
-                    [PulpCodedException(error_codes.PLP1005, checksum_type=checksum_type)])
-            self.checksum_constructor = checksum_function
+                    [PulpCodedException(error_codes.PLP1005, checksum_type=t)])
+        if self.checksum_type is not None:
+            self.checksum_constructor = CHECKSUM_FUNCTIONS[self.checksum_type]
+
+        self.size = None
+        self.checksums = {}
+        self.open_size = None
+        self.open_checksums = {}
+        # The hashing wrappers of the file as stored and of its uncompressed content
+        self._file_hasher = None
+        self._open_hasher = None
 
     def __enter__(self):
 
@@ -93,12 +164,19 @@ class MetadataFileContext(object):
         except Exception, e:
             _LOG.exception(e)
 
+        if self._file_hasher is not None:
+            self.size = self._file_hasher.size
+            self.checksums = self._file_hasher.hexdigests()
+            self.open_size = self._open_hasher.size
+            self.open_checksums = self._open_hasher.hexdigests()
+
         # Add calculated checksum to the filename
         file_name = os.path.basename(self.metadata_file_path)
         if self.checksum_type is not None:
-            with open(self.metadata_file_path, 'rb') as file_handle:
-                content = file_handle.read()
-                checksum = self.checksum_constructor(content).hexdigest()
+            checksum = self.checksums.get(self.checksum_type)
+            if checksum is None:
+                # The file was not written through the hashing wrappers
+                checksum = self._checksum_file(self.checksum_type)
 
             self.checksum = checksum
             file_name_with_checksum = checksum + '-' + file_name
@@ -109,6 +187,25 @@ class MetadataFileContext(object):
 
         # Set the metadata_file_handle to None so we don't double call finalize
         self.metadata_file_handle = None
+        self._file_hasher = None
+        self._open_hasher = None
+
+    def _checksum_file(self, checksum_type):
+        """
+        Calculate the checksum of the metadata file by reading it back.
+
+        :param checksum_type: checksum type, as found in CHECKSUM_FUNCTIONS
+        :type  checksum_type: str
+        :return: the checksum of the file
+        :rtype:  str
+        """
+        hasher = CHECKSUM_FUNCTIONS[checksum_type]()
+        with open(self.metadata_file_path, 'rb') as file_handle:
+            content = file_handle.read(CHECKSUM_BUFFER_SIZE)
+            while content:
+                hasher.update(content)
+                content = file_handle.read(CHECKSUM_BUFFER_SIZE)
+        return hasher.hexdigest()
 
     def _open_metadata_file_handle(self):
         """
@@ -142,11 +239,15 @@ class MetadataFileContext(object):
         msg = _('Opening metadata file handle for [%(p)s]')
         _LOG.debug(msg % {'p': self.metadata_file_path})
 
+        self._file_hasher = HashingFileWrapper(open(self.metadata_file_path, 'wb'),
+                                               self.checksum_types)
         if self.metadata_file_path.endswith('.gz'):
-            self.metadata_file_handle = gzip.open(self.metadata_file_path, 'w')
-
+            gzip_handle = gzip.GzipFile(self.metadata_file_path, 'wb', fileobj=self._file_hasher)
+            self._open_hasher = HashingFileWrapper(gzip_handle, self.checksum_types,
+                                                   self._file_hasher)
         else:
-            self.metadata_file_handle = open(self.metadata_file_path, 'w')
+            self._open_hasher = self._file_hasher
+        self.metadata_file_handle = self._open_hasher
 
     def _write_file_header(self):
         """
@@ -184,13 +285,17 @@ class MetadataFileContext(object):
             # finalize has already been run or initialize has not been run
             return True
 
+        if isinstance(file_object, HashingFileWrapper):
+            file_object = file_object.file_object
+
         try:
             return file_object.closed
         except AttributeError:
             # python 2.6 doesn't have a "closed" attribute on a GzipFile,
-            # so we must look deeper.
+            # so we must look deeper. Closing a GzipFile drops its fileobj, which is
+            # the only file object it has when it was given one to write to.
             if isinstance(file_object, gzip.GzipFile):
-                return file_object.myfileobj is None or file_object.myfileobj.closed
+                return file_object.fileobj is None
             else:
                 raise
 
@@ -1,5 +1,6 @@
 import errno
 from gettext import gettext as _
+import hashlib
 import itertools
 import logging
 import os
@@ -8,6 +9,9 @@ import shutil
 
 DEFAULT_PAGE_SIZE = 1000
 
+# Number of bytes read into RAM at a time when comparing files
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
 _log = logging.getLogger(__name__)
 
 
@@ -146,3 +150,92 @@ def clear_directory(path, skip_list=()):
 
         elif os.path.isfile(entry_path):
             os.unlink(entry_path)
+
+
+def link_tree(source_dir, target_dir, reference_dir=None):
+    """
+    Recreate the tree of source_dir at target_dir without copying the contents of its files
+    where possible. Directories are created and symbolic links are recreated. A regular file
+    that is identical to the file at the same relative path in reference_dir, such as a previous
+    copy of the tree, is hard linked to that file. Other files are hard linked to the source
+    file, and only copied when that fails, such as when source_dir is on another filesystem.
+
+    :param source_dir: path of the directory to recreate
+    :type  source_dir: str
+    :param target_dir: path the directory is recreated at; it must not exist
+    :type  target_dir: str
+    :param reference_dir: path of a directory whose identical files are linked to, if any
+    :type  reference_dir: str
+
+    :return: the number of files whose contents were copied
+    :rtype:  int
+    """
+    copied = 0
+
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        relative_dir = os.path.relpath(dir_path, source_dir)
+        target_path = os.path.normpath(os.path.join(target_dir, relative_dir))
+        os.makedirs(target_path)
+        shutil.copystat(dir_path, target_path)
+
+        for name in dir_names + file_names:
+            source = os.path.join(dir_path, name)
+            target = os.path.join(target_path, name)
+
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+            if os.path.isdir(source):
+                # Created as the walk reaches it
+                continue
+
+            if reference_dir is not None:
+                reference = os.path.normpath(os.path.join(reference_dir, relative_dir, name))
+                if _identical_files(source, reference):
+                    try:
+                        os.link(reference, target)
+                        continue
+                    except OSError:
+                        pass
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+                copied += 1
+
+    return copied
+
+
+def _identical_files(path, other_path):
+    """
+    :param path: path of a regular file
+    :type  path: str
+    :param other_path: path of another file, which may not exist
+    :type  other_path: str
+    :return: True if other_path is a regular file with the same contents as path
+    :rtype:  bool
+    """
+    if os.path.islink(other_path) or not os.path.isfile(other_path):
+        return False
+    if os.path.getsize(path) != os.path.getsize(other_path):
+        return False
+    return _checksum(path) == _checksum(other_path)
+
+
+def _checksum(path):
+    """
+    :param path: path of a file
+    :type  path: str
+    :return: the sha256 checksum of the file's contents
+    :rtype:  str
+    """
+    hasher = hashlib.sha256()
+    file_object = open(path, 'rb')
+    try:
+        bits = file_object.read(CHECKSUM_CHUNK_SIZE)
+        while bits:
+            hasher.update(bits)
+            bits = file_object.read(CHECKSUM_CHUNK_SIZE)
+    finally:
+        file_object.close()
+    return hasher.hexdigest()
@@ -1,8 +1,11 @@
 import copy
+import errno
 from gettext import gettext as _
 from itertools import chain, imap
 import logging
+from multiprocessing.pool import ThreadPool
 import os
+import Queue
 import shutil
 import sys
 import tarfile
@@ -10,7 +13,7 @@ import time
 import traceback
 import uuid
 
-from pulp.common import error_codes
+from pulp.common import dateutils, error_codes
 from pulp.common.plugins import reporting_constants, importer_constants
 from pulp.common.util import encode_unicode
 from pulp.plugins.model import Unit
@@ -28,6 +31,13 @@ from nectar.downloaders.threaded import HTTPThreadedDownloader
 
 _LOG = logging.getLogger(__name__)
 
+# The minimum number of seconds between two progress reports written to the database, unless
+# one is forced by a change of a step's state
+PROGRESS_REPORT_INTERVAL = 1.0
+
+# Marks that a publish step has not yet found out whether it is incremental
+_INCREMENTAL_SINCE_UNKNOWN = object()
+
 
 def _post_order(step):
     """
@@ -42,12 +52,131 @@ def _post_order(step):
     yield step
 
 
+def _changed_paths(old, new, path='', changes=None):
+    """
+    Find the values of a progress report that differ from those of the report last written.
+    Dicts with the same keys and lists of the same length are compared item by item, so that
+    only the values that changed within them are found.
+
+    :param old: the progress report last written
+    :type old: list or dict
+    :param new: the current progress report
+    :type new: list or dict
+    :param path: the dotted path of the reports within the whole report
+    :type path: str
+    :param changes: the dict the changes are added to
+    :type changes: dict
+    :returns: dict mapping the dotted paths of the values that changed to their new values,
+              where the empty path stands for the whole report
+    :rtype: dict
+    """
+    if changes is None:
+        changes = {}
+    if isinstance(old, dict) and isinstance(new, dict) and set(old) == set(new):
+        for key, value in new.iteritems():
+            _changed_paths(old[key], value, '%s.%s' % (path, key) if path else key, changes)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, value in enumerate(new):
+            _changed_paths(old[index], value, '%s.%d' % (path, index) if path else str(index),
+                           changes)
+    elif old != new:
+        changes[path] = new
+    return changes
+
+
+def _process_in_parallel(step, items, process):
+    """
+    Call process with each of the items from a pool of step.process_workers threads, accounting
+    for each item processed as the serial processing loops do. At most step.process_prefetch
+    items are read from the generator ahead of those that have been processed.
+
+    When step.process_ordered is True, the items are accounted for in the order they were read,
+    so that as in the serial loops, the first item to fail is the first one read that failed and
+    only the items read before it are counted as successes. Otherwise they are accounted for as
+    they complete.
+
+    Once an item fails or the step is canceled, no more items are read, and the ones already
+    being processed are waited for before the failure is raised or this returns.
+
+    :param step: the step processing the items
+    :type step: Step
+    :param items: the items to process
+    :type items: iterable
+    :param process: the method processing an item
+    :type process: callable
+    """
+    completed = Queue.Queue()
+
+    def call(index, item):
+        try:
+            process(item)
+            completed.put((index, None))
+        except BaseException:
+            # Every item must be completed, or it would be waited for forever
+            completed.put((index, sys.exc_info()))
+
+    items = iter(items)
+    prefetch = max(step.process_prefetch or 2 * step.process_workers, 1)
+    pool = ThreadPool(step.process_workers)
+    try:
+        failure = None
+        exhausted = False
+        read = 0
+        outstanding = 0
+        # Maps the index of the items that completed out of order to their failure, if any
+        results = {}
+        next_index = 0
+        while True:
+            if not (exhausted or failure or step.canceled) and outstanding < prefetch:
+                try:
+                    item = items.next()
+                except StopIteration:
+                    exhausted = True
+                else:
+                    pool.apply_async(call, (read, item))
+                    read += 1
+                    outstanding += 1
+                continue
+            if not outstanding:
+                break
+
+            index, exc_info = completed.get()
+            outstanding -= 1
+            if step.process_ordered:
+                results[index] = exc_info
+                done = []
+                while next_index in results:
+                    done.append(results.pop(next_index))
+                    next_index += 1
+            else:
+                done = [exc_info]
+
+            for exc_info in done:
+                if failure:
+                    continue
+                if exc_info:
+                    failure = exc_info
+                else:
+                    step.progress_successes += 1
+                    step.progress_details = ""
+                    step.report_progress()
+
+        if failure:
+            raise failure[0], failure[1], failure[2]
+    finally:
+        pool.close()
+        pool.join()
+
+
 class Step(object):
     """
     Base class for step processing. The only tie to the platform is an assumption of
     the use of a conduit that extends StatusMixin for reporting status along the way.
     """
 
+    # The minimum number of seconds between two progress reports written by the root step
+    progress_report_interval = PROGRESS_REPORT_INTERVAL
+
     def __init__(self, step_type, status_conduit=None, non_halting_exceptions=None):
         """
         :param step_type: The id of the step this processes
@@ -70,6 +199,7 @@ class Step(object):
         self.children = []
         self.last_report_time = 0
         self.last_reported_state = self.state
+        self.last_written_report = None
         self.timestamp = str(time.time())
         self.non_halting_exceptions = non_halting_exceptions
         self.exceptions = []
@@ -269,15 +399,26 @@ class Step(object):
             self.last_reported_state = self.state
         if self.parent:
             self.parent.report_progress(force)
+        elif force or time.time() - self.last_report_time >= self.progress_report_interval:
+            # Changes made in between are written along with the next report
+            self.write_progress_report()
+
+    def write_progress_report(self):
+        """
+        Write the progress report of this step tree to the database. Once a report has been
+        written, only the values that changed since are written, if the status conduit
+        supports it.
+        """
+        report = self.get_progress_report()
+        conduit = self.get_status_conduit()
+        if self.last_written_report is None or not hasattr(conduit, 'update_progress'):
+            conduit.set_progress(report)
         else:
-            if force:
-                self.get_status_conduit().set_progress(self.get_progress_report())
-            else:
-                current_time = time.time()
-                if current_time != self.last_report_time:
-                    # Update at most once a second
-                    self.get_status_conduit().set_progress(self.get_progress_report())
-                    self.last_report_time = current_time
+            changes = _changed_paths(self.last_written_report, report)
+            if changes:
+                conduit.update_progress(report, changes)
+        self.last_written_report = copy.deepcopy(report)
+        self.last_report_time = time.time()
 
     def get_progress_report(self):
         """
@@ -536,6 +677,7 @@ class PublishStep(PluginStep):
         super(PublishStep, self).__init__(step_type, repo=repo, conduit=publish_conduit,
                                           config=config, working_dir=working_dir,
                                           plugin_type=distributor_type)
+        self._incremental_since = _INCREMENTAL_SINCE_UNKNOWN
 
     def get_distributor_type(self):
         """
@@ -557,6 +699,64 @@ class PublishStep(PluginStep):
         """
         return self.process_lifecycle()
 
+    def get_incremental_since(self):
+        """
+        Find out whether the incremental steps of this publish only need to process the units
+        associated with the repo since the last successful publish, and since when. This is
+        decided once for the whole publish by the step at the root of it.
+
+        The publish is incremental if the last one succeeded with the same configuration,
+        and no unit processed by an incremental step that cannot handle removals was removed
+        from the repo since. Incremental steps are expected to keep their output of the
+        previous publish themselves, since the working directory does not survive it.
+
+        :return: ISO8601 timestamp at which the last successful publish started, compared with
+                 the created timestamp of the unit associations; None if everything must be
+                 published
+        :rtype:  str or None
+        """
+        if self.parent is not None:
+            return self.parent.get_incremental_since()
+        if self._incremental_since is _INCREMENTAL_SINCE_UNKNOWN:
+            self._incremental_since = self._find_incremental_since()
+        return self._incremental_since
+
+    def _find_incremental_since(self):
+        """
+        :return: ISO8601 timestamp at which the last successful publish started if this publish
+                 can be incremental, None otherwise
+        :rtype:  str or None
+        """
+        incremental_steps = [step for step in _post_order(self)
+                             if getattr(step, 'incremental', False)]
+        if not incremental_steps:
+            return None
+
+        conduit = self.get_conduit()
+        last_publish, config_digest = conduit.last_successful_publish()
+        if last_publish is None:
+            return None
+        if config_digest != self.get_config().digest():
+            _LOG.debug('Configuration changed since the last publish of repository [%s]'
+                       % self.get_repo().id)
+            return None
+        if last_publish < conduit.removals_retained_since():
+            _LOG.debug('Units removed since the last publish of repository [%s] may no longer '
+                       'be recorded' % self.get_repo().id)
+            return None
+
+        type_ids = set()
+        for step in incremental_steps:
+            if not step.incremental_removals:
+                type_ids.update(step.unit_type)
+        if type_ids:
+            for unit in conduit.get_removed_units(last_publish, sorted(type_ids)):
+                _LOG.debug('Units were removed since the last publish of repository [%s]'
+                           % self.get_repo().id)
+                return None
+
+        return dateutils.format_iso8601_datetime(last_publish)
+
     @staticmethod
     def _create_symlink(source_path, link_path):
         """
@@ -598,6 +798,19 @@ class UnitPublishStep(PublishStep):
     PluginStep with the PluginStepIterativeProcessingMixin
     """
 
+    # The number of threads process_unit is called from; with 1 the units are processed serially
+    process_workers = 1
+    # The number of units read ahead of those processed; defaults to twice process_workers
+    process_prefetch = None
+    # Whether the units processed in parallel are accounted for in the order they are read
+    process_ordered = True
+    # Whether only the units associated, or updated in place, since the last successful publish
+    # are processed, when possible; see PublishStep.get_incremental_since
+    incremental = False
+    # Whether an incremental step handles the units removed since the last publish itself, by
+    # way of get_removed_units; if not, any such removal makes the publish a full one
+    incremental_removals = False
+
     def __init__(self, step_type, unit_type=None, association_filters=None,
                  unit_fields=None):
         """
@@ -617,20 +830,86 @@ class UnitPublishStep(PublishStep):
         self.skip_list = set()
         self.association_filters = association_filters
         self.unit_fields = unit_fields
+        self._updated_unit_ids = None
 
     def get_unit_generator(self):
         """
         This method returns a generator for the unit_type specified on the PublishStep.
         The units created by this generator will be iterated over by the process_unit method.
+        The units are streamed from the database in batches, by type and in order of unit id.
 
         :return: generator of units
         :rtype:  GeneratorTyp of Units
         """
         types_to_query = (set(self.unit_type)).difference(self.skip_list)
         criteria = UnitAssociationCriteria(type_ids=list(types_to_query),
-                                           association_filters=self.association_filters,
+                                           association_filters=self.get_association_filters(),
                                            unit_fields=self.unit_fields)
-        return self.get_conduit().get_units(criteria, as_generator=True)
+        return self.get_conduit().get_units(criteria, as_generator=True, streamed=True)
+
+    def is_incremental(self):
+        """
+        :return: whether only the units associated since the last successful publish are
+                 processed by this step
+        :rtype:  bool
+        """
+        return self.incremental and self.get_incremental_since() is not None
+
+    def get_association_filters(self):
+        """
+        Return the filters the associations of the units processed by this step match. When the
+        step is incremental, they are restricted to the associations created since the last
+        successful publish, and to those of the units updated in place since.
+
+        :return: association filters
+        :rtype:  dict or None
+        """
+        if not self.is_incremental():
+            return self.association_filters
+        since_filter = {'repo_id': self.get_repo().id,
+                        'created': {'$gte': self.get_incremental_since()}}
+        updated = self.get_updated_unit_ids()
+        if updated:
+            updated_filters = [{'unit_type_id': type_id, 'unit_id': {'$in': unit_ids}}
+                               for type_id, unit_ids in sorted(updated.items())]
+            since_filter = {'repo_id': since_filter.pop('repo_id'),
+                            '$or': [since_filter] + updated_filters}
+        if not self.association_filters:
+            return since_filter
+        return {'$and': [self.association_filters, since_filter]}
+
+    def get_updated_unit_ids(self):
+        """
+        Return the ids of the units of the types processed by this step that were updated in
+        place since the last successful publish, while staying associated with the repo. They
+        are looked up once per step, so that the units counted and those processed match.
+
+        :return: dict mapping unit type ids to lists of ids of the updated units
+        :rtype:  dict
+        """
+        if not self.is_incremental():
+            return {}
+        if self._updated_unit_ids is None:
+            since = dateutils.parse_iso8601_datetime(self.get_incremental_since())
+            types_to_query = set(self.unit_type).difference(self.skip_list)
+            self._updated_unit_ids = self.get_conduit().get_updated_unit_ids(
+                since, sorted(types_to_query))
+        return self._updated_unit_ids
+
+    def get_removed_units(self):
+        """
+        Return the units of the types processed by this step that were removed from the repo
+        since the last successful publish, so that an incremental step handling removals can
+        remove them from its output. A unit may have been associated again since.
+
+        :return: dicts with the unit_id, unit_type_id and removed timestamp of the units
+        :rtype:  iterable of dict
+        """
+        if not self.is_incremental():
+            return []
+        since = dateutils.parse_iso8601_datetime(self.get_incremental_since())
+        types_to_query = set(self.unit_type).difference(self.skip_list)
+        return self.get_conduit().get_removed_units(since, list(types_to_query))
 
     def is_skipped(self):
         """
@@ -666,6 +945,9 @@ class UnitPublishStep(PublishStep):
         This block is called for the main processing loop
         """
         package_unit_generator = self.get_unit_generator()
+        if self.process_workers > 1:
+            _process_in_parallel(self, package_unit_generator, self.process_unit)
+            return
         for package_unit in package_unit_generator:
             if self.canceled:
                 return
@@ -689,9 +971,10 @@ class UnitPublishStep(PublishStep):
             id_list = self.unit_type
         total = 0
         types_to_query = set(id_list).difference(self.skip_list)
-        if not ignore_filter and self.association_filters:
+        association_filters = self.get_association_filters()
+        if not ignore_filter and association_filters:
             # We are copying using a filter so we have to get everything
-            new_filter = copy.deepcopy(self.association_filters)
+            new_filter = copy.deepcopy(association_filters)
             new_filter['unit_type_id'] = {'$in': list(types_to_query)}
             criteria = Criteria(filters=new_filter)
             association_query_manager = manager_factory.repo_unit_association_query_manager()
@@ -722,9 +1005,15 @@ class AtomicDirectoryPublishStep(PublishStep):
             link each file in the source directory to a file with the same name in the target
             directory
     :type only_publish_directory_contents: bool
+    :param move_source_dir: If true, the source directory is moved to the master directory
+            instead of being copied, and left empty. When they are on different filesystems,
+            the files of the source directory that are unchanged since the previous publish are
+            hard linked to those of the previous master directory instead, and only the others
+            are copied.
+    :type move_source_dir: bool
     """
     def __init__(self, source_dir, publish_locations, master_publish_dir, step_type=None,
-                 only_publish_directory_contents=False):
+                 only_publish_directory_contents=False, move_source_dir=False):
         step_type = step_type if step_type else reporting_constants.PUBLISH_STEP_DIRECTORY
         super(AtomicDirectoryPublishStep, self).__init__(step_type)
         self.context = None
@@ -732,6 +1021,7 @@ class AtomicDirectoryPublishStep(PublishStep):
         self.publish_locations = publish_locations
         self.master_publish_dir = master_publish_dir
         self.only_publish_directory_contents = only_publish_directory_contents
+        self.move_source_dir = move_source_dir
 
     def process_main(self):
         """
@@ -747,8 +1037,11 @@ class AtomicDirectoryPublishStep(PublishStep):
         # Given that it is timestamped for this publish/repo we could skip the copytree
         # for items where http & https are published to a separate directory
 
-        _LOG.debug('Copying tree from %s to %s' % (self.source_dir, timestamp_master_dir))
-        shutil.copytree(self.source_dir, timestamp_master_dir, symlinks=True)
+        if self.move_source_dir:
+            self._move_source_dir(timestamp_master_dir)
+        else:
+            _LOG.debug('Copying tree from %s to %s' % (self.source_dir, timestamp_master_dir))
+            shutil.copytree(self.source_dir, timestamp_master_dir, symlinks=True)
 
         for source_relative_location, publish_location in self.publish_locations:
             if source_relative_location.startswith('/'):
@@ -789,6 +1082,45 @@ class AtomicDirectoryPublishStep(PublishStep):
         # Clear out any previously published masters
         self._clear_directory(self.master_publish_dir, skip_list=[self.parent.timestamp])
 
+    def _move_source_dir(self, timestamp_master_dir):
+        """
+        Move the source directory to the master directory, or recreate it there by linking its
+        files when it is on another filesystem, and leave an empty source directory behind.
+
+        :param timestamp_master_dir: The master directory of this publish
+        :type timestamp_master_dir: str
+        """
+        misc.mkdir(self.master_publish_dir)
+        try:
+            _LOG.debug('Moving %s to %s' % (self.source_dir, timestamp_master_dir))
+            os.rename(self.source_dir, timestamp_master_dir)
+        except OSError, e:
+            if e.errno != errno.EXDEV:
+                raise
+            previous_master_dir = self._previous_master_dir()
+            _LOG.debug('Linking tree from %s to %s against %s' % (
+                self.source_dir, timestamp_master_dir, previous_master_dir))
+            copied = misc.link_tree(self.source_dir, timestamp_master_dir, previous_master_dir)
+            _LOG.debug('Copied %d changed files to %s' % (copied, timestamp_master_dir))
+            shutil.rmtree(self.source_dir)
+        os.makedirs(self.source_dir)
+
+    def _previous_master_dir(self):
+        """
+        :return: the most recently modified master directory other than the one of this
+                 publish, or None if there is none
+        :rtype: str
+        """
+        master_dirs = []
+        for name in os.listdir(self.master_publish_dir):
+            path = os.path.join(self.master_publish_dir, name)
+            if name != self.parent.timestamp and os.path.isdir(path) \
+                    and not os.path.islink(path):
+                master_dirs.append((os.path.getmtime(path), path))
+        if not master_dirs:
+            return None
+        return max(master_dirs)[1]
+
 
 class SaveTarFilePublishStep(PublishStep):
     """
@@ -868,12 +1200,21 @@ class PluginStepIterativeProcessingMixin(object):
     A mixin for steps that iterate over a generator
     """
 
+    # The number of threads process_item is called from; with 1 the items are processed serially
+    process_workers = 1
+    # The number of items read ahead of those processed; defaults to twice process_workers
+    process_prefetch = None
+    # Whether the items processed in parallel are accounted for in the order they are read
+    process_ordered = True
 
     def _process_block(self):
         """
         This block is called for the main processing loop and handles reporting.
         """
         generator = self.get_generator()
+        if self.process_workers > 1:
+            _process_in_parallel(self, generator, self.process_item)
+            return
         for item in generator:
             if self.canceled:
                 return
@@ -0,0 +1,238 @@
+"""
+This module contains the write-behind buffer that workers use to record the state transitions of
+their tasks, and the cache of canceled tasks they check before running a task.
+
+Both are kept per process. The buffer is flushed to the database when it holds status_flush_size
+tasks, when status_flush_interval seconds have passed since a transition was buffered, when a
+task completes if status_flush_on_complete is set, and when the worker process shuts down. These
+settings are found in the [tasks] section of the server configuration.
+"""
+import logging
+import threading
+import time
+
+from pulp.common import constants, dateutils
+from pulp.server.config import config
+from pulp.server.db.model.dispatch import TaskStatus
+
+
+_logger = logging.getLogger(__name__)
+
+# The number of seconds since their cancellation that the RevocationCache loads canceled tasks for
+REVOCATION_WINDOW = 24 * 60 * 60
+
+# The buffer and revocation cache used by this process, created on first use
+_buffer = None
+_revocations = None
+
+
+class TaskStatusBuffer(object):
+    """
+    Coalesces the TaskStatus updates of the tasks run by a worker process, so that a task going
+    through several states between two flushes costs a single write for its fields. All the
+    updates are upserts, since the TaskStatus may not have reached the database the worker reads
+    from yet.
+
+    A state is either forced, or only set on a task that is not already in a complete state, so
+    that a task canceled while its transitions wait in the buffer stays canceled.
+    """
+
+    def __init__(self, flush_size=None, flush_interval=None, flush_on_complete=None):
+        """
+        :param flush_size:        The number of tasks with buffered updates that triggers a
+                                  flush. Defaults to the status_flush_size setting.
+        :type  flush_size:        int
+        :param flush_interval:    The number of seconds an update may stay in the buffer. When
+                                  0, every update is written as soon as it is made. Defaults to
+                                  the status_flush_interval setting.
+        :type  flush_interval:    float
+        :param flush_on_complete: Whether the buffer is flushed when a task completes. Defaults
+                                  to the status_flush_on_complete setting.
+        :type  flush_on_complete: bool
+        """
+        if flush_size is None:
+            flush_size = config.getint('tasks', 'status_flush_size')
+        if flush_interval is None:
+            flush_interval = config.getfloat('tasks', 'status_flush_interval')
+        if flush_on_complete is None:
+            flush_on_complete = config.getboolean('tasks', 'status_flush_on_complete')
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flush_on_complete = flush_on_complete
+
+        self._lock = threading.RLock()
+        self._timer = None
+        # Maps task ids to a dict of the fields to set, the state to set and whether it is forced
+        self._pending = {}
+
+    def update(self, task_id, fields=None, state=None, force_state=False):
+        """
+        Buffer an update to a TaskStatus. Fields set by an earlier update still in the buffer are
+        overwritten, and the state replaces the buffered one.
+
+        :param task_id:     The id of the task
+        :type  task_id:     basestring
+        :param fields:      Maps TaskStatus field names to the value to set them to
+        :type  fields:      dict
+        :param state:       The state to move the task to, if any
+        :type  state:       basestring
+        :param force_state: Whether the state is set even if the task is in a complete state
+        :type  force_state: bool
+        """
+        with self._lock:
+            pending = self._pending.setdefault(task_id, {'fields': {}, 'state': None,
+                                                         'force_state': False})
+            pending['fields'].update(fields or {})
+            if state is not None:
+                pending['state'] = state
+                pending['force_state'] = force_state
+            complete = state in constants.CALL_COMPLETE_STATES
+            flush_now = self.flush_interval <= 0 or len(self._pending) >= self.flush_size or \
+                (complete and self.flush_on_complete)
+            if not flush_now:
+                self._start_timer()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all the buffered updates to the database. Updates that fail to be written are kept
+        in the buffer, under any update made to the same task in the meantime.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        for task_id, update in pending.iteritems():
+            try:
+                self._write(task_id, update)
+            except Exception:
+                _logger.exception('Failed to write the status of task %s' % task_id)
+                self._requeue(task_id, update)
+
+    def _write(self, task_id, update):
+        """
+        :param task_id: The id of the task
+        :type  task_id: basestring
+        :param update:  The buffered update of the task, as stored in _pending
+        :type  update:  dict
+        """
+        to_set = dict(('set__%s' % name, value) for name, value in update['fields'].iteritems())
+        if update['state'] is not None and update['force_state']:
+            to_set['set__state'] = update['state']
+        if to_set:
+            TaskStatus.objects(task_id=task_id).update_one(upsert=True, **to_set)
+        if update['state'] is not None and not update['force_state']:
+            TaskStatus.objects(task_id=task_id, state__nin=constants.CALL_COMPLETE_STATES).\
+                update_one(set__state=update['state'])
+
+    def _requeue(self, task_id, update):
+        """
+        Put an update that failed to be written back in the buffer, under any newer update of the
+        same task.
+
+        :param task_id: The id of the task
+        :type  task_id: basestring
+        :param update:  The buffered update of the task, as stored in _pending
+        :type  update:  dict
+        """
+        with self._lock:
+            newer = self._pending.get(task_id)
+            if newer is not None:
+                update['fields'].update(newer['fields'])
+                if newer['state'] is not None:
+                    update['state'] = newer['state']
+                    update['force_state'] = newer['force_state']
+            self._pending[task_id] = update
+            self._start_timer()
+
+    def _start_timer(self):
+        """
+        Schedule a flush of the buffer flush_interval seconds from now, unless one is already
+        scheduled. This must be called with the lock held.
+        """
+        if self._timer is None and self.flush_interval > 0:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+class RevocationCache(object):
+    """
+    The ids of the tasks that were canceled before they started in the last REVOCATION_WINDOW
+    seconds, loaded from the database every refresh_interval seconds.
+
+    Canceling a task also revokes it, and the worker that receives it then drops it without
+    running it. The cache covers the tasks that were canceled while their worker was not
+    listening, and is the only thing checked before running a task: a task canceled since the
+    last refresh is dropped by the revocation instead.
+    """
+
+    def __init__(self, refresh_interval=None):
+        """
+        :param refresh_interval: The number of seconds the canceled tasks are cached for.
+                                 Defaults to the revocation_refresh_interval setting.
+        :type  refresh_interval: float
+        """
+        if refresh_interval is None:
+            refresh_interval = config.getfloat('tasks', 'revocation_refresh_interval')
+        self.refresh_interval = refresh_interval
+        self._revoked = frozenset()
+        self._last_refresh = None
+
+    def is_revoked(self, task_id):
+        """
+        :param task_id: The id of the task
+        :type  task_id: basestring
+        :return:        True if the task was canceled, False otherwise
+        :rtype:         bool
+        """
+        if self._last_refresh is None or \
+                time.time() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+        return task_id in self._revoked
+
+    def refresh(self):
+        """
+        Load the ids of the tasks that were canceled before they started in the last
+        REVOCATION_WINDOW seconds.
+        """
+        now = time.time()
+        canceled_since = dateutils.format_iso8601_utc_timestamp(now - REVOCATION_WINDOW)
+        self._revoked = frozenset(TaskStatus.objects(state=constants.CALL_CANCELED_STATE,
+                                                     start_time=None,
+                                                     finish_time__gte=canceled_since)
+                                  .distinct('task_id'))
+        self._last_refresh = now
+
+
+def get_buffer():
+    """
+    :return: the TaskStatusBuffer of this process
+    :rtype:  TaskStatusBuffer
+    """
+    global _buffer
+    if _buffer is None:
+        _buffer = TaskStatusBuffer()
+    return _buffer
+
+
+def get_revocations():
+    """
+    :return: the RevocationCache of this process
+    :rtype:  RevocationCache
+    """
+    global _revocations
+    if _revocations is None:
+        _revocations = RevocationCache()
+    return _revocations
+
+
+def flush():
+    """
+    Write the buffered TaskStatus updates of this process to the database, if there are any.
+    """
+    if _buffer is not None:
+        _buffer.flush()
@@ -8,10 +8,11 @@ import uuid
 from celery import task, Task as CeleryTask, current_task
 from celery.app import control, defaults
 from celery.result import AsyncResult
-from celery.signals import worker_init
+from celery.signals import worker_init, worker_process_shutdown, worker_shutdown
 from mongoengine.queryset import DoesNotExist
 
 from pulp.common import constants, dateutils
+from pulp.server.async import status_buffer
 from pulp.server.async.celery_instance import celery, RESOURCE_MANAGER_QUEUE, \
     DEDICATED_QUEUE_EXCHANGE
 from pulp.server.exceptions import PulpException, MissingResource
@@ -61,7 +62,7 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
             break
 
         try:
-            worker = resources.get_unreserved_worker()
+            worker = resources.get_unreserved_worker(resource_id)
         except NoWorkers:
             pass
         else:
@@ -71,6 +72,7 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
         time.sleep(0.25)
 
     ReservedResource(task_id, worker['name'], resource_id).save()
+    resources.record_reservation(task_id, worker['name'], resource_id)
 
     inner_kwargs['routing_key'] = worker.name
     inner_kwargs['exchange'] = DEDICATED_QUEUE_EXCHANGE
@@ -303,12 +305,8 @@ class Task(CeleryTask, ReservedTaskMixin):
         This overrides CeleryTask's __call__() method. We use this method
         for task state tracking of Pulp tasks.
         """
-        # Check task status and skip running the task if task state is 'canceled'.
-        try:
-            task_status = TaskStatus.objects.get(task_id=self.request.id)
-        except DoesNotExist:
-            task_status = None
-        if task_status and task_status['state'] == constants.CALL_CANCELED_STATE:
+        # Skip running the task if it was canceled before it started.
+        if status_buffer.get_revocations().is_revoked(self.request.id):
             _logger.debug("Task cancel received for task-id : [%s]" % self.request.id)
             return
         # Update start_time and set the task state to 'running' for asynchronous tasks.
@@ -317,10 +315,11 @@ class Task(CeleryTask, ReservedTaskMixin):
         if not self.request.called_directly:
             now = datetime.now(dateutils.utc_tz())
             start_time = dateutils.format_iso8601_datetime(now)
-            # Using 'upsert' to avoid a possible race condition described in the apply_async method
-            # above.
-            TaskStatus.objects(task_id=self.request.id).update_one(
-                set__state=constants.CALL_RUNNING_STATE, set__start_time=start_time, upsert=True)
+            # The update is buffered, and is written along with the task's completion if the
+            # task completes quickly. It is an upsert to avoid a possible race condition
+            # described in the apply_async method above.
+            status_buffer.get_buffer().update(self.request.id, {'start_time': start_time},
+                                              state=constants.CALL_RUNNING_STATE)
         # Run the actual task
         _logger.debug("Running task : [%s]" % self.request.id)
         return super(Task, self).__call__(*args, **kwargs)
@@ -341,15 +340,7 @@ class Task(CeleryTask, ReservedTaskMixin):
         if not self.request.called_directly:
             now = datetime.now(dateutils.utc_tz())
             finish_time = dateutils.format_iso8601_datetime(now)
-            task_status = TaskStatus.objects.get(task_id=task_id)
-            task_status['finish_time'] = finish_time
-            task_status['result'] = retval
-
-            # Only set the state to finished if it's not already in a complete state. This is
-            # important for when the task has been canceled, so we don't move the task from canceled
-            # to finished.
-            if task_status['state'] not in constants.CALL_COMPLETE_STATES:
-                task_status['state'] = constants.CALL_FINISHED_STATE
+            task_status = {'finish_time': finish_time, 'result': retval}
             if isinstance(retval, TaskResult):
                 task_status['result'] = retval.return_value
                 if retval.error:
@@ -366,7 +357,11 @@ class Task(CeleryTask, ReservedTaskMixin):
                 task_status['spawned_tasks'] = [retval.task_id, ]
                 task_status['result'] = None
 
-            task_status.save()
+            # The state is only set to finished if it's not already in a complete state. This is
+            # important for when the task has been canceled, so we don't move the task from
+            # canceled to finished.
+            status_buffer.get_buffer().update(task_id, task_status,
+                                              state=constants.CALL_FINISHED_STATE)
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """
@@ -384,15 +379,12 @@ class Task(CeleryTask, ReservedTaskMixin):
         if not self.request.called_directly:
             now = datetime.now(dateutils.utc_tz())
             finish_time = dateutils.format_iso8601_datetime(now)
-            task_status = TaskStatus.objects.get(task_id=task_id)
-            task_status['state'] = constants.CALL_ERROR_STATE
-            task_status['finish_time'] = finish_time
-            task_status['traceback'] = einfo.traceback
             if not isinstance(exc, PulpException):
                 exc = PulpException(str(exc))
-            task_status['error'] = exc.to_dict()
-
-            task_status.save()
+            task_status = {'finish_time': finish_time, 'traceback': einfo.traceback,
+                           'error': exc.to_dict()}
+            status_buffer.get_buffer().update(task_id, task_status,
+                                              state=constants.CALL_ERROR_STATE, force_state=True)
 
 
 def cancel(task_id):
@@ -416,8 +408,11 @@ def cancel(task_id):
         _logger.info(msg % {'task_id': task_id, 'state': task_status['state']})
         return
     controller.revoke(task_id, terminate=True)
+    # The finish time is when the task was canceled, which bounds the canceled tasks the workers
+    # load into their RevocationCache
+    finish_time = dateutils.format_iso8601_datetime(datetime.now(dateutils.utc_tz()))
     TaskStatus.objects(task_id=task_id, state__nin=constants.CALL_COMPLETE_STATES).\
-        update_one(set__state=constants.CALL_CANCELED_STATE)
+        update_one(set__state=constants.CALL_CANCELED_STATE, set__finish_time=finish_time)
     msg = _('Task canceled: %(task_id)s.')
     msg = msg % {'task_id': task_id}
     _logger.info(msg)
@@ -507,3 +502,30 @@ def cleanup_old_worker(*args, **kwargs):
     """
     name = kwargs['sender'].hostname
     _delete_worker(name, normal_shutdown=True)
+
+
+@worker_init.connect
+def use_reservation_registry(*args, **kwargs):
+    """
+    Have the resource manager place reserved tasks using an in-memory registry of the workers and
+    reservations, rather than by reading them from the database for every placement.
+
+    :param args: For positional arguments; and not used otherwise
+    :param kwargs: For keyword arguments, and expected to have one named 'sender'
+    :return: None
+    """
+    if kwargs['sender'].hostname.startswith(RESOURCE_MANAGER_QUEUE):
+        resources.use_reservation_registry()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_task_status(*args, **kwargs):
+    """
+    Write the task state changes still buffered by this process to the database before it exits.
+
+    :param args: For positional arguments; and not used otherwise
+    :param kwargs: For keyword arguments; and not used otherwise
+    :return: None
+    """
+    status_buffer.flush()
@@ -21,6 +21,7 @@ _default_values = {
         'repo_sync_history': '60',
         'repo_publish_history': '60',
         'repo_group_publish_history': '60',
+        'repo_content_unit_removals': '30',
         'task_status_history': '7',
         'task_result_history': '3',
     },
@@ -67,6 +68,7 @@ _default_values = {
         'user_cert_expiration': '7',
         'consumer_cert_expiration': '3650',
         'serial_number_path': '/var/lib/pulp/sn.dat',
+        'authorization_cache_ttl': '10',
     },
     'server': {
         'server_name': socket.gethostname(),
@@ -84,6 +86,12 @@ _default_values = {
         'cacert': '/etc/pki/pulp/qpid/ca.crt',
         'keyfile': '/etc/pki/pulp/qpid/client.crt',
         'certfile': '/etc/pki/pulp/qpid/client.crt',
+        'worker_placement_policy': 'least_loaded',
+        'max_worker_reservations': '1',
+        'status_flush_size': '100',
+        'status_flush_interval': '1',
+        'status_flush_on_complete': 'true',
+        'revocation_refresh_interval': '5',
     },
 }
 
@@ -1,6 +1,8 @@
 from collections import namedtuple
+from itertools import islice
 from logging import getLogger
 from threading import Thread, RLock
+import sys
 from Queue import Queue, Empty, Full
 
 from nectar.listener import DownloadEventListener
@@ -15,6 +17,10 @@ from pulp.server.managers import factory as managers
 log = getLogger(__name__)
 
 
+# The number of requests whose catalog entries are found by a single query.
+PREFETCH_CHUNK_SIZE = 500
+
+
 class ContentContainer(object):
     """
     The content container represents a virtual collection of content that is
@@ -349,18 +355,21 @@ class Batch(object):
         count = 0
         report = DownloadReport()
         report.total_sources = len(self.sources)
+        prefetcher = CatalogPrefetcher(self.canceled, self.requests)
+        prefetcher.start()
 
         try:
-            for request in self.requests:
+            for request, entries in prefetcher:
                 if self.is_canceled:
                     break
-                request.find_sources(self.primary, self.sources)
+                request.find_sources(self.primary, self.sources, entries)
                 self.dispatch(request)
                 count += 1
         except Exception:
             self.canceled.set()
             raise
         finally:
+            prefetcher.halt()
             self.in_progress.wait(count)
             for queue in self.queues.values():
                 queue.put(None)
@@ -376,6 +385,123 @@ class Batch(object):
         return report
 
 
+class CatalogPrefetcher(Thread):
+    """
+    A thread that finds the catalog entries matching a batch of download requests.
+    The requests are read in chunks and the entries of each chunk are found using
+    a single query, one chunk ahead of the requests being dispatched, so that
+    searching the catalog overlaps with downloading.
+    Iterating the prefetcher generates tuples of: (request, entries).
+    :ivar _halted: Flag indicating that a thread halt has been requested.
+    :type _halted: bool
+    :ivar canceled: A cancel event.  Signals cancellation has been requested.
+    :type canceled: threading.Event
+    :ivar requests: An iterable of: pulp.server.content.sources.model.Request.
+    :type requests: iterable
+    :ivar chunk_size: The number of requests whose entries are found at once.
+    :type chunk_size: int
+    :ivar queue: Used to pass the chunks of requests and entries between threads.
+    :type queue: Queue
+    :ivar error: The exc_info of an exception raised while finding entries.
+    :type error: tuple
+    """
+
+    def __init__(self, canceled, requests, chunk_size=PREFETCH_CHUNK_SIZE):
+        """
+        :param canceled: A cancel event.  Signals cancellation requested.
+        :type canceled: threading.Event
+        :param requests: An iterable of: pulp.server.content.sources.model.Request.
+        :type requests: iterable
+        :param chunk_size: The number of requests whose entries are found at once.
+        :type chunk_size: int
+        """
+        super(CatalogPrefetcher, self).__init__(name='catalog-prefetch')
+        self._halted = False
+        self.canceled = canceled
+        self.requests = requests
+        self.chunk_size = chunk_size
+        self.queue = Queue(1)
+        self.error = None
+        self.setDaemon(True)
+
+    @property
+    def _run(self):
+        """
+        Get whether the thread should continue to run.
+        :return: True if should continue.
+        :rtype: bool
+        """
+        return not (self.canceled.is_set() or self._halted)
+
+    def put(self, item):
+        """
+        Add a chunk to the queue.  A chunk of (None) is an end-of-queue marker.
+        :param item: A list of tuple: (request, entries).
+        :type item: list
+        """
+        while self._run:
+            try:
+                self.queue.put(item, timeout=3)
+                break
+            except Full:
+                # ignored
+                pass
+
+    def get(self):
+        """
+        Get the next chunk.
+        :return: A list of tuple: (request, entries).
+        :rtype: list
+        """
+        while self._run:
+            try:
+                return self.queue.get(timeout=3)
+            except Empty:
+                # ignored
+                pass
+        return None  # end-of-queue marker
+
+    def run(self):
+        """
+        The thread main.
+        """
+        try:
+            requests = iter(self.requests)
+            while self._run:
+                chunk = list(islice(requests, self.chunk_size))
+                if not chunk:
+                    break
+                catalog = managers.content_catalog_manager()
+                entries = catalog.find_all([(r.type_id, r.unit_key) for r in chunk])
+                self.put(zip(chunk, entries))
+        except Exception:
+            self.error = sys.exc_info()
+        finally:
+            self.put(None)
+
+    def halt(self):
+        """
+        Halt the thread.
+        """
+        self._halted = True
+
+    def __iter__(self):
+        """
+        Performs a get() until reaching the end-of-queue marker.
+        :return: An iterable of tuple: (request, entries).
+        :rtype: iterable
+        """
+        while True:
+            chunk = self.get()
+            if chunk is None:
+                # end-of-queue marker
+                break
+            for item in chunk:
+                yield item
+        if self.error:
+            raise self.error[0], self.error[1], self.error[2]
+
+
 # The object handled by the RequestQueue put() and get().
 Item = namedtuple('Item', ['request', 'url'])
 
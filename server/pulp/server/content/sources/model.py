@@ -34,6 +34,7 @@ PATHS_REGEX = re.compile(r'\s+')
 REFRESHING = 'Refreshing [%s] url:%s'
 REFRESH_SUCCEEDED = 'Refresh [%s] succeeded.  Added: %d, Deleted: %d'
 REFRESH_FAILED = 'Refresh [%s] url: %s, failed: %s'
+REFRESH_DISCARDED = 'Refresh [%s] incomplete, catalog entries not replaced'
 
 
 class Request(object):
@@ -80,7 +81,7 @@ class Request(object):
         self.errors = []
         self.data = None
 
-    def find_sources(self, primary, alternates):
+    def find_sources(self, primary, alternates, entries=None):
         """
         Find and set the list of content sources in the order they are to
         be used to satisfy the request.  The alternate sources are
@@ -89,10 +90,15 @@ class Request(object):
         :type primary: ContentSource
         :param alternates: A list of alternative sources.
         :type list of: ContentSource
+        :param entries: The catalog entries matching the requested unit, when
+            already found.  The catalog is searched when not specified.
+        :type entries: list
         """
         resolved = [(primary, self.url)]
-        catalog = managers.content_catalog_manager()
-        for entry in catalog.find(self.type_id, self.unit_key):
+        if entries is None:
+            catalog = managers.content_catalog_manager()
+            entries = catalog.find(self.type_id, self.unit_key)
+        for entry in entries:
             source_id = entry[constants.SOURCE_ID]
             source = alternates.get(source_id)
             if source is None:
@@ -284,6 +290,8 @@ class ContentSource(object):
         """
         Refresh the content catalog using the cataloger plugin as
         defined by the "type" descriptor property.
+        The entries of all the URLs replace those of the source in the catalog
+        at once, and only when all of the URLs were refreshed successfully.
         :param cancel_event: An event that indicates the refresh has been canceled.
         :type cancel_event: threading.Event
         :return: The list of refresh reports.
@@ -292,23 +300,34 @@ class ContentSource(object):
         reports = []
         conduit = self.get_conduit()
         plugin = self.get_cataloger()
-        for url in self.urls:
-            if cancel_event.isSet():
-                break
-            conduit.reset()
-            report = RefreshReport(self.id, url)
-            log.info(REFRESHING, self.id, url)
-            try:
-                plugin.refresh(conduit, self.descriptor, url)
-                log.info(REFRESH_SUCCEEDED, self.id, conduit.added_count, conduit.deleted_count)
-                report.succeeded = True
-                report.added_count = conduit.added_count
-                report.deleted_count = conduit.deleted_count
-            except Exception, e:
-                log.error(REFRESH_FAILED, self.id, url, e)
-                report.errors.append(str(e))
-            finally:
-                reports.append(report)
+        conduit.begin_refresh()
+        committed = False
+        try:
+            for url in self.urls:
+                if cancel_event.isSet():
+                    break
+                conduit.reset()
+                report = RefreshReport(self.id, url)
+                log.info(REFRESHING, self.id, url)
+                try:
+                    plugin.refresh(conduit, self.descriptor, url)
+                    log.info(
+                        REFRESH_SUCCEEDED, self.id, conduit.added_count, conduit.deleted_count)
+                    report.succeeded = True
+                    report.added_count = conduit.added_count
+                    report.deleted_count = conduit.deleted_count
+                except Exception, e:
+                    log.error(REFRESH_FAILED, self.id, url, e)
+                    report.errors.append(str(e))
+                finally:
+                    reports.append(report)
+            if len(reports) == len(self.urls) and all(r.succeeded for r in reports):
+                conduit.commit_refresh()
+                committed = True
+        finally:
+            if not committed:
+                log.warn(REFRESH_DISCARDED, self.id)
+                conduit.abort_refresh()
         return reports
 
     def dict(self):
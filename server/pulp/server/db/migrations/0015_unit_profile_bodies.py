@@ -0,0 +1,32 @@
+"""
+This migration moves the profiles stored in every unit profile into the unit profile bodies,
+which store each distinct profile once, and removes the copies of the profiles stored with the
+repository profile applicability data.
+"""
+from pulp.server.db.model.consumer import RepoProfileApplicability, UnitProfile, UnitProfileBody
+
+
+def migrate(*args, **kwargs):
+    """
+    Perform the migration as described in this module's docblock.
+
+    :param args:   unused
+    :type  args:   list
+    :param kwargs: unused
+    :type  kwargs: dict
+    """
+    collection = UnitProfile.get_collection()
+    body_collection = UnitProfileBody.get_collection()
+    for unit_profile in collection.find({'profile': {'$exists': True}},
+                                        fields=['profile_hash', 'profile']):
+        # The body is referenced before the profile is removed so that it is never lost
+        profile_hash = unit_profile['profile_hash']
+        result = body_collection.update({'profile_hash': profile_hash},
+                                        {'$inc': {'refcount': 1}}, safe=True)
+        if result['n'] == 0:
+            body_collection.insert(UnitProfileBody(profile_hash, unit_profile['profile']),
+                                   safe=True)
+        collection.update({'_id': unit_profile['_id']}, {'$unset': {'profile': 1}}, safe=True)
+
+    RepoProfileApplicability.get_collection().update(
+        {'profile': {'$exists': True}}, {'$unset': {'profile': 1}}, multi=True, safe=True)
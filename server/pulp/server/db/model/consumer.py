@@ -12,12 +12,10 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import datetime
-import hashlib
-import json
 
 from pulp.server.db.model.base import Model
 from pulp.server.db.model.reaper_base import ReaperMixin
-from pulp.common import dateutils
+from pulp.common import dateutils, profile as profile_utils
 
 
 # -- classes -----------------------------------------------------------------
@@ -171,8 +169,9 @@ class RepoProfileApplicability(Model):
     for a given consumer profile_hash and repository ID. The applicability data is a dictionary
     structure that represents the applicable units for the given profile and repository.
 
-    The profile itself is included here for ease of recalculating the applicability when a
-    repository's contents change.
+    The profile itself is not stored here. It is shared with the consumers' UnitProfiles through
+    the UnitProfileBody identified by the profile_hash, and is loaded into the profile attribute
+    when the applicability needs recalculating because a repository's contents changed.
 
     The RepoProfileApplicabilityManager can be accessed through the classlevel "objects" attribute.
     """
@@ -182,7 +181,8 @@ class RepoProfileApplicability(Model):
         ('profile_hash', 'repo_id'),
     )
 
-    def __init__(self, profile_hash, repo_id, profile, applicability, _id=None, **kwargs):
+    def __init__(self, profile_hash, repo_id, profile=None, applicability=None, _id=None,
+                 **kwargs):
         """
         Construct a RepoProfileApplicability object.
 
@@ -191,7 +191,8 @@ class RepoProfileApplicability(Model):
         :type  profile_hash:  basestring
         :param repo_id:       The repo ID that this applicability data is for
         :type  repo_id:       basestring
-        :param profile:       The entire profile that resulted in the profile_hash
+        :param profile:       The entire profile that resulted in the profile_hash, if it has
+                              been loaded. It is not saved with this object.
         :type  profile:       object
         :param applicability: A dictionary mapping content_type_ids to lists of applicable Unit IDs.
         :type  applicability: dict
@@ -226,7 +227,7 @@ class RepoProfileApplicability(Model):
         # If this object's _id attribute is not None, then it represents an existing DB object.
         # Else, we need to create an object with this object's attributes
         new_document = {'profile_hash': self.profile_hash, 'repo_id': self.repo_id,
-                        'profile': self.profile, 'applicability': self.applicability}
+                        'applicability': self.applicability}
         if self._id is not None:
             self.get_collection().update({'_id': self._id}, new_document, safe=True)
         else:
@@ -257,13 +258,18 @@ class UnitProfile(Model):
     installed RPMs in some repeatable fashion, such that any two consumers that have exactly the
     same RPMs installed will end up with the same ordering of their RPMs in the database.
 
+    Many consumers, such as those built from the same image, have identical profiles. The profile
+    is therefore not saved in this collection; it is stored once per profile_hash as a
+    UnitProfileBody that all the UnitProfiles with that hash reference.
+
     :ivar  consumer_id:  A consumer ID.
     :type consumer_id:  str
     :ivar  content_type: The profile (unit) type ID.
     :type content_type: str
-    :ivar  profile:      The stored profile.
+    :ivar  profile:      The profile, which is not saved with the UnitProfile.
     :type profile:      object
-    :ivar  profile_hash: A hash of the profile, used for quick comparisons of profiles
+    :ivar  profile_hash: A hash of the profile, used for quick comparisons of profiles and to
+                         reference the UnitProfileBody holding it
     :type profile_hash: basestring
     """
 
@@ -278,7 +284,7 @@ class UnitProfile(Model):
         :type  consumer_id:  str
         :param content_type: The profile (unit) type ID.
         :type  content_type: str
-        :param profile:      The stored profile.
+        :param profile:      The profile.
         :type  profile:      object
         :param profile_hash: A hash of the profile, used for quick comparisons of profiles. If it is
                              None, the constructor will automatically calculate it based on the
@@ -305,10 +311,41 @@ class UnitProfile(Model):
         :return:        Hash of profile
         :rtype:         basestring
         """
-        # Don't use any whitespace in the json separators, and sort dictionary keys to be repeatable
-        serialized_profile = json.dumps(profile, separators=(',', ':'), sort_keys=True)
-        hasher = hashlib.sha256(serialized_profile)
-        return hasher.hexdigest()
+        # Consumers calculate the same hash to report deltas against the profile they last sent
+        return profile_utils.calculate_hash(profile)
+
+
+class UnitProfileBody(Model):
+    """
+    Stores a consumer profile once for all the UnitProfiles that have the same profile_hash. The
+    refcount is the number of UnitProfiles that reference the body; bodies are removed once it
+    drops to zero.
+
+    :ivar profile_hash: The hash of the profile, as calculated by UnitProfile.calculate_hash()
+    :type profile_hash: basestring
+    :ivar profile:      The profile
+    :type profile:      object
+    :ivar refcount:     The number of UnitProfiles that reference this body
+    :type refcount:     int
+    """
+
+    collection_name = 'consumer_unit_profile_bodies'
+    unique_indices = ('profile_hash',)
+    search_indices = ('refcount',)
+
+    def __init__(self, profile_hash, profile, refcount=1):
+        """
+        :param profile_hash: The hash of the profile
+        :type  profile_hash: basestring
+        :param profile:      The profile
+        :type  profile:      object
+        :param refcount:     The number of UnitProfiles that reference this body
+        :type  refcount:     int
+        """
+        super(UnitProfileBody, self).__init__()
+        self.profile_hash = profile_hash
+        self.profile = profile
+        self.refcount = refcount
 
 
 class ConsumerHistoryEvent(Model, ReaperMixin):
@@ -80,6 +80,8 @@ class ContentCatalog(Model):
        - supporting find() operations on a catalog containing multiple entries
          matching the same locator.  In these cases, only the newest entry is
          included for each source in the result set.
+       - ignoring the entries of a generation written by a bulk refresh until
+         the refresh switches the source to it.  See ContentCatalogGeneration.
     :ivar source_id: The ID of the contributing content source.
     :type source_id: str
     :ivar expires: The expiration UTC timestamp.
@@ -92,10 +94,12 @@ class ContentCatalog(Model):
     :type locator: str
     :ivar url: The URL used to download the file associated with the unit.
     :type url: str
+    :ivar generation: The bulk refresh that wrote the entry, or None.
+    :type generation: str
     """
 
     collection_name = 'content_catalog'
-    search_indices = ('source_id', 'locator')
+    search_indices = ('source_id', 'locator', ('source_id', 'generation'))
     unique_indices = ()
 
     @staticmethod
@@ -128,7 +132,7 @@ class ContentCatalog(Model):
         dt = now + timedelta(seconds=duration)
         return dateutils.datetime_to_utc_timestamp(dt)
 
-    def __init__(self, source_id, expiration, type_id, unit_key, url):
+    def __init__(self, source_id, expiration, type_id, unit_key, url, generation=None):
         """
         :param source_id: The ID of the contributing content source.
         :type source_id: str
@@ -140,6 +144,8 @@ class ContentCatalog(Model):
         :type unit_key: dict
         :param url: The URL used to download the file associated with the unit.
         :type url: str
+        :param generation: The bulk refresh that wrote the entry.
+        :type generation: str
         """
         Model.__init__(self)
         self.source_id = source_id
@@ -148,3 +154,31 @@ class ContentCatalog(Model):
         self.unit_key = unit_key
         self.locator = self.get_locator(type_id, unit_key)
         self.url = url
+        self.generation = generation
+
+
+class ContentCatalogGeneration(Model):
+    """
+    Records the generation of catalog entries that is current for a content source.
+    A bulk refresh writes the entries of a content source as a new generation, which
+    readers ignore until the refresh switches the source to it by updating this
+    record.  Entries without a generation are always current.
+    :ivar source_id: The ID of the content source.
+    :type source_id: str
+    :ivar generation: The current generation of the content source's entries.
+    :type generation: str
+    """
+
+    collection_name = 'content_catalog_generations'
+    unique_indices = ('source_id',)
+
+    def __init__(self, source_id, generation):
+        """
+        :param source_id: The ID of the content source.
+        :type source_id: str
+        :param generation: The current generation of the content source's entries.
+        :type generation: str
+        """
+        Model.__init__(self)
+        self.source_id = source_id
+        self.generation = generation
@@ -156,6 +156,14 @@ class RepoDistributor(Model):
     @ivar last_publish: timestamp of the last publish (regardless of success or failure)
                         in ISO8601 format
     @type last_publish: str
+
+    @ivar last_successful_publish: timestamp at which the last successful publish started
+                                   in ISO8601 format
+    @type last_successful_publish: str
+
+    @ivar last_publish_config: digest of the configuration the last successful publish was
+                               run with
+    @type last_publish_config: str
     """
     RESOURCE_TEMPLATE = 'pulp:distributor:%s:%s'
 
@@ -172,6 +180,8 @@ class RepoDistributor(Model):
         self.auto_publish = auto_publish
         self.scratchpad = None
         self.last_publish = None
+        self.last_successful_publish = None
+        self.last_publish_config = None
         self.scheduled_publishes = []
 
     @classmethod
@@ -261,6 +271,45 @@ class RepoContentUnit(Model):
         self.updated = self.created
 
 
+class RepoContentUnitRemoval(Model, ReaperMixin):
+    """
+    Each instance records that a content unit stopped being associated with a
+    repository. Units added to a repository can be found through the created
+    timestamp of their RepoContentUnit, but removed associations are deleted,
+    so these records are what allows consumers of repository changes, such as
+    applicability regeneration, to find out which units were removed since a
+    given point in time.
+
+    The documents in this collection may be reaped, so it inherits from ReaperMixin.
+
+    @ivar repo_id: identifies the repo
+    @type repo_id: str
+
+    @ivar unit_id: ID (_id) of the content unit in its type collection
+    @type unit_id: str
+
+    @ivar unit_type_id: identifies the type of content unit that was removed
+    @type unit_type_id: str
+
+    @ivar removed: iso8601 formatted timestamp indicating when the unit was removed
+    @type removed: str
+    """
+
+    collection_name = 'repo_content_unit_removals'
+
+    search_indices = (('repo_id', 'removed'),)
+
+    def __init__(self, repo_id, unit_id, unit_type_id):
+        super(RepoContentUnitRemoval, self).__init__()
+
+        self.repo_id = repo_id
+        self.unit_id = unit_id
+        self.unit_type_id = unit_type_id
+
+        utc_timestamp = dateutils.now_utc_timestamp()
+        self.removed = dateutils.format_iso8601_utc_timestamp(utc_timestamp)
+
+
 class RepoSyncResult(Model, ReaperMixin):
     """
     Stores the results of a repo sync.
@@ -19,6 +19,7 @@ _COLLECTION_TIMEDELTAS = {
     consumer.ConsumerHistoryEvent: 'consumer_history',
     repository.RepoSyncResult: 'repo_sync_history',
     repository.RepoPublishResult: 'repo_publish_history',
+    repository.RepoContentUnitRemoval: 'repo_content_unit_removals',
     repo_group.RepoGroupPublishResult: 'repo_group_publish_history',
     celery_result.CeleryResult: 'task_result_history',
 }
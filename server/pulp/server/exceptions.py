@@ -136,6 +136,18 @@ class PulpCodedAuthenticationException(PulpCodedException):
         return self.old_error_code
 
 
+class PulpCodedConflictException(PulpCodedException):
+    """
+    Class for coded exceptions raised when a request conflicts with the current state of a
+    resource. Raising this exception results in a 409 Conflict code being returned.
+
+    :param error_code: The particular error code that should be used for this conflict exception
+    :type  error_code: pulp.common.error_codes.Error
+    """
+
+    http_status_code = httplib.CONFLICT
+
+
 class MissingResource(PulpExecutionException):
     """"
     Base class for exceptions raised due to requesting a resource that does not
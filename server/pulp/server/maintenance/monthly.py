@@ -3,6 +3,7 @@ from celery import task
 from pulp.common.tags import action_tag
 from pulp.server.async.tasks import Task
 from pulp.server.managers.consumer.applicability import RepoProfileApplicabilityManager
+from pulp.server.managers.consumer.profile import ProfileManager
 
 
 @task
@@ -20,3 +21,4 @@ def monthly_maintenance():
     Perform tasks that should happen on a monthly basis.
     """
     RepoProfileApplicabilityManager().remove_orphans()
+    ProfileManager.remove_orphan_bodies()
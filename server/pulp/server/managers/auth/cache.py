@@ -0,0 +1,217 @@
+"""
+Contains the cache of the users' effective permissions used to authorize REST calls.
+
+Each web server process keeps its own cache. The permission, role and user managers invalidate
+the entries they affect in the process they run in, and entries expire after the
+authorization_cache_ttl setting of the [security] section of the server configuration, which
+bounds how long a change made by another process takes to apply.
+"""
+import threading
+import time
+
+from pulp.server.config import config
+from pulp.server.db.model.auth import Permission, User
+from pulp.server.exceptions import MissingResource
+
+
+# The maximum number of users whose permissions are cached
+AUTHORIZATION_CACHE_SIZE = 1000
+
+# The cache used by this process, created on first use
+_cache = None
+
+
+class PermissionTrie(object):
+    """
+    A user's permissions, stored in a trie keyed by the parts of the resource paths so that all
+    the permissions on the prefixes of a resource are found in a single walk.
+    """
+
+    def __init__(self):
+        # Each node is a tuple of a dict mapping path parts to child nodes, and a set of the
+        # operations permitted on the resource the node represents
+        self._root = ({}, set())
+
+    def add(self, resource, operations):
+        """
+        Permit the operations on the resource.
+
+        :param resource:   pulp resource path, such as /v2/repositories/
+        :type  resource:   str
+        :param operations: operations permitted on the resource
+        :type  operations: list of int
+        """
+        node = self._root
+        for part in _parts(resource):
+            node = node[0].setdefault(part, ({}, set()))
+        node[1].update(operations)
+
+    def is_authorized(self, resource, operation):
+        """
+        :param resource:  pulp resource path
+        :type  resource:  str
+        :param operation: operation to be performed on the resource
+        :type  operation: int
+        :return:          True if the operation is permitted on the resource or any of its
+                          prefixes, False otherwise
+        :rtype:           bool
+        """
+        node = self._root
+        if operation in node[1]:
+            return True
+        for part in _parts(resource):
+            node = node[0].get(part)
+            if node is None:
+                return False
+            if operation in node[1]:
+                return True
+        return False
+
+
+class UserAuthorization(object):
+    """
+    A user and their effective permissions, as loaded from the database.
+
+    :ivar user:        the user document
+    :type user:        dict
+    :ivar permissions: the permissions of the user
+    :type permissions: PermissionTrie
+    """
+
+    def __init__(self, user, permissions):
+        self.user = user
+        self.permissions = permissions
+
+    @classmethod
+    def load(cls, login):
+        """
+        Load a user and their permissions from the database.
+
+        :param login: login of the user
+        :type  login: str
+        :return:      the user's authorization
+        :rtype:       UserAuthorization
+        :raises MissingResource: if there is no user with the given login
+        """
+        user = User.get_collection().find_one({'login': login})
+        if user is None:
+            raise MissingResource(login)
+
+        permissions = PermissionTrie()
+        for permission in Permission.get_collection().find({'users.username': login}):
+            resource = permission['resource']
+            # Only resources in their canonical form can match a resource being accessed
+            if resource != '/%s/' % '/'.join(_parts(resource)) and resource != '/':
+                continue
+            for user_permission in permission['users']:
+                if user_permission['username'] == login:
+                    permissions.add(resource, user_permission['permissions'])
+        return cls(user, permissions)
+
+
+class AuthorizationCache(object):
+    """
+    Caches UserAuthorization objects by login for ttl seconds, evicting the least recently used
+    ones beyond max_size.
+    """
+
+    def __init__(self, ttl=None, max_size=AUTHORIZATION_CACHE_SIZE):
+        """
+        :param ttl:      The number of seconds an authorization is cached for. When 0, nothing
+                         is cached. Defaults to the authorization_cache_ttl setting.
+        :type  ttl:      float
+        :param max_size: The maximum number of users whose authorization is cached
+        :type  max_size: int
+        """
+        if ttl is None:
+            ttl = config.getfloat('security', 'authorization_cache_ttl')
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # Incremented by every invalidation, so that an authorization loaded while one happens
+        # is not cached
+        self._generation = 0
+        # Maps logins to a tuple of the time they were loaded and their UserAuthorization
+        self._entries = {}
+        # The logins in _entries, from the least to the most recently used
+        self._order = []
+
+    def get(self, login):
+        """
+        Return the authorization of a user, loading it from the database if it is not cached or
+        has expired.
+
+        :param login: login of the user
+        :type  login: str
+        :return:      the user's authorization
+        :rtype:       UserAuthorization
+        :raises MissingResource: if there is no user with the given login
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(login, None)
+            if entry is not None:
+                self._order.remove(login)
+                if now - entry[0] < self.ttl:
+                    self._entries[login] = entry
+                    self._order.append(login)
+                    return entry[1]
+            generation = self._generation
+
+        authorization = UserAuthorization.load(login)
+        with self._lock:
+            if self.ttl > 0 and generation == self._generation:
+                if self._entries.pop(login, None) is not None:
+                    self._order.remove(login)
+                self._entries[login] = (now, authorization)
+                self._order.append(login)
+                while len(self._order) > self.max_size:
+                    del self._entries[self._order.pop(0)]
+        return authorization
+
+    def invalidate(self, login=None):
+        """
+        Drop the authorization of a user from the cache, or of all users.
+
+        :param login: login of the user, or None for all users
+        :type  login: str
+        """
+        with self._lock:
+            self._generation += 1
+            if login is None:
+                self._entries.clear()
+                del self._order[:]
+            elif self._entries.pop(login, None) is not None:
+                self._order.remove(login)
+
+
+def _parts(resource):
+    """
+    :param resource: pulp resource path
+    :type  resource: str
+    :return:         the non empty parts of the path
+    :rtype:          list of str
+    """
+    return [p for p in resource.split('/') if p]
+
+
+def get_cache():
+    """
+    :return: the AuthorizationCache of this process
+    :rtype:  AuthorizationCache
+    """
+    global _cache
+    if _cache is None:
+        _cache = AuthorizationCache()
+    return _cache
+
+
+def invalidate(login=None):
+    """
+    Drop the authorization of a user from the cache of this process, or of all users.
+
+    :param login: login of the user, or None for all users
+    :type  login: str
+    """
+    if _cache is not None:
+        _cache.invalidate(login)
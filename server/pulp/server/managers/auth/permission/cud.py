@@ -27,6 +27,7 @@ from pulp.server.exceptions import (
     DuplicateResource, InvalidValue, MissingResource, PulpDataException,
     PulpExecutionException)
 from pulp.server.managers import factory
+from pulp.server.managers.auth import cache as auth_cache
 from pulp.server.managers.auth.user import system
 
 
@@ -88,6 +89,7 @@ class PermissionManager(object):
             raise PulpDataException(_("Update Keyword [%s] is not supported" % key))
 
         Permission.get_collection().save(found, safe=True)
+        auth_cache.invalidate()
 
     @staticmethod
     def delete_permission(resource_uri):
@@ -110,6 +112,7 @@ class PermissionManager(object):
             raise MissingResource(resource_uri)
 
         Permission.get_collection().remove({'resource': resource_uri}, safe=True)
+        auth_cache.invalidate()
 
     @staticmethod
     def grant(resource, login, operations):
@@ -149,6 +152,7 @@ class PermissionManager(object):
             current_ops.append(o)
 
         Permission.get_collection().save(permission, safe=True)
+        auth_cache.invalidate(login)
 
     @staticmethod
     def revoke(resource, login, operations):
@@ -194,6 +198,7 @@ class PermissionManager(object):
             return
 
         Permission.get_collection().save(permission, safe=True)
+        auth_cache.invalidate(login)
 
     def grant_automatic_permissions_for_resource(self, resource):
         """
@@ -262,6 +267,7 @@ class PermissionManager(object):
             else:
                 # Delete entire permission if there are no more users
                 Permission.get_collection().remove({'resource': permission['resource']}, safe=True)
+        auth_cache.invalidate(login)
 
     def operation_name_to_value(self, name):
         """
@@ -16,9 +16,10 @@ Contains users query classes
 
 from gettext import gettext as _
 
-from pulp.server.db.model.auth import User, Permission, Role
+from pulp.server.db.model.auth import User, Role
 from pulp.server.exceptions import PulpDataException, MissingResource
 from pulp.server.managers import factory
+from pulp.server.managers.auth import cache as auth_cache
 from pulp.server.managers.auth.role.cud import SUPER_USER_ROLE
 
 
@@ -99,11 +100,7 @@ class UserQueryManager(object):
         @rtype: bool
         @return: True if the user is a super user, False otherwise
         """
-        user = User.get_collection().find_one({'login' : login})
-        if user is None:
-            raise MissingResource(login)
-
-        role_manager = factory.role_manager()
+        user = auth_cache.get_cache().get(login).user
         return SUPER_USER_ROLE in user['roles']
 
     def is_authorized(self, resource, login, operation):
@@ -123,23 +120,10 @@ class UserQueryManager(object):
         @return: True if the user is authorized for the operation on the resource,
                  False otherwise
         """
-        if self.is_superuser(login):
+        authorization = auth_cache.get_cache().get(login)
+        if SUPER_USER_ROLE in authorization.user['roles']:
             return True
-
-        permission_query_manager = factory.permission_query_manager()
-
-        parts = [p for p in resource.split('/') if p]
-        while parts:
-            current_resource = '/%s/' % '/'.join(parts)
-            permission = permission_query_manager.find_by_resource(current_resource)
-            if permission is not None:
-                if operation in permission_query_manager.find_user_permission(permission, login):
-                    return True
-            parts = parts[:-1]
-
-        permission = Permission.get_collection().find_one({'resource': '/'})
-        return (permission is not None and
-                operation in permission_query_manager.find_user_permission(permission, login))
+        return authorization.permissions.is_authorized(resource, operation)
 
     def is_last_super_user(self, login):
         """
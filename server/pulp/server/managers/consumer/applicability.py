@@ -6,21 +6,39 @@ from gettext import gettext as _
 from logging import getLogger
 
 from celery import task
+import pymongo
 
+from pulp.common import dateutils, tags
 from pulp.plugins.conduits.profiler import ProfilerConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.plugins.profiler import Profiler
-from pulp.server.async.tasks import Task
+from pulp.plugins.util.misc import paginate
+from pulp.server.async.tasks import get_current_task_id, Task, TaskResult
 from pulp.server.db.model.consumer import Bind, RepoProfileApplicability, UnitProfile
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.repository import Repo
+from pulp.server.db.model.dispatch import TaskStatus
+from pulp.server.db.model.repository import Repo, RepoContentUnit, RepoContentUnitRemoval
 from pulp.server.managers import factory as managers
 from pulp.server.managers.consumer.query import ConsumerQueryManager
 
 
 _logger = getLogger(__name__)
 
+# Number of existing applicability documents, whose profiles are loaded together, that are
+# processed together when regenerating a repository's applicability
+APPLICABILITY_PAGE_SIZE = 100
+
+# Maximum number of (repo, profile) pairs regenerated by a single subtask when regenerating the
+# applicability of consumers
+APPLICABILITY_CHUNK_SIZE = 50
+
+# Number of consumers whose applicability is collated together by iterate_consumer_applicability
+CONSUMER_APPLICABILITY_PAGE_SIZE = 1000
+
+# Key of the aggregate progress of the subtasks in a regeneration task's progress report
+PROGRESS_REPORT_KEY = 'applicability_regeneration'
+
 
 class ApplicabilityRegenerationManager(object):
     @staticmethod
@@ -31,6 +49,23 @@ class ApplicabilityRegenerationManager(object):
         :param consumer_criteria: The consumer selection criteria
         :type consumer_criteria: dict
         """
+        repo_profiles = ApplicabilityRegenerationManager.find_missing_applicability(
+            consumer_criteria)
+        for repo_id, profiles in repo_profiles.items():
+            ApplicabilityRegenerationManager.regenerate_applicability_for_repo_profiles(
+                repo_id, profiles)
+
+    @staticmethod
+    def find_missing_applicability(consumer_criteria):
+        """
+        Find the (repo, profile) pairs of the given consumers that have no applicability data yet.
+
+        :param consumer_criteria: The consumer selection criteria
+        :type consumer_criteria: dict
+        :return: dictionary mapping repo ids to sorted lists of
+                 (profile_hash, content_type, profile_id) tuples
+        :rtype: dict
+        """
         consumer_criteria = Criteria.from_dict(consumer_criteria)
         consumer_query_manager = managers.consumer_query_manager()
         bind_manager = managers.consumer_bind_manager()
@@ -82,65 +117,279 @@ class ApplicabilityRegenerationManager(object):
         for binding in all_repo_bindings:
             repo_consumers_map.setdefault(binding['repo_id'], []).append(binding['consumer_id'])
 
-        # Create a set of (repo_id, (profile_hash, content_type))
-        repo_profile_hashes = set()
+        # Create a map of repo_id to the set of (profile_hash, content_type) of its consumers.
+        # These are all guaranteed to be unique tuples because of the logic used to create maps
+        # and sets above, eliminating multiple unnecessary queries to check for existing
+        # applicability for same profiles.
+        repo_profile_hashes = {}
         for repo_id, consumer_id_list in repo_consumers_map.items():
             for consumer_id in consumer_id_list:
                 if consumer_id in consumer_unit_profiles_map:
-                    for unit_profile_tuple in consumer_unit_profiles_map[consumer_id]:
-                        repo_profile_hashes.add((repo_id, unit_profile_tuple))
+                    repo_profile_hashes.setdefault(repo_id, set()).update(
+                        consumer_unit_profiles_map[consumer_id])
+
+        # Leave out the profiles whose applicability already exists, one query per repo
+        repo_profiles = {}
+        applicability_collection = RepoProfileApplicability.get_collection()
+        for repo_id, profile_tuples in repo_profile_hashes.items():
+            spec = {'repo_id': repo_id,
+                    'profile_hash': {'$in': [p_hash for p_hash, p_type in profile_tuples]}}
+            existing = set(applicability_collection.find(spec).distinct('profile_hash'))
+            profiles = [(p_hash, p_type, profile_hash_profile_id_map[p_hash])
+                        for p_hash, p_type in profile_tuples if p_hash not in existing]
+            if profiles:
+                repo_profiles[repo_id] = sorted(profiles)
+        return repo_profiles
 
-        # Iterate through each tuple in repo_profile_hashes set and regenerate applicability,
-        # if it doesn't exist. These are all guaranteed to be unique tuples because of the logic
-        # used to create maps and sets above, eliminating multiple unnecessary queries
-        # to check for existing applicability for same profiles.
+    @staticmethod
+    def regenerate_applicability_for_repo_profiles(repo_id, profiles):
+        """
+        Generate and save applicability data for the given profiles against the given repo.
+        Profiles whose applicability against the repo exists by the time they are reached are
+        skipped, so that overlapping regenerations do not calculate the same data twice.
+
+        :param repo_id:  repo id to be used to calculate applicability
+        :type  repo_id:  str
+        :param profiles: list of (profile_hash, content_type, profile_id) tuples
+        :type  profiles: list
+        """
         manager = managers.applicability_regeneration_manager()
-        for repo_id, (profile_hash, content_type) in repo_profile_hashes:
+        for profile_hash, content_type, profile_id in profiles:
             # Check if applicability for given profile_hash and repo_id already exists
             if ApplicabilityRegenerationManager._is_existing_applicability(repo_id, profile_hash):
                 continue
             # If applicability does not exist, generate applicability data for given profile
             # and repo id.
-            profile_id = profile_hash_profile_id_map[profile_hash]
             manager.regenerate_applicability(profile_hash, content_type, profile_id, repo_id)
 
     @staticmethod
-    def regenerate_applicability_for_repos(repo_criteria):
+    def regenerate_applicability_for_repos(repo_criteria, full_rebuild=False):
         """
         Regenerate and save applicability data affected by given updated repositories.
 
+        Once a repository's applicability data has been regenerated, later regenerations only
+        account for the units added to and removed from the repository since then, as long as
+        the profiler supports calculating applicability for a subset of units. Otherwise, the
+        applicability data is calculated again from all of the repository's units.
+
         :param repo_criteria: The repo selection criteria
         :type repo_criteria: dict
+        :param full_rebuild: if True, recalculate all applicability data for the repositories
+                             instead of only applying the changes since the last regeneration
+        :type full_rebuild: bool
         """
         repo_criteria = Criteria.from_dict(repo_criteria)
         repo_query_manager = managers.repo_query_manager()
 
         # Process repo criteria
-        repo_criteria.fields = ['id']
-        repo_ids = [r['id'] for r in repo_query_manager.find_by_criteria(repo_criteria)]
-
-        for repo_id in repo_ids:
-            # Find all existing applicabilities for given repo_id
-            existing_applicabilities = RepoProfileApplicability.get_collection().find(
-                {'repo_id': repo_id})
-            for existing_applicability in existing_applicabilities:
+        repo_criteria.fields = ['id', 'last_applicability_regeneration']
+        repos = repo_query_manager.find_by_criteria(repo_criteria)
+
+        for repo in repos:
+            ApplicabilityRegenerationManager._regenerate_applicability_for_repo(repo, full_rebuild)
+
+    @staticmethod
+    def regenerate_applicability_for_repo(repo_id, full_rebuild=False):
+        """
+        Regenerate and save applicability data affected by the given updated repository. See
+        regenerate_applicability_for_repos for details.
+
+        :param repo_id:      id of the repo whose applicability data should be regenerated
+        :type  repo_id:      str
+        :param full_rebuild: if True, recalculate all applicability data for the repository
+                             instead of only applying the changes since the last regeneration
+        :type  full_rebuild: bool
+        """
+        repo = Repo.get_collection().find_one(
+            {'id': repo_id}, fields=['id', 'last_applicability_regeneration'])
+        if repo is not None:
+            ApplicabilityRegenerationManager._regenerate_applicability_for_repo(repo, full_rebuild)
+
+    @staticmethod
+    def _regenerate_applicability_for_repo(repo, full_rebuild):
+        """
+        Regenerate and save applicability data affected by the given updated repository.
+
+        :param repo:         repo document with at least the id and
+                             last_applicability_regeneration fields
+        :type  repo:         dict
+        :param full_rebuild: if True, recalculate all applicability data for the repository
+        :type  full_rebuild: bool
+        """
+        repo_id = repo['id']
+        # Changes made to the repo while this runs will be applied by the next regeneration
+        regeneration_started = dateutils.format_iso8601_utc_timestamp(
+            dateutils.now_utc_timestamp())
+
+        last_regeneration = repo.get('last_applicability_regeneration')
+        # The removals since the last regeneration may have been reaped if it is too old
+        retained_since = managers.repo_unit_association_query_manager().removals_retained_since()
+        if full_rebuild or last_regeneration is None or last_regeneration < retained_since:
+            ApplicabilityRegenerationManager._regenerate_repo_applicability(repo_id)
+        else:
+            added, removed = ApplicabilityRegenerationManager._get_repo_changes(
+                repo_id, last_regeneration)
+            if added or removed:
+                ApplicabilityRegenerationManager._regenerate_repo_applicability(
+                    repo_id, added, removed)
+
+        Repo.get_collection().update(
+            {'id': repo_id},
+            {'$set': {'last_applicability_regeneration': regeneration_started}}, safe=True)
+        # The recorded removals may no longer be needed by the regeneration or the distributors
+        managers.repo_unit_association_manager().prune_removals(repo_id)
+
+    @staticmethod
+    def _regenerate_repo_applicability(repo_id, added=None, removed=None):
+        """
+        Regenerate all existing applicability data for the given repo. If added and removed are
+        given, the existing applicability data is updated with just those units where possible.
+
+        :param repo_id: id of the repo whose applicability data should be regenerated
+        :type  repo_id: str
+        :param added:   dictionary mapping content type ids to lists of ids of units added to
+                        the repo, or None to recalculate the applicability data from scratch
+        :type  added:   dict or None
+        :param removed: dictionary mapping content type ids to lists of ids of units removed
+                        from the repo
+        :type  removed: dict or None
+        """
+        # Find all existing applicabilities for given repo_id
+        existing_applicabilities = RepoProfileApplicability.get_collection().find(
+            {'repo_id': repo_id})
+
+        for page in paginate(existing_applicabilities, APPLICABILITY_PAGE_SIZE):
+            # Look up the unit profiles for the whole page at once
+            profile_hashes = [a['profile_hash'] for a in page]
+            unit_profiles = UnitProfile.get_collection().find(
+                {'profile_hash': {'$in': profile_hashes}},
+                fields=['id', 'profile_hash', 'content_type'])
+            unit_profiles = dict((p['profile_hash'], p) for p in unit_profiles)
+            profiles = managers.consumer_profile_manager().get_profile_bodies(
+                unit_profiles.keys())
+
+            for existing_applicability in page:
                 # Convert cursor to RepoProfileApplicability object
                 existing_applicability = RepoProfileApplicability(**dict(existing_applicability))
                 profile_hash = existing_applicability['profile_hash']
-                unit_profile = UnitProfile.get_collection().find_one({'profile_hash': profile_hash},
-                                                                     fields=['id', 'content_type'])
-                if unit_profile is None:
-                    # Unit profiles change whenever packages are installed or removed on consumers,
-                    # and it is possible that existing_applicability references a UnitProfile
-                    # that no longer exists. This is harmless, as Pulp has a monthly cleanup task
-                    # that will identify these dangling references and remove them.
+                unit_profile = unit_profiles.get(profile_hash)
+                existing_applicability.profile = profiles.get(profile_hash)
+                if unit_profile is None or existing_applicability.profile is None:
+                    # Unit profiles change whenever packages are installed or removed on
+                    # consumers, and it is possible that existing_applicability references a
+                    # UnitProfile that no longer exists. This is harmless, as Pulp has a monthly
+                    # cleanup task that will identify these dangling references and remove them.
                     continue
 
+                if added is not None:
+                    updated = ApplicabilityRegenerationManager.update_applicability(
+                        existing_applicability, unit_profile['content_type'], added, removed)
+                    if updated:
+                        continue
+
                 # Regenerate applicability data for given unit_profile and repo id
                 ApplicabilityRegenerationManager.regenerate_applicability(
                     profile_hash, unit_profile['content_type'], unit_profile['id'], repo_id,
                     existing_applicability)
 
+    @staticmethod
+    def update_applicability(existing_applicability, content_type, added, removed):
+        """
+        Update existing applicability data with the units added to and removed from its repo,
+        without recalculating the applicability of the repo's other units. Removed units are
+        pulled from the applicability data and the applicable added units are added to it.
+
+        :param existing_applicability: existing RepoProfileApplicability object to be updated,
+                                       with its profile loaded
+        :type  existing_applicability: pulp.server.db.model.consumer.RepoProfileApplicability
+        :param content_type:           profile (unit) type ID
+        :type  content_type:           str
+        :param added:                  dictionary mapping content type ids to lists of ids of
+                                       units added to the repo
+        :type  added:                  dict
+        :param removed:                dictionary mapping content type ids to lists of ids of
+                                       units removed from the repo
+        :type  removed:                dict
+        :return:                       False if the profiler does not support calculating
+                                       applicability for a subset of units, True otherwise
+        :rtype:                        bool
+        """
+        profiler, profiler_cfg = ApplicabilityRegenerationManager._profiler(content_type)
+
+        applicable = {}
+        if added:
+            call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
+                                                  repo_plugin_config=None)
+            try:
+                # Only the units of types the profiler handles can be applicable
+                profiler_types = profiler.metadata()['types']
+                added = dict((t, ids) for t, ids in added.items() if t in profiler_types)
+                if added:
+                    applicable = profiler.calculate_applicable_units_subset(
+                        existing_applicability.profile, existing_applicability.repo_id, added,
+                        call_config, ProfilerConduit())
+            except NotImplementedError:
+                return False
+
+        collection = RepoProfileApplicability.get_collection()
+        spec = {'_id': existing_applicability._id}
+
+        # A single update cannot both pull from and add to the same field
+        if removed:
+            pull = dict(('applicability.%s' % t, {'$in': ids}) for t, ids in removed.items())
+            collection.update(spec, {'$pull': pull}, safe=True)
+        add = dict(('applicability.%s' % t, {'$each': ids}) for t, ids in applicable.items()
+                   if ids)
+        if add:
+            collection.update(spec, {'$addToSet': add}, safe=True)
+
+        return True
+
+    @staticmethod
+    def _get_repo_changes(repo_id, since):
+        """
+        Find the units added to and removed from the given repo since the given time. The units
+        of the repo that were updated in place since are returned as both removed and added, so
+        that their applicability is calculated again.
+
+        :param repo_id: id of the repo
+        :type  repo_id: str
+        :param since:   iso8601 formatted timestamp
+        :type  since:   str
+        :return:        two dictionaries, of added and of removed units, that map content type
+                        ids to lists of unit ids
+        :rtype:         tuple
+        """
+        association_collection = RepoContentUnit.get_collection()
+
+        added = {}
+        spec = {'repo_id': repo_id, 'created': {'$gte': since}}
+        for association in association_collection.find(spec, fields=['unit_id', 'unit_type_id']):
+            added.setdefault(association['unit_type_id'], set()).add(association['unit_id'])
+
+        removed = {}
+        spec = {'repo_id': repo_id, 'removed': {'$gte': since}}
+        for removal in RepoContentUnitRemoval.get_collection().find(
+                spec, fields=['unit_id', 'unit_type_id']):
+            removed.setdefault(removal['unit_type_id'], set()).add(removal['unit_id'])
+
+        # Units that were removed and later added back are still in the repo
+        for unit_type_id, unit_ids in removed.items():
+            spec = {'repo_id': repo_id, 'unit_type_id': unit_type_id,
+                    'unit_id': {'$in': list(unit_ids)}}
+            unit_ids.difference_update(association_collection.find(spec).distinct('unit_id'))
+            if not unit_ids:
+                del removed[unit_type_id]
+
+        query_manager = managers.repo_unit_association_query_manager()
+        for unit_type_id, unit_ids in query_manager.get_updated_unit_ids(repo_id, since).items():
+            added.setdefault(unit_type_id, set()).update(unit_ids)
+            removed.setdefault(unit_type_id, set()).update(unit_ids)
+
+        added = dict((t, list(ids)) for t, ids in added.items())
+        removed = dict((t, list(ids)) for t, ids in removed.items())
+        return added, removed
+
     @staticmethod
     def regenerate_applicability(profile_hash, content_type, profile_id,
                                  bound_repo_id, existing_applicability=None):
@@ -154,14 +403,16 @@ class ApplicabilityRegenerationManager(object):
         :param content_type: profile (unit) type ID
         :type content_type: str
 
-        :param profile_id: unique id of the unit profile
+        :param profile_id: unique id of the unit profile, unused as the profile is looked up
+                           by its hash
         :type profile_id: str
 
         :param bound_repo_id: repo id to be used to calculate applicability
                               against the given unit profile
         :type bound_repo_id: str
 
-        :param existing_applicability: existing RepoProfileApplicability object to be replaced
+        :param existing_applicability: existing RepoProfileApplicability object to be replaced,
+                                       with its profile loaded
         :type existing_applicability: pulp.server.db.model.consumer.RepoProfileApplicability
         """
         profiler_conduit = ProfilerConduit()
@@ -180,13 +431,15 @@ class ApplicabilityRegenerationManager(object):
         # Get the intersection of existing types in the repo and the types that the profiler
         # handles. If the intersection is not empty, regenerate applicability
         if (set(repo_content_types) & set(profiler.metadata()['types'])):
-            # Get the actual profile for existing_applicability or lookup using profile_id
+            # Get the actual profile for existing_applicability or look up its stored body
             if existing_applicability:
                 profile = existing_applicability.profile
             else:
-                unit_profile = UnitProfile.get_collection().find_one({'id': profile_id},
-                                                                     fields=['profile'])
-                profile = unit_profile['profile']
+                profile = managers.consumer_profile_manager().get_profile_bodies(
+                    [profile_hash]).get(profile_hash)
+                if profile is None:
+                    # The profile was replaced on all its consumers since it was looked up
+                    return
             call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
                                                   repo_plugin_config=None)
             try:
@@ -207,7 +460,7 @@ class ApplicabilityRegenerationManager(object):
                 # Create a new RepoProfileApplicability object and save it in the db
                 RepoProfileApplicability.objects.create(profile_hash,
                                                         bound_repo_id,
-                                                        unit_profile['profile'],
+                                                        profile,
                                                         applicability)
 
     @staticmethod
@@ -267,12 +520,131 @@ class ApplicabilityRegenerationManager(object):
         return plugin, cfg
 
 
-regenerate_applicability_for_consumers = task(
-    ApplicabilityRegenerationManager.regenerate_applicability_for_consumers, base=Task,
-    ignore_result=True)
-regenerate_applicability_for_repos = task(
-    ApplicabilityRegenerationManager.regenerate_applicability_for_repos, base=Task,
-    ignore_result=True)
+@task(base=Task, ignore_result=True)
+def regenerate_applicability_for_consumers(consumer_criteria):
+    """
+    Regenerate and save applicability data for given updated consumers, spreading the work
+    across the workers. The (repo, profile) pairs that are missing applicability data are split
+    into chunks of pairs with the same repo, and each chunk is regenerated by a subtask that
+    reserves its repo. Subtasks for the same repo thus never calculate the same applicability
+    concurrently.
+
+    :param consumer_criteria: The consumer selection criteria
+    :type consumer_criteria: dict
+    :return: task result listing the spawned subtasks
+    :rtype: pulp.server.async.tasks.TaskResult
+    """
+    repo_profiles = ApplicabilityRegenerationManager.find_missing_applicability(consumer_criteria)
+
+    parent_task_id = get_current_task_id()
+    subtasks = []
+    for repo_id in sorted(repo_profiles):
+        for profiles in paginate(repo_profiles[repo_id], APPLICABILITY_CHUNK_SIZE):
+            subtasks.append((regenerate_applicability_for_repo_profiles, repo_id,
+                             (repo_id, profiles), len(profiles)))
+    return _spawn_regeneration_subtasks(parent_task_id, subtasks)
+
+
+@task(base=Task, ignore_result=True)
+def regenerate_applicability_for_repos(repo_criteria, full_rebuild=False):
+    """
+    Regenerate and save applicability data affected by given updated repositories, spreading
+    the work across the workers. Each repository is regenerated by a subtask that reserves it.
+
+    :param repo_criteria: The repo selection criteria
+    :type repo_criteria: dict
+    :param full_rebuild: if True, recalculate all applicability data for the repositories
+                         instead of only applying the changes since the last regeneration
+    :type full_rebuild: bool
+    :return: task result listing the spawned subtasks
+    :rtype: pulp.server.async.tasks.TaskResult
+    """
+    repo_criteria = Criteria.from_dict(repo_criteria)
+    repo_criteria.fields = ['id']
+    repo_ids = [r['id'] for r in managers.repo_query_manager().find_by_criteria(repo_criteria)]
+
+    parent_task_id = get_current_task_id()
+    subtasks = [(regenerate_applicability_for_repo, repo_id, (repo_id, full_rebuild), 1)
+                for repo_id in sorted(set(repo_ids))]
+    return _spawn_regeneration_subtasks(parent_task_id, subtasks)
+
+
+@task(base=Task, ignore_result=True)
+def regenerate_applicability_for_repo_profiles(repo_id, profiles, parent_task_id=None):
+    """
+    Regenerate and save applicability data for a chunk of profiles against a repo, as spawned
+    by regenerate_applicability_for_consumers.
+
+    :param repo_id:        repo id to be used to calculate applicability
+    :type  repo_id:        str
+    :param profiles:       list of (profile_hash, content_type, profile_id) tuples
+    :type  profiles:       list
+    :param parent_task_id: id of the task that spawned this one, whose progress is updated
+    :type  parent_task_id: str
+    """
+    ApplicabilityRegenerationManager.regenerate_applicability_for_repo_profiles(repo_id, profiles)
+    _update_regeneration_progress(parent_task_id, len(profiles))
+
+
+@task(base=Task, ignore_result=True)
+def regenerate_applicability_for_repo(repo_id, full_rebuild=False, parent_task_id=None):
+    """
+    Regenerate and save applicability data affected by an updated repo, as spawned by
+    regenerate_applicability_for_repos.
+
+    :param repo_id:        id of the repo whose applicability data should be regenerated
+    :type  repo_id:        str
+    :param full_rebuild:   if True, recalculate all applicability data for the repository
+    :type  full_rebuild:   bool
+    :param parent_task_id: id of the task that spawned this one, whose progress is updated
+    :type  parent_task_id: str
+    """
+    ApplicabilityRegenerationManager.regenerate_applicability_for_repo(repo_id, full_rebuild)
+    _update_regeneration_progress(parent_task_id, 1)
+
+
+def _spawn_regeneration_subtasks(parent_task_id, subtasks):
+    """
+    Dispatch applicability regeneration subtasks, each reserving the repo it works on, and
+    initialize the aggregate progress report of the parent task.
+
+    :param parent_task_id: id of the task spawning the subtasks, or None
+    :type  parent_task_id: str
+    :param subtasks:       list of (task, repo_id, args, item_count) tuples
+    :type  subtasks:       list
+    :return: task result listing the spawned subtasks
+    :rtype: pulp.server.async.tasks.TaskResult
+    """
+    if parent_task_id is not None:
+        progress = {'subtasks': len(subtasks),
+                    'items_total': sum(item_count for t, r, a, item_count in subtasks),
+                    'items_completed': 0}
+        TaskStatus.objects(task_id=parent_task_id).update_one(
+            set__progress_report={PROGRESS_REPORT_KEY: progress})
+
+    spawned_tasks = []
+    for subtask, repo_id, args, item_count in subtasks:
+        task_tags = [tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, repo_id),
+                     tags.action_tag('content_applicability_regeneration')]
+        spawned_tasks.append(subtask.apply_async_with_reservation(
+            tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE, repo_id, args,
+            {'parent_task_id': parent_task_id}, tags=task_tags))
+    return TaskResult(spawned_tasks=spawned_tasks)
+
+
+def _update_regeneration_progress(parent_task_id, items_completed):
+    """
+    Add the items completed by a regeneration subtask to the progress report of its parent.
+
+    :param parent_task_id:  id of the task that spawned the subtask, or None
+    :type  parent_task_id:  str
+    :param items_completed: number of items the subtask completed
+    :type  items_completed: int
+    """
+    if parent_task_id is None:
+        return
+    TaskStatus.objects(task_id=parent_task_id).update_one(
+        **{'inc__progress_report__%s__items_completed' % PROGRESS_REPORT_KEY: items_completed})
 
 
 class DoesNotExist(Exception):
@@ -304,7 +676,8 @@ class RepoProfileApplicabilityManager(object):
         :type  profile_hash:  basestring
         :param repo_id:       The repo ID that this applicability data is for
         :type  repo_id:       basestring
-        :param profile:       The entire profile that resulted in the profile_hash
+        :param profile:       The entire profile that resulted in the profile_hash. It is shared
+                              with the unit profiles rather than saved with the applicability.
         :type  profile:       object
         :param applicability: A dictionary structure mapping unit type IDs to lists of applicable
                               Unit IDs.
@@ -422,6 +795,67 @@ def retrieve_consumer_applicability(consumer_criteria, content_types=None):
     # We only need the consumer ids
     consumer_criteria['fields'] = ['id']
     consumer_ids = [c['id'] for c in ConsumerQueryManager.find_by_criteria(consumer_criteria)]
+    return _get_consumer_applicability(consumer_ids, content_types)
+
+
+def iterate_consumer_applicability(consumer_criteria, content_types=None,
+                                   page_size=CONSUMER_APPLICABILITY_PAGE_SIZE, page_token=None):
+    """
+    Query content applicability for consumers matched by a given consumer_criteria, optionally
+    limiting by content type, one page of consumers at a time so that the memory used does not
+    grow with the number of consumers.
+
+    The consumers are walked in order of their ids, page_size consumers at a time, and a report
+    in the format returned by retrieve_consumer_applicability is generated for each page.
+    Consumers that share applicability data are only collated within the same page. The sort,
+    skip and limit of the criteria are not used.
+
+    :param consumer_criteria: The consumer selection criteria
+    :type  consumer_criteria: pulp.server.db.model.criteria.Criteria
+    :param content_types:     An optional list of content types that the caller wishes to limit
+                              the results to. Defaults to None, which will return data for all
+                              types
+    :type  content_types:     list
+    :param page_size:         The number of consumers in each page
+    :type  page_size:         int
+    :param page_token:        The token returned with a previous page, to resume after it.
+                              Defaults to None, which starts at the first page
+    :type  page_token:        basestring
+    :return: generator of (report, next_page_token) tuples. next_page_token is None for the
+             last page
+    :rtype:  generator
+    """
+    filters = consumer_criteria.filters or {}
+    while True:
+        spec = filters
+        if page_token is not None:
+            after_token = {'id': {'$gt': page_token}}
+            spec = {'$and': [filters, after_token]} if filters else after_token
+        criteria = Criteria(filters=spec, sort=[('id', pymongo.ASCENDING)], limit=page_size,
+                            fields=['id'])
+        consumer_ids = [c['id'] for c in ConsumerQueryManager.find_by_criteria(criteria)]
+
+        # A short page is the last one
+        page_token = consumer_ids[-1] if len(consumer_ids) == page_size else None
+        yield _get_consumer_applicability(consumer_ids, content_types), page_token
+        if page_token is None:
+            return
+
+
+def _get_consumer_applicability(consumer_ids, content_types):
+    """
+    Query content applicability for the given consumers, optionally limiting by content type.
+
+    :param consumer_ids:  A list of consumer ids that the applicability data should be retrieved
+                          against
+    :type  consumer_ids:  list
+    :param content_types: An optional list of content types that the caller wishes to limit the
+                          results to. None will return data for all types
+    :type  content_types: list
+    :return: applicability data for the consumers, in the format returned by
+             retrieve_consumer_applicability
+    :rtype:  list
+    """
     consumer_map = dict([(c, {'profiles': [], 'repo_ids': []}) for c in consumer_ids])
 
     # Fill out the mapping of consumer_ids to profiles, and store the list of profile_hashes
@@ -13,13 +13,17 @@
 """
 Contains profile management classes
 """
+import copy
+
 from celery import task
+from pymongo.errors import DuplicateKeyError
 
+from pulp.common import error_codes, profile as profile_utils
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.plugins.profiler import Profiler
 from pulp.server.async.tasks import Task
-from pulp.server.db.model.consumer import UnitProfile
-from pulp.server.exceptions import MissingResource
+from pulp.server.db.model.consumer import UnitProfile, UnitProfileBody
+from pulp.server.exceptions import InvalidValue, MissingResource, PulpCodedConflictException
 from pulp.server.managers import factory
 
 
@@ -45,7 +49,8 @@ class ProfileManager(object):
     def update(consumer_id, content_type, profile):
         """
         Update a unit profile.
-        Created if not already exists.
+        Created if not already exists. Nothing is written when the profile has the hash already
+        stored for the consumer.
 
         :param consumer_id:  uniquely identifies the consumer.
         :type  consumer_id:  str
@@ -64,17 +69,85 @@ class ProfileManager(object):
         # Allow the profiler a chance to update the profile before we save it
         profile = profiler.update_profile(consumer, content_type, profile, config)
 
-        try:
-            p = ProfileManager.get_profile(consumer_id, content_type)
-            p['profile'] = profile
-            # We store the profile's hash anytime the profile gets altered
-            p['profile_hash'] = UnitProfile.calculate_hash(profile)
-        except MissingResource:
-            p = UnitProfile(consumer_id, content_type, profile)
+        profile_hash = UnitProfile.calculate_hash(profile)
         collection = UnitProfile.get_collection()
-        collection.save(p, safe=True)
+        profile_id = dict(consumer_id=consumer_id, content_type=content_type)
+        p = collection.find_one(profile_id)
+        if p is not None and p['profile_hash'] == profile_hash:
+            # The consumer already references this profile, so there is nothing to store
+            p['profile'] = profile
+            return p
+
+        # The body is acquired before it is referenced so that it is never missing
+        ProfileManager._acquire_body(profile_hash, profile)
+        if p is None:
+            p = UnitProfile(consumer_id, content_type, profile, profile_hash)
+            del p.profile
+            try:
+                collection.insert(p, safe=True)
+            except DuplicateKeyError:
+                ProfileManager._release_body(profile_hash)
+                raise
+        else:
+            # The previous body is the one replaced by this update, even if another update of
+            # the same profile raced with this one
+            previous = collection.find_and_modify({'_id': p['_id']},
+                                                  {'$set': {'profile_hash': profile_hash}},
+                                                  fields=['profile_hash'])
+            if previous is None:
+                ProfileManager._release_body(profile_hash)
+                raise MissingResource(profile_id=profile_id)
+            ProfileManager._release_body(previous['profile_hash'])
+            p['profile_hash'] = profile_hash
+        p['profile'] = profile
         return p
 
+    @staticmethod
+    def update_delta(consumer_id, content_type, base_hash, delta, profile_hash):
+        """
+        Update a unit profile with the changes made to the profile the consumer last sent, as
+        calculated by pulp.common.profile.calculate_delta().
+
+        The consumer must send the whole profile instead when PulpCodedConflictException is
+        raised. This happens when the stored profile is not the base of the delta, which is also
+        the case when the profiler altered the base profile before it was stored.
+
+        :param consumer_id:  uniquely identifies the consumer.
+        :type  consumer_id:  str
+        :param content_type: The profile (content) type ID.
+        :type  content_type: str
+        :param base_hash:    The hash of the profile the delta applies to
+        :type  base_hash:    basestring
+        :param delta:        The changes made to the base profile
+        :type  delta:        dict
+        :param profile_hash: The hash of the profile that results from applying the delta
+        :type  profile_hash: basestring
+        :return:             The updated unit profile
+        :rtype:              dict
+        :raise MissingResource: when the consumer does not exist.
+        :raise PulpCodedConflictException: when the delta does not result in the profile with
+                                           the given hash.
+        """
+        factory.consumer_manager().get_consumer(consumer_id)
+        conflict = PulpCodedConflictException(error_codes.PLP0033, consumer_id=consumer_id,
+                                              content_type=content_type)
+
+        collection = UnitProfile.get_collection()
+        profile_id = dict(consumer_id=consumer_id, content_type=content_type)
+        p = collection.find_one(profile_id, fields=['profile_hash'])
+        if p is None or p['profile_hash'] != base_hash:
+            raise conflict
+        base = ProfileManager.get_profile_bodies([base_hash]).get(base_hash)
+        if base is None:
+            raise conflict
+        try:
+            profile = profile_utils.apply_delta(base, delta)
+        except ValueError:
+            raise conflict
+        if UnitProfile.calculate_hash(profile) != profile_hash:
+            raise conflict
+        return ProfileManager.update(consumer_id, content_type, profile)
+
     @staticmethod
     def delete(consumer_id, content_type):
         """
@@ -85,9 +158,12 @@ class ProfileManager(object):
         :param content_type: The profile (content) type ID.
         :type  content_type: str
         """
-        profile = ProfileManager.get_profile(consumer_id, content_type)
         collection = UnitProfile.get_collection()
-        collection.remove(profile, safe=True)
+        profile_id = dict(consumer_id=consumer_id, content_type=content_type)
+        profile = collection.find_and_modify(profile_id, remove=True, fields=['profile_hash'])
+        if profile is None:
+            raise MissingResource(profile_id=profile_id)
+        ProfileManager._release_body(profile['profile_hash'])
 
     def consumer_deleted(self, id):
         """
@@ -97,8 +173,12 @@ class ProfileManager(object):
         @type id: str
         """
         collection = UnitProfile.get_collection()
-        for p in self.get_profiles(id):
-            collection.remove(p, sefe=True)
+        while True:
+            p = collection.find_and_modify({'consumer_id': id}, remove=True,
+                                           fields=['profile_hash'])
+            if p is None:
+                break
+            ProfileManager._release_body(p['profile_hash'])
 
     @staticmethod
     def get_profile(consumer_id, content_type):
@@ -119,7 +199,7 @@ class ProfileManager(object):
         if profile is None:
             raise MissingResource(profile_id=profile_id)
         else:
-            return profile
+            return ProfileManager._attach_bodies([profile])[0]
 
     def get_profiles(self, consumer_id):
         """
@@ -133,21 +213,186 @@ class ProfileManager(object):
         collection = UnitProfile.get_collection()
         query = dict(consumer_id=consumer_id)
         cursor = collection.find(query)
-        return list(cursor)
+        return ProfileManager._attach_bodies(list(cursor))
 
     @staticmethod
     def find_by_criteria(criteria):
         """
         Return a list of unit profiles that match the provided criteria.
 
+        The profiles are stored apart from the unit profiles, by hash. Top level filters on the
+        profile, and the profile fields, are applied to the stored profiles, and the unit
+        profiles are then matched by hash. Sorting on the profile, or filtering on it within
+        an operator such as $or, is not supported.
+
         @param criteria:    A Criteria object representing a search you want
                             to perform
         @type  criteria:    pulp.server.db.model.criteria.Criteria
 
         @return:    list of UnitProfile instances
         @rtype:     list
+
+        @raise InvalidValue: when the profile is sorted on, or filtered on within an operator
+        """
+        filters = dict(criteria.filters or {})
+        body_filters = {}
+        for name in filters.keys():
+            if ProfileManager._is_profile_field(name):
+                body_filters[name] = filters.pop(name)
+            elif ProfileManager._mentions_profile(filters[name]):
+                raise InvalidValue(['filters'])
+        for name, direction in criteria.sort or []:
+            if ProfileManager._is_profile_field(name):
+                raise InvalidValue(['sort'])
+
+        if criteria.fields is None:
+            body_fields = ['profile']
+        else:
+            body_fields = [f for f in criteria.fields if ProfileManager._is_profile_field(f)]
+            if not body_fields and not body_filters:
+                return UnitProfile.get_collection().query(criteria)
+
+        criteria = copy.copy(criteria)
+        bodies = None
+        if body_filters:
+            bodies = ProfileManager._find_bodies(body_filters, body_fields or ['profile'])
+            matched = {'profile_hash': {'$in': bodies.keys()}}
+            if 'profile_hash' in filters:
+                filters = {'$and': [filters, matched]}
+            else:
+                filters.update(matched)
+            criteria.filters = filters
+        if criteria.fields is not None:
+            criteria.fields = [f for f in criteria.fields
+                               if not ProfileManager._is_profile_field(f)] + ['profile_hash']
+        profiles = list(UnitProfile.get_collection().query(criteria))
+        if not body_fields:
+            return profiles
+        if bodies is None:
+            spec = {'profile_hash': {'$in': list(set(p['profile_hash'] for p in profiles))}}
+            bodies = ProfileManager._find_bodies(spec, body_fields)
+        for p in profiles:
+            p['profile'] = bodies.get(p['profile_hash'])
+        return profiles
+
+    @staticmethod
+    def get_profile_bodies(profile_hashes):
+        """
+        Get the profiles stored for the given profile hashes.
+
+        :param profile_hashes: hashes of the profiles
+        :type  profile_hashes: list
+        :return:               dictionary mapping the profile hashes to the profiles. Hashes
+                               with no stored profile are left out.
+        :rtype:                dict
+        """
+        collection = UnitProfileBody.get_collection()
+        bodies = collection.find({'profile_hash': {'$in': list(set(profile_hashes))}},
+                                 fields=['profile_hash', 'profile'])
+        return dict((b['profile_hash'], b['profile']) for b in bodies)
+
+    @staticmethod
+    def _find_bodies(spec, fields):
+        """
+        Get the parts of the stored profiles matching a query.
+
+        :param spec:   query on the stored profile bodies
+        :type  spec:   dict
+        :param fields: the profile fields to return, such as "profile" or "profile.name"
+        :type  fields: list
+        :return:       dictionary mapping the profile hashes to the profiles
+        :rtype:        dict
+        """
+        collection = UnitProfileBody.get_collection()
+        bodies = collection.find(spec, fields=['profile_hash'] + list(fields))
+        return dict((b['profile_hash'], b.get('profile')) for b in bodies)
+
+    @staticmethod
+    def _is_profile_field(name):
+        """
+        :param name: the name of a unit profile field, in dot notation
+        :type  name: basestring
+        :return:     True if the field is the profile, or a part of it
+        :rtype:      bool
+        """
+        return name == 'profile' or name.startswith('profile.')
+
+    @staticmethod
+    def _mentions_profile(value):
+        """
+        :param value: part of a query
+        :type  value: object
+        :return:      True if the profile is queried anywhere in the value
+        :rtype:       bool
+        """
+        if isinstance(value, dict):
+            if any(ProfileManager._is_profile_field(k) for k in value):
+                return True
+            return ProfileManager._mentions_profile(value.values())
+        if isinstance(value, (list, tuple)):
+            return any(ProfileManager._mentions_profile(v) for v in value)
+        return False
+
+    @staticmethod
+    def remove_orphan_bodies():
+        """
+        Remove the stored profiles that are no longer referenced by any unit profile. Bodies
+        are normally removed as soon as they are released by their last unit profile, so this
+        only finds those left behind by an interrupted release.
+        """
+        UnitProfileBody.get_collection().remove({'refcount': {'$lte': 0}}, safe=True)
+
+    @staticmethod
+    def _attach_bodies(profiles):
+        """
+        Set the profile of unit profile documents from the stored profile bodies.
+
+        :param profiles: unit profile documents, including their profile_hash
+        :type  profiles: list
+        :return:         the same unit profile documents
+        :rtype:          list
+        """
+        bodies = ProfileManager.get_profile_bodies([p['profile_hash'] for p in profiles])
+        for p in profiles:
+            p['profile'] = bodies.get(p['profile_hash'])
+        return profiles
+
+    @staticmethod
+    def _acquire_body(profile_hash, profile):
+        """
+        Add a reference to the stored body of a profile, storing it if it does not exist.
+
+        :param profile_hash: hash of the profile
+        :type  profile_hash: basestring
+        :param profile:      the profile
+        :type  profile:      object
+        """
+        collection = UnitProfileBody.get_collection()
+        while True:
+            result = collection.update({'profile_hash': profile_hash},
+                                       {'$inc': {'refcount': 1}}, safe=True)
+            if result['n']:
+                return
+            try:
+                collection.insert(UnitProfileBody(profile_hash, profile), safe=True)
+                return
+            except DuplicateKeyError:
+                # The same profile was stored concurrently, so reference that one
+                continue
+
+    @staticmethod
+    def _release_body(profile_hash):
+        """
+        Remove a reference to the stored body of a profile, and remove the body when nothing
+        references it anymore. A body that is acquired again concurrently is not removed, as its
+        refcount is then above zero.
+
+        :param profile_hash: hash of the profile
+        :type  profile_hash: basestring
         """
-        return UnitProfile.get_collection().query(criteria)
+        collection = UnitProfileBody.get_collection()
+        collection.update({'profile_hash': profile_hash}, {'$inc': {'refcount': -1}}, safe=True)
+        collection.remove({'profile_hash': profile_hash, 'refcount': {'$lte': 0}}, safe=True)
 
 
 create = task(ProfileManager.create, base=Task)
@@ -10,10 +10,12 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 from logging import getLogger
+from uuid import uuid4
 
 from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 
-from pulp.server.db.model.content import ContentCatalog
+from pulp.server.db.model.content import ContentCatalog, ContentCatalogGeneration
 
 
 log = getLogger(__name__)
@@ -24,6 +26,9 @@ log = getLogger(__name__)
 # in the catalog after it has expired.
 GRACE_PERIOD = 3600  # 1 hour.
 
+# The number of entries a CatalogWriter inserts at once.
+WRITER_BATCH_SIZE = 5000
+
 
 class ContentCatalogManager(object):
     """
@@ -40,8 +45,22 @@ class ContentCatalogManager(object):
        - supporting find() operations on a catalog containing multiple entries
          matching the same locator.  In these cases, only the newest entry is
          included for each source in the result set.
+       - ignoring the entries of a generation written by a bulk refresh until
+         the refresh switches the source to it.
     """
 
+    def writer(self, source_id, expires):
+        """
+        Get a writer used to refresh the entries of a content source in bulk.
+        :param source_id: A content source ID.
+        :type source_id: str
+        :param expires: The entry expiration in seconds.
+        :type expires: int
+        :return: A catalog writer.
+        :rtype: CatalogWriter
+        """
+        return CatalogWriter(source_id, expires)
+
     def add_entry(self, source_id, expires, type_id, unit_key, url):
         """
         Add an entry to the content catalog.
@@ -87,6 +106,7 @@ class ContentCatalogManager(object):
         collection = ContentCatalog.get_collection()
         query = {'source_id': source_id}
         result = collection.remove(query, safe=True)
+        ContentCatalogGeneration.get_collection().remove(query, safe=True)
         return result['n']
 
     def purge_expired(self, grace_period=GRACE_PERIOD):
@@ -137,16 +157,35 @@ class ContentCatalogManager(object):
         :return: A list of matching entries.
         :rtype: list
         """
+        return self.find_all([(type_id, unit_key)])[0]
+
+    def find_all(self, units):
+        """
+        Find entries in the content catalog for a list of units using a single
+        query.  As with find(), only the newest entry for each source is included
+        in the entries found for a unit.
+        :param units: A list of tuple: (type_id, unit_key).
+        :type units: list
+        :return: A list of the lists of matching entries, in the order of units.
+        :rtype: list
+        """
         collection = ContentCatalog.get_collection()
-        locator = ContentCatalog.get_locator(type_id, unit_key)
+        locators = [ContentCatalog.get_locator(type_id, unit_key) for type_id, unit_key in units]
         query = {
-            'locator': locator,
+            'locator': {'$in': list(set(locators))},
             'expiration': {'$gte': ContentCatalog.get_expiration(0)}
         }
-        newest_by_source = {}
-        for entry in collection.find(query, sort=[('_id', ASCENDING)]):
+        entries = list(collection.find(query, sort=[('_id', ASCENDING)]))
+        generations = self._current_generations(
+            set(entry['source_id'] for entry in entries if entry.get('generation')))
+        newest_by_locator = {}
+        for entry in entries:
+            generation = entry.get('generation')
+            if generation and generation != generations.get(entry['source_id']):
+                continue
+            newest_by_source = newest_by_locator.setdefault(entry['locator'], {})
             newest_by_source[entry['source_id']] = entry
-        return newest_by_source.values()
+        return [newest_by_locator.get(locator, {}).values() for locator in locators]
 
     def has_entries(self, source_id):
         """
@@ -157,9 +196,153 @@ class ContentCatalogManager(object):
         :rtype: bool
         """
         collection = ContentCatalog.get_collection()
+        generations = self._current_generations([source_id])
         query = {
             'source_id': source_id,
-            'expiration': {'$gte': ContentCatalog.get_expiration(0)}
+            'expiration': {'$gte': ContentCatalog.get_expiration(0)},
+            'generation': {'$in': [None, generations.get(source_id)]}
         }
         cursor = collection.find(query)
         return cursor.count() > 0
+
+    @staticmethod
+    def _current_generations(source_ids):
+        """
+        Get the current generation of the entries of content sources.
+        :param source_ids: A list of content source IDs.
+        :type source_ids: iterable
+        :return: The current generations keyed by content source ID.  Sources
+            that were never refreshed in bulk are not included.
+        :rtype: dict
+        """
+        source_ids = list(source_ids)
+        if not source_ids:
+            return {}
+        collection = ContentCatalogGeneration.get_collection()
+        query = {'source_id': {'$in': source_ids}}
+        return dict((g['source_id'], g['generation']) for g in collection.find(query))
+
+
+class CatalogWriter(object):
+    """
+    Refreshes the entries of a content source in the catalog in bulk.
+    The entries are written as a new generation of the source's entries, which
+    readers ignore until commit() switches the source to it.  The previous
+    generation is then purged.  This way readers see either the entries before
+    or after the refresh, never part of them.
+    Entries are buffered and inserted in batches.  The inserts are not
+    acknowledged until the writer is flushed, so the writer keeps its
+    thread on the same database connection until it is committed or aborted.
+    :ivar source_id: The content source ID.
+    :type source_id: str
+    :ivar expires: The entry expiration in seconds.
+    :type expires: int
+    :ivar generation: The generation of the entries written.
+    :type generation: str
+    :ivar batch_size: The number of entries inserted at once.
+    :type batch_size: int
+    :ivar deleted: The locators of the entries deleted from the new generation.
+    :type deleted: set
+    """
+
+    def __init__(self, source_id, expires, batch_size=WRITER_BATCH_SIZE):
+        """
+        :param source_id: The content source ID.
+        :type source_id: str
+        :param expires: The entry expiration in seconds.
+        :type expires: int
+        :param batch_size: The number of entries inserted at once.
+        :type batch_size: int
+        """
+        self.source_id = source_id
+        self.expires = expires
+        self.generation = str(uuid4())
+        self.batch_size = batch_size
+        self.entries = []
+        self.deleted = set()
+        self.collection = ContentCatalog.get_collection()
+        self.collection.database.connection.start_request()
+
+    def add_entry(self, type_id, unit_key, url):
+        """
+        Add an entry to the new generation.
+        :param type_id: The unit type ID.
+        :type type_id: str
+        :param unit_key: The unit key.
+        :type unit_key: dict
+        :param url: The download URL.
+        :type url: str
+        """
+        entry = ContentCatalog(
+            self.source_id, self.expires, type_id, unit_key, url, generation=self.generation)
+        self.deleted.discard(entry['locator'])
+        self.entries.append(entry)
+        if len(self.entries) >= self.batch_size:
+            self.collection.insert(self.entries, safe=False)
+            self.entries = []
+
+    def delete_entry(self, type_id, unit_key):
+        """
+        Delete an entry from the new generation.  The entry of the current
+        generation stays visible to readers until commit() purges it, or is
+        left in place by abort().
+        :param type_id: The unit type ID.
+        :type type_id: str
+        :param unit_key: The unit key.
+        :type unit_key: dict
+        """
+        locator = ContentCatalog.get_locator(type_id, unit_key)
+        self.deleted.add(locator)
+        self.entries = [entry for entry in self.entries if entry['locator'] != locator]
+        # the errors of the pending inserts would be masked by the removal
+        self.flush()
+        query = {'source_id': self.source_id, 'generation': self.generation, 'locator': locator}
+        self.collection.remove(query, safe=True)
+
+    def flush(self):
+        """
+        Insert the buffered entries and wait until all of the entries inserted
+        so far have been written.
+        :raise OperationFailure: when an insert failed.
+        """
+        if self.entries:
+            self.collection.insert(self.entries, safe=False)
+            self.entries = []
+        error = self.collection.database.error()
+        if error:
+            raise OperationFailure(error['err'], error.get('code'))
+
+    def commit(self):
+        """
+        Flush the new generation, switch the content source to it and purge
+        the entries of the previous generation.
+        :return: The number of entries purged.
+        :rtype: int
+        """
+        try:
+            self.flush()
+            collection = ContentCatalogGeneration.get_collection()
+            previous = collection.find_and_modify(
+                {'source_id': self.source_id},
+                {'$set': {'generation': self.generation}},
+                upsert=True)
+        finally:
+            self.collection.database.connection.end_request()
+        # entries added without a generation are replaced as well
+        superseded = [None]
+        if previous is not None:
+            superseded.append(previous['generation'])
+        query = {'source_id': self.source_id, 'generation': {'$in': superseded}}
+        result = self.collection.remove(query, safe=True)
+        return result['n']
+
+    def abort(self):
+        """
+        Discard the new generation.
+        """
+        self.entries = []
+        # wait for the pending inserts so that none is written after the removal
+        self.collection.database.error()
+        self.collection.database.connection.end_request()
+        query = {'source_id': self.source_id, 'generation': self.generation}
+        self.collection.remove(query, safe=True)
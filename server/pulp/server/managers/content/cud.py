@@ -35,6 +35,38 @@ class ContentManager(object):
         collection.insert(unit_doc, safe=True)
         return unit_id
 
+    def add_content_units(self, content_type, units):
+        """
+        Add multiple content units of the same type and their metadata to the
+        corresponding pulp db collection with a single insert.
+
+        The insert continues past units that already exist, so if a
+        DuplicateKeyError is raised the remaining units have still been added.
+        @param content_type: unique id of content collection
+        @type content_type: str
+        @param units: list of (unit_id, unit_metadata) tuples; a unit_id of None
+                      means to generate an id
+        @type units: list of tuple
+        @return: unit ids in the same order as the given units
+        @rtype: list of str
+        @raise DuplicateKeyError: if one or more of the units already exist
+        """
+        collection = content_types_db.type_units_collection(content_type)
+        unit_docs = []
+        for unit_id, unit_metadata in units:
+            if unit_id is None:
+                unit_id = str(uuid.uuid4())
+            unit_doc = {
+                '_id': unit_id,
+                '_content_type_id': content_type,
+                '_last_updated': dateutils.now_utc_timestamp()
+            }
+            unit_doc.update(unit_metadata)
+            unit_docs.append(unit_doc)
+        if unit_docs:
+            collection.insert(unit_docs, safe=True, continue_on_error=True)
+        return [doc['_id'] for doc in unit_docs]
+
     def update_content_unit(self, content_type, unit_id, unit_metadata_delta):
         """
         Update a content unit's stored metadata.
@@ -7,6 +7,7 @@ import shutil
 from celery import task
 
 from pulp.plugins.types import database as content_types_db
+from pulp.plugins.util.misc import paginate, DEFAULT_PAGE_SIZE
 from pulp.server import config as pulp_config, exceptions as pulp_exceptions
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.repository import RepoContentUnit
@@ -14,6 +15,10 @@ from pulp.server.db.model.repository import RepoContentUnit
 
 _logger = logging.getLogger(__name__)
 
+# Number of content unit ids checked against the repo_content_units collection
+# in a single query when searching for orphans
+ORPHAN_BATCH_SIZE = DEFAULT_PAGE_SIZE
+
 
 class OrphanManager(object):
 
@@ -40,8 +45,8 @@ class OrphanManager(object):
         :rtype: int
         """
         count = 0
-        for unit in OrphanManager.generate_orphans_by_type(content_type_id):
-            count += 1
+        for orphans in OrphanManager._generate_orphan_batches(content_type_id, ['_id']):
+            count += len(orphans)
         return count
 
     def generate_all_orphans(self, fields=None):
@@ -92,18 +97,63 @@ class OrphanManager(object):
         """
 
         fields = fields if fields is not None else ['_id']
+
+        for orphans in OrphanManager._generate_orphan_batches(content_type_id, fields):
+            for content_unit in orphans:
+                yield content_unit
+
+    @staticmethod
+    def _generate_orphan_batches(content_type_id, fields, batch_size=ORPHAN_BATCH_SIZE):
+        """
+        Return a generator of lists of orphaned content units of the given content type.
+
+        The content units are streamed in `_id` order and checked for associations
+        in batches of batch_size, so the number of database queries is proportional
+        to the number of batches rather than the number of content units. Only one
+        batch of content units is held in memory at a time.
+
+        :param content_type_id: id of the content type
+        :type content_type_id: basestring
+        :param fields: list of fields to include in each content unit; `_id` is always included
+        :type fields: list
+        :param batch_size: maximum number of content units checked per query
+        :type batch_size: int
+        :return: generator of lists of orphaned content units for the given content type
+        :rtype: generator
+        """
+
+        if '_id' not in fields:
+            fields = ['_id'] + list(fields)
+
         content_units_collection = content_types_db.type_units_collection(content_type_id)
         repo_content_units_collection = RepoContentUnit.get_collection()
 
-        for content_unit in content_units_collection.find({}, fields=fields):
+        cursor = content_units_collection.find({}, fields=fields).sort('_id')
+        cursor.batch_size(batch_size)
 
-            repo_content_units_cursor = repo_content_units_collection.find(
-                {'unit_id': content_unit['_id']})
+        for batch in paginate(cursor, batch_size):
+            orphans = OrphanManager._filter_associated(repo_content_units_collection, batch)
+            if orphans:
+                yield orphans
 
-            if repo_content_units_cursor.count() > 0:
-                continue
+    @staticmethod
+    def _filter_associated(repo_content_units_collection, content_units):
+        """
+        Remove the content units that are associated with at least one repository.
+
+        :param repo_content_units_collection: the repo_content_units collection
+        :type repo_content_units_collection: pymongo.collection.Collection
+        :param content_units: content units to check; each must contain an `_id`
+        :type content_units: list
+        :return: the content units that are not associated with any repository
+        :rtype: list
+        """
+        unit_ids = [content_unit['_id'] for content_unit in content_units]
+        associated_ids = set(repo_content_units_collection.find(
+            {'unit_id': {'$in': unit_ids}}).distinct('unit_id'))
 
-            yield content_unit
+        return [content_unit for content_unit in content_units
+                if content_unit['_id'] not in associated_ids]
 
     @staticmethod
     def generate_orphans_by_type_with_unit_keys(content_type_id):
@@ -142,12 +192,13 @@ class OrphanManager(object):
                                  given content type and unit id
         """
 
-        for content_unit in OrphanManager.generate_orphans_by_type(content_type_id):
-
-            if content_unit['_id'] != content_unit_id:
-                continue
+        content_units_collection = content_types_db.type_units_collection(content_type_id)
+        content_unit = content_units_collection.find_one({'_id': content_unit_id}, fields=['_id'])
 
-            return content_unit
+        if content_unit is not None:
+            repo_content_units_collection = RepoContentUnit.get_collection()
+            if repo_content_units_collection.find_one({'unit_id': content_unit_id}) is None:
+                return content_unit
 
         raise pulp_exceptions.MissingResource(content_type=content_type_id,
                                               content_unit=content_unit_id)
@@ -202,19 +253,26 @@ class OrphanManager(object):
         :type content_unit_ids: iterable or None
         """
 
+        if content_unit_ids is not None:
+            content_unit_ids = set(content_unit_ids)
+
         content_units_collection = content_types_db.type_units_collection(content_type_id)
 
-        for content_unit in OrphanManager.generate_orphans_by_type(content_type_id,
-                                                                   fields=['_id', '_storage_path']):
+        for orphans in OrphanManager._generate_orphan_batches(content_type_id,
+                                                              ['_id', '_storage_path']):
 
-            if content_unit_ids is not None and content_unit['_id'] not in content_unit_ids:
-                continue
+            if content_unit_ids is not None:
+                orphans = [o for o in orphans if o['_id'] in content_unit_ids]
+                if not orphans:
+                    continue
 
-            content_units_collection.remove(content_unit['_id'], safe=False)
+            orphan_ids = [content_unit['_id'] for content_unit in orphans]
+            content_units_collection.remove({'_id': {'$in': orphan_ids}}, safe=False)
 
-            storage_path = content_unit.get('_storage_path', None)
-            if storage_path is not None:
-                OrphanManager.delete_orphaned_file(storage_path)
+            for content_unit in orphans:
+                storage_path = content_unit.get('_storage_path', None)
+                if storage_path is not None:
+                    OrphanManager.delete_orphaned_file(storage_path)
 
     @staticmethod
     def delete_orphaned_file(path):
@@ -0,0 +1,235 @@
+"""
+This module contains the policies the resource manager uses to choose which worker a reserved task
+is placed on, when the resource it reserves is not already reserved on a worker.
+
+The policy is selected with the worker_placement_policy setting of the [tasks] section of the
+server configuration.
+"""
+from gettext import gettext as _
+import logging
+
+from pulp.server.config import config
+
+
+_logger = logging.getLogger(__name__)
+
+# The policy used when the configured one is not known
+DEFAULT_POLICY = 'least_loaded'
+
+# The number of resources the resource_affinity policy remembers the last worker of
+AFFINITY_CACHE_SIZE = 10000
+
+# The number of placement decisions between the summaries of the placement metrics that are logged
+METRICS_LOG_INTERVAL = 100
+
+
+class PlacementPolicy(object):
+    """
+    Base class for the worker placement policies. Subclasses implement choose() and are listed
+    in POLICIES under their name.
+    """
+
+    name = None
+
+    def choose(self, workers, loads, resource_id):
+        """
+        Choose the worker to place a task on.
+
+        :param workers:     The workers that can take the task, sorted by name. This is never
+                            empty.
+        :type  workers:     list of pulp.server.db.model.resources.Worker
+        :param loads:       Maps worker names to their number of outstanding reserved tasks
+        :type  loads:       dict
+        :param resource_id: The name of the resource the task reserves, or None if not known
+        :type  resource_id: basestring
+        :return:            The chosen worker
+        :rtype:             pulp.server.db.model.resources.Worker
+        """
+        raise NotImplementedError()
+
+
+class LeastLoadedPolicy(PlacementPolicy):
+    """
+    Choose the worker with the fewest outstanding tasks. Ties go to the worker that was chosen
+    the longest time ago, so that idle workers take turns.
+    """
+
+    name = 'least_loaded'
+
+    def __init__(self):
+        self._placements = 0
+        # Maps worker names to the number of the placement they were last chosen for
+        self._last_chosen = {}
+
+    def choose(self, workers, loads, resource_id):
+        worker = min(workers, key=lambda w: (loads.get(w['name'], 0),
+                                             self._last_chosen.get(w['name'], -1)))
+        self._placements += 1
+        self._last_chosen[worker['name']] = self._placements
+        return worker
+
+
+class RoundRobinPolicy(PlacementPolicy):
+    """
+    Choose the workers in turn, in order of their names, regardless of their load.
+    """
+
+    name = 'round_robin'
+
+    def __init__(self):
+        self._last_name = None
+
+    def choose(self, workers, loads, resource_id):
+        worker = workers[0]
+        if self._last_name is not None:
+            for w in workers:
+                if w['name'] > self._last_name:
+                    worker = w
+                    break
+        self._last_name = worker['name']
+        return worker
+
+
+class ResourceAffinityPolicy(LeastLoadedPolicy):
+    """
+    Choose the worker a task reserving the same resource was last placed on, if it can take the
+    task, so that resources keep being worked on by the same worker. Otherwise choose the least
+    loaded worker.
+    """
+
+    name = 'resource_affinity'
+
+    def __init__(self, cache_size=AFFINITY_CACHE_SIZE):
+        super(ResourceAffinityPolicy, self).__init__()
+        self.cache_size = cache_size
+        # Maps resource ids to the name of the worker they were last placed on
+        self._resource_workers = {}
+        # The resource ids in _resource_workers, from the least to the most recently placed
+        self._order = []
+
+    def choose(self, workers, loads, resource_id):
+        worker = None
+        last_name = self._resource_workers.pop(resource_id, None)
+        if last_name is not None:
+            self._order.remove(resource_id)
+        for w in workers:
+            if w['name'] == last_name:
+                worker = w
+                break
+        if worker is None:
+            worker = super(ResourceAffinityPolicy, self).choose(workers, loads, resource_id)
+
+        if resource_id is not None:
+            self._resource_workers[resource_id] = worker['name']
+            self._order.append(resource_id)
+            while len(self._order) > self.cache_size:
+                del self._resource_workers[self._order.pop(0)]
+        return worker
+
+
+POLICIES = dict((policy.name, policy) for policy in
+                (LeastLoadedPolicy, RoundRobinPolicy, ResourceAffinityPolicy))
+
+
+class PlacementMetrics(object):
+    """
+    Counts the placement decisions made in this process. Each decision is logged at the debug
+    level, and a summary of the counts is logged at the info level every METRICS_LOG_INTERVAL
+    decisions so that operators can follow how the tasks are spread over the workers.
+
+    :ivar decisions:     The number of placement decisions made
+    :type decisions:     int
+    :ivar worker_counts: Maps worker names to the number of tasks placed on them
+    :type worker_counts: dict
+    """
+
+    def __init__(self):
+        self.decisions = 0
+        self.worker_counts = {}
+
+    def record(self, policy, worker, workers, loads, resource_id):
+        """
+        Record and log a placement decision.
+
+        :param policy:      The policy that made the decision
+        :type  policy:      PlacementPolicy
+        :param worker:      The chosen worker
+        :type  worker:      pulp.server.db.model.resources.Worker
+        :param workers:     The workers that could take the task
+        :type  workers:     list of pulp.server.db.model.resources.Worker
+        :param loads:       Maps worker names to their number of outstanding reserved tasks
+        :type  loads:       dict
+        :param resource_id: The name of the resource the task reserves
+        :type  resource_id: basestring
+        """
+        self.decisions += 1
+        self.worker_counts[worker['name']] = self.worker_counts.get(worker['name'], 0) + 1
+        _logger.debug(
+            'Placement %(decision)d: %(policy)s placed resource %(resource)s on %(worker)s '
+            'with %(load)d outstanding tasks, out of %(eligible)d eligible workers' %
+            {'decision': self.decisions, 'policy': policy.name, 'resource': resource_id,
+             'worker': worker['name'], 'load': loads.get(worker['name'], 0),
+             'eligible': len(workers)})
+        if self.decisions % METRICS_LOG_INTERVAL == 0:
+            self.log_summary()
+
+    def log_summary(self):
+        """
+        Log the number of decisions made and the number of tasks placed on each worker.
+        """
+        counts = ', '.join('%s: %d' % (name, count)
+                           for name, count in sorted(self.worker_counts.items()))
+        msg = _('Worker placement made %(decisions)d decisions. Tasks placed per worker: '
+                '%(counts)s')
+        _logger.info(msg % {'decisions': self.decisions, 'counts': counts})
+
+    def as_dict(self):
+        """
+        :return: the metrics as a dictionary, suitable for serialization
+        :rtype:  dict
+        """
+        return {'decisions': self.decisions, 'worker_counts': dict(self.worker_counts)}
+
+
+metrics = PlacementMetrics()
+
+# The policy instance used by this process, created on first use
+_policy = None
+
+
+def get_policy():
+    """
+    Get the placement policy configured for this process.
+
+    :return: the placement policy
+    :rtype:  PlacementPolicy
+    """
+    global _policy
+    if _policy is None:
+        name = config.get('tasks', 'worker_placement_policy')
+        if name not in POLICIES:
+            msg = _('Unknown worker placement policy %(name)s, using %(default)s instead.')
+            _logger.warning(msg % {'name': name, 'default': DEFAULT_POLICY})
+            name = DEFAULT_POLICY
+        _policy = POLICIES[name]()
+    return _policy
+
+
+def place(workers, loads, resource_id=None):
+    """
+    Choose the worker to place a task on with the configured policy, and record the decision.
+
+    :param workers:     The workers that can take the task. This must not be empty.
+    :type  workers:     list of pulp.server.db.model.resources.Worker
+    :param loads:       Maps worker names to their number of outstanding reserved tasks
+    :type  loads:       dict
+    :param resource_id: The name of the resource the task reserves, or None if not known
+    :type  resource_id: basestring
+    :return:            The chosen worker
+    :rtype:             pulp.server.db.model.resources.Worker
+    """
+    workers = sorted(workers, key=lambda w: w['name'])
+    policy = get_policy()
+    worker = policy.choose(workers, loads, resource_id)
+    metrics.record(policy, worker, workers, loads, resource_id)
+    return worker
@@ -5,7 +5,9 @@ or distributor configuration.
 """
 
 from gettext import gettext as _
+from itertools import imap
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import re
 import shutil
@@ -18,7 +20,8 @@ from pulp.common import dateutils
 from pulp.common import tags
 from pulp.server.async.tasks import Task, TaskResult
 from pulp.server.db.model.repository import (Repo, RepoDistributor, RepoImporter, RepoContentUnit,
-                                             RepoSyncResult, RepoPublishResult)
+                                             RepoContentUnitRemoval, RepoSyncResult,
+                                             RepoPublishResult)
 from pulp.server.exceptions import (DuplicateResource, InvalidValue, MissingResource,
                                     PulpExecutionException)
 from pulp.server.tasks import repository
@@ -26,6 +29,9 @@ import pulp.server.managers.factory as manager_factory
 import pulp.server.managers.repo._common as common_utils
 
 
+# The number of repositories whose content unit counts are rebuilt at once
+REBUILD_COUNTS_BATCH_SIZE = 100
+
 _REPO_ID_REGEX = re.compile(r'^[.\-_A-Za-z0-9]+$')  # letters, numbers, underscore, hyphen
 _DISTRIBUTOR_ID_REGEX = _REPO_ID_REGEX  # for now, use the same constraints
 
@@ -258,6 +264,7 @@ class RepoManager(object):
 
             # Remove all associations from the repo
             RepoContentUnit.get_collection().remove({'repo_id': repo_id}, safe=True)
+            RepoContentUnitRemoval.get_collection().remove({'repo_id': repo_id}, safe=True)
         except Exception, e:
             msg = _('Error updating one or more database collections while removing repo [%(r)s]')
             msg = msg % {'r': repo_id}
@@ -536,41 +543,44 @@ class RepoManager(object):
             raise MissingResource(repo_id=repo_id)
 
     @staticmethod
-    def rebuild_content_unit_counts(repo_ids=None):
+    def rebuild_content_unit_counts(repo_ids=None, workers=1):
         """
-        WARNING: This might take a long time, and it should not be used unless
-        absolutely necessary. Not responsible for melted servers.
+        This will recalculate the content unit counts of each content type for the
+        given repositories, which defaults to ALL repositories.
 
-        This will iterate through the given repositories, which defaults to ALL
-        repositories, and recalculate the content unit counts for each content
-        type.
+        The repositories are processed REBUILD_COUNTS_BATCH_SIZE at a time. The
+        associations of a batch are counted by a single aggregation grouped by
+        repository and type, and only the repositories whose counts changed are
+        updated. Batches may be processed concurrently, which mostly helps when
+        the database has cores to spare.
 
         This method is called from platform migration 0004, so consult that
         migration before changing this method.
 
         :param repo_ids:    list of repository IDs. DEFAULTS TO ALL REPO IDs!!!
         :type  repo_ids:    list
+        :param workers:     number of batches processed concurrently
+        :type  workers:     int
         """
-        association_collection = RepoContentUnit.get_collection()
-        repo_collection = Repo.get_collection()
-
         # default to all repos if none were specified
         if not repo_ids:
+            repo_collection = Repo.get_collection()
             repo_ids = [repo['id'] for repo in repo_collection.find(fields=['id'])]
 
         _logger.info('regenerating content unit counts for %d repositories' % len(repo_ids))
 
-        for repo_id in repo_ids:
-            _logger.debug('regenerating content unit count for repository "%s"' % repo_id)
-            counts = {}
-            cursor = association_collection.find({'repo_id': repo_id})
-            type_ids = cursor.distinct('unit_type_id')
-            cursor.close()
-            for type_id in type_ids:
-                spec = {'repo_id': repo_id, 'unit_type_id': type_id}
-                counts[type_id] = association_collection.find(spec).count()
-            repo_collection.update({'id': repo_id}, {'$set': {'content_unit_counts': counts}},
-                                   safe=True)
+        batches = [repo_ids[i:i + REBUILD_COUNTS_BATCH_SIZE]
+                   for i in xrange(0, len(repo_ids), REBUILD_COUNTS_BATCH_SIZE)]
+        if workers > 1 and len(batches) > 1:
+            pool = ThreadPool(min(workers, len(batches)))
+            try:
+                results = pool.imap_unordered(_rebuild_content_unit_counts, batches)
+                _log_rebuild_progress(results, len(repo_ids))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            _log_rebuild_progress(imap(_rebuild_content_unit_counts, batches), len(repo_ids))
 
 
 create_and_configure_repo = task(RepoManager.create_and_configure_repo, base=Task)
@@ -578,6 +588,55 @@ delete_repo = task(RepoManager.delete_repo, base=Task, ignore_result=True)
 update_repo_and_plugins = task(RepoManager.update_repo_and_plugins, base=Task)
 
 
+def _rebuild_content_unit_counts(repo_ids):
+    """
+    Recalculate the content unit counts of a batch of repositories.
+
+    :param repo_ids: list of repository IDs
+    :type  repo_ids: list
+    :return:         the number of repositories processed
+    :rtype:          int
+    """
+    repo_collection = Repo.get_collection()
+
+    counts = dict((repo_id, {}) for repo_id in repo_ids)
+    pipeline = [
+        {'$match': {'repo_id': {'$in': repo_ids}}},
+        {'$group': {'_id': {'repo_id': '$repo_id', 'unit_type_id': '$unit_type_id'},
+                    'count': {'$sum': 1}}},
+    ]
+    for group in RepoContentUnit.get_collection().aggregate(pipeline)['result']:
+        counts[group['_id']['repo_id']][group['_id']['unit_type_id']] = group['count']
+
+    current_repos = repo_collection.find({'id': {'$in': repo_ids}},
+                                         fields=['id', 'content_unit_counts'])
+    for repo in current_repos:
+        repo_counts = counts[repo['id']]
+        if repo.get('content_unit_counts') == repo_counts:
+            continue
+        _logger.debug('updating content unit counts for repository "%s"' % repo['id'])
+        repo_collection.update({'id': repo['id']},
+                               {'$set': {'content_unit_counts': repo_counts}}, safe=True)
+
+    return len(repo_ids)
+
+
+def _log_rebuild_progress(results, total):
+    """
+    Log the progress of a rebuild of the content unit counts as batches complete.
+
+    :param results: iterator of the number of repositories processed by each batch
+    :type  results: iterator
+    :param total:   the number of repositories to process
+    :type  total:   int
+    """
+    done = 0
+    for processed in results:
+        done += processed
+        _logger.info('regenerated content unit counts for %d of %d repositories' %
+                     (done, total))
+
+
 def is_repo_id_valid(repo_id):
     """
     :return: true if the repo ID is valid; false otherwise
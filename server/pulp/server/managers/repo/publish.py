@@ -157,6 +157,16 @@ class RepoPublishManager(object):
             summary = details = _('Unknown')
             result_code = RepoPublishResult.RESULT_SUCCESS
 
+        if result_code == RepoPublishResult.RESULT_SUCCESS:
+            # The units associated since this publish started may be published incrementally by
+            # the next one, as long as the configuration doesn't change
+            distributor_coll.update(
+                {'repo_id': repo_id, 'id': distributor_id},
+                {'$set': {'last_successful_publish': publish_start_timestamp,
+                          'last_publish_config': call_config.digest()}}, safe=True)
+            # The recorded removals may no longer be needed by any of the repo's distributors
+            manager_factory.repo_unit_association_manager().prune_removals(repo_id)
+
         result = RepoPublishResult.expected_result(
             repo_id, repo_distributor['id'], repo_distributor['distributor_type_id'],
             publish_start_timestamp, publish_end_timestamp, summary, details, result_code)
@@ -241,6 +251,39 @@ class RepoPublishManager(object):
             instance = dateutils.parse_iso8601_datetime(date_str)
             return instance
 
+    def last_successful_publish(self, repo_id, distributor_id):
+        """
+        Returns the timestamp at which the last successful publish started, along with the
+        digest of the configuration it was run with. If the repo has never been published
+        successfully, both are None.
+
+        @param repo_id: identifies the repo
+        @type  repo_id: str
+
+        @param distributor_id: identifies the repo's distributor
+        @type  distributor_id: str
+
+        @return: timestamp of the last successful publish and digest of its configuration,
+                 as returned by PluginCallConfiguration.digest
+        @rtype:  tuple of (datetime or None, str or None)
+
+        @raise MissingResource: if there is no distributor identified by the
+                given repo ID and distributor ID
+        """
+
+        coll = RepoDistributor.get_collection()
+        repo_distributor = coll.find_one({'repo_id': repo_id, 'id': distributor_id})
+
+        if repo_distributor is None:
+            raise MissingResource(repo_id)
+
+        date_str = repo_distributor.get('last_successful_publish')
+        if date_str is None:
+            return None, None
+
+        return (dateutils.parse_iso8601_datetime(date_str),
+                repo_distributor.get('last_publish_config'))
+
     def publish_history(self, repo_id, distributor_id, limit=None, sort=constants.SORT_DESCENDING,
                         start_date=None, end_date=None):
         """
@@ -3,18 +3,22 @@ Contains the manager class and exceptions for handling the mappings between
 repositories and content units.
 """
 from gettext import gettext as _
+from itertools import islice
 import logging
 import sys
 
 from celery import task
 import pymongo
+import pymongo.errors
 
+from pulp.common import dateutils
 from pulp.plugins.conduits.unit_import import ImportUnitConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.criteria import UnitAssociationCriteria
-from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.db.model.repository import (Repo, RepoContentUnit, RepoContentUnitRemoval,
+                                             RepoDistributor)
 import pulp.plugins.conduits._common as conduit_common_utils
 import pulp.plugins.types.database as types_db
 import pulp.server.exceptions as exceptions
@@ -43,6 +47,9 @@ SORT_DESCENDING = pymongo.DESCENDING
 
 _VALID_DIRECTIONS = (SORT_ASCENDING, SORT_DESCENDING)
 
+# The number of associations inserted at once by associate_all_by_ids
+BULK_ASSOCIATE_BATCH_SIZE = 1000
+
 logger = logging.getLogger(__name__)
 
 
@@ -123,11 +130,109 @@ class RepoUnitAssociationManager(object):
             # update the record for the last added field
             manager.update_last_unit_added(repo_id)
 
+    def bulk_associate(self, repo_id, unit_type_id, unit_id_list, owner_type, owner_id):
+        """
+        Creates associations between the given repo and a batch of content units
+        of the same type using one query to find existing associations and one
+        insert for the new ones. The unit count and last unit added timestamp
+        on the repo are updated once for the whole batch.
+
+        Units that are already associated with the repo, by any owner, are
+        skipped, matching the semantics of associate_unit_by_id.
+
+        :param repo_id:      identifies the repo
+        :type  repo_id:      str
+        :param unit_type_id: identifies the type of unit being added
+        :type  unit_type_id: str
+        :param unit_id_list: unique identifiers for units within the given type
+        :type  unit_id_list: list of str
+        :param owner_type:   category of the caller making the association;
+                             must be one of the OWNER_* variables in this module
+        :type  owner_type:   str
+        :param owner_id:     identifies the caller making the association, either
+                             the importer ID or user login
+        :type  owner_id:     str
+
+        :return:    number of new units added to the repo
+        :rtype:     int
+
+        :raise InvalidValue: if the given owner type is not of the valid enumeration
+        """
+        if owner_type not in _OWNER_TYPES:
+            raise exceptions.InvalidValue(['owner_type'])
+
+        added_count, raced = self._insert_associations(repo_id, unit_type_id, unit_id_list,
+                                                       owner_type, owner_id)
+        if added_count:
+            self._update_repo_metadata(repo_id, unit_type_id, added_count, raced)
+
+        return added_count
+
+    @staticmethod
+    def _insert_associations(repo_id, unit_type_id, unit_id_list, owner_type, owner_id):
+        """
+        Insert the associations between the repo and the units it doesn't have yet, without
+        updating the repo's metadata. Duplicate associations are ignored.
+
+        :return:    number of new units added to the repo, and whether another workflow
+                    created some of the same associations in the meantime, in which case
+                    the number may be off and the unit counts of the repo must be rebuilt
+        :rtype:     tuple of (int, bool)
+        """
+        collection = RepoContentUnit.get_collection()
+
+        spec = {'repo_id': repo_id,
+                'unit_type_id': unit_type_id,
+                'unit_id': {'$in': list(unit_id_list)}}
+        existing_ids = set(collection.find(spec).distinct('unit_id'))
+
+        new_associations = []
+        for unit_id in unit_id_list:
+            if unit_id in existing_ids:
+                continue
+            # guards against the same unit appearing twice in the list
+            existing_ids.add(unit_id)
+            new_associations.append(
+                RepoContentUnit(repo_id, unit_id, unit_type_id, owner_type, owner_id))
+
+        if not new_associations:
+            return 0, False
+
+        try:
+            collection.insert(new_associations, safe=True, continue_on_error=True)
+        except pymongo.errors.DuplicateKeyError:
+            # Another workflow created some of the same associations in the meantime
+            # and has already counted them. The rest were still inserted.
+            logger.debug(_('some associations already existed in repository [%(r)s]') %
+                         {'r': repo_id})
+            return len(new_associations), True
+
+        return len(new_associations), False
+
+    @staticmethod
+    def _update_repo_metadata(repo_id, unit_type_id, added_count, recount):
+        """
+        Update the unit count and last unit added timestamp of the repo once units were added.
+
+        :param added_count: number of units of the type added to the repo
+        :type  added_count: int
+        :param recount:     if True, the unit counts are recalculated rather than incremented
+        :type  recount:     bool
+        """
+        repo_manager = manager_factory.repo_manager()
+        if recount:
+            repo_manager.rebuild_content_unit_counts([repo_id])
+        else:
+            repo_manager.update_unit_count(repo_id, unit_type_id, added_count)
+        repo_manager.update_last_unit_added(repo_id)
+
     def associate_all_by_ids(self, repo_id, unit_type_id, unit_id_list, owner_type, owner_id):
         """
         Creates multiple associations between the given repo and content units.
 
-        See associate_unit_by_id for semantics.
+        See associate_unit_by_id for semantics. The associations are inserted in batches of
+        BULK_ASSOCIATE_BATCH_SIZE, as in bulk_associate, and the repo's metadata is updated
+        once at the end.
 
         @param repo_id: identifies the repo
         @type  repo_id: str
@@ -152,22 +257,19 @@ class RepoUnitAssociationManager(object):
         @raise InvalidType: if the given owner type is not of the valid enumeration
         """
 
-        # There may be a way to batch this in mongo which would be ideal for a
-        # bulk operation like this. But for deadline purposes, this call will
-        # simply loop and call the single method.
+        if owner_type not in _OWNER_TYPES:
+            raise exceptions.InvalidValue(['owner_type'])
 
         unique_count = 0
-        for unit_id in unit_id_list:
-            if not RepoUnitAssociationManager.association_exists(repo_id, unit_id, unit_type_id):
-                unique_count += 1
-            self.associate_unit_by_id(repo_id, unit_type_id, unit_id, owner_type, owner_id, False)
+        raced = False
+        for batch in _batches(unit_id_list, BULK_ASSOCIATE_BATCH_SIZE):
+            added_count, batch_raced = self._insert_associations(
+                repo_id, unit_type_id, batch, owner_type, owner_id)
+            unique_count += added_count
+            raced = raced or batch_raced
 
-        # update the count of associated units on the repo object
         if unique_count:
-            manager_factory.repo_manager().update_unit_count(
-                repo_id, unit_type_id, unique_count)
-            # update the timestamp for when the units were added to the repo
-            manager_factory.repo_manager().update_last_unit_added(repo_id)
+            self._update_repo_metadata(repo_id, unit_type_id, unique_count, raced)
         return unique_count
 
     @staticmethod
@@ -191,6 +293,10 @@ class RepoUnitAssociationManager(object):
         If criteria is None, the effect of this call is to copy the source
         repository's associations into the destination repository.
 
+        If the importer declares in its metadata that it only associates the units
+        it imports, it is not called, and the associations are made in bulk by
+        Pulp instead.
+
         :param source_repo_id:         identifies the source repository
         :type  source_repo_id:         str
         :param dest_repo_id:           identifies the destination repository
@@ -219,9 +325,10 @@ class RepoUnitAssociationManager(object):
         source_repo_importer = importer_manager.get_importer(source_repo_id)
 
         # The docs are incorrect on the list_importer_types call; it actually
-        # returns a dict with the types under key "types" for some reason.
-        supported_type_ids = plugin_api.list_importer_types(
-            dest_repo_importer['importer_type_id'])['types']
+        # returns the importer's metadata, with the types under key "types".
+        dest_importer_metadata = plugin_api.list_importer_types(
+            dest_repo_importer['importer_type_id'])
+        supported_type_ids = dest_importer_metadata['types']
 
         # If criteria is specified, retrieve the list of units now
         associate_us = None
@@ -241,6 +348,14 @@ class RepoUnitAssociationManager(object):
         if len(unsupported_types) > 0:
             raise exceptions.InvalidValue(['types'])
 
+        # An importer that does nothing more than associate the units it is given has no need
+        # to be called; the associations are copied in bulk instead
+        if dest_importer_metadata.get('import_associates_only', False):
+            login = manager_factory.principal_manager().get_principal()['login']
+            unit_ids = copy_associations(source_repo_id, dest_repo_id, associate_us,
+                                         associated_unit_type_ids, login)
+            return {'units_successful': unit_ids}
+
         # Convert all of the units into the plugin standard representation if
         # a filter was specified
         transfer_units = None
@@ -386,13 +501,18 @@ class RepoUnitAssociationManager(object):
                     }
             collection.remove(spec, safe=True)
 
-            unique_count = sum(
-                1 for unit_id in unit_ids if not RepoUnitAssociationManager.association_exists(
-                    repo_id, unit_id, unit_type_id))
-            if not unique_count:
+            # Units may still be associated with the repo by another owner
+            remaining_ids = set(collection.find(spec).distinct('unit_id'))
+            removed_ids = set(unit_ids) - remaining_ids
+            if not removed_ids:
                 continue
 
-            repo_manager.update_unit_count(repo_id, unit_type_id, -unique_count)
+            repo_manager.update_unit_count(repo_id, unit_type_id, -len(removed_ids))
+
+            # Record the removals so later consumers of the repo's changes can find them
+            removals = [RepoContentUnitRemoval(repo_id, unit_id, unit_type_id)
+                        for unit_id in removed_ids]
+            RepoContentUnitRemoval.get_collection().insert(removals, safe=True)
 
         repo_manager.update_last_unit_removed(repo_id)
 
@@ -409,6 +529,34 @@ class RepoUnitAssociationManager(object):
 
         return {'units_successful': serializable_units}
 
+    @staticmethod
+    def prune_removals(repo_id):
+        """
+        Delete the records of the units removed from the repository that are no longer needed.
+        The removals are needed by the applicability regeneration of the repository since it
+        last ran, and by the incremental publish of each of its distributors since it last
+        succeeded, so only the records older than all of those are deleted. While any of them
+        has never run, nothing is deleted here and the records are left for the reaper.
+
+        @param repo_id: identifies the repo
+        @type  repo_id: str
+        """
+        repo = Repo.get_collection().find_one(
+            {'id': repo_id}, fields=['last_applicability_regeneration'])
+        if repo is None:
+            return
+        since = [repo.get('last_applicability_regeneration')]
+        for distributor in RepoDistributor.get_collection().find(
+                {'repo_id': repo_id}, fields=['last_successful_publish']):
+            since.append(distributor.get('last_successful_publish'))
+        if None in since:
+            return
+
+        oldest = min(dateutils.parse_iso8601_datetime(s) for s in since)
+        RepoContentUnitRemoval.get_collection().remove(
+            {'repo_id': repo_id, 'removed': {'$lt': dateutils.format_iso8601_datetime(oldest)}},
+            safe=True)
+
     @staticmethod
     def association_exists(repo_id, unit_id, unit_type_id):
         """
@@ -445,6 +593,22 @@ associate_from_repo = task(RepoUnitAssociationManager.associate_from_repo, base=
 unassociate_by_criteria = task(RepoUnitAssociationManager.unassociate_by_criteria, base=Task)
 
 
+def _batches(iterable, size):
+    """
+    :param iterable: items to split in batches
+    :type  iterable: iterable
+    :param size:     the maximum number of items in a batch
+    :type  size:     int
+    :return:         generator of lists of the items, in order
+    :rtype:          generator
+    """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
 def load_associated_units(source_repo_id, criteria):
     criteria.association_fields = None
 
@@ -455,6 +619,54 @@ def load_associated_units(source_repo_id, criteria):
     return associate_us
 
 
+def copy_associations(source_repo_id, dest_repo_id, associated_units, associated_unit_type_ids,
+                      owner_id):
+    """
+    Associate units of the source repository with the destination repository in bulk, as
+    though a user had associated them.
+
+    :param source_repo_id:           identifies the source repository
+    :type  source_repo_id:           str
+    :param dest_repo_id:             identifies the destination repository
+    :type  dest_repo_id:             str
+    :param associated_units:         the units to associate, as returned by get_units; if None,
+                                     all the units of the source repository are associated
+    :type  associated_units:         list of dict
+    :param associated_unit_type_ids: the types of the units to associate
+    :type  associated_unit_type_ids: iterable of str
+    :param owner_id:                 login of the user making the associations
+    :type  owner_id:                 str
+    :return:                         type ids and unit keys of the associated units
+    :rtype:                          list of dict
+    """
+    type_defs = dict((type_id, types_db.type_definition(type_id))
+                     for type_id in associated_unit_type_ids)
+
+    if associated_units is None:
+        # Only the unit keys are needed, so the source repository is streamed with those alone
+        unit_fields = set()
+        for type_def in type_defs.values():
+            unit_fields.update(type_def['unit_key'])
+        criteria = UnitAssociationCriteria(type_ids=list(type_defs), unit_fields=list(unit_fields))
+        association_query_manager = manager_factory.repo_unit_association_query_manager()
+        associated_units = association_query_manager.stream_units(source_repo_id, criteria)
+
+    unit_ids = {}  # maps unit_type_id to a list of unit_ids
+    copied_units = []
+    for unit in associated_units:
+        type_id = unit['unit_type_id']
+        unit_ids.setdefault(type_id, []).append(unit['unit_id'])
+        transfer_unit = conduit_common_utils.to_plugin_associated_unit(unit, type_defs[type_id])
+        copied_units.append(transfer_unit.to_id_dict())
+
+    association_manager = manager_factory.repo_unit_association_manager()
+    for type_id, id_list in unit_ids.items():
+        association_manager.associate_all_by_ids(dest_repo_id, type_id, id_list,
+                                                 RepoContentUnit.OWNER_TYPE_USER, owner_id)
+
+    return copied_units
+
+
 def calculate_associated_type_ids(source_repo_id, associated_units):
     if associated_units is not None:
         associated_unit_type_ids = set([u['unit_type_id'] for u in associated_units])
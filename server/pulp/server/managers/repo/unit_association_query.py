@@ -4,9 +4,12 @@ Contains the manager class for performing queries for repo-unit associations.
 
 import pymongo
 
+from pulp.common import dateutils
 from pulp.plugins.types import database as types_db
+from pulp.server.config import config
 from pulp.server.db.model.criteria import UnitAssociationCriteria
-from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.db.model.repository import RepoContentUnit, RepoContentUnitRemoval
+from pulp.server.exceptions import InvalidValue
 
 
 # Valid sort strings
@@ -23,6 +26,9 @@ SORT_DESCENDING = pymongo.DESCENDING
 
 _VALID_DIRECTIONS = (SORT_ASCENDING, SORT_DESCENDING)
 
+# The number of units whose associations are held in memory at once by stream_units
+STREAM_BATCH_SIZE = 1000
+
 
 class RepoUnitAssociationQueryManager(object):
 
@@ -206,6 +212,49 @@ class RepoUnitAssociationQueryManager(object):
         # to a list. Should probably log this. Is there a log-level "stupid"?
         return list(units_generator)
 
+    def stream_units(self, repo_id, criteria=None, batch_size=STREAM_BATCH_SIZE):
+        """
+        Generate the units associated with the repository based on the provided unit
+        association criteria, in the same form as get_units.
+
+        Where get_units reads the associations of all the matching units before returning the
+        first one, this walks the associations of each type in order of unit id, batch_size
+        units at a time, and fetches the units of a batch with a single query. Only one batch
+        is held in memory at a time, so the first units are returned as soon as their batch has
+        been read, whatever the size of the repository.
+
+        The units are generated by type, in order of type id, and in order of unit id within a
+        type, so the criteria may not specify sorts. Skip and limit are applied to the generated
+        associations.
+
+        :param repo_id: identifies the repository
+        :type  repo_id: str
+
+        :param criteria: if specified will drive the query
+        :type  criteria: UnitAssociationCriteria
+
+        :param batch_size: the number of units read from the database at once
+        :type  batch_size: int
+
+        :return: generator of units associated with the repo
+        :rtype: generator
+
+        :raises InvalidValue: if the criteria specify a sort
+        """
+
+        criteria = criteria or UnitAssociationCriteria()
+
+        if criteria.association_sort or criteria.unit_sort:
+            raise InvalidValue(['sort'])
+
+        units_generator = self._streamed_units(repo_id, criteria, batch_size)
+
+        if criteria.skip or criteria.limit:
+            units_generator = self._with_skip_and_limit(units_generator, criteria.skip,
+                                                        criteria.limit)
+
+        return units_generator
+
     def get_units_across_types(self, repo_id, criteria=None, as_generator=False):
         """
         Retrieves data describing units associated with the given repository
@@ -273,6 +322,80 @@ class RepoUnitAssociationQueryManager(object):
 
         return self.get_units(repo_id, criteria, as_generator)
 
+    @staticmethod
+    def get_removed_units(repo_id, since, type_ids=None):
+        """
+        Retrieve the records of the units that stopped being associated with the repository
+        since the given time. A unit that was associated again afterwards is still included.
+
+        :param repo_id: identifies the repository
+        :type  repo_id: str
+        :param since: ISO8601 timestamp of the earliest removal to retrieve
+        :type  since: str
+        :param type_ids: if specified, only removals of units of these types are retrieved
+        :type  type_ids: list of str
+        :return: cursor of dicts with the unit_id, unit_type_id and removed timestamp of the
+                 removed units
+        :rtype: pymongo.cursor.Cursor
+        """
+
+        spec = {'repo_id': repo_id, 'removed': {'$gte': since}}
+        if type_ids:
+            spec['unit_type_id'] = {'$in': type_ids}
+
+        collection = RepoContentUnitRemoval.get_collection()
+
+        return collection.find(spec, fields=['unit_id', 'unit_type_id', 'removed'])
+
+    @staticmethod
+    def get_updated_unit_ids(repo_id, since, type_ids=None):
+        """
+        Retrieve the ids of the units associated with the repository whose metadata was updated
+        since the given time. Units are updated in place, for instance when they are imported
+        again, without their association changing.
+
+        :param repo_id: identifies the repository
+        :type  repo_id: str
+        :param since: ISO8601 timestamp of the earliest update to retrieve
+        :type  since: str
+        :param type_ids: if specified, only units of these types are retrieved
+        :type  type_ids: list of str
+        :return: dict mapping unit type ids to lists of ids of the updated units
+        :rtype: dict
+        """
+        since = dateutils.datetime_to_utc_timestamp(dateutils.parse_iso8601_datetime(since))
+        if type_ids is None:
+            type_ids = RepoUnitAssociationQueryManager.unit_type_ids_for_repo(repo_id)
+
+        association_collection = RepoContentUnit.get_collection()
+        updated = {}
+        for type_id in type_ids:
+            collection = types_db.type_units_collection(type_id)
+            unit_ids = [u['_id'] for u in
+                        collection.find({'_last_updated': {'$gte': since}}, fields=[])]
+            if not unit_ids:
+                continue
+            spec = {'repo_id': repo_id, 'unit_type_id': type_id, 'unit_id': {'$in': unit_ids}}
+            unit_ids = association_collection.find(spec).distinct('unit_id')
+            if unit_ids:
+                updated[type_id] = unit_ids
+        return updated
+
+    @staticmethod
+    def removals_retained_since():
+        """
+        Removal records are reaped once they are older than the repo_content_unit_removals
+        setting of the [data_reaping] section of the server configuration. Only the removals
+        since the returned time are sure to still be recorded, so anything that needs the removals
+        since an earlier time must treat the repository as if it was entirely changed.
+
+        :return: ISO8601 timestamp of the earliest time the removals are complete since
+        :rtype:  str
+        """
+        days = config.getfloat('data_reaping', 'repo_content_unit_removals')
+        return dateutils.format_iso8601_utc_timestamp(
+            dateutils.now_utc_timestamp() - days * 24 * 60 * 60)
+
     @staticmethod
     def unit_type_ids_for_repo(repo_id):
         """
@@ -349,6 +472,49 @@ class RepoUnitAssociationQueryManager(object):
 
             previously_generated_association_ids.add(association_id)
 
+    def _streamed_units(self, repo_id, criteria, batch_size):
+        """
+        Generate the associations matching the criteria, merged with their units, fetching the
+        units of batch_size associated units at a time.
+
+        :type repo_id: str
+        :type criteria: UnitAssociationCriteria
+        :type batch_size: int
+        :rtype: generator
+        """
+
+        fields = criteria.association_fields
+        if criteria.remove_duplicates and fields is not None and 'created' not in fields:
+            # The earliest association of a unit is the one that is kept
+            fields = fields + ['created']
+
+        collection = RepoContentUnit.get_collection()
+
+        for unit_type_id in sorted(criteria.type_ids or self.unit_type_ids_for_repo(repo_id)):
+            spec = criteria.association_filters.copy()
+            spec['repo_id'] = repo_id
+            spec['unit_type_id'] = unit_type_id
+
+            # The unique index on the associations covers this sort
+            cursor = collection.find(spec, fields=fields).sort('unit_id', SORT_ASCENDING)
+
+            # unit_id -> [association_1, association_2, ...]
+            associations_batch = {}
+
+            for association in cursor:
+                associations = associations_batch.get(association['unit_id'])
+                if associations is None:
+                    if len(associations_batch) >= batch_size:
+                        for unit in self._merged_units_batch(unit_type_id, criteria,
+                                                             associations_batch):
+                            yield unit
+                        associations_batch = {}
+                    associations = associations_batch[association['unit_id']] = []
+                associations.append(association)
+
+            for unit in self._merged_units_batch(unit_type_id, criteria, associations_batch):
+                yield unit
+
     @staticmethod
     def _with_skip_and_limit(iterator, skip, limit):
         """
@@ -401,13 +567,7 @@ class RepoUnitAssociationQueryManager(object):
         spec = criteria.unit_filters.copy()
         spec['_id'] = {'$in': associated_unit_ids}
 
-        fields = criteria.unit_fields
-
-        # The _content_type_id is required for looking up the association.
-        if fields is not None and '_content_type_id' not in fields:
-            fields = list(fields)
-            fields.append('_content_type_id')
-
+        fields = RepoUnitAssociationQueryManager._unit_fields(criteria)
         cursor = collection.find(spec, fields=fields)
 
         sort = criteria.unit_sort
@@ -423,6 +583,24 @@ class RepoUnitAssociationQueryManager(object):
 
         return cursor
 
+    @staticmethod
+    def _unit_fields(criteria):
+        """
+        Return the fields of the units to retrieve for the provided criteria.
+
+        :type criteria: UnitAssociationCriteria
+        :rtype: list or None
+        """
+
+        fields = criteria.unit_fields
+
+        # The _content_type_id is required for looking up the association.
+        if fields is not None and '_content_type_id' not in fields:
+            fields = list(fields)
+            fields.append('_content_type_id')
+
+        return fields
+
     @staticmethod
     def _associated_units_cursors_with_skip(units_cursors, skip):
         """
@@ -553,6 +731,44 @@ class RepoUnitAssociationQueryManager(object):
             association['metadata'] = unit
             yield association
 
+    @staticmethod
+    def _merged_units_batch(unit_type_id, criteria, associations_batch):
+        """
+        Retrieve the units of a batch of associations with a single query and return the
+        associations with the unit information as metadata on them, in order of unit id.
+
+        :type unit_type_id: str
+        :type criteria: UnitAssociationCriteria
+        :param associations_batch: unit_id -> [association_1, association_2, ...]
+        :type associations_batch: dict
+        :rtype: generator
+        """
+
+        if not associations_batch:
+            return
+
+        spec = criteria.unit_filters.copy()
+        spec['_id'] = {'$in': associations_batch.keys()}
+
+        collection = types_db.type_units_collection(unit_type_id)
+        fields = RepoUnitAssociationQueryManager._unit_fields(criteria)
+        cursor = collection.find(spec, fields=fields)
+        units_by_id = dict((u['_id'], u) for u in cursor)
+
+        for unit_id in sorted(associations_batch):
+            # Units may have been filtered out by the unit filters
+            unit = units_by_id.get(unit_id)
+            if unit is None:
+                continue
+
+            associations = associations_batch[unit_id]
+            if criteria.remove_duplicates:
+                associations = [min(associations, key=lambda a: a['created'])]
+
+            for association in associations:
+                association['metadata'] = unit
+                yield association
+
     @staticmethod
     def _merged_units_unique_units(associations_lookup, associated_units):
         """
@@ -2,11 +2,22 @@
 This module contains management functions for the models found in the
 pulp.server.db.model.resources module.
 """
+import time
 
 from pulp.common.constants import SCHEDULER_WORKER_NAME
 from pulp.server.async.celery_instance import RESOURCE_MANAGER_QUEUE
+from pulp.server.config import config
 from pulp.server.db.model import criteria, resources
 from pulp.server.exceptions import NoWorkers
+from pulp.server.managers import placement
+
+
+# The number of seconds the ReservationRegistry relies on what it has loaded from the database
+# before loading the workers and reservations again
+REGISTRY_REFRESH_INTERVAL = 1
+
+# The ReservationRegistry used by this process, if any. See use_reservation_registry().
+_registry = None
 
 
 def filter_workers(criteria):
@@ -39,6 +50,9 @@ def get_worker_for_reservation(resource_id):
                            `resource_id` associated with it.
     :rtype:                pulp.server.db.model.resources.Worker
     """
+    if _registry is not None:
+        return _registry.get_worker_for_reservation(resource_id)
+
     reservation = resources.ReservedResource.get_collection().find_one({'resource_id': resource_id})
     if reservation:
         find_worker_by_name = criteria.Criteria({'_id': reservation['worker_name']})
@@ -60,29 +74,198 @@ def _is_worker(worker_name):
     return True
 
 
-def get_unreserved_worker():
+def get_unreserved_worker(resource_id=None):
     """
-    Return the Worker instance that has no reserved_resource entries associated with it. If there
-    are no unreserved workers a pulp.server.exceptions.NoWorkers exception is raised.
+    Return a Worker instance that can take a task reserving a new resource. That is a worker with
+    fewer reserved_resource entries associated with it than the max_worker_reservations setting,
+    which by default means a worker with none. Out of those, the worker is chosen by the
+    configured placement policy. If there are no such workers a
+    pulp.server.exceptions.NoWorkers exception is raised.
+
+    :param resource_id: The name of the resource the task reserves, for the placement policy
+    :type  resource_id: basestring
 
-    :raises NoWorkers: If all workers have reserved_resource entries associated with them.
+    :raises NoWorkers: If all workers have as many reserved_resource entries associated with
+                       them as allowed.
 
-    :returns:          The Worker instance that has no reserved_resource entries associated with it.
+    :returns:          The Worker instance chosen to take the task
     :rtype:            pulp.server.db.model.resources.Worker
     """
+    if _registry is not None:
+        return _registry.get_unreserved_worker(resource_id)
 
     # Build a mapping of queue names to Worker objects
     workers_dict = dict((worker['name'], worker) for worker in filter_workers(criteria.Criteria()))
-    worker_names = [name for name in workers_dict.keys()]
-    reserved_names = [r['worker_name'] for r in resources.ReservedResource.get_collection().find()]
+    # Count the reservations of each worker
+    loads = {}
+    for r in resources.ReservedResource.get_collection().find():
+        loads[r['worker_name']] = loads.get(r['worker_name'], 0) + 1
 
-    # Find an unreserved worker using set differences of the names, and filter
+    worker = _place(workers_dict, loads, resource_id)
+    if worker is None:
+        # All workers are reserved
+        raise NoWorkers()
+    return worker
+
+
+def _place(workers_dict, loads, resource_id):
+    """
+    Choose the worker to place a task reserving a new resource on, out of the workers that have
+    fewer reservations than allowed, and that should be assigned work.
+
+    :param workers_dict: Maps worker names to Worker objects
+    :type  workers_dict: dict
+    :param loads:        Maps worker names to their number of reservations
+    :type  loads:        dict
+    :param resource_id:  The name of the resource the task reserves
+    :type  resource_id:  basestring
+    :return:             The chosen worker, or None if no worker can take the task
+    :rtype:              pulp.server.db.model.resources.Worker
+    """
+    max_reservations = config.getint('tasks', 'max_worker_reservations')
+    # Find the workers with fewer reservations than allowed, and filter
     # out workers that should not be assigned work.
     # NB: this is a little messy but set comprehensions are in python 2.7+
-    unreserved_workers = set(filter(_is_worker, worker_names)) - set(reserved_names)
+    eligible = [worker for name, worker in workers_dict.iteritems()
+                if _is_worker(name) and loads.get(name, 0) < max_reservations]
+    if not eligible:
+        return None
+    return placement.place(eligible, loads, resource_id)
 
-    try:
-        return workers_dict[unreserved_workers.pop()]
-    except KeyError:
-        # All workers are reserved
+
+def record_reservation(task_id, worker_name, resource_id):
+    """
+    Let the ReservationRegistry of this process know about a reservation that has just been
+    saved to the database. This does nothing if this process does not use a ReservationRegistry.
+
+    :param task_id:     The UUID of the task that requested the reservation
+    :type  task_id:     basestring
+    :param worker_name: The name of the worker the task was placed on
+    :type  worker_name: basestring
+    :param resource_id: The name of the reserved resource
+    :type  resource_id: basestring
+    """
+    if _registry is not None:
+        _registry.add_reservation(task_id, worker_name, resource_id)
+
+
+def use_reservation_registry():
+    """
+    Make get_worker_for_reservation() and get_unreserved_worker() answer from a
+    ReservationRegistry kept in this process, rather than from the database. This is meant for
+    the resource manager, which is the only process that places reserved tasks.
+    """
+    global _registry
+    _registry = ReservationRegistry()
+
+
+class ReservationRegistry(object):
+    """
+    An in-memory registry of the workers and of the resource reservations held on them, so that
+    the resource manager can place tasks without reading the workers and reserved_resources
+    collections for every placement.
+
+    The resource manager is the only process that creates reservations, so the registry learns
+    about them as they are made. Workers come and go, and reservations are released, in other
+    processes though, which only record those changes in the database. The registry loads them
+    from there every refresh_interval seconds, however many tasks are waiting to be placed. In
+    between, a released reservation keeps routing tasks for its resource to the same worker,
+    which is always safe, and a task that finds no unreserved worker waits for the next refresh.
+    The reservations are still saved to the database, which remains their record should the
+    resource manager restart.
+
+    Workers that go missing are deleted from the database along with their reservations, and
+    cleared from their queue, so the next refresh drops them from the registry.
+    """
+
+    def __init__(self, refresh_interval=REGISTRY_REFRESH_INTERVAL):
+        """
+        :param refresh_interval: The number of seconds to rely on what has been loaded from the
+                                 database
+        :type  refresh_interval: int
+        """
+        self.refresh_interval = refresh_interval
+        # Worker objects for the workers that can be assigned work, keyed by name
+        self._workers = {}
+        # Maps resource ids to the name of the worker they are reserved on
+        self._resource_workers = {}
+        # Maps worker names to the set of task ids holding a reservation on them
+        self._worker_reservations = {}
+        self._last_refresh = None
+
+    def refresh(self):
+        """
+        Load the workers and reservations from the database, replacing what is in the registry.
+        """
+        self._workers = dict((w.name, w) for w in filter_workers(criteria.Criteria())
+                             if _is_worker(w.name))
+        self._resource_workers = {}
+        self._worker_reservations = {}
+        for reservation in resources.ReservedResource.get_collection().find():
+            self.add_reservation(reservation['_id'], reservation['worker_name'],
+                                 reservation['resource_id'])
+        self._last_refresh = time.time()
+
+    def add_reservation(self, task_id, worker_name, resource_id):
+        """
+        Record a reservation of a resource on a worker for a task.
+
+        :param task_id:     The UUID of the task that requested the reservation
+        :type  task_id:     basestring
+        :param worker_name: The name of the worker the task was placed on
+        :type  worker_name: basestring
+        :param resource_id: The name of the reserved resource
+        :type  resource_id: basestring
+        """
+        self._resource_workers[resource_id] = worker_name
+        self._worker_reservations.setdefault(worker_name, set()).add(task_id)
+
+    def get_worker_for_reservation(self, resource_id):
+        """
+        Return the Worker that the given resource is reserved on.
+
+        :param resource_id: The name of the resource you wish to reserve for your task.
+        :type  resource_id: basestring
+        :raises NoWorkers:  If the resource is not reserved on a known worker.
+        :returns:           The Worker the resource is reserved on
+        :rtype:             pulp.server.db.model.resources.Worker
+        """
+        self._refresh_if_stale()
+        worker_name = self._resource_workers.get(resource_id)
+        if worker_name in self._workers:
+            return self._workers[worker_name]
         raise NoWorkers()
+
+    def get_unreserved_worker(self, resource_id=None):
+        """
+        Return a Worker that can take a task reserving a new resource. See
+        pulp.server.managers.resources.get_unreserved_worker.
+
+        :param resource_id: The name of the resource the task reserves, for the placement policy
+        :type  resource_id: basestring
+        :raises NoWorkers:  If all workers have as many reservations as allowed.
+        :returns:           The Worker chosen to take the task
+        :rtype:             pulp.server.db.model.resources.Worker
+        """
+        self._refresh_if_stale()
+        worker = _place(self._workers, self._loads(), resource_id)
+        if worker is None:
+            raise NoWorkers()
+        return worker
+
+    def _loads(self):
+        """
+        :return: worker names mapped to their number of reservations
+        :rtype:  dict
+        """
+        return dict((name, len(task_ids)) for name, task_ids in
+                    self._worker_reservations.iteritems())
+
+    def _refresh_if_stale(self):
+        """
+        Load the workers and reservations from the database if they have not been loaded within
+        the refresh interval.
+        """
+        if self._last_refresh is None or \
+                time.time() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
@@ -10,7 +10,9 @@ from pulp.server.auth.authorization import READ, CREATE, UPDATE, DELETE
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.exceptions import InvalidValue, MissingValue, OperationPostponed, \
     UnsupportedValue, MissingResource
-from pulp.server.managers.consumer.applicability import (regenerate_applicability_for_consumers,
+from pulp.server.managers.consumer.applicability import (CONSUMER_APPLICABILITY_PAGE_SIZE,
+                                                         iterate_consumer_applicability,
+                                                         regenerate_applicability_for_consumers,
                                                          retrieve_consumer_applicability)
 from pulp.server.managers.schedule.consumer import UNIT_INSTALL_ACTION, UNIT_UNINSTALL_ACTION, \
     UNIT_UPDATE_ACTION
@@ -460,6 +462,9 @@ class Profiles(JSONController):
     def POST(self, consumer_id):
         """
         Associate a profile with a consumer by content type ID.
+        Instead of the profile, the body may contain the delta from the profile with the hash
+        base_hash to the profile with the hash profile_hash. The profile is then left out of the
+        returned object, and 409 is returned when the whole profile must be sent instead.
         @param consumer_id: A consumer ID.
         @type consumer_id: str
         @return: The created model object:
@@ -469,9 +474,18 @@ class Profiles(JSONController):
         body = self.params()
         content_type = body.get('content_type')
         profile = body.get('profile')
+        delta = body.get('delta')
 
         manager = managers.consumer_profile_manager()
-        new_profile = manager.create(consumer_id, content_type, profile)
+        if delta is None:
+            new_profile = manager.create(consumer_id, content_type, profile)
+        else:
+            missing_params = [p for p in ('base_hash', 'profile_hash') if body.get(p) is None]
+            if missing_params:
+                raise MissingValue(missing_params)
+            new_profile = manager.update_delta(consumer_id, content_type, body['base_hash'],
+                                               delta, body['profile_hash'])
+            del new_profile['profile']
         link = serialization.link.child_link_obj(consumer_id, content_type)
         new_profile.update(link)
         return self.created(link['_href'], new_profile)
@@ -554,7 +568,9 @@ class ContentApplicability(JSONController):
         Query content applicability for a given consumer criteria query.
 
         body {criteria: <object>,
-              content_types: <array>[optional]}
+              content_types: <array>[optional],
+              page_size: <int>[optional],
+              page_token: <str>[optional]}
 
         This method returns a JSON document containing an array of objects that each have two
         keys: 'consumers', and 'applicability'. 'consumers' will index an array of consumer_ids,
@@ -567,6 +583,11 @@ class ContentApplicability(JSONController):
          {'consumers': ['consumer_2', 'consumer_3'],
           'applicability': {'content_type_1': ['unit_1', 'unit_2']}}]
 
+        If page_size or page_token is given, only the applicability of one page of consumers,
+        in order of their ids, is returned. The document is then an object with two keys:
+        'applicability', which indexes the array described above, and 'next_page_token', which
+        indexes the page_token to request the next page with, or null after the last page.
+
         :return: applicability data matching the consumer criteria query
         :rtype:  str
         """
@@ -576,10 +597,19 @@ class ContentApplicability(JSONController):
         try:
             consumer_criteria = self._get_consumer_criteria()
             content_types = self._get_content_types()
+            page_size, page_token = self._get_page()
         except InvalidValue, e:
             return self.bad_request(str(e))
 
-        return self.ok(retrieve_consumer_applicability(consumer_criteria, content_types))
+        if page_size is None and page_token is None:
+            return self.ok(retrieve_consumer_applicability(consumer_criteria, content_types))
+
+        if page_size is None:
+            page_size = CONSUMER_APPLICABILITY_PAGE_SIZE
+        pages = iterate_consumer_applicability(consumer_criteria, content_types, page_size,
+                                               page_token)
+        applicability, next_page_token = next(pages)
+        return self.ok({'applicability': applicability, 'next_page_token': next_page_token})
 
     def _get_consumer_criteria(self):
         """
@@ -616,6 +646,27 @@ class ContentApplicability(JSONController):
 
         return content_types
 
+    def _get_page(self):
+        """
+        Get the size and token of the page of consumers that the caller wishes to limit the
+        response to. Either is None if the caller did not include it.
+
+        :return: tuple of the page size and the page token
+        :rtype:  tuple
+        """
+        body = self.params()
+
+        page_size = body.get('page_size', None)
+        if page_size is not None and (not isinstance(page_size, int) or
+                                      isinstance(page_size, bool) or page_size < 1):
+            raise InvalidValue('page_size must be a positive integer.')
+
+        page_token = body.get('page_token', None)
+        if page_token is not None and not isinstance(page_token, basestring):
+            raise InvalidValue('page_token must be a string.')
+
+        return page_size, page_token
+
 
 class ContentApplicabilityRegeneration(JSONController):
     """
@@ -950,7 +950,7 @@ class ContentApplicabilityRegeneration(JSONController):
         Creates an async task to regenerate content applicability data for given updated
         repositories.
 
-        body {repo_criteria:<dict>}
+        body {repo_criteria:<dict>, full_rebuild:<bool>}
         """
         body = self.params()
         repo_criteria = body.get('repo_criteria', None)
@@ -960,11 +960,14 @@ class ContentApplicabilityRegeneration(JSONController):
             repo_criteria = Criteria.from_client_input(repo_criteria)
         except:
             raise exceptions.InvalidValue('repo_criteria')
+        full_rebuild = body.get('full_rebuild', False)
+        if not isinstance(full_rebuild, bool):
+            raise exceptions.InvalidValue('full_rebuild')
 
         regeneration_tag = tags.action_tag('content_applicability_regeneration')
         async_result = regenerate_applicability_for_repos.apply_async_with_reservation(
             tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE, tags.RESOURCE_ANY_ID,
-            (repo_criteria.as_dict(),), tags=[regeneration_tag])
+            (repo_criteria.as_dict(),), {'full_rebuild': full_rebuild}, tags=[regeneration_tag])
         raise exceptions.OperationPostponed(async_result)
 
 
@@ -27,6 +27,7 @@ from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import Worker, ReservedResource
 from pulp.server.logs import start_logging, stop_logging
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.auth import cache as auth_cache
 from pulp.server.managers.auth.cert.cert_generator import SerialNumber
 from pulp.server.managers.auth.role.cud import SUPER_USER_ROLE
 from pulp.server.webservices import http
@@ -73,6 +74,8 @@ class PulpServerTests(unittest.TestCase):
         super(PulpServerTests, self).setUp()
         self._mocks = {}
         self.config = PulpServerTests.CONFIG # shadow for simplicity
+        # Users and permissions are recreated between tests without the managers
+        auth_cache.invalidate()
         self.clean()
 
     def tearDown(self):
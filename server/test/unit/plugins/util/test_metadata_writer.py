@@ -248,6 +248,63 @@ class MetadataWriterTests(unittest.TestCase):
                                                    expected_metadata_file_name)
         self.assertEquals(expected_metadata_file_path, context.metadata_file_path)
 
+    def test_finalize_checksums_computed_while_writing(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha256', checksum_types=['md5'])
+        context._checksum_file = Mock()
+
+        context.initialize()
+        context.metadata_file_handle.write('some content')
+        context.finalize()
+
+        self.assertFalse(context._checksum_file.called)
+        with open(context.metadata_file_path, 'rb') as file_handle:
+            content = file_handle.read()
+        expected = {'sha256': hashlib.sha256(content).hexdigest(),
+                    'md5': hashlib.md5(content).hexdigest()}
+        self.assertEqual(context.checksums, expected)
+        self.assertEqual(context.open_checksums, expected)
+        self.assertEqual(context.size, len(content))
+        self.assertEqual(context.open_size, len(content))
+        self.assertEqual(context.checksum, expected['sha256'])
+        self.assertEqual(os.path.basename(context.metadata_file_path),
+                         expected['sha256'] + '-test.xml')
+
+    def test_finalize_checksums_gzip(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml.gz')
+        context = MetadataFileContext(path, 'sha256')
+
+        context.initialize()
+        context.metadata_file_handle.write('some content')
+        context.finalize()
+
+        with open(context.metadata_file_path, 'rb') as file_handle:
+            content = file_handle.read()
+        self.assertEqual(context.checksums, {'sha256': hashlib.sha256(content).hexdigest()})
+        self.assertEqual(context.size, len(content))
+        self.assertEqual(context.open_checksums,
+                         {'sha256': hashlib.sha256('some content').hexdigest()})
+        self.assertEqual(context.open_size, len('some content'))
+        file_handle = gzip.open(context.metadata_file_path)
+        self.assertEqual(file_handle.read(), 'some content')
+        file_handle.close()
+
+    def test_finalize_checksum_not_written_through_wrapper(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha1')
+        context.metadata_file_handle = open(path, 'w')
+        context.metadata_file_handle.write('some content')
+
+        context.finalize()
+
+        self.assertEqual(context.checksum, hashlib.sha1('some content').hexdigest())
+        self.assertEqual(context.checksums, {})
+
+    def test_init_invalid_additional_checksum(self):
+        path = os.path.join(self.metadata_file_dir, 'foo', 'header.xml')
+        assert_validation_exception(MetadataFileContext, [PLP1005], path,
+                                    checksum_types=['invalid'])
+
     @patch('pulp.plugins.util.metadata_writer._LOG.exception')
     def test_finalize_error_on_footer(self, mock_logger):
 
@@ -263,3 +263,47 @@ class TestCreateSymlink(unittest.TestCase):
         touch(link_path)
 
         self.assertRaises(RuntimeError, misc.create_symlink, source_path, link_path)
+
+
+class TestLinkTree(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='working_')
+        self.source_dir = os.path.join(self.working_dir, 'source')
+        self.target_dir = os.path.join(self.working_dir, 'target')
+        self.reference_dir = os.path.join(self.working_dir, 'reference')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _write(self, path, contents):
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(contents)
+
+    def test_link_tree(self):
+        self._write(os.path.join(self.source_dir, 'sub', 'unchanged'), 'unchanged')
+        self._write(os.path.join(self.source_dir, 'changed'), 'new')
+        os.symlink('sub', os.path.join(self.source_dir, 'link'))
+        self._write(os.path.join(self.reference_dir, 'sub', 'unchanged'), 'unchanged')
+        self._write(os.path.join(self.reference_dir, 'changed'), 'old')
+
+        copied = misc.link_tree(self.source_dir, self.target_dir, self.reference_dir)
+
+        self.assertEqual(copied, 0)
+        self.assertTrue(os.path.samefile(os.path.join(self.target_dir, 'sub', 'unchanged'),
+                                         os.path.join(self.reference_dir, 'sub', 'unchanged')))
+        self.assertTrue(os.path.samefile(os.path.join(self.target_dir, 'changed'),
+                                         os.path.join(self.source_dir, 'changed')))
+        self.assertEqual(os.readlink(os.path.join(self.target_dir, 'link')), 'sub')
+
+    @patch('pulp.plugins.util.misc.os.link', side_effect=OSError(errno.EXDEV, 'cross-device'))
+    def test_link_tree_copies(self, mock_link):
+        self._write(os.path.join(self.source_dir, 'sub', 'file'), 'contents')
+
+        copied = misc.link_tree(self.source_dir, self.target_dir)
+
+        self.assertEqual(copied, 1)
+        with open(os.path.join(self.target_dir, 'sub', 'file')) as f:
+            self.assertEqual(f.read(), 'contents')
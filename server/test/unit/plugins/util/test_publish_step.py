@@ -1,4 +1,6 @@
 import contextlib
+import datetime
+import errno
 import os
 import shutil
 import sys
@@ -13,6 +15,7 @@ from mock import Mock, patch, MagicMock
 from nectar.downloaders.local import LocalFileDownloader
 from nectar.request import DownloadRequest
 
+from pulp.common import dateutils
 from pulp.common.plugins import reporting_constants, importer_constants
 from pulp.devel.unit.util import touch, compare_dict
 from pulp.plugins.config import PluginCallConfiguration
@@ -21,7 +24,7 @@ from pulp.plugins.conduits.repo_sync import RepoSyncConduit
 from pulp.plugins.model import Repository, Unit
 from pulp.plugins.util.publish_step import Step, PublishStep, UnitPublishStep, PluginStep, \
     AtomicDirectoryPublishStep, SaveTarFilePublishStep, _post_order, CopyDirectoryStep, \
-    PluginStepIterativeProcessingMixin, DownloadStep, GetLocalUnitsStep
+    PluginStepIterativeProcessingMixin, DownloadStep, GetLocalUnitsStep, _changed_paths
 from pulp.server.managers import factory
 
 
@@ -117,6 +120,77 @@ class StepTests(PublisherBase):
         step.parent.get_status_conduit.return_value = 'foo'
         self.assertEquals('foo', step.get_status_conduit())
 
+    @patch('pulp.plugins.util.publish_step.time')
+    def test_report_progress_throttled(self, mock_time):
+        step = Step('foo_step', status_conduit=Mock())
+        step.write_progress_report = Mock()
+        step.last_report_time = 100
+        mock_time.time.return_value = 100.5
+        step.report_progress()
+        self.assertFalse(step.write_progress_report.called)
+        step.report_progress(force=True)
+        self.assertEquals(step.write_progress_report.call_count, 1)
+        mock_time.time.return_value = 101
+        step.report_progress()
+        self.assertEquals(step.write_progress_report.call_count, 2)
+
+    def test_report_progress_state_change_forced(self):
+        step = Step('foo_step', status_conduit=Mock())
+        step.last_report_time = time.time()
+        step.write_progress_report = Mock()
+        step.report_progress()
+        self.assertFalse(step.write_progress_report.called)
+        step.state = reporting_constants.STATE_RUNNING
+        step.report_progress()
+        step.write_progress_report.assert_called_once_with()
+
+    def test_write_progress_report_changes(self):
+        step = Step('foo_step', status_conduit=Mock())
+        step.add_child(Step('child1'))
+        step.add_child(Step('child2'))
+        step.write_progress_report()
+        step.status_conduit.set_progress.assert_called_once_with(step.get_progress_report())
+
+        step.children[1].progress_successes = 5
+        step.write_progress_report()
+
+        step.status_conduit.update_progress.assert_called_once_with(
+            step.get_progress_report(),
+            {'1.num_success': 5, '1.num_processed': 5})
+
+    def test_write_progress_report_unchanged(self):
+        step = Step('foo_step', status_conduit=Mock())
+        step.write_progress_report()
+        step.write_progress_report()
+        self.assertFalse(step.status_conduit.update_progress.called)
+
+    def test_write_progress_report_without_updates(self):
+        step = Step('foo_step', status_conduit=Mock(spec=['set_progress']))
+        step.write_progress_report()
+        step.total_units = 10
+        step.write_progress_report()
+        self.assertEquals(step.status_conduit.set_progress.call_count, 2)
+
+
+class ChangedPathsTests(unittest.TestCase):
+
+    def test_nested_changes(self):
+        old = [{'a': 1, 'b': {'c': [1, 2]}}, {'a': 1}]
+        new = [{'a': 1, 'b': {'c': [1, 3]}}, {'a': 2}]
+        self.assertEquals(_changed_paths(old, new), {'0.b.c.1': 3, '1.a': 2})
+
+    def test_changed_structure(self):
+        old = [{'a': [1]}, {'a': 1}]
+        new = [{'a': [1, 2]}, {'a': 1, 'b': 2}]
+        self.assertEquals(_changed_paths(old, new), {'0.a': [1, 2], '1': {'a': 1, 'b': 2}})
+
+    def test_changed_report(self):
+        self.assertEquals(_changed_paths([{'a': 1}], [{'a': 1}, {'a': 2}]),
+                          {'': [{'a': 1}, {'a': 2}]})
+
+    def test_unchanged(self):
+        self.assertEquals(_changed_paths([{'a': 1}], [{'a': 1}]), {})
+
 
 class PluginStepTests(PluginBase):
     """
@@ -599,6 +673,68 @@ class PublishStepTests(PublisherBase):
 
         self.assertFalse(report.success_flag)
 
+    def _incremental_publisher(self, last_publish, config_digest=None, removed_units=()):
+        step = UnitPublishStep('step_one', ['FOO', 'BAR'])
+        step.incremental = True
+        self.publisher.add_child(step)
+        if config_digest is None:
+            config_digest = self.config.digest()
+        self.conduit.last_successful_publish = Mock(return_value=(last_publish, config_digest))
+        self.conduit.get_removed_units = Mock(return_value=iter(removed_units))
+        self.conduit.removals_retained_since = Mock(
+            return_value=datetime.datetime(2014, 1, 1, tzinfo=dateutils.utc_tz()))
+        return step
+
+    def test_get_incremental_since(self):
+        last_publish = datetime.datetime(2014, 1, 2, 3, 4, 5, tzinfo=dateutils.utc_tz())
+        step = self._incremental_publisher(last_publish)
+
+        self.assertEquals(step.get_incremental_since(), '2014-01-02T03:04:05Z')
+        self.assertEquals(self.publisher.get_incremental_since(), '2014-01-02T03:04:05Z')
+        # Found once for the whole publish
+        self.assertEquals(self.conduit.last_successful_publish.call_count, 1)
+        self.conduit.get_removed_units.assert_called_once_with(last_publish, ['BAR', 'FOO'])
+
+    def test_get_incremental_since_no_incremental_step(self):
+        self.publisher.add_child(UnitPublishStep('step_one', 'FOO'))
+        self.conduit.last_successful_publish = Mock()
+
+        self.assertTrue(self.publisher.get_incremental_since() is None)
+        self.assertFalse(self.conduit.last_successful_publish.called)
+
+    def test_get_incremental_since_never_published(self):
+        step = self._incremental_publisher(None)
+
+        self.assertTrue(step.get_incremental_since() is None)
+        self.assertFalse(step.is_incremental())
+
+    def test_get_incremental_since_config_changed(self):
+        last_publish = datetime.datetime(2014, 1, 2, tzinfo=dateutils.utc_tz())
+        step = self._incremental_publisher(last_publish, config_digest='other')
+
+        self.assertTrue(step.get_incremental_since() is None)
+
+    def test_get_incremental_since_removals_reaped(self):
+        last_publish = datetime.datetime(2013, 12, 31, tzinfo=dateutils.utc_tz())
+        step = self._incremental_publisher(last_publish)
+
+        self.assertTrue(step.get_incremental_since() is None)
+        self.assertFalse(self.conduit.get_removed_units.called)
+
+    def test_get_incremental_since_units_removed(self):
+        last_publish = datetime.datetime(2014, 1, 2, tzinfo=dateutils.utc_tz())
+        step = self._incremental_publisher(last_publish, removed_units=[{'unit_id': 'a'}])
+
+        self.assertTrue(step.get_incremental_since() is None)
+
+    def test_get_incremental_since_removals_handled(self):
+        last_publish = datetime.datetime(2014, 1, 2, tzinfo=dateutils.utc_tz())
+        step = self._incremental_publisher(last_publish, removed_units=[{'unit_id': 'a'}])
+        step.incremental_removals = True
+
+        self.assertEquals(step.get_incremental_since(), '2014-01-02T00:00:00Z')
+        self.assertFalse(self.conduit.get_removed_units.called)
+
 
 class UnitPublishStepTests(PublisherBase):
 
@@ -657,6 +793,87 @@ class UnitPublishStepTests(PublisherBase):
         self.assertEquals(step.total_units, 1)
         mock_method.assert_called_once_with('mock_unit')
 
+    @patch('pulp.plugins.conduits.repo_publish.RepoPublishConduit.get_units')
+    def test_process_step_parallel(self, mock_get_units):
+        self.publisher.repo.content_unit_counts = {'FOO_TYPE': 20}
+        mock_get_units.return_value = iter(range(20))
+        step = UnitPublishStep('foo_step', 'FOO_TYPE')
+        step.parent = self.publisher
+        step.process_workers = 4
+        step.process_prefetch = 5
+        step.process_unit = Mock()
+        step.report_progress = Mock()
+        step.process()
+
+        self.assertEquals(step.state, reporting_constants.STATE_COMPLETE)
+        self.assertEquals(step.progress_successes, 20)
+        self.assertEquals(step.report_progress.call_count, 22)
+        self.assertEquals(sorted(c[0][0] for c in step.process_unit.call_args_list), range(20))
+
+    @patch('pulp.plugins.conduits.repo_publish.RepoPublishConduit.get_units')
+    def test_process_step_parallel_exception(self, mock_get_units):
+        self.publisher.repo.content_unit_counts = {'FOO_TYPE': 20}
+        mock_get_units.return_value = iter(range(20))
+        step = UnitPublishStep('foo_step', 'FOO_TYPE')
+        step.parent = self.publisher
+        step.process_workers = 2
+
+        def process_unit(unit):
+            if unit == 3:
+                raise ValueError()
+            # Complete the units after the failed one first
+            if unit < 3:
+                time.sleep(0.05)
+
+        step.process_unit = process_unit
+
+        self.assertRaises(ValueError, step.process)
+        self.assertEquals(step.state, reporting_constants.STATE_FAILED)
+        self.assertEquals(step.progress_successes, 3)
+        self.assertEquals(step.progress_failures, 1)
+
+    @patch('pulp.plugins.conduits.repo_publish.RepoPublishConduit.get_units')
+    def test_process_step_parallel_prefetch(self, mock_get_units):
+        self.publisher.repo.content_unit_counts = {'FOO_TYPE': 20}
+        read = []
+
+        def get_units(*args, **kwargs):
+            for unit in range(20):
+                read.append(unit)
+                yield unit
+
+        mock_get_units.side_effect = get_units
+        step = UnitPublishStep('foo_step', 'FOO_TYPE')
+        step.parent = self.publisher
+        step.process_workers = 2
+        step.process_prefetch = 3
+
+        processed = []
+
+        def process_unit(unit):
+            # No more than process_prefetch units are read ahead of those processed
+            self.assertTrue(len(read) - len(processed) <= 3)
+            processed.append(unit)
+
+        step.process_unit = process_unit
+        step.process()
+
+        self.assertEquals(step.state, reporting_constants.STATE_COMPLETE)
+
+    @patch('pulp.plugins.conduits.repo_publish.RepoPublishConduit.get_units')
+    def test_process_step_parallel_cancelled(self, mock_get_units):
+        self.publisher.repo.content_unit_counts = {'FOO_TYPE': 20}
+        mock_get_units.return_value = iter(range(20))
+        step = UnitPublishStep('foo_step', 'FOO_TYPE')
+        self.publisher.add_child(step)
+        step.process_workers = 2
+        step.process_prefetch = 2
+        step.process_unit = Mock(side_effect=lambda unit: unit == 0 and step.cancel())
+        step.process()
+
+        self.assertEquals(step.state, reporting_constants.STATE_CANCELLED)
+        self.assertTrue(step.process_unit.call_count <= 3)
+
     @patch('pulp.plugins.conduits.repo_publish.RepoPublishConduit.get_units')
     def test_process_step_cancelled_mid_unit_processing(self, mock_get_units):
         self.publisher.repo.content_unit_counts = {'FOO_TYPE': 2}
@@ -735,6 +952,73 @@ class UnitPublishStepTests(PublisherBase):
         total = step._get_total()
         self.assertEquals(0, total)
 
+    def test_get_association_filters_not_incremental(self):
+        step = UnitPublishStep("foo", ['bar', 'baz'], association_filters={'foo': 'bar'})
+        step.get_incremental_since = Mock(return_value='2014-01-02T00:00:00Z')
+
+        self.assertEquals(step.get_association_filters(), {'foo': 'bar'})
+        self.assertEquals(step.get_removed_units(), [])
+
+    def test_get_association_filters_incremental(self):
+        step = UnitPublishStep("foo", ['bar', 'baz'], association_filters={'foo': 'bar'})
+        self.publisher.add_child(step)
+        step.incremental = True
+        step.get_incremental_since = Mock(return_value='2014-01-02T00:00:00Z')
+        self.conduit.get_updated_unit_ids = Mock(return_value={})
+
+        since_filter = {'repo_id': self.repo_id, 'created': {'$gte': '2014-01-02T00:00:00Z'}}
+        self.assertEquals(step.get_association_filters(), {'$and': [{'foo': 'bar'},
+                                                                    since_filter]})
+        step.association_filters = None
+        self.assertEquals(step.get_association_filters(), since_filter)
+
+    def test_get_association_filters_updated_units(self):
+        step = UnitPublishStep("foo", ['bar', 'baz'])
+        self.publisher.add_child(step)
+        step.incremental = True
+        step.get_incremental_since = Mock(return_value='2014-01-02T00:00:00Z')
+        self.conduit.get_updated_unit_ids = Mock(return_value={'bar': ['a']})
+
+        self.assertEquals(step.get_association_filters(),
+                          {'repo_id': self.repo_id,
+                           '$or': [{'created': {'$gte': '2014-01-02T00:00:00Z'}},
+                                   {'unit_type_id': 'bar', 'unit_id': {'$in': ['a']}}]})
+        step.get_association_filters()
+        # The updated units are looked up once
+        self.conduit.get_updated_unit_ids.assert_called_once_with(
+            datetime.datetime(2014, 1, 2, tzinfo=dateutils.utc_tz()), ['bar', 'baz'])
+
+    @patch('pulp.plugins.util.publish_step.manager_factory')
+    def test_get_total_incremental(self, mock_manager_factory):
+        step = UnitPublishStep("foo", ['bar'])
+        self.publisher.add_child(step)
+        step.incremental = True
+        step.get_incremental_since = Mock(return_value='2014-01-02T00:00:00Z')
+        self.conduit.get_updated_unit_ids = Mock(return_value={})
+
+        find_by_criteria = mock_manager_factory.repo_unit_association_query_manager.return_value.\
+            find_by_criteria
+        find_by_criteria.return_value.count.return_value = 5
+        total = step._get_total()
+
+        criteria_object = find_by_criteria.call_args[0][0]
+        compare_dict(criteria_object.filters, {'repo_id': self.repo_id,
+                                               'created': {'$gte': '2014-01-02T00:00:00Z'},
+                                               'unit_type_id': {'$in': ['bar']}})
+        self.assertEquals(5, total)
+
+    def test_get_removed_units_incremental(self):
+        step = UnitPublishStep("foo", ['bar', 'baz'])
+        self.publisher.add_child(step)
+        step.incremental = True
+        step.skip_list = set(['baz'])
+        step.get_incremental_since = Mock(return_value='2014-01-02T00:00:00Z')
+        self.conduit.get_removed_units = Mock(return_value=[{'unit_id': 'a'}])
+
+        self.assertEquals(step.get_removed_units(), [{'unit_id': 'a'}])
+        self.conduit.get_removed_units.assert_called_once_with(
+            datetime.datetime(2014, 1, 2, tzinfo=dateutils.utc_tz()), ['bar'])
+
     def test_process_unit_with_no_work(self):
         # Run the blank process unit to ensure no exceptions are raised
         step = UnitPublishStep("foo", ['bar', 'baz'])
@@ -832,6 +1116,49 @@ class TestAtomicDirectoryPublishStep(unittest.TestCase):
         self.assertTrue(os.path.exists(existing_file))
         self.assertEquals(1, len(os.listdir(master_dir)))
 
+    def test_process_main_move_source_dir(self):
+        source_dir = os.path.join(self.working_directory, 'source')
+        master_dir = os.path.join(self.working_directory, 'master')
+        publish_dir = os.path.join(self.working_directory, 'publish', 'bar')
+        step = AtomicDirectoryPublishStep(source_dir, [('/', publish_dir)], master_dir,
+                                          move_source_dir=True)
+        step.parent = Mock(timestamp=str(time.time()))
+        touch(os.path.join(source_dir, 'foo', 'bar.html'))
+        source_inode = os.stat(os.path.join(source_dir, 'foo', 'bar.html')).st_ino
+
+        step.process_main()
+
+        target_file = os.path.join(publish_dir, 'foo', 'bar.html')
+        self.assertEquals(os.stat(target_file).st_ino, source_inode)
+        self.assertEquals(os.listdir(source_dir), [])
+
+    def test_process_main_move_source_dir_other_filesystem(self):
+        source_dir = os.path.join(self.working_directory, 'source')
+        master_dir = os.path.join(self.working_directory, 'master')
+        publish_dir = os.path.join(self.working_directory, 'publish', 'bar')
+        step = AtomicDirectoryPublishStep(source_dir, [('/', publish_dir)], master_dir,
+                                          move_source_dir=True)
+        step.parent = Mock(timestamp=str(time.time()))
+        touch(os.path.join(source_dir, 'foo', 'bar.html'))
+        previous_file = os.path.join(master_dir, 'previous', 'foo', 'bar.html')
+        touch(previous_file)
+        previous_inode = os.stat(previous_file).st_ino
+
+        rename = os.rename
+
+        def cross_device_rename(src, dst):
+            if src == source_dir:
+                raise OSError(errno.EXDEV, 'cross-device')
+            rename(src, dst)
+
+        with patch('pulp.plugins.util.publish_step.os.rename', cross_device_rename):
+            step.process_main()
+
+        target_file = os.path.join(publish_dir, 'foo', 'bar.html')
+        self.assertEquals(os.stat(target_file).st_ino, previous_inode)
+        self.assertEquals(os.listdir(source_dir), [])
+        self.assertEquals(os.listdir(master_dir), [step.parent.timestamp])
+
 
 class TestSaveTarFilePublishStep(unittest.TestCase):
     def setUp(self):
@@ -924,6 +1251,15 @@ class TestPluginStepIterativeProcessingMixin(unittest.TestCase):
         dummystep.report_progress.assert_called()
         self.assertEquals(dummystep.progress_successes, 2)
 
+    def test_process_block_parallel(self):
+        dummystep = self.DummyStep()
+        dummystep.process_workers = 2
+        dummystep.process_ordered = False
+        dummystep._process_block()
+        self.assertEquals(dummystep.process_item.call_count, 2)
+        self.assertEquals(dummystep.report_progress.call_count, 2)
+        self.assertEquals(dummystep.progress_successes, 2)
+
     def test_process_block_canceled_item(self):
         dummystep = self.DummyCanceledStep()
         dummystep._process_block()
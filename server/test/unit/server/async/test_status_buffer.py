@@ -0,0 +1,169 @@
+"""
+This module contains tests for the pulp.server.async.status_buffer module.
+"""
+from datetime import datetime
+import time
+
+import mock
+
+from ...base import ResourceReservationTests
+from pulp.common import constants, dateutils
+from pulp.server.async import status_buffer
+from pulp.server.db.model.dispatch import TaskStatus
+
+
+class TestTaskStatusBuffer(ResourceReservationTests):
+
+    def setUp(self):
+        super(TestTaskStatusBuffer, self).setUp()
+        self.buffer = status_buffer.TaskStatusBuffer(flush_size=10, flush_interval=60,
+                                                     flush_on_complete=True)
+
+    def tearDown(self):
+        self.buffer.flush()
+        super(TestTaskStatusBuffer, self).tearDown()
+
+    def test_updates_coalesced(self):
+        TaskStatus('task_1').save()
+
+        self.buffer.update('task_1', {'start_time': '2014-01-01T00:00:00Z'},
+                           state=constants.CALL_RUNNING_STATE)
+        # Nothing is written until the task completes
+        self.assertEqual(TaskStatus.objects.get(task_id='task_1')['state'],
+                         constants.CALL_WAITING_STATE)
+
+        with mock.patch.object(self.buffer, '_write', wraps=self.buffer._write) as mock_write:
+            self.buffer.update('task_1', {'result': 'done'}, state=constants.CALL_FINISHED_STATE)
+
+        self.assertEqual(mock_write.call_count, 1)
+        task_status = TaskStatus.objects.get(task_id='task_1')
+        self.assertEqual(task_status['state'], constants.CALL_FINISHED_STATE)
+        self.assertEqual(task_status['start_time'], '2014-01-01T00:00:00Z')
+        self.assertEqual(task_status['result'], 'done')
+
+    def test_complete_state_not_overwritten(self):
+        TaskStatus('task_1', state=constants.CALL_CANCELED_STATE).save()
+
+        self.buffer.update('task_1', {'result': 'done'}, state=constants.CALL_FINISHED_STATE)
+
+        task_status = TaskStatus.objects.get(task_id='task_1')
+        self.assertEqual(task_status['state'], constants.CALL_CANCELED_STATE)
+        self.assertEqual(task_status['result'], 'done')
+
+    def test_forced_state(self):
+        TaskStatus('task_1', state=constants.CALL_CANCELED_STATE).save()
+
+        self.buffer.update('task_1', state=constants.CALL_ERROR_STATE, force_state=True)
+
+        self.assertEqual(TaskStatus.objects.get(task_id='task_1')['state'],
+                         constants.CALL_ERROR_STATE)
+
+    def test_missing_task_status_created(self):
+        self.buffer.update('task_1', {'start_time': '2014-01-01T00:00:00Z'},
+                           state=constants.CALL_RUNNING_STATE)
+        self.buffer.flush()
+
+        self.assertEqual(TaskStatus.objects.get(task_id='task_1')['state'],
+                         constants.CALL_RUNNING_STATE)
+
+    def test_flushed_when_full(self):
+        self.buffer.flush_size = 2
+
+        self.buffer.update('task_1', state=constants.CALL_RUNNING_STATE)
+        self.assertEqual(TaskStatus.objects.count(), 0)
+        self.buffer.update('task_2', state=constants.CALL_RUNNING_STATE)
+
+        self.assertEqual(TaskStatus.objects.count(), 2)
+
+    def test_completion_buffered(self):
+        self.buffer.flush_on_complete = False
+
+        self.buffer.update('task_1', state=constants.CALL_FINISHED_STATE)
+
+        self.assertEqual(TaskStatus.objects.count(), 0)
+        self.assertTrue(self.buffer._timer is not None)
+
+    def test_written_through_without_interval(self):
+        self.buffer.flush_interval = 0
+
+        self.buffer.update('task_1', state=constants.CALL_RUNNING_STATE)
+
+        self.assertEqual(TaskStatus.objects.count(), 1)
+        self.assertTrue(self.buffer._timer is None)
+
+    @mock.patch('pulp.server.async.status_buffer._logger')
+    def test_failed_write_requeued(self, mock_logger):
+        self.buffer.update('task_1', {'result': 'first'}, state=constants.CALL_RUNNING_STATE)
+
+        with mock.patch.object(self.buffer, '_write', side_effect=Exception()):
+            self.buffer.flush()
+        self.buffer.update('task_1', {'result': 'second'})
+
+        self.assertTrue(mock_logger.exception.called)
+        self.assertEqual(self.buffer._pending['task_1'],
+                         {'fields': {'result': 'second'}, 'state': constants.CALL_RUNNING_STATE,
+                          'force_state': False})
+
+
+class TestRevocationCache(ResourceReservationTests):
+
+    def canceled(self, task_id, **kwargs):
+        finish_time = dateutils.format_iso8601_datetime(datetime.now(dateutils.utc_tz()))
+        kwargs.setdefault('finish_time', finish_time)
+        TaskStatus(task_id, state=constants.CALL_CANCELED_STATE, **kwargs).save()
+
+    def test_canceled_task_revoked(self):
+        self.canceled('task_1')
+        self.canceled('task_2', start_time='2014-01-01T00:00:00Z')
+        TaskStatus('task_3').save()
+        cache = status_buffer.RevocationCache(refresh_interval=60)
+
+        self.assertTrue(cache.is_revoked('task_1'))
+        # Only the tasks canceled before they started are cached
+        self.assertFalse(cache.is_revoked('task_2'))
+        self.assertFalse(cache.is_revoked('task_3'))
+        self.assertEqual(cache._revoked, frozenset(['task_1']))
+
+    @mock.patch('pulp.server.async.status_buffer.TaskStatus')
+    def test_cached_without_query(self, mock_task_status):
+        mock_task_status.objects.return_value.distinct.return_value = ['task_1']
+        cache = status_buffer.RevocationCache(refresh_interval=60)
+
+        self.assertTrue(cache.is_revoked('task_1'))
+        self.assertFalse(cache.is_revoked('task_2'))
+        self.assertFalse(cache.is_revoked('task_3'))
+
+        # The database is only read by the refresh
+        self.assertEqual(mock_task_status.objects.call_count, 1)
+
+    def test_canceled_since_refresh_not_revoked(self):
+        cache = status_buffer.RevocationCache(refresh_interval=60)
+        self.assertFalse(cache.is_revoked('task_1'))
+
+        self.canceled('task_1')
+
+        self.assertFalse(cache.is_revoked('task_1'))
+
+    def test_refresh_bounded(self):
+        self.canceled('task_1', finish_time='2014-01-01T00:00:00Z')
+        self.canceled('task_2')
+        cache = status_buffer.RevocationCache(refresh_interval=60)
+
+        cache.refresh()
+
+        self.assertEqual(cache._revoked, frozenset(['task_2']))
+        self.assertFalse(cache.is_revoked('task_1'))
+
+    @mock.patch('pulp.server.async.status_buffer.time')
+    def test_refreshed_after_interval(self, mock_time):
+        mock_time.time.return_value = time.time()
+        cache = status_buffer.RevocationCache(refresh_interval=5)
+        self.assertFalse(cache.is_revoked('task_1'))
+        self.canceled('task_1')
+
+        mock_time.time.return_value += 4
+        cache.is_revoked('task_1')
+        self.assertEqual(cache._revoked, frozenset())
+        mock_time.time.return_value += 1
+        cache.is_revoked('task_1')
+        self.assertEqual(cache._revoked, frozenset(['task_1']))
@@ -362,6 +362,38 @@ class TestReservedTaskMixinApplyAsyncWithReservation(ResourceReservationTests):
         self.assertEqual(self.result, str(self.mock_uuid.uuid4.return_value))
 
 
+class TestTaskCall(ResourceReservationTests):
+
+    @mock.patch('pulp.server.async.tasks.status_buffer')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_revoked_task_not_run(self, mock_request, mock_status_buffer):
+        is_revoked = mock_status_buffer.get_revocations.return_value.is_revoked
+        is_revoked.return_value = True
+        task = tasks.Task()
+        task.run = mock.Mock()
+
+        self.assertEqual(task(1), None)
+
+        is_revoked.assert_called_once_with(mock_request.id)
+        self.assertFalse(task.run.called)
+        self.assertFalse(mock_status_buffer.get_buffer.called)
+
+    @mock.patch('pulp.server.async.tasks.status_buffer')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_running_state_buffered(self, mock_request, mock_status_buffer):
+        mock_status_buffer.get_revocations.return_value.is_revoked.return_value = False
+        mock_request.called_directly = False
+        task = tasks.Task()
+        task.run = mock.Mock()
+
+        self.assertEqual(task(1), task.run.return_value)
+
+        task.run.assert_called_once_with(1)
+        update = mock_status_buffer.get_buffer.return_value.update
+        update.assert_called_once_with(mock_request.id, {'start_time': mock.ANY},
+                                       state='running')
+
+
 class TestTaskOnSuccessHandler(ResourceReservationTests):
 
     @mock.patch('pulp.server.async.tasks.Task.request')
@@ -657,6 +689,7 @@ class TestCancel(PulpServerTests):
         self.assertTrue('Task canceled' in log_msg)
         task_status = TaskStatus.objects(task_id=task_id).first()
         self.assertEqual(task_status['state'], CALL_CANCELED_STATE)
+        self.assertTrue(task_status['finish_time'] is not None)
 
     @mock.patch('pulp.server.async.tasks.controller.revoke', autospec=True)
     @mock.patch('pulp.server.async.tasks._logger', autospec=True)
@@ -812,6 +845,31 @@ class TestCleanupOldWorker(unittest.TestCase):
         mock__delete_worker.assert_called_once_with(sender.hostname, normal_shutdown=True)
 
 
+class TestUseReservationRegistry(unittest.TestCase):
+
+    @mock.patch('pulp.server.async.tasks.resources.use_reservation_registry')
+    def test_resource_manager_uses_registry(self, mock_use_reservation_registry):
+        sender = mock.Mock()
+        sender.hostname = 'resource_manager@host'
+        tasks.use_reservation_registry(sender=sender)
+        mock_use_reservation_registry.assert_called_once_with()
+
+    @mock.patch('pulp.server.async.tasks.resources.use_reservation_registry')
+    def test_other_worker_does_not_use_registry(self, mock_use_reservation_registry):
+        sender = mock.Mock()
+        sender.hostname = 'reserved_resource_worker-0@host'
+        tasks.use_reservation_registry(sender=sender)
+        self.assertFalse(mock_use_reservation_registry.called)
+
+
+class TestFlushTaskStatus(unittest.TestCase):
+
+    @mock.patch('pulp.server.async.tasks.status_buffer')
+    def test_buffer_flushed(self, mock_status_buffer):
+        tasks.flush_task_status(sender=mock.Mock())
+        mock_status_buffer.flush.assert_called_once_with()
+
+
 class TestScheduledTasks(unittest.TestCase):
 
     @mock.patch('pulp.server.db.reaper.reap_expired_documents.apply_async')
@@ -20,7 +20,7 @@ from mock import patch, Mock
 
 from pulp.server.content.sources.container import (
     ContentContainer, NectarListener, Item, RequestQueue, Batch, DownloadReport,
-    Listener, NectarFeed, Tracker)
+    Listener, NectarFeed, Tracker, CatalogPrefetcher)
 from pulp.server.content.sources.model import ContentSource
 
 
@@ -539,12 +539,15 @@ class TestBatch(TestCase):
         self.assertEqual(batch.queues[fake_source.id], fake_queue())
         self.assertEqual(queue, fake_queue())
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
-    def test_download(self, fake_dispatch, fake_wait):
+    def test_download(self, fake_dispatch, fake_wait, fake_manager):
         primary = Mock()
         sources = [Mock(), Mock()]
         requests = [Mock(), Mock(), Mock()]
+        entries = [[Mock()], [], [Mock(), Mock()]]
+        fake_manager.return_value.find_all.return_value = entries
 
         queue_1 = Mock()
         queue_1.downloader = Mock()
@@ -566,8 +569,10 @@ class TestBatch(TestCase):
 
         # validation
         # initial dispatch
-        for request in requests:
-            request.find_sources.assert_called_with(primary, sources)
+        fake_manager.return_value.find_all.assert_called_once_with(
+            [(r.type_id, r.unit_key) for r in requests])
+        for request, request_entries in zip(requests, entries):
+            request.find_sources.assert_called_with(primary, sources, request_entries)
         calls = fake_dispatch.call_args_list
         self.assertEqual(len(calls), len(requests))
         for i, request in enumerate(requests):
@@ -646,9 +651,11 @@ class TestBatch(TestCase):
         self.assertEqual(report.downloads['source-2'].total_succeeded, 200)
         self.assertEqual(report.downloads['source-2'].total_failed, 10)
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
-    def test_download_with_exception(self, fake_dispatch, fake_wait):
+    def test_download_with_exception(self, fake_dispatch, fake_wait, fake_manager):
+        fake_manager.return_value.find_all.side_effect = lambda units: [[]] * len(units)
         primary = Mock()
         fake_dispatch.side_effect = ValueError()
         sources = [Mock(), Mock()]
@@ -669,6 +676,59 @@ class TestBatch(TestCase):
             queue.join.assert_called_with()
 
 
+class TestCatalogPrefetcher(TestCase):
+
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
+    def test_iter(self, fake_manager):
+        find_all = fake_manager.return_value.find_all
+        find_all.side_effect = lambda units: [[key] for type_id, key in units]
+        requests = [Mock(type_id='t', unit_key=n) for n in range(5)]
+        canceled = Mock()
+        canceled.is_set.return_value = False
+
+        # test
+        prefetcher = CatalogPrefetcher(canceled, iter(requests), chunk_size=2)
+        prefetcher.start()
+        found = list(prefetcher)
+
+        # validation
+        self.assertEqual(found, [(r, [r.unit_key]) for r in requests])
+        self.assertEqual(find_all.call_count, 3)
+        find_all.assert_any_call([('t', 0), ('t', 1)])
+        find_all.assert_any_call([('t', 4)])
+
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
+    def test_iter_raised(self, fake_manager):
+        fake_manager.return_value.find_all.side_effect = ValueError()
+        canceled = Mock()
+        canceled.is_set.return_value = False
+
+        # test
+        prefetcher = CatalogPrefetcher(canceled, [Mock()])
+        prefetcher.start()
+
+        # validation
+        self.assertRaises(ValueError, list, prefetcher)
+
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
+    def test_iter_canceled(self, fake_manager):
+        canceled = Mock()
+        canceled.is_set.return_value = True
+
+        # test
+        prefetcher = CatalogPrefetcher(canceled, [Mock()])
+        prefetcher.run()
+
+        # validation
+        self.assertEqual(list(prefetcher), [])
+        self.assertFalse(fake_manager.return_value.find_all.called)
+
+    def test_halt(self):
+        prefetcher = CatalogPrefetcher(Mock(), [])
+        prefetcher.halt()
+        self.assertTrue(prefetcher._halted)
+
+
 class TestRequestQueue(TestCase):
 
     @patch('pulp.server.content.sources.container.Thread', new=Mock())
@@ -147,6 +147,26 @@ class TestRequest(TestCase):
         self.assertEqual(request.sources[4][0].id, primary.id)
         self.assertEqual(request.sources[4][1], url)
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
+    def test_find_sources_prefetched(self, fake_manager):
+        url = 'http://redhat.com/repository'
+        primary = PrimarySource(None)
+        alternatives = dict([(s, ContentSource(s, d)) for s, d in DESCRIPTOR])
+
+        # test
+
+        request = Request('test_1', 1, url, '/tmp/123')
+        request.find_sources(primary, alternatives, CATALOG[:1])
+
+        # validation
+
+        self.assertFalse(fake_manager().find.called)
+        request.sources = list(request.sources)
+        self.assertEqual(len(request.sources), 2)
+        self.assertEqual(request.sources[0][0].id, 's-1')
+        self.assertEqual(request.sources[0][1], CATALOG[0][constants.URL])
+        self.assertEqual(request.sources[1][0].id, primary.id)
+
     def test_next_source(self):
         sources = [1, 2, 3]
         request = Request('', {}, '', '')
@@ -401,6 +421,9 @@ class TestContentSource(TestCase):
         self.assertEqual(canceled.isSet.call_count, len(urls))
         self.assertEqual(conduit.reset.call_count, len(urls))
         self.assertEqual(cataloger.refresh.call_count, len(urls))
+        conduit.begin_refresh.assert_called_once_with()
+        conduit.commit_refresh.assert_called_once_with()
+        self.assertFalse(conduit.abort_refresh.called)
 
         n = 0
         added = 10
@@ -443,6 +466,8 @@ class TestContentSource(TestCase):
         self.assertEqual(conduit.reset.call_count, 0)
         self.assertEqual(cataloger.refresh.call_count, 0)
         self.assertEqual(report, [])
+        self.assertFalse(conduit.commit_refresh.called)
+        conduit.abort_refresh.assert_called_once_with()
 
     @patch('pulp.server.content.sources.model.ContentSource.urls')
     def test_refresh_raised(self, fake_urls):
@@ -469,6 +494,8 @@ class TestContentSource(TestCase):
         self.assertEqual(canceled.isSet.call_count, len(urls))
         self.assertEqual(conduit.reset.call_count, len(urls))
         self.assertEqual(cataloger.refresh.call_count, len(urls))
+        self.assertFalse(conduit.commit_refresh.called)
+        conduit.abort_refresh.assert_called_once_with()
 
         n = 0
         for _url in source.urls:
@@ -0,0 +1,55 @@
+"""
+This module contains tests for pulp.server.db.migrations.0015_unit_profile_bodies.
+"""
+import unittest
+
+import mock
+
+from pulp.server.db.migrate.models import _import_all_the_way
+
+
+migration = _import_all_the_way('pulp.server.db.migrations.0015_unit_profile_bodies')
+
+
+class TestMigrate(unittest.TestCase):
+    """
+    Test the migrate() function.
+    """
+    @mock.patch('pulp.server.db.migrations.0015_unit_profile_bodies.RepoProfileApplicability')
+    @mock.patch('pulp.server.db.migrations.0015_unit_profile_bodies.UnitProfileBody')
+    @mock.patch('pulp.server.db.migrations.0015_unit_profile_bodies.UnitProfile')
+    def test_migrate(self, unit_profile, unit_profile_body, repo_profile_applicability):
+        """
+        Ensure that the profiles are moved to the bodies, each of which is stored once.
+        """
+        profile_collection = unit_profile.get_collection.return_value
+        profile_collection.find.return_value = [
+            {'_id': 1, 'profile_hash': 'hash_1', 'profile': 'profile_1'},
+            {'_id': 2, 'profile_hash': 'hash_1', 'profile': 'profile_1'},
+            {'_id': 3, 'profile_hash': 'hash_2', 'profile': 'profile_2'}]
+        body_collection = unit_profile_body.get_collection.return_value
+        stored = set()
+
+        def update(spec, document, safe):
+            n = int(spec['profile_hash'] in stored)
+            stored.add(spec['profile_hash'])
+            return {'n': n}
+
+        body_collection.update.side_effect = update
+
+        migration.migrate()
+
+        profile_collection.find.assert_called_once_with({'profile': {'$exists': True}},
+                                                        fields=['profile_hash', 'profile'])
+        self.assertEqual(body_collection.update.call_count, 3)
+        body_collection.update.assert_called_with({'profile_hash': 'hash_2'},
+                                                  {'$inc': {'refcount': 1}}, safe=True)
+        # Only the first unit profile of each hash stores its body
+        self.assertEqual(unit_profile_body.call_args_list,
+                         [mock.call('hash_1', 'profile_1'), mock.call('hash_2', 'profile_2')])
+        self.assertEqual(body_collection.insert.call_count, 2)
+        self.assertEqual(profile_collection.update.call_args_list,
+                         [mock.call({'_id': i}, {'$unset': {'profile': 1}}, safe=True)
+                          for i in (1, 2, 3)])
+        repo_profile_applicability.get_collection.return_value.update.assert_called_once_with(
+            {'profile': {'$exists': True}}, {'$unset': {'profile': 1}}, multi=True, safe=True)
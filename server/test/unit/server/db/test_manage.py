@@ -325,9 +325,11 @@ class TestManageDB(MigrationTest):
         self.assertEqual(indexes['attribute_1_1']['key'], [(u'attribute_1', 1)])
         self.assertEqual(indexes['attribute_3_1']['dropDups'], False)
         self.assertEqual(indexes['attribute_3_1']['key'], [(u'attribute_3', 1)])
+        self.assertEqual(indexes['_last_updated_1']['key'], [(u'_last_updated', 1)])
         # Make sure we only have the indexes that we've hand inspected here
-        self.assertEqual(indexes.keys(), [u'_id_', u'attribute_1_1_attribute_2_1_attribute_3_1',
-                                          u'attribute_1_1', u'attribute_3_1'])
+        self.assertEqual(sorted(indexes.keys()),
+                         sorted([u'_id_', u'attribute_1_1_attribute_2_1_attribute_3_1',
+                                 u'attribute_1_1', u'attribute_3_1', u'_last_updated_1']))
 
     @patch('pulp.server.db.manage.logging.getLogger')
     @patch.object(models.MigrationPackage, 'apply_migration',
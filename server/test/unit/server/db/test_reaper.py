@@ -27,6 +27,7 @@ class TestReaperCollectionConfig(unittest.TestCase):
                                consumer.ConsumerHistoryEvent,
                                repository.RepoSyncResult,
                                repository.RepoPublishResult,
+                               repository.RepoContentUnitRemoval,
                                repo_group.RepoGroupPublishResult,
                                celery_result.CeleryResult]
         for key in collections_to_reap:
@@ -40,6 +41,8 @@ class TestReaperCollectionConfig(unittest.TestCase):
                          'repo_sync_history')
         self.assertEqual(reaper._COLLECTION_TIMEDELTAS[repository.RepoPublishResult],
                          'repo_publish_history')
+        self.assertEqual(reaper._COLLECTION_TIMEDELTAS[repository.RepoContentUnitRemoval],
+                         'repo_content_unit_removals')
         self.assertEqual(reaper._COLLECTION_TIMEDELTAS[repo_group.RepoGroupPublishResult],
                          'repo_group_publish_history')
         self.assertEqual(reaper._COLLECTION_TIMEDELTAS[celery_result.CeleryResult],
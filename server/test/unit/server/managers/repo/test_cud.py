@@ -50,42 +50,59 @@ class RepoManagerTests(base.ResourceReservationTests):
         # platform migration 0004 has a test for this that uses live data
 
         repo_col = mock_get_repo_col.return_value
-        find = mock_get_assoc_col.return_value.find
-        cursor = find.return_value
-        cursor.distinct.return_value = ['rpm', 'srpm']
-        cursor.count.return_value = 6
-
-        self.manager.rebuild_content_unit_counts(['repo1'])
-
-        # once to get the type_ids, then once more for each of the 2 types
-        self.assertEqual(find.call_count, 3)
-        find.assert_any_call({'repo_id': 'repo1'})
-        find.assert_any_call({'repo_id': 'repo1', 'unit_type_id': 'rpm'})
-        find.assert_any_call({'repo_id': 'repo1', 'unit_type_id': 'srpm'})
-
-        self.assertEqual(repo_col.update.call_count, 1)
-        repo_col.update.assert_called_once_with(
+        repo_col.find.return_value = [
+            {'id': 'repo1', 'content_unit_counts': {'rpm': 1}},
+            {'id': 'repo2', 'content_unit_counts': {'rpm': 2}},
+            {'id': 'repo3'}]
+        aggregate = mock_get_assoc_col.return_value.aggregate
+        aggregate.return_value = {'result': [
+            {'_id': {'repo_id': 'repo1', 'unit_type_id': 'rpm'}, 'count': 6},
+            {'_id': {'repo_id': 'repo1', 'unit_type_id': 'srpm'}, 'count': 6},
+            {'_id': {'repo_id': 'repo2', 'unit_type_id': 'rpm'}, 'count': 2}]}
+
+        self.manager.rebuild_content_unit_counts(['repo1', 'repo2', 'repo3'])
+
+        # all the repos are counted by a single aggregation
+        self.assertEqual(aggregate.call_count, 1)
+        pipeline = aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0], {'$match': {'repo_id': {'$in': ['repo1', 'repo2',
+                                                                      'repo3']}}})
+
+        # repo2's counts did not change
+        self.assertEqual(repo_col.update.call_count, 2)
+        repo_col.update.assert_any_call(
             {'id': 'repo1'},
             {'$set': {'content_unit_counts': {'rpm': 6, 'srpm': 6}}},
             safe=True
         )
+        repo_col.update.assert_any_call(
+            {'id': 'repo3'},
+            {'$set': {'content_unit_counts': {}}},
+            safe=True
+        )
 
+    @mock.patch('pulp.server.managers.repo.cud.REBUILD_COUNTS_BATCH_SIZE', 1)
     @mock.patch('pulp.server.db.model.repository.Repo.get_collection')
     @mock.patch('pulp.server.db.model.repository.RepoContentUnit.get_collection')
     def test_rebuild_default_all_repos(self, mock_get_assoc_col, mock_get_repo_col):
+        def find(spec=None, fields=None):
+            repo_ids = spec['id']['$in'] if spec else ['repo1', 'repo2']
+            return [{'id': repo_id} for repo_id in repo_ids]
+
         repo_col = mock_get_repo_col.return_value
-        repo_col.find.return_value = [{'id': 'repo1'}, {'id': 'repo2'}]
+        repo_col.find.side_effect = find
 
         assoc_col = mock_get_assoc_col.return_value
-        # don't return any type IDs
-        assoc_col.find.return_value.distinct.return_value = []
+        # don't return any counts
+        assoc_col.aggregate.return_value = {'result': []}
 
-        self.manager.rebuild_content_unit_counts()
+        self.manager.rebuild_content_unit_counts(workers=2)
 
-        # makes sure it found these 2 repos and tried to operate on them
-        assoc_col.find.assert_any_call({'repo_id': 'repo1'})
-        assoc_col.find.assert_any_call({'repo_id': 'repo2'})
-        self.assertEqual(assoc_col.find.call_count, 2)
+        # makes sure it found these 2 repos and operated on them in separate batches
+        self.assertEqual(assoc_col.aggregate.call_count, 2)
+        matched = sorted(c[0][0][0]['$match']['repo_id']['$in']
+                         for c in assoc_col.aggregate.call_args_list)
+        self.assertEqual(matched, [['repo1'], ['repo2']])
 
     def test_create(self):
         """
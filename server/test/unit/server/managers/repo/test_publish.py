@@ -67,6 +67,9 @@ class RepoSyncManagerTests(base.PulpServerTests):
         #   History
         entries = list(RepoPublishResult.get_collection().find({'repo_id': 'repo-1'}))
         self.assertEqual(1, len(entries))
+        self.assertEqual(entries[0]['started'], repo_distributor['last_successful_publish'])
+        call_config = mock_plugins.MOCK_DISTRIBUTOR.publish_repo.call_args[0][2]
+        self.assertEqual(call_config.digest(), repo_distributor['last_publish_config'])
         self.assertEqual('repo-1', entries[0]['repo_id'])
         self.assertEqual('dist-1', entries[0]['distributor_id'])
         self.assertEqual('mock-distributor', entries[0]['distributor_type_id'])
@@ -116,6 +119,10 @@ class RepoSyncManagerTests(base.PulpServerTests):
         entries = list(RepoPublishResult.get_collection().find({'repo_id': 'repo-1'}))
         self.assertEqual(1, len(entries))
 
+        repo_distributor = RepoDistributor.get_collection().find_one({'repo_id': 'repo-1',
+                                                                      'id': 'dist-1'})
+        self.assertTrue(repo_distributor['last_successful_publish'] is None)
+
         for check_me in entries[0], report:
             self.assertEqual('repo-1', check_me['repo_id'])
             self.assertEqual('dist-1', check_me['distributor_id'])
@@ -345,6 +352,41 @@ class RepoSyncManagerTests(base.PulpServerTests):
         # Verify
         self.assertTrue(last is None)
 
+    def test_last_successful_publish(self):
+        """
+        Tests retrieving the last successful publish and the digest of its configuration.
+        """
+
+        # Setup
+        expected = datetime.datetime(year=2020, month=4, day=12, hour=0, minute=23)
+
+        dist = RepoDistributor('repo-1', 'dist-1', 'type-1', None, True)
+        dist['last_successful_publish'] = dateutils.format_iso8601_datetime(expected)
+        dist['last_publish_config'] = 'digest'
+        RepoDistributor.get_collection().save(dist)
+
+        # Test
+        last = self.publish_manager.last_successful_publish('repo-1', 'dist-1')
+
+        # Verify
+        self.assertEqual((expected, 'digest'), last)
+
+    def test_last_successful_publish_never_published(self):
+        """
+        Tests getting the last successful publish of a distributor saved before it was recorded.
+        """
+
+        # Setup
+        dist = RepoDistributor('repo-1', 'dist-1', 'type-1', None, True)
+        del dist['last_successful_publish']
+        RepoDistributor.get_collection().save(dist)
+
+        # Test
+        last = self.publish_manager.last_successful_publish('repo-1', 'dist-1')
+
+        # Verify
+        self.assertEqual((None, None), last)
+
     def test_last_missing_distributor(self):
         """
         Tests getting last publish for a distributor that doesn't exist
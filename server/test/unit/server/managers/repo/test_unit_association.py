@@ -226,6 +226,49 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
         # Clean Up
         manager_factory.principal_manager().set_principal(principal=None)
 
+    @mock.patch('pulp.server.managers.repo.unit_association.plugin_api.list_importer_types')
+    def test_associate_from_repo_associates_only(self, mock_list_types):
+        mock_list_types.return_value = {'types': ['mock-type'], 'import_associates_only': True}
+        source_repo_id = 'source-repo'
+        dest_repo_id = 'dest-repo'
+
+        self.repo_manager.create_repo(source_repo_id)
+        self.importer_manager.set_importer(source_repo_id, 'mock-importer', {})
+
+        self.repo_manager.create_repo(dest_repo_id)
+        self.importer_manager.set_importer(dest_repo_id, 'mock-importer', {})
+
+        self.content_manager.add_content_unit('mock-type', 'unit-1', {'key-1': 'unit-1'})
+        self.content_manager.add_content_unit('mock-type', 'unit-2', {'key-1': 'unit-2'})
+
+        self.manager.associate_unit_by_id(source_repo_id, 'mock-type', 'unit-1', OWNER_TYPE_USER,
+                                          'admin')
+        self.manager.associate_unit_by_id(source_repo_id, 'mock-type', 'unit-2', OWNER_TYPE_USER,
+                                          'admin')
+
+        fake_user = User('associate-user', '')
+        manager_factory.principal_manager().set_principal(principal=fake_user)
+
+        # Test
+        results = self.manager.associate_from_repo(source_repo_id, dest_repo_id)
+        associated = results['units_successful']
+
+        # Verify
+        self.assertFalse(mock_plugins.MOCK_IMPORTER.import_units.called)
+        self.assertEqual(sorted(u['unit_key']['key-1'] for u in associated),
+                         ['unit-1', 'unit-2'])
+
+        repo_units = list(RepoContentUnit.get_collection().find({'repo_id': dest_repo_id}))
+        self.assertEqual(sorted(u['unit_id'] for u in repo_units), ['unit-1', 'unit-2'])
+        for unit in repo_units:
+            self.assertEqual(unit['owner_type'], OWNER_TYPE_USER)
+            self.assertEqual(unit['owner_id'], fake_user.login)
+        counts = Repo.get_collection().find_one({'id': dest_repo_id})['content_unit_counts']
+        self.assertEqual(counts, {'mock-type': 2})
+
+        # Clean Up
+        manager_factory.principal_manager().set_principal(principal=None)
+
     def test_associate_from_repo_with_criteria(self):
         # Setup
         source_repo_id = 'source-repo'
@@ -457,6 +500,58 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
 
         mock_call.assert_called_once_with(self.repo_id, 'type-1', 2)
 
+    @mock.patch('pulp.server.managers.repo.unit_association.BULK_ASSOCIATE_BATCH_SIZE', 2)
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_associate_all_batches(self, mock_count, mock_added):
+        ids = iter(['foo', 'bar', 'baz', 'foo', 'qux'])
+
+        ret = self.manager.associate_all_by_ids(
+            self.repo_id, 'type-1', ids, OWNER_TYPE_USER, 'admin')
+
+        self.assertEqual(ret, 4)
+        mock_count.assert_called_once_with(self.repo_id, 'type-1', 4)
+        mock_added.assert_called_once_with(self.repo_id)
+        repo_units = list(RepoContentUnit.get_collection().find({'repo_id': self.repo_id}))
+        self.assertEqual(sorted(u['unit_id'] for u in repo_units), ['bar', 'baz', 'foo', 'qux'])
+
+    def test_associate_all_invalid_owner_type(self):
+        self.assertRaises(exceptions.InvalidValue, self.manager.associate_all_by_ids,
+                          self.repo_id, 'type-1', [], 'bad-owner', 'irrelevant')
+
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_bulk_associate(self, mock_call):
+        self.manager.associate_unit_by_id(
+            self.repo_id, 'type-1', 'foo', OWNER_TYPE_IMPORTER, 'test-importer')
+        mock_call.reset_mock()
+
+        ret = self.manager.bulk_associate(
+            self.repo_id, 'type-1', ['foo', 'bar', 'baz', 'bar'], OWNER_TYPE_USER, 'admin')
+
+        self.assertEqual(ret, 2)
+        mock_call.assert_called_once_with(self.repo_id, 'type-1', 2)
+        repo_units = list(RepoContentUnit.get_collection().find({'repo_id': self.repo_id}))
+        self.assertEqual(set(u['unit_id'] for u in repo_units), set(['foo', 'bar', 'baz']))
+
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_bulk_associate_all_existing(self, mock_count, mock_added):
+        self.manager.associate_unit_by_id(
+            self.repo_id, 'type-1', 'foo', OWNER_TYPE_USER, 'admin')
+        mock_count.reset_mock()
+        mock_added.reset_mock()
+
+        ret = self.manager.bulk_associate(
+            self.repo_id, 'type-1', ['foo'], OWNER_TYPE_USER, 'admin')
+
+        self.assertEqual(ret, 0)
+        self.assertFalse(mock_count.called)
+        self.assertFalse(mock_added.called)
+
+    def test_bulk_associate_invalid_owner_type(self):
+        self.assertRaises(exceptions.InvalidValue, self.manager.bulk_associate,
+                          self.repo_id, 'type-1', ['unit-1'], 'bad-owner', 'irrelevant')
+
     def test_unassociate_all(self):
         """
         Tests unassociating multiple units in a single call.
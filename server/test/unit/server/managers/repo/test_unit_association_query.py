@@ -13,6 +13,7 @@ from pulp.common import dateutils
 from pulp.plugins.types import database, model
 from pulp.server.db.model.criteria import Criteria, UnitAssociationCriteria
 from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.exceptions import InvalidValue
 from pulp.server.managers.repo.unit_association import OWNER_TYPE_USER, OWNER_TYPE_IMPORTER
 import pulp.server.managers.content.cud as content_cud_manager
 import pulp.server.managers.factory as manager_factory
@@ -633,6 +634,55 @@ class UnitAssociationQueryTests(base.PulpServerTests):
         for u in units:
             self.assertTrue(u['metadata']['key_1'] != 'aardvark')
 
+    # -- stream_units tests ---------------------------------------------------
+
+    def test_stream_units(self):
+        # Test
+        units = list(self.manager.stream_units('repo-1', batch_size=2))
+
+        # Verify
+        self.assertEqual(self.repo_1_count, len(units))
+        unit_ids = [(u['unit_type_id'], u['unit_id']) for u in units]
+        self.assertEqual(sorted(unit_ids), unit_ids)
+        for u in units:
+            self._assert_unit_integrity(u)
+
+    def test_stream_units_unit_filters_and_fields(self):
+        # Test
+        criteria = UnitAssociationCriteria(type_ids=['beta'], unit_filters={'md_2': 0},
+                                           unit_fields=['md_1'])
+        units = list(self.manager.stream_units('repo-1', criteria, batch_size=3))
+
+        # Verify
+        self.assertEqual(['ball', 'bat'], [u['unit_id'] for u in units])
+        for u in units:
+            self.assertTrue('md_1' in u['metadata'])
+            self.assertFalse('md_3' in u['metadata'])
+
+    def test_stream_units_skip_and_limit(self):
+        # Setup
+        all_units = list(self.manager.stream_units('repo-1'))
+
+        # Test
+        criteria = UnitAssociationCriteria(skip=1, limit=2)
+        units = list(self.manager.stream_units('repo-1', criteria))
+
+        # Verify
+        self.assertEqual([u['unit_id'] for u in all_units[1:3]], [u['unit_id'] for u in units])
+
+    def test_stream_units_remove_duplicates(self):
+        # Test
+        criteria = UnitAssociationCriteria(association_fields=['owner_type'],
+                                           remove_duplicates=True)
+        units = list(self.manager.stream_units('repo-1', criteria))
+
+        # Verify
+        self.assertEqual(self.repo_1_count, len(units))
+
+    def test_stream_units_sort(self):
+        criteria = UnitAssociationCriteria(unit_sort=[('key_1', 1)])
+        self.assertRaises(InvalidValue, self.manager.stream_units, 'repo-1', criteria)
+
     def test_criteria_str(self):
         # Setup
         c1 = UnitAssociationCriteria()
@@ -0,0 +1,115 @@
+"""
+This module contains tests for the pulp.server.managers.auth.cache module.
+"""
+import unittest
+
+import mock
+
+from ... import base
+from pulp.server.auth.authorization import CREATE, READ, UPDATE
+from pulp.server.db.model.auth import Permission, User
+from pulp.server.exceptions import MissingResource
+from pulp.server.managers import factory
+from pulp.server.managers.auth import cache
+
+
+class TestPermissionTrie(unittest.TestCase):
+
+    def test_prefix_permission(self):
+        trie = cache.PermissionTrie()
+        trie.add('/v2/repositories/', [READ])
+        trie.add('/v2/repositories/repo1/', [UPDATE])
+
+        self.assertTrue(trie.is_authorized('/v2/repositories/repo1/search/units/', READ))
+        self.assertTrue(trie.is_authorized('/v2/repositories/repo1/', UPDATE))
+        self.assertFalse(trie.is_authorized('/v2/repositories/repo2/', UPDATE))
+        self.assertFalse(trie.is_authorized('/v2/repositories/', CREATE))
+        self.assertFalse(trie.is_authorized('/v2/users/', READ))
+
+    def test_root_permission(self):
+        trie = cache.PermissionTrie()
+        trie.add('/', [READ])
+
+        self.assertTrue(trie.is_authorized('/v2/repositories/', READ))
+        self.assertFalse(trie.is_authorized('/v2/repositories/', CREATE))
+
+
+class TestAuthorizationCache(base.PulpServerTests):
+
+    def setUp(self):
+        super(TestAuthorizationCache, self).setUp()
+        User.get_collection().save(User('user1', None, roles=[]), safe=True)
+        Permission.get_collection().save(
+            {'resource': '/v2/repositories/', 'users': [{'username': 'user1',
+                                                         'permissions': [READ]}]}, safe=True)
+        self.cache = cache.AuthorizationCache(ttl=60)
+
+    def clean(self):
+        super(TestAuthorizationCache, self).clean()
+        User.get_collection().remove()
+        Permission.get_collection().remove()
+
+    def test_load(self):
+        authorization = self.cache.get('user1')
+
+        self.assertEqual(authorization.user['login'], 'user1')
+        self.assertTrue(authorization.permissions.is_authorized('/v2/repositories/repo1/', READ))
+        self.assertFalse(authorization.permissions.is_authorized('/v2/repositories/', UPDATE))
+
+    def test_missing_user(self):
+        self.assertRaises(MissingResource, self.cache.get, 'user2')
+
+    @mock.patch('pulp.server.managers.auth.cache.UserAuthorization.load')
+    def test_cached(self, mock_load):
+        self.assertTrue(self.cache.get('user1') is self.cache.get('user1'))
+        mock_load.assert_called_once_with('user1')
+
+    @mock.patch('pulp.server.managers.auth.cache.time')
+    def test_expired(self, mock_time):
+        mock_time.time.return_value = 100
+        first = self.cache.get('user1')
+        mock_time.time.return_value = 159
+        self.assertTrue(self.cache.get('user1') is first)
+        mock_time.time.return_value = 160
+        self.assertFalse(self.cache.get('user1') is first)
+
+    def test_invalidate(self):
+        first = self.cache.get('user1')
+        self.cache.invalidate('user2')
+        self.assertTrue(self.cache.get('user1') is first)
+        self.cache.invalidate('user1')
+        self.assertFalse(self.cache.get('user1') is first)
+
+    def test_max_size(self):
+        User.get_collection().save(User('user2', None), safe=True)
+        self.cache.max_size = 1
+
+        self.cache.get('user1')
+        self.cache.get('user2')
+
+        self.assertEqual(self.cache._entries.keys(), ['user2'])
+        self.assertEqual(self.cache._order, ['user2'])
+
+    @mock.patch('pulp.server.managers.auth.cache.UserAuthorization.load')
+    def test_least_recently_used_dropped(self, mock_load):
+        self.cache.max_size = 2
+
+        self.cache.get('user1')
+        self.cache.get('user2')
+        self.cache.get('user1')
+        self.cache.get('user3')
+
+        self.assertEqual(sorted(self.cache._entries.keys()), ['user1', 'user3'])
+        self.assertEqual(self.cache._order, ['user1', 'user3'])
+
+    def test_no_ttl(self):
+        self.cache.ttl = 0
+        self.assertFalse(self.cache.get('user1') is self.cache.get('user1'))
+
+    def test_invalidated_by_grant(self):
+        user_query_manager = factory.user_query_manager()
+        self.assertFalse(user_query_manager.is_authorized('/v2/users/', 'user1', UPDATE))
+
+        factory.permission_manager().grant('/v2/users/', 'user1', [UPDATE])
+
+        self.assertTrue(user_query_manager.is_authorized('/v2/users/', 'user1', UPDATE))
@@ -0,0 +1,121 @@
+"""
+This module contains tests for the pulp.server.managers.placement module.
+"""
+from datetime import datetime
+import unittest
+
+import mock
+
+from pulp.server.db.model.resources import Worker
+from pulp.server.managers import placement
+
+
+WORKERS = [Worker('worker_1', datetime.utcnow()), Worker('worker_2', datetime.utcnow()),
+           Worker('worker_3', datetime.utcnow())]
+
+
+class TestLeastLoadedPolicy(unittest.TestCase):
+
+    def test_least_loaded_chosen(self):
+        policy = placement.LeastLoadedPolicy()
+        loads = {'worker_1': 2, 'worker_2': 1, 'worker_3': 3}
+        self.assertEqual(policy.choose(WORKERS, loads, 'resource').name, 'worker_2')
+
+    def test_idle_workers_take_turns(self):
+        policy = placement.LeastLoadedPolicy()
+        names = [policy.choose(WORKERS, {}, 'resource').name for i in range(4)]
+        self.assertEqual(names, ['worker_1', 'worker_2', 'worker_3', 'worker_1'])
+
+
+class TestRoundRobinPolicy(unittest.TestCase):
+
+    def test_workers_chosen_in_turn(self):
+        policy = placement.RoundRobinPolicy()
+        loads = {'worker_2': 5}
+        names = [policy.choose(WORKERS, loads, 'resource').name for i in range(4)]
+        self.assertEqual(names, ['worker_1', 'worker_2', 'worker_3', 'worker_1'])
+
+    def test_missing_worker_skipped(self):
+        policy = placement.RoundRobinPolicy()
+        policy.choose(WORKERS, {}, 'resource')
+        self.assertEqual(policy.choose(WORKERS[2:], {}, 'resource').name, 'worker_3')
+
+
+class TestResourceAffinityPolicy(unittest.TestCase):
+
+    def test_same_worker_chosen_for_resource(self):
+        policy = placement.ResourceAffinityPolicy()
+        first = policy.choose(WORKERS, {}, 'resource_1')
+        policy.choose(WORKERS, {}, 'resource_2')
+        # The worker of resource_1 is chosen again, though it is not the least loaded
+        self.assertEqual(policy.choose(WORKERS, {first.name: 1}, 'resource_1').name, first.name)
+
+    def test_least_loaded_chosen_when_worker_not_eligible(self):
+        policy = placement.ResourceAffinityPolicy()
+        policy.choose(WORKERS, {}, 'resource_1')
+        loads = {'worker_2': 1, 'worker_3': 2}
+        self.assertEqual(policy.choose(WORKERS[1:], loads, 'resource_1').name, 'worker_2')
+
+    def test_cache_size(self):
+        policy = placement.ResourceAffinityPolicy(cache_size=1)
+        policy.choose(WORKERS, {}, 'resource_1')
+        policy.choose(WORKERS, {}, 'resource_2')
+        self.assertEqual(policy._resource_workers.keys(), ['resource_2'])
+        self.assertEqual(policy._order, ['resource_2'])
+
+    def test_cache_evicts_least_recently_placed(self):
+        policy = placement.ResourceAffinityPolicy(cache_size=2)
+        policy.choose(WORKERS, {}, 'resource_1')
+        policy.choose(WORKERS, {}, 'resource_2')
+        policy.choose(WORKERS, {}, 'resource_1')
+        policy.choose(WORKERS, {}, 'resource_3')
+        self.assertEqual(sorted(policy._resource_workers.keys()), ['resource_1', 'resource_3'])
+        self.assertEqual(policy._order, ['resource_1', 'resource_3'])
+
+
+class TestPlace(unittest.TestCase):
+
+    def setUp(self):
+        placement._policy = None
+        placement.metrics = placement.PlacementMetrics()
+
+    def tearDown(self):
+        placement._policy = None
+        placement.metrics = placement.PlacementMetrics()
+
+    @mock.patch('pulp.server.managers.placement.config')
+    def test_configured_policy_used(self, mock_config):
+        mock_config.get.return_value = 'round_robin'
+        self.assertTrue(isinstance(placement.get_policy(), placement.RoundRobinPolicy))
+        mock_config.get.assert_called_once_with('tasks', 'worker_placement_policy')
+
+    @mock.patch('pulp.server.managers.placement.config')
+    def test_unknown_policy(self, mock_config):
+        mock_config.get.return_value = 'fastest'
+        self.assertTrue(isinstance(placement.get_policy(), placement.LeastLoadedPolicy))
+
+    @mock.patch('pulp.server.managers.placement.config')
+    def test_place_records_metrics(self, mock_config):
+        mock_config.get.return_value = 'least_loaded'
+        loads = {'worker_1': 1}
+
+        worker = placement.place(list(reversed(WORKERS)), loads, 'resource_1')
+        placement.place(WORKERS, loads, 'resource_2')
+
+        self.assertEqual(worker.name, 'worker_2')
+        self.assertEqual(placement.metrics.as_dict(),
+                         {'decisions': 2, 'worker_counts': {'worker_2': 1, 'worker_3': 1}})
+
+    @mock.patch('pulp.server.managers.placement.METRICS_LOG_INTERVAL', 2)
+    @mock.patch('pulp.server.managers.placement._logger')
+    @mock.patch('pulp.server.managers.placement.config')
+    def test_place_logs_metrics_summary(self, mock_config, mock_logger):
+        mock_config.get.return_value = 'least_loaded'
+
+        placement.place(WORKERS, {}, 'resource_1')
+        self.assertFalse(mock_logger.info.called)
+        placement.place(WORKERS, {}, 'resource_2')
+
+        msg = mock_logger.info.call_args[0][0]
+        self.assertTrue('2 decisions' in msg)
+        self.assertTrue('worker_1: 1, worker_2: 1' in msg)
@@ -10,7 +10,7 @@ import pymongo
 from ...base import ResourceReservationTests
 from pulp.server.exceptions import NoWorkers
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.resources import Worker
+from pulp.server.db.model.resources import ReservedResource, Worker
 from pulp.server.managers import resources
 
 
@@ -174,6 +174,28 @@ class TestGetUnreservedWorker(ResourceReservationTests):
         else:
             self.fail("NoWorkers() Exception should have been raised.")
 
+    @mock.patch('pulp.server.managers.resources.config')
+    def test_worker_returned_below_max_reservations(self, mock_config):
+        mock_config.getint.return_value = 2
+        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
+        find = self.mock_resources.ReservedResource.get_collection.return_value.find
+        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'a'}, {'worker_name': 'b'}]
+        result = resources.get_unreserved_worker('resource_1')
+        self.assertEqual(result, {'name': 'b'})
+        mock_config.getint.assert_called_once_with('tasks', 'max_worker_reservations')
+
+    @mock.patch('pulp.server.managers.resources.placement')
+    def test_placement_policy_chooses_worker(self, mock_placement):
+        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'},
+                                                 {'name': 'resource_manager@host'}]
+        find = self.mock_resources.ReservedResource.get_collection.return_value.find
+        find.return_value = []
+        result = resources.get_unreserved_worker('resource_1')
+        self.assertEqual(result, mock_placement.place.return_value)
+        workers, loads, resource_id = mock_placement.place.call_args[0]
+        self.assertEqual(sorted(w['name'] for w in workers), ['a', 'b'])
+        self.assertEqual(resource_id, 'resource_1')
+
     def test_is_worker(self):
         self.assertTrue(resources._is_worker("a_worker@some.hostname"))
 
@@ -182,3 +204,86 @@ class TestGetUnreservedWorker(ResourceReservationTests):
 
     def test_is_not_worker_is_resource_mgr(self):
         self.assertEquals(resources._is_worker("resource_manager@some.hostname"), False)
+
+
+class TestReservationRegistry(ResourceReservationTests):
+
+    def setUp(self):
+        super(TestReservationRegistry, self).setUp()
+        now = datetime.utcnow()
+        for name in ('worker_1', 'worker_2', 'resource_manager@host'):
+            Worker(name, now).save()
+        ReservedResource('task_1', 'worker_1', 'resource_1').save()
+        self.registry = resources.ReservationRegistry()
+
+    def test_get_worker_for_reservation(self):
+        worker = self.registry.get_worker_for_reservation('resource_1')
+        self.assertEqual(worker.name, 'worker_1')
+        self.assertRaises(NoWorkers, self.registry.get_worker_for_reservation, 'resource_2')
+
+    def test_get_unreserved_worker(self):
+        worker = self.registry.get_unreserved_worker()
+        self.assertEqual(worker.name, 'worker_2')
+
+    def test_added_reservation_used_without_database(self):
+        self.registry.refresh()
+        self.registry.add_reservation('task_2', 'worker_2', 'resource_2')
+
+        with mock.patch('pulp.server.managers.resources.resources') as mock_resources:
+            worker = self.registry.get_worker_for_reservation('resource_2')
+            self.assertRaises(NoWorkers, self.registry.get_unreserved_worker)
+
+        self.assertEqual(worker.name, 'worker_2')
+        # Having no unreserved worker left, the task waits for the next refresh
+        self.assertFalse(mock_resources.ReservedResource.get_collection.called)
+        self.assertFalse(mock_resources.Worker.get_collection.called)
+
+    def test_released_reservation_found_on_refresh(self):
+        self.registry.refresh()
+        ReservedResource('task_2', 'worker_2', 'resource_2').save()
+        self.registry.add_reservation('task_2', 'worker_2', 'resource_2')
+        ReservedResource.get_collection().remove({'_id': 'task_1'})
+
+        # Until refreshed, the released resource is still placed on the same worker
+        self.assertEqual(self.registry.get_worker_for_reservation('resource_1').name, 'worker_1')
+        self.assertRaises(NoWorkers, self.registry.get_unreserved_worker)
+
+        self.registry.refresh()
+
+        self.assertEqual(self.registry.get_unreserved_worker().name, 'worker_1')
+        self.assertRaises(NoWorkers, self.registry.get_worker_for_reservation, 'resource_1')
+
+    def test_missing_worker_dropped_on_refresh(self):
+        self.registry.refresh()
+        # The worker went missing and was deleted along with its reservations
+        Worker.get_collection().remove({'_id': 'worker_1'})
+        ReservedResource.get_collection().remove({'_id': 'task_1'})
+
+        self.registry.refresh()
+
+        self.assertRaises(NoWorkers, self.registry.get_worker_for_reservation, 'resource_1')
+        self.assertEqual(self.registry.get_unreserved_worker('resource_1').name, 'worker_2')
+        self.assertFalse('worker_1' in self.registry._workers)
+
+    @mock.patch('pulp.server.managers.resources.time')
+    def test_refreshed_after_interval(self, mock_time):
+        mock_time.time.return_value = 100
+        self.registry.refresh()
+        Worker('worker_3', datetime.utcnow()).save()
+        ReservedResource('task_3', 'worker_3', 'resource_3').save()
+
+        mock_time.time.return_value = 100 + resources.REGISTRY_REFRESH_INTERVAL - 1
+        self.assertRaises(NoWorkers, self.registry.get_worker_for_reservation, 'resource_3')
+
+        mock_time.time.return_value = 100 + resources.REGISTRY_REFRESH_INTERVAL
+        worker = self.registry.get_worker_for_reservation('resource_3')
+        self.assertEqual(worker.name, 'worker_3')
+
+    @mock.patch('pulp.server.managers.resources._registry')
+    def test_module_functions_use_registry(self, mock_registry):
+        self.assertEqual(resources.get_worker_for_reservation('resource_1'),
+                         mock_registry.get_worker_for_reservation.return_value)
+        self.assertEqual(resources.get_unreserved_worker(),
+                         mock_registry.get_unreserved_worker.return_value)
+        resources.record_reservation('task_2', 'worker_2', 'resource_2')
+        mock_registry.add_reservation.assert_called_once_with('task_2', 'worker_2', 'resource_2')
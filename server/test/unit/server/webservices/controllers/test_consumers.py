@@ -993,6 +993,36 @@ class TestProfilesNoWSGI(PulpWebservicesTests):
 
         self.validate_auth(authorization.CREATE)
 
+    @mock.patch('pulp.server.webservices.controllers.consumers.Profiles.created')
+    @mock.patch('pulp.server.tasks.consumer.managers.consumer_profile_manager')
+    def test_post_delta(self, mock_manager, mock_created):
+        # Setup
+        profiles = consumers.Profiles()
+        delta = {'added': [[0, 'a']], 'removed': []}
+        profiles.params = mock.Mock(return_value={'content_type': 'bar', 'delta': delta,
+                                                  'base_hash': 'h1', 'profile_hash': 'h2'})
+        mock_manager.return_value.update_delta.return_value = {'foo': 'bar', 'profile': ['a']}
+
+        # Test
+        profiles.POST('consumer-foo')
+        mock_manager.return_value.update_delta.assert_called_once_with(
+            'consumer-foo', 'bar', 'h1', delta, 'h2')
+        self.assertFalse(mock_manager.return_value.create.called)
+        uri_path = self.get_mock_uri_path('consumer-foo', 'bar')
+        # The profile is not sent back
+        compare_dict(mock_created.mock_calls[0][1][1], {'foo': 'bar', '_href': uri_path})
+
+    @mock.patch('pulp.server.tasks.consumer.managers.consumer_profile_manager')
+    def test_post_delta_missing_hash(self, mock_manager):
+        # Setup
+        profiles = consumers.Profiles()
+        profiles.params = mock.Mock(return_value={'content_type': 'bar', 'delta': {},
+                                                  'base_hash': 'h1'})
+
+        # Test
+        self.assertRaises(MissingValue, profiles.POST, 'consumer-foo')
+        self.assertFalse(mock_manager.return_value.update_delta.called)
+
 
 class TestProfileNoWSGI(PulpWebservicesTests):
 
@@ -1526,6 +1556,73 @@ class TestContentApplicability(base.PulpWebserviceTests,
 
         self.assertEqual(content_types, ['c_1', 'c_2'])
 
+    def test__get_page_none(self):
+        """
+        Test the _get_page() method when no page was requested.
+        """
+        ca = ContentApplicability()
+        ca.params = mock.MagicMock(return_value={})
+
+        self.assertEqual(ca._get_page(), (None, None))
+
+    def test__get_page(self):
+        """
+        Test the _get_page() method when page_size and page_token were passed.
+        """
+        ca = ContentApplicability()
+        ca.params = mock.MagicMock(return_value={'page_size': 10, 'page_token': 'consumer_1'})
+
+        self.assertEqual(ca._get_page(), (10, 'consumer_1'))
+
+    def test__get_page_invalid(self):
+        """
+        Test the _get_page() method with invalid page sizes and tokens.
+        """
+        ca = ContentApplicability()
+        for body in ({'page_size': 0}, {'page_size': '10'}, {'page_size': True},
+                     {'page_token': 7}):
+            ca.params = mock.MagicMock(return_value=body)
+            self.assertRaises(InvalidValue, ca._get_page)
+
+    @mock.patch('pulp.server.managers.consumer.bind.factory.consumer_history_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_distributor_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_query_manager')
+    def test_POST_paged(self, *unused_mocks):
+        """
+        Test the POST() method walking through the consumers a page at a time.
+        """
+        consumer_ids = ['consumer_1', 'consumer_2', 'consumer_3']
+        manager = factory.consumer_manager()
+        profile_manager = ProfileManager()
+        bind_manager = BindManager()
+        for consumer_id in consumer_ids:
+            manager.register(consumer_id)
+            consumer_profile = profile_manager.create(consumer_id, 'content_type_1',
+                                                      ['unit_1-0.9.1'])
+            bind_manager.bind(consumer_id, 'repo_1', 'distributor_id', False, {})
+        RepoProfileApplicability.objects.create(consumer_profile.profile_hash, 'repo_1',
+                                                consumer_profile.profile,
+                                                {'content_type_1': ['unit_1-0.9.2']})
+        criteria = {'criteria': {'filters': {'id': {'$in': consumer_ids}}}, 'page_size': 2}
+
+        status, body = self.post(self.PATH, criteria)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body['next_page_token'], 'consumer_2')
+        self.assert_equal_ignoring_list_order(
+            body['applicability'],
+            [{'consumers': ['consumer_1', 'consumer_2'],
+              'applicability': {'content_type_1': ['unit_1-0.9.2']}}])
+
+        criteria['page_token'] = body['next_page_token']
+        status, body = self.post(self.PATH, criteria)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body['next_page_token'], None)
+        self.assertEqual(body['applicability'],
+                         [{'consumers': ['consumer_3'],
+                           'applicability': {'content_type_1': ['unit_1-0.9.2']}}])
+
 
 class TestConsumerApplicabilityRegeneration(base.PulpWebserviceTests):
 
@@ -11,9 +11,11 @@
 
 from uuid import uuid4
 
+import mock
+
 from base import PulpServerTests
 
-from pulp.server.db.model.content import ContentCatalog
+from pulp.server.db.model.content import ContentCatalog, ContentCatalogGeneration
 from pulp.plugins.conduits.cataloger import CatalogerConduit
 
 
@@ -27,10 +29,12 @@ class TestCatalogerConduit(PulpServerTests):
     def setUp(self):
         super(TestCatalogerConduit, self).setUp()
         ContentCatalog.get_collection().remove()
+        ContentCatalogGeneration.get_collection().remove()
 
     def tearDown(self):
         super(TestCatalogerConduit, self).tearDown()
         ContentCatalog.get_collection().remove()
+        ContentCatalogGeneration.get_collection().remove()
 
     def units(self, start_n, end_n):
         units = []
@@ -89,4 +93,49 @@ class TestCatalogerConduit(PulpServerTests):
         conduit.deleted_count = 10
         conduit.reset()
         self.assertEqual(conduit.added_count, 0)
-        self.assertEqual(conduit.deleted_count, 0)
\ No newline at end of file
+        self.assertEqual(conduit.deleted_count, 0)
+
+    def test_refresh(self):
+        conduit = CatalogerConduit(SOURCE_ID, EXPIRES)
+        for unit_key, url in self.units(0, 10):
+            conduit.add_entry(TYPE_ID, unit_key, url)
+        units = self.units(10, 10)
+        conduit.begin_refresh()
+        for unit_key, url in units:
+            conduit.add_entry(TYPE_ID, unit_key, url)
+        conduit.delete_entry(TYPE_ID, units[0][0])
+        conduit.commit_refresh()
+        collection = ContentCatalog.get_collection()
+        self.assertTrue(conduit.writer is None)
+        self.assertEqual(conduit.added_count, 20)
+        self.assertEqual(conduit.deleted_count, 1)
+        self.assertEqual(len(units) - 1, collection.find().count())
+        for unit_key, url in units[1:]:
+            locator = ContentCatalog.get_locator(TYPE_ID, unit_key)
+            entry = collection.find_one({'locator': locator})
+            self.assertEqual(entry['url'], url)
+
+    def test_refresh_commit_failed(self):
+        conduit = CatalogerConduit(SOURCE_ID, EXPIRES)
+        conduit.begin_refresh()
+        writer = conduit.writer
+        writer.commit = mock.Mock(side_effect=ValueError())
+        writer.abort = mock.Mock()
+        self.assertRaises(ValueError, conduit.commit_refresh)
+        # The refresh can still be aborted
+        conduit.abort_refresh()
+        writer.abort.assert_called_once_with()
+        self.assertTrue(conduit.writer is None)
+
+    def test_refresh_aborted(self):
+        conduit = CatalogerConduit(SOURCE_ID, EXPIRES)
+        units = self.units(0, 10)
+        for unit_key, url in units:
+            conduit.add_entry(TYPE_ID, unit_key, url)
+        conduit.begin_refresh()
+        for unit_key, url in self.units(10, 10):
+            conduit.add_entry(TYPE_ID, unit_key, url)
+        conduit.abort_refresh()
+        conduit.abort_refresh()
+        collection = ContentCatalog.get_collection()
+        self.assertEqual(len(units), collection.find().count())
@@ -148,6 +148,24 @@ class SingleRepoUnitsMixinTests(unittest.TestCase):
         self.assertEqual(mock_query_call.call_args[0][0], self.repo_id)
         self.assertEqual(mock_query_call.call_args[1]['criteria'], fake_criteria)
 
+    @mock.patch('pulp.plugins.types.database.all_type_definitions')
+    @mock.patch('pulp.server.managers.repo.unit_association_query.'
+                'RepoUnitAssociationQueryManager.stream_units')
+    def test_get_units_streamed(self, mock_query_call, mock_type_def_call):
+        # Setup
+        mock_query_call.return_value = iter([
+            {'unit_type_id': 'type-1', 'metadata': {'m': 'm1', 'k1': 'v1'}},
+        ])
+        mock_type_def_call.return_value = [{'id': 'type-1', 'unit_key': ['k1']}]
+
+        # Test
+        units = self.mixin.get_units(criteria='fake-criteria', streamed=True)
+
+        # Verify
+        self.assertFalse(isinstance(units, list))
+        self.assertEqual(1, len(list(units)))
+        mock_query_call.assert_called_once_with(self.repo_id, criteria='fake-criteria')
+
     @mock.patch('pulp.server.managers.repo.unit_association_query.'
                 'RepoUnitAssociationQueryManager.get_units')
     def test_get_units_server_error(self, mock_query_call):
@@ -597,6 +615,105 @@ class AddUnitMixinTests(unittest.TestCase):
         # Test
         self.assertRaises(mixins.ImporterConduitException, self.mixin.save_unit, None)
 
+    @mock.patch('pulp.plugins.types.database.type_units_unit_key')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.update_content_unit')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.add_content_units')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'bulk_associate')
+    def test_save_units(self, mock_associate, mock_add, mock_update, mock_get, mock_unit_key):
+        # Setup
+        mock_unit_key.return_value = ['k']
+        existing = Unit('t', {'k': 'v1'}, {'m': 'm1'}, None)
+        new = Unit('t', {'k': 'v2'}, {'m': 'm2'}, None)
+        # the second document matches the lookup spec but not a unit in the batch
+        mock_get.return_value = ({'_id': 'existing', 'k': 'v1'}, {'_id': 'other', 'k': 'v3'})
+
+        # Test
+        self.mixin.save_units([existing, new])
+
+        # Verify
+        self.assertEqual(1, mock_get.call_count)
+        mock_update.assert_called_once_with('t', 'existing', mock.ANY)
+        self.assertEqual(1, mock_add.call_count)
+        added = list(mock_add.call_args[0][1])
+        self.assertEqual(1, len(added))
+        self.assertEqual(added[0][0], new.id)
+        self.assertEqual(existing.id, 'existing')
+        self.assertTrue(new.id is not None)
+        mock_associate.assert_called_once_with(self.repo_id, 't', ['existing', new.id],
+                                               self.association_owner_type,
+                                               self.association_owner_id)
+        self.assertEqual(1, self.mixin._added_count)
+        self.assertEqual(1, self.mixin._updated_count)
+
+    @mock.patch('pulp.plugins.types.database.type_units_unit_key')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.add_content_units')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'bulk_associate')
+    def test_save_units_batches(self, mock_associate, mock_add, mock_get, mock_unit_key):
+        # Setup
+        mock_unit_key.return_value = ['k']
+        mock_get.return_value = ()
+        units = [Unit('t', {'k': str(i)}, {}, None) for i in range(5)]
+
+        # Test
+        self.mixin.save_units(units, batch_size=2)
+
+        # Verify
+        self.assertEqual(3, mock_get.call_count)
+        self.assertEqual(3, mock_add.call_count)
+        self.assertEqual(3, mock_associate.call_count)
+        self.assertEqual(5, self.mixin._added_count)
+
+    @mock.patch('pulp.plugins.types.database.type_units_unit_key')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_ids')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_content_unit_by_keys_dict')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.update_content_unit')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.add_content_units')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'bulk_associate')
+    def test_save_units_race_condition(self, mock_associate, mock_add, mock_update,
+                                       mock_get_one, mock_get, mock_get_by_ids, mock_unit_key):
+        """
+        Another workflow adds one of the units between the lookup and the insert,
+        so that unit is updated instead.
+        """
+        # Setup
+        mock_unit_key.return_value = ['k']
+        mock_get.return_value = ()
+        mock_add.side_effect = DuplicateKeyError('dups!')
+        mock_get_one.return_value = {'_id': 'existing'}
+        units = [Unit('t', {'k': 'v1'}, {}, None), Unit('t', {'k': 'v2'}, {}, None)]
+
+        def _inserted(type_id, unit_ids, fields):
+            return ({'_id': unit_ids[1]},)
+        mock_get_by_ids.side_effect = _inserted
+
+        # Test
+        self.mixin.save_units(units)
+
+        # Verify
+        self.assertEqual(units[0].id, 'existing')
+        self.assertEqual(1, mock_update.call_count)
+        self.assertEqual(1, self.mixin._added_count)
+        self.assertEqual(1, self.mixin._updated_count)
+        self.assertEqual(1, mock_associate.call_count)
+
+    @mock.patch('pulp.plugins.types.database.type_units_unit_key')
+    def test_save_units_with_error(self, mock_unit_key):
+        mock_unit_key.side_effect = Exception()
+
+        self.assertRaises(mixins.ImporterConduitException, self.mixin.save_units,
+                          [Unit('t', {'k': 'v'}, {}, None)])
+
     @mock.patch('pulp.server.managers.content.cud.ContentManager.link_referenced_content_units')
     def test_link_unit(self, mock_link):
         # Setup
@@ -701,6 +818,48 @@ class StatusMixinTests(unittest.TestCase):
         # Test
         self.assertRaises(mixins.ImporterConduitException, self.mixin.set_progress, 'foo')
 
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
+    @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
+    def test_update_progress(self, mock_get_task_id, mock_task_status_objects,
+                             mock_get_collection):
+        mock_get_task_id.return_value = 'test-id'
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+        self.mixin.set_progress([{'num_processed': 0}])
+
+        self.mixin.update_progress([{'num_processed': 5}], {'0.num_processed': 5})
+
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': 'test-id'},
+            {'$set': {'progress_report.test-report.0.num_processed': 5}}, safe=True)
+        self.assertEqual(self.mixin.progress_report, {'test-report': [{'num_processed': 5}]})
+        self.assertEqual(1, mock_task_status_objects.return_value.update_one.call_count)
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
+    @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
+    def test_update_progress_not_set(self, mock_get_task_id, mock_task_status_objects,
+                                     mock_get_collection):
+        mock_get_task_id.return_value = 'test-id'
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+
+        self.mixin.update_progress([{'num_processed': 5}], {'0.num_processed': 5})
+
+        mock_task_status_objects.return_value.update_one.assert_called_once_with(
+            set__progress_report={'test-report': [{'num_processed': 5}]})
+        self.assertFalse(mock_get_collection.called)
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
+    def test_update_progress_with_exception(self, mock_task_status_objects, mock_get_collection):
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+        self.mixin.task_id = 'test_id'
+        self.mixin.set_progress([{'num_processed': 0}])
+        mock_get_collection.return_value.update.side_effect = Exception()
+
+        self.assertRaises(mixins.ImporterConduitException, self.mixin.update_progress,
+                          [{'num_processed': 5}], {'0.num_processed': 5})
+
 
 class PublishReportMixinTests(unittest.TestCase):
 
@@ -13,7 +13,7 @@ from uuid import uuid4
 
 from base import PulpServerTests
 
-from pulp.server.db.model.content import ContentCatalog
+from pulp.server.db.model.content import ContentCatalog, ContentCatalogGeneration
 from pulp.server.managers.content.catalog import ContentCatalogManager
 from pulp.server.managers import factory
 
@@ -28,10 +28,12 @@ class TestCatalogManager(PulpServerTests):
     def setUp(self):
         super(TestCatalogManager, self).setUp()
         ContentCatalog.get_collection().remove()
+        ContentCatalogGeneration.get_collection().remove()
 
     def tearDown(self):
         super(TestCatalogManager, self).tearDown()
         ContentCatalog.get_collection().remove()
+        ContentCatalogGeneration.get_collection().remove()
 
     def test_locator(self):
         key_1 = {'a': 1, 'b': 2, 'c': 3}
@@ -183,6 +185,21 @@ class TestCatalogManager(PulpServerTests):
             self.assertEqual(entry['unit_key'], unit_key)
             self.assertEqual(entry['url'], url)
 
+    def test_find_all(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units:
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+            manager.add_entry('other', EXPIRATION, TYPE_ID, unit_key, url)
+        missing = self.units(10, 1)[0][0]
+        keys = [(TYPE_ID, units[3][0]), (TYPE_ID, missing), (TYPE_ID, units[0][0])]
+        found = manager.find_all(keys)
+        self.assertEqual(len(found), 3)
+        self.assertEqual(len(found[0]), 2)
+        self.assertEqual(found[0][0]['unit_key'], units[3][0])
+        self.assertEqual(found[1], [])
+        self.assertEqual(sorted(e['source_id'] for e in found[2]), ['other', SOURCE_ID])
+
     def test_expired(self):
         units = self.units(0, 10)
         manager = ContentCatalogManager()
@@ -200,6 +217,75 @@ class TestCatalogManager(PulpServerTests):
             entries = manager.find(TYPE_ID, unit_key)
             self.assertEqual(len(entries), 0)
 
+    def test_writer(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units:
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        collection = ContentCatalog.get_collection()
+        # first refresh
+        new_units = self.units(10, 10)
+        writer = manager.writer(SOURCE_ID, EXPIRATION)
+        writer.batch_size = 3
+        for unit_key, url in new_units:
+            writer.add_entry(TYPE_ID, unit_key, url)
+        writer.flush()
+        # not visible until committed
+        self.assertEqual(collection.find().count(), 20)
+        self.assertEqual(len(manager.find(TYPE_ID, new_units[0][0])), 0)
+        self.assertEqual(len(manager.find(TYPE_ID, units[0][0])), 1)
+        purged = writer.commit()
+        self.assertEqual(purged, 10)
+        self.assertEqual(collection.find().count(), 10)
+        self.assertEqual(len(manager.find(TYPE_ID, new_units[0][0])), 1)
+        self.assertEqual(len(manager.find(TYPE_ID, units[0][0])), 0)
+        self.assertTrue(manager.has_entries(SOURCE_ID))
+        # second refresh replaces the first
+        writer = manager.writer(SOURCE_ID, EXPIRATION)
+        for unit_key, url in units:
+            writer.add_entry(TYPE_ID, unit_key, url)
+        purged = writer.commit()
+        self.assertEqual(purged, 10)
+        self.assertEqual(collection.find({'generation': writer.generation}).count(), 10)
+        self.assertEqual(collection.find().count(), 10)
+        generation = ContentCatalogGeneration.get_collection().find_one({'source_id': SOURCE_ID})
+        self.assertEqual(generation['generation'], writer.generation)
+
+    def test_writer_delete_entry(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units:
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        writer = manager.writer(SOURCE_ID, EXPIRATION)
+        writer.batch_size = 3
+        for unit_key, url in units:
+            writer.add_entry(TYPE_ID, unit_key, url)
+        writer.delete_entry(TYPE_ID, units[0][0])
+        writer.flush()
+        # the current entry stays visible until committed
+        self.assertEqual(len(manager.find(TYPE_ID, units[0][0])), 1)
+        self.assertEqual(writer.deleted, set([ContentCatalog.get_locator(TYPE_ID, units[0][0])]))
+        writer.commit()
+        self.assertEqual(len(manager.find(TYPE_ID, units[0][0])), 0)
+        self.assertEqual(len(manager.find(TYPE_ID, units[1][0])), 1)
+        # the current entry is kept when aborted
+        writer = manager.writer(SOURCE_ID, EXPIRATION)
+        writer.delete_entry(TYPE_ID, units[1][0])
+        writer.abort()
+        self.assertEqual(len(manager.find(TYPE_ID, units[1][0])), 1)
+
+    def test_writer_abort(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        writer = manager.writer(SOURCE_ID, EXPIRATION)
+        for unit_key, url in units:
+            writer.add_entry(TYPE_ID, unit_key, url)
+        writer.flush()
+        self.assertFalse(manager.has_entries(SOURCE_ID))
+        writer.abort()
+        collection = ContentCatalog.get_collection()
+        self.assertEqual(collection.find().count(), 0)
+
     def test_factory(self):
         manager = factory.content_catalog_manager()
         self.assertTrue(isinstance(manager, ContentCatalogManager))
\ No newline at end of file
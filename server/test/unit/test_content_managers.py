@@ -75,6 +75,16 @@ class PulpContentCUDTests(PulpContentTests):
         self.assertEqual(len(units), 1)
         self.assertTrue('_last_updated' in units[0])
 
+    def test_add_content_units(self):
+        units = [('unit-1', TYPE_1_UNITS[0]), (None, TYPE_1_UNITS[1])]
+        unit_ids = self.cud_manager.add_content_units(TYPE_1_DEF.id, units)
+        self.assertEqual(len(unit_ids), 2)
+        self.assertEqual(unit_ids[0], 'unit-1')
+        self.assertNotEqual(unit_ids[1], None)
+        units = self.query_manager.list_content_units(TYPE_1_DEF.id)
+        self.assertEqual(len(units), 2)
+        self.assertTrue(all('_last_updated' in u for u in units))
+
     def test_update_content_unit(self):
         unit_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
         unit = self.query_manager.get_content_unit_by_id(TYPE_1_DEF.id, unit_id)
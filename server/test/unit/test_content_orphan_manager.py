@@ -221,6 +221,46 @@ class OrphanManagerGeneratorTests(OrphanManagerTests):
         orphans = list(self.orphan_manager.generate_all_orphans())
         self.assertEqual(len(orphans), 1)
 
+    def test_orphans_in_multiple_batches(self):
+        units = [gen_content_unit(PHONY_TYPE_1.id, self.content_root) for i in range(5)]
+        associate_content_unit_with_repo(units[1])
+        associate_content_unit_with_repo(units[3])
+
+        batches = list(OrphanManager._generate_orphan_batches(PHONY_TYPE_1.id, ['_id'],
+                                                              batch_size=2))
+
+        orphan_ids = set(u['_id'] for batch in batches for u in batch)
+        expected_ids = set(units[i]['_id'] for i in (0, 2, 4))
+        self.assertEqual(orphan_ids, expected_ids)
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+
+    def test_orphan_batches_always_include_id(self):
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+
+        batches = list(OrphanManager._generate_orphan_batches(PHONY_TYPE_1.id, ['name']))
+
+        self.assertEqual(len(batches), 1)
+        self.assertTrue('_id' in batches[0][0])
+        self.assertTrue('name' in batches[0][0])
+
+    def test_orphans_count_by_type(self):
+        unit_1 = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        gen_content_unit(PHONY_TYPE_2.id, self.content_root)
+        associate_content_unit_with_repo(unit_1)
+
+        self.assertEqual(self.orphan_manager.orphans_count_by_type(PHONY_TYPE_1.id), 1)
+        self.assertEqual(self.orphan_manager.orphans_summary(),
+                         {PHONY_TYPE_1.id: 1, PHONY_TYPE_2.id: 1})
+
+    def test_get_associated_unit_is_not_orphan(self):
+        unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        associate_content_unit_with_repo(unit)
+
+        self.assertRaises(pulp_exceptions.MissingResource,
+                          self.orphan_manager.get_orphan,
+                          PHONY_TYPE_1.id, unit['_id'])
+
     # delete with generator test methods ---------------------------------------
 
     def test_delete_one_orphan_using_generators(self):
@@ -277,6 +317,18 @@ class OrphanManagerGeneratorTests(OrphanManagerTests):
         self.assertFalse(os.path.exists(unit_1['_storage_path']))
         self.assertTrue(os.path.exists(unit_2['_storage_path']))
 
+    def test_delete_by_type_skips_associated_units(self):
+        unit_1 = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        unit_2 = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        associate_content_unit_with_repo(unit_1)
+
+        self.orphan_manager.delete_orphans_by_type(PHONY_TYPE_1.id)
+
+        self.assertTrue(os.path.exists(unit_1['_storage_path']))
+        self.assertFalse(os.path.exists(unit_2['_storage_path']))
+        collection = content_type_db.type_units_collection(PHONY_TYPE_1.id)
+        self.assertEqual(collection.find().count(), 1)
+
     def test_delete_by_id_using_generators(self):
         unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
 
@@ -42,3 +42,15 @@ class PluginCallConfigurationTests(unittest.TestCase):
         self.assertEqual(flattened['c'], 'c3')
         self.assertEqual(flattened['d'], 'd2')
         self.assertEqual(flattened['e'], 'e4')
+
+    def test_digest(self):
+        # Test
+        digest = self.config.digest()
+
+        # Verify
+        same = PluginCallConfiguration({'b': 'b4', 'e': 'e4', 'd': 'd2'},
+                                       {'c': 'c3', 'a': 'a4'})
+        self.assertEqual(digest, same.digest())
+
+        self.config.override_config['e'] = 'e5'
+        self.assertNotEqual(digest, self.config.digest())
@@ -22,7 +22,8 @@ from pulp.server.managers.repo.unit_association import OWNER_TYPE_IMPORTER
 from pulp.plugins.types import database as typedb
 from pulp.plugins.types.model import TypeDefinition
 from pulp.plugins.loader import api as plugin_api
-from pulp.plugins.conduits.profiler import ProfilerConduit
+from pulp.plugins.conduits import profiler
+from pulp.plugins.conduits.profiler import ProfilerConduit, UnitIndexCache
 
 # -- test cases ---------------------------------------------------------------
 
@@ -49,6 +50,7 @@ class BaseProfilerConduitTests(base.PulpServerTests):
         plugin_api._create_manager()
         typedb.update_database([self.TYPE_1_DEF, self.TYPE_2_DEF])
         mock_plugins.install()
+        profiler._unit_index_cache.clear()
 
     def tearDown(self):
         super(BaseProfilerConduitTests, self).tearDown()
@@ -163,3 +165,79 @@ class BaseProfilerConduitTests(base.PulpServerTests):
         for u in units:
             self.assertTrue('key-1' in u.unit_key)
             self.assertTrue('extra_field' in u.metadata)
+
+    def test_get_repo_unit_index(self):
+        # Setup
+        self.populate(additional_key='extra_field')
+        # Test
+        conduit = ProfilerConduit()
+        index = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id, ['extra_field'])
+        # Verify
+        self.assertEquals(len(index.units), 9)
+        units = index.find(**{'key-1': '3'})
+        self.assertEquals(len(units), 1)
+        self.assertEquals(units[0].unit_key, {'key-1': '3'})
+        self.assertEquals(units[0].metadata['extra_field'], '3')
+        self.assertEquals(len(index.find(**{'key-1': '3', 'extra_field': '3'})), 1)
+        self.assertEquals(index.find(**{'key-1': '3', 'extra_field': '4'}), [])
+        self.assertEquals(index.find(**{'key-1': 'missing'}), [])
+
+    def test_get_repo_unit_index_cached(self):
+        # Setup
+        self.populate()
+        conduit = ProfilerConduit()
+        index = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id)
+        # Test
+        cached = ProfilerConduit().get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id)
+        other_type = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_2_DEF.id)
+        # Verify
+        self.assertTrue(cached is index)
+        self.assertFalse(other_type is index)
+
+    def test_get_repo_unit_index_units_removed(self):
+        # Setup
+        self.populate()
+        conduit = ProfilerConduit()
+        index = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id)
+        # Test
+        manager = factory.repo_unit_association_manager()
+        manager.unassociate_unit_by_id(self.REPO_ID, self.TYPE_1_DEF.id, 'unit-0',
+                                       OWNER_TYPE_IMPORTER, 'test-importer',
+                                       notify_plugins=False)
+        reloaded = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id)
+        # Verify
+        self.assertFalse(reloaded is index)
+        self.assertEquals(len(reloaded.units), 8)
+
+    def test_get_repo_unit_index_units_added(self):
+        # Setup
+        self.populate()
+        conduit = ProfilerConduit()
+        index = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id)
+        # Test
+        factory.repo_manager().update_last_unit_added(self.REPO_ID)
+        reloaded = conduit.get_repo_unit_index(self.REPO_ID, self.TYPE_1_DEF.id)
+        # Verify
+        self.assertFalse(reloaded is index)
+        self.assertEquals(len(reloaded.units), 9)
+
+
+class UnitIndexCacheTests(base.PulpServerTests):
+
+    def test_lru_eviction(self):
+        cache = UnitIndexCache(max_size=2)
+        cache.put('a', 1, 'index-a')
+        cache.put('b', 1, 'index-b')
+        # Using 'a' makes 'b' the least recently used
+        self.assertEquals(cache.get('a', 1), 'index-a')
+        cache.put('c', 1, 'index-c')
+        self.assertEquals(cache.get('b', 1), None)
+        self.assertEquals(cache.get('a', 1), 'index-a')
+        self.assertEquals(cache.get('c', 1), 'index-c')
+
+    def test_stale_stamp(self):
+        cache = UnitIndexCache()
+        cache.put('a', 1, 'index-a')
+        self.assertEquals(cache.get('a', 2), None)
+        # Stale entries are dropped
+        self.assertEquals(cache.get('a', 1), None)
@@ -18,8 +18,10 @@ from pulp.common import dateutils
 from pulp.devel import mock_plugins
 from pulp.plugins.conduits.mixins import DistributorConduitException
 from pulp.plugins.conduits.repo_publish import RepoPublishConduit, RepoGroupPublishConduit
+from pulp.plugins.types import database as types_db
 from pulp.server.db.model.repo_group import RepoGroup, RepoGroupDistributor
-from pulp.server.db.model.repository import Repo, RepoDistributor
+from pulp.server.db.model.repository import (Repo, RepoContentUnit, RepoContentUnitRemoval,
+                                             RepoDistributor)
 from pulp.server.managers import factory as manager_factory
 
 
@@ -32,6 +34,9 @@ class RepoPublishConduitTests(base.PulpServerTests):
 
         Repo.get_collection().remove()
         RepoDistributor.get_collection().remove()
+        RepoContentUnitRemoval.get_collection().remove()
+        RepoContentUnit.get_collection().remove()
+        types_db.type_units_collection('type-1').remove()
 
     def setUp(self):
         super(RepoPublishConduitTests, self).setUp()
@@ -85,6 +90,86 @@ class RepoPublishConduitTests(base.PulpServerTests):
         # Test
         self.assertRaises(DistributorConduitException, self.conduit.last_publish)
 
+    def test_last_successful_publish(self):
+        # Test - Unpublished
+        self.assertEqual((None, None), self.conduit.last_successful_publish())
+
+        # Setup - Previous publish
+        last_publish = datetime.datetime.now(dateutils.utc_tz())
+        repo_dist = RepoDistributor.get_collection().find_one({'repo_id': 'repo-1'})
+        repo_dist['last_successful_publish'] = dateutils.format_iso8601_datetime(last_publish)
+        repo_dist['last_publish_config'] = 'digest'
+        RepoDistributor.get_collection().save(repo_dist, safe=True)
+
+        # Test - Last publish
+        found, config_digest = self.conduit.last_successful_publish()
+        self.assertTrue(isinstance(found, datetime.datetime))
+        self.assertEqual(repo_dist['last_successful_publish'],
+                         dateutils.format_iso8601_datetime(found))
+        self.assertEqual('digest', config_digest)
+
+    def test_get_removed_units(self):
+        # Setup
+        removed = RepoContentUnitRemoval('repo-1', 'unit-1', 'type-1')
+        RepoContentUnitRemoval.get_collection().save(removed, safe=True)
+        RepoContentUnitRemoval.get_collection().save(
+            RepoContentUnitRemoval('repo-1', 'unit-2', 'type-2'), safe=True)
+        RepoContentUnitRemoval.get_collection().save(
+            RepoContentUnitRemoval('repo-2', 'unit-3', 'type-1'), safe=True)
+        since = dateutils.parse_iso8601_datetime(removed['removed'])
+
+        # Test
+        found = list(self.conduit.get_removed_units(since, ['type-1']))
+
+        # Verify
+        self.assertEqual(1, len(found))
+        self.assertEqual('unit-1', found[0]['unit_id'])
+        self.assertEqual('type-1', found[0]['unit_type_id'])
+
+        later = since + datetime.timedelta(seconds=1)
+        self.assertEqual([], list(self.conduit.get_removed_units(later)))
+
+    def test_get_updated_unit_ids(self):
+        # Setup
+        for repo_id, unit_id in (('repo-1', 'unit-1'), ('repo-2', 'unit-2')):
+            RepoContentUnit.get_collection().save(
+                RepoContentUnit(repo_id, unit_id, 'type-1', 'importer', 'imp'), safe=True)
+            types_db.type_units_collection('type-1').save(
+                {'_id': unit_id, '_last_updated': dateutils.now_utc_timestamp()}, safe=True)
+        now = dateutils.now_utc_datetime_with_tzinfo()
+
+        # Test
+        found = self.conduit.get_updated_unit_ids(now - datetime.timedelta(minutes=1),
+                                                  ['type-1'])
+
+        # Verify
+        self.assertEqual(found, {'type-1': ['unit-1']})
+
+        later = now + datetime.timedelta(minutes=1)
+        self.assertEqual({}, self.conduit.get_updated_unit_ids(later, ['type-1']))
+
+    @mock.patch('pulp.server.managers.repo.unit_association_query.'
+                'RepoUnitAssociationQueryManager.get_updated_unit_ids')
+    def test_get_updated_unit_ids_with_error(self, mock_call):
+        mock_call.side_effect = Exception()
+        self.assertRaises(DistributorConduitException, self.conduit.get_updated_unit_ids,
+                          datetime.datetime.now(dateutils.utc_tz()))
+
+    def test_removals_retained_since(self):
+        # Test
+        retained_since = self.conduit.removals_retained_since()
+
+        # Verify the default of 30 days of records is used
+        age = dateutils.now_utc_datetime_with_tzinfo() - retained_since
+        self.assertTrue(datetime.timedelta(days=30) <= age < datetime.timedelta(days=30, minutes=1))
+
+    @mock.patch('pulp.server.managers.repo.unit_association_query.'
+                'RepoUnitAssociationQueryManager.get_removed_units')
+    def test_get_removed_units_with_error(self, mock_call):
+        mock_call.side_effect = Exception()
+        self.assertRaises(DistributorConduitException, self.conduit.get_removed_units,
+                          datetime.datetime.now(dateutils.utc_tz()))
+
 class RepoGroupPublishConduitTests(base.PulpServerTests):
     def clean(self):
         super(RepoGroupPublishConduitTests, self).clean()
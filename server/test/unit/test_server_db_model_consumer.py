@@ -124,7 +124,7 @@ class TestRepoProfileApplicability(PulpServerTests):
         document = self.collection.find_one()
         self.assertEqual(document['profile_hash'], profile_hash)
         self.assertEqual(document['repo_id'], repo_id)
-        self.assertEqual(document['profile'], profile)
+        self.assertFalse('profile' in document)
         self.assertEqual(document['applicability'], applicability_data)
 
         # Our applicability object should still have the correct _id attribute
@@ -153,7 +153,7 @@ class TestRepoProfileApplicability(PulpServerTests):
         document = self.collection.find_one()
         self.assertEqual(document['profile_hash'], profile_hash)
         self.assertEqual(document['repo_id'], repo_id)
-        self.assertEqual(document['profile'], profile)
+        self.assertFalse('profile' in document)
         self.assertEqual(document['applicability'], applicability_data)
 
         # Our applicability object should now have the correct _id attribute
@@ -315,3 +315,26 @@ class TestUnitProfile(unittest.TestCase):
 
         self.assertNotEqual(consumer.UnitProfile.calculate_hash(profile_1.profile),
                             consumer.UnitProfile.calculate_hash(profile_2.profile))
+
+
+class TestUnitProfileBody(unittest.TestCase):
+    """
+    Test the UnitProfileBody class.
+    """
+    def test___init__(self):
+        """
+        Test the constructor.
+        """
+        body = consumer.UnitProfileBody('profile_hash', 'profile')
+
+        self.assertEqual(body.profile_hash, 'profile_hash')
+        self.assertEqual(body.profile, 'profile')
+        self.assertEqual(body.refcount, 1)
+
+    def test___init___with_refcount(self):
+        """
+        Test the constructor, passing the optional refcount.
+        """
+        body = consumer.UnitProfileBody('profile_hash', 'profile', 3)
+
+        self.assertEqual(body.refcount, 3)
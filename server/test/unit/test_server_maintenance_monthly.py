@@ -33,3 +33,14 @@ class TestMain(unittest.TestCase):
         monthly.monthly_maintenance()
 
         remove_orphans.assert_called_once_with()
+
+    @mock.patch('pulp.server.maintenance.monthly.RepoProfileApplicabilityManager.remove_orphans')
+    @mock.patch('pulp.server.maintenance.monthly.ProfileManager.remove_orphan_bodies')
+    def test_monthly_maintenance_calls_remove_orphan_bodies(self, remove_orphan_bodies,
+                                                            remove_orphans):
+        """
+        Assert that the main() function removes the orphaned profile bodies.
+        """
+        monthly.monthly_maintenance()
+
+        remove_orphan_bodies.assert_called_once_with()
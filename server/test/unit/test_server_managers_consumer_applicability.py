@@ -11,20 +11,28 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import datetime
+
 import mock
 
+from pulp.common import dateutils, tags
 from pulp.plugins.conduits.profiler import ProfilerConduit
 from pulp.plugins.loader import api as plugins
+from pulp.plugins.types import database as types_db
 from pulp.server.db.model.consumer import (Bind, Consumer, RepoProfileApplicability,
-                                           UnitProfile)
+                                           UnitProfile, UnitProfileBody)
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.repository import Repo, RepoDistributor
+from pulp.server.db.model.dispatch import TaskStatus
+from pulp.server.db.model.repository import (Repo, RepoContentUnit, RepoContentUnitRemoval,
+                                             RepoDistributor)
 from pulp.server.managers import factory as factory
+from pulp.server.managers.consumer import applicability as applicability_tasks
 from pulp.server.managers.consumer.applicability import (
     _add_consumers_to_applicability_map, _add_profiles_to_consumer_map_and_get_hashes,
     _add_repo_ids_to_consumer_map, _format_report, _get_applicability_map,
     _get_consumer_applicability_map, DoesNotExist, MultipleObjectsReturned,
-    retrieve_consumer_applicability, ApplicabilityRegenerationManager)
+    iterate_consumer_applicability, retrieve_consumer_applicability,
+    ApplicabilityRegenerationManager)
 from pulp.server.managers.consumer.bind import BindManager
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -52,6 +60,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         Bind.get_collection().remove()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        UnitProfileBody.get_collection().remove()
         RepoProfileApplicability.get_collection().remove()
         plugins._create_manager()
         mock_plugins.install()
@@ -74,9 +83,19 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         Bind.get_collection().remove()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        UnitProfileBody.get_collection().remove()
         RepoProfileApplicability.get_collection().remove()
+        RepoContentUnit.get_collection().remove()
+        RepoContentUnitRemoval.get_collection().remove()
+        types_db.type_units_collection('rpm').remove()
+        TaskStatus.objects().delete()
         mock_plugins.reset()
 
+    def profile(self, applicability):
+        # Applicability documents reference the stored profile by its hash
+        profile_hash = applicability['profile_hash']
+        return ProfileManager.get_profile_bodies([profile_hash]).get(profile_hash)
+
     def populate_consumers(self):
         # Register consumers with rpm profiles
         manager = factory.consumer_manager()
@@ -147,7 +166,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', u'errata-2']}
         for applicability in applicability_list:
             self.assertEqual(applicability['applicability'], expected_applicability)
-            self.assertTrue(applicability['profile'] in [self.PROFILE1, self.PROFILE2])
+            self.assertTrue(self.profile(applicability) in [self.PROFILE1, self.PROFILE2])
 
     def test_regenerate_applicability_for_consumers_with_same_profiles(self):
         # Setup
@@ -161,7 +180,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         self.assertEqual(len(applicability_list), 2)
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', u'errata-2']}
         for applicability in applicability_list:
-            self.assertEqual(applicability['profile'], self.PROFILE1)
+            self.assertEqual(self.profile(applicability), self.PROFILE1)
             self.assertEqual(applicability['applicability'], expected_applicability)
 
     def test_regenerate_applicability_for_empty_consumer_criteria(self):
@@ -176,7 +195,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         self.assertEqual(len(applicability_list), 2)
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', u'errata-2']}
         for applicability in applicability_list:
-            self.assertEqual(applicability['profile'], self.PROFILE1)
+            self.assertEqual(self.profile(applicability), self.PROFILE1)
             self.assertEqual(applicability['applicability'], expected_applicability)
 
     def test_regenerate_applicability_for_consumer_criteria_no_bindings(self):
@@ -218,7 +237,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', u'errata-2']}
         for applicability in applicability_list:
             self.assertEqual(applicability['applicability'], expected_applicability)
-            self.assertTrue(applicability['profile'] in [self.PROFILE1, self.PROFILE2])
+            self.assertTrue(self.profile(applicability) in [self.PROFILE1, self.PROFILE2])
 
     def test_regenerate_applicability_for_repos_with_same_consumer_profiles(self):
         # Setup
@@ -233,7 +252,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         self.assertEqual(len(applicability_list), 2)
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', u'errata-2']}
         for applicability in applicability_list:
-            self.assertEqual(applicability['profile'], self.PROFILE1)
+            self.assertEqual(self.profile(applicability), self.PROFILE1)
             self.assertEqual(applicability['applicability'], expected_applicability)
 
     def test_regenerate_applicability_for_empty_repo_criteria(self):
@@ -249,7 +268,7 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         self.assertEqual(len(applicability_list), 2)
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', u'errata-2']}
         for applicability in applicability_list:
-            self.assertEqual(applicability['profile'], self.PROFILE1)
+            self.assertEqual(self.profile(applicability), self.PROFILE1)
             self.assertEqual(applicability['applicability'], expected_applicability)
 
     def test_regenerate_applicability_for_repo_criteria_no_bindings(self):
@@ -303,9 +322,255 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         applicability_list = list(RepoProfileApplicability.get_collection().find())
         self.assertEqual(len(applicability_list), 1)
         expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', 'errata-2']}
-        self.assertEqual(applicability_list[0]['profile'], self.PROFILE1)
+        # The applicability of the replaced profile is left for the orphan cleanup
+        self.assertEqual(applicability_list[0]['profile_hash'],
+                         UnitProfile.calculate_hash(self.PROFILE1))
         self.assertEqual(applicability_list[0]['applicability'], expected_applicability)
 
+    def test_regenerate_applicability_for_repos_incremental(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        # The first regeneration for the repos is a full one
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units.reset_mock()
+        profiler.calculate_applicable_units_subset = mock.Mock(return_value={'rpm': ['rpm-3']})
+
+        RepoContentUnit.get_collection().insert(
+            RepoContentUnit(self.REPO_IDS[0], 'rpm-3', 'rpm', 'importer', 'yum'), safe=True)
+        RepoContentUnitRemoval.get_collection().insert(
+            RepoContentUnitRemoval(self.REPO_IDS[0], 'rpm-1', 'rpm'), safe=True)
+
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        # Verify
+        self.assertFalse(profiler.calculate_applicable_units.called)
+        self.assertEqual(profiler.calculate_applicable_units_subset.call_count, 1)
+        self.assertEqual(profiler.calculate_applicable_units_subset.call_args[0][2],
+                         {'rpm': ['rpm-3']})
+        repo_1 = RepoProfileApplicability.get_collection().find_one({'repo_id': self.REPO_IDS[0]})
+        self.assertEqual(repo_1['applicability'],
+                         {'rpm': ['rpm-2', 'rpm-3'], 'erratum': ['errata-1', 'errata-2']})
+        repo_2 = RepoProfileApplicability.get_collection().find_one({'repo_id': self.REPO_IDS[1]})
+        self.assertEqual(repo_2['applicability'],
+                         {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', 'errata-2']})
+
+    def test_regenerate_applicability_for_repos_updated_units(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        association = RepoContentUnit(self.REPO_IDS[0], 'rpm-2', 'rpm', 'importer', 'yum')
+        association.created = '2014-01-01T00:00:00Z'
+        RepoContentUnit.get_collection().insert(association, safe=True)
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units.reset_mock()
+        profiler.calculate_applicable_units_subset = mock.Mock(return_value={})
+        # The unit is imported again, which updates it in place
+        types_db.type_units_collection('rpm').insert(
+            {'_id': 'rpm-2', '_last_updated': dateutils.now_utc_timestamp()}, safe=True)
+
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        # Verify the updated unit is no longer applicable
+        self.assertFalse(profiler.calculate_applicable_units.called)
+        self.assertEqual(profiler.calculate_applicable_units_subset.call_args[0][2],
+                         {'rpm': ['rpm-2']})
+        repo_1 = RepoProfileApplicability.get_collection().find_one({'repo_id': self.REPO_IDS[0]})
+        self.assertEqual(repo_1['applicability'],
+                         {'rpm': ['rpm-1'], 'erratum': ['errata-1', 'errata-2']})
+
+    def test_regenerate_applicability_keeps_removals_for_publish(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units_subset = mock.Mock(return_value={})
+        last_publish = dateutils.now_utc_datetime_with_tzinfo() - datetime.timedelta(hours=1)
+        RepoDistributor.get_collection().update(
+            {'repo_id': self.REPO_IDS[0]},
+            {'$set': {'last_successful_publish': dateutils.format_iso8601_datetime(last_publish)}},
+            safe=True)
+        RepoContentUnitRemoval.get_collection().insert(
+            RepoContentUnitRemoval(self.REPO_IDS[0], 'rpm-1', 'rpm'), safe=True)
+
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        # Verify the next publish still finds the removal
+        query_manager = factory.repo_unit_association_query_manager()
+        removed = list(query_manager.get_removed_units(
+            self.REPO_IDS[0], dateutils.format_iso8601_datetime(last_publish)))
+        self.assertEqual([r['unit_id'] for r in removed], ['rpm-1'])
+
+        # Once the publish has processed it, the next regeneration prunes the removal
+        last_publish = dateutils.now_utc_datetime_with_tzinfo() + datetime.timedelta(seconds=1)
+        RepoDistributor.get_collection().update(
+            {'repo_id': self.REPO_IDS[0]},
+            {'$set': {'last_successful_publish': dateutils.format_iso8601_datetime(last_publish)}},
+            safe=True)
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+        self.assertEqual(RepoContentUnitRemoval.get_collection().find().count(), 0)
+
+    @mock.patch('pulp.server.managers.repo.unit_association_query.config')
+    def test_regenerate_applicability_for_repos_removals_reaped(self, mock_config):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units.reset_mock()
+        profiler.calculate_applicable_units_subset = mock.Mock(return_value={})
+        # The removals since the last regeneration are no longer all recorded
+        mock_config.getfloat.return_value = -1
+
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        # Verify the applicability is rebuilt from scratch
+        self.assertFalse(profiler.calculate_applicable_units_subset.called)
+        self.assertEqual(profiler.calculate_applicable_units.call_count, 2)
+
+    def test_regenerate_applicability_for_repos_incremental_not_supported(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units.reset_mock()
+        profiler.calculate_applicable_units_subset = mock.Mock(side_effect=NotImplementedError())
+        RepoContentUnit.get_collection().insert(
+            RepoContentUnit(self.REPO_IDS[0], 'rpm-3', 'rpm', 'importer', 'yum'), safe=True)
+
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        # Verify the applicability of the changed repo is rebuilt from scratch
+        self.assertEqual(profiler.calculate_applicable_units.call_count, 1)
+        self.assertEqual(profiler.calculate_applicable_units.call_args[0][1], self.REPO_IDS[0])
+
+    def test_regenerate_applicability_for_repos_full_rebuild(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units.reset_mock()
+        profiler.calculate_applicable_units_subset = mock.Mock()
+
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA, full_rebuild=True)
+
+        # Verify
+        self.assertEqual(profiler.calculate_applicable_units.call_count, 2)
+        self.assertFalse(profiler.calculate_applicable_units_subset.called)
+
+    def test_find_missing_applicability(self):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_repo_profiles(
+            self.REPO_IDS[0],
+            manager.find_missing_applicability(self.CONSUMER_CRITERIA)[self.REPO_IDS[0]][:1])
+
+        # Test
+        repo_profiles = manager.find_missing_applicability(self.CONSUMER_CRITERIA)
+
+        # Verify the applicability that exists is left out
+        self.assertEqual(sorted(repo_profiles), self.REPO_IDS)
+        self.assertEqual(len(repo_profiles[self.REPO_IDS[0]]), 1)
+        self.assertEqual(len(repo_profiles[self.REPO_IDS[1]]), 2)
+        for profile_hash, content_type, profile_id in repo_profiles[self.REPO_IDS[1]]:
+            self.assertEqual(content_type, 'rpm')
+            unit_profile = UnitProfile.get_collection().find_one({'id': profile_id})
+            self.assertEqual(unit_profile['profile_hash'], profile_hash)
+
+    @mock.patch.object(applicability_tasks, 'APPLICABILITY_CHUNK_SIZE', 1)
+    @mock.patch.object(applicability_tasks, 'regenerate_applicability_for_repo_profiles')
+    def test_regenerate_applicability_for_consumers_task(self, mock_subtask):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        mock_subtask.apply_async_with_reservation.side_effect = \
+            lambda *args, **kwargs: {'task_id': args[1]}
+
+        # Test
+        result = applicability_tasks.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+
+        # Verify one subtask per (repo, profile) pair, each reserving its repo
+        calls = mock_subtask.apply_async_with_reservation.call_args_list
+        self.assertEqual(len(calls), 4)
+        for call in calls:
+            args, kwargs = call
+            self.assertEqual(args[0], tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE)
+            self.assertEqual(args[2][0], args[1])
+            self.assertEqual(len(args[2][1]), 1)
+        self.assertEqual([a[1] for a, k in calls], [self.REPO_IDS[0]] * 2 + [self.REPO_IDS[1]] * 2)
+        self.assertEqual(len(result.spawned_tasks), 4)
+        # Nothing has been calculated by the parent task
+        self.assertEqual(RepoProfileApplicability.get_collection().find().count(), 0)
+
+    @mock.patch.object(applicability_tasks, 'regenerate_applicability_for_repo')
+    def test_regenerate_applicability_for_repos_task(self, mock_subtask):
+        # Setup
+        self.populate_repos()
+        mock_subtask.apply_async_with_reservation.side_effect = \
+            lambda *args, **kwargs: {'task_id': args[1]}
+
+        # Test
+        result = applicability_tasks.regenerate_applicability_for_repos(
+            self.REPO_CRITERIA.as_dict(), full_rebuild=True)
+
+        # Verify
+        calls = mock_subtask.apply_async_with_reservation.call_args_list
+        self.assertEqual([args[2] for args, kwargs in calls],
+                         [(repo_id, True) for repo_id in self.REPO_IDS])
+        self.assertEqual(result.spawned_tasks,
+                         [{'task_id': repo_id} for repo_id in self.REPO_IDS])
+
+    def test_regenerate_applicability_for_repo_profiles_task_progress(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        TaskStatus(task_id='parent-task', progress_report={
+            applicability_tasks.PROGRESS_REPORT_KEY: {'items_completed': 0}}).save()
+        repo_profiles = ApplicabilityRegenerationManager.find_missing_applicability(
+            self.CONSUMER_CRITERIA)
+
+        # Test
+        applicability_tasks.regenerate_applicability_for_repo_profiles(
+            self.REPO_IDS[0], repo_profiles[self.REPO_IDS[0]], parent_task_id='parent-task')
+
+        # Verify
+        self.assertEqual(RepoProfileApplicability.get_collection().find(
+            {'repo_id': self.REPO_IDS[0]}).count(), 1)
+        task_status = TaskStatus.objects.get(task_id='parent-task')
+        progress = task_status['progress_report'][applicability_tasks.PROGRESS_REPORT_KEY]
+        self.assertEqual(progress['items_completed'], 1)
+
 
 class TestRepoProfileApplicabilityManager(base.PulpServerTests):
     """
@@ -328,6 +593,7 @@ class TestRepoProfileApplicabilityManager(base.PulpServerTests):
         Repo.get_collection().drop()
         Consumer.get_collection().drop()
         UnitProfile.get_collection().drop()
+        UnitProfileBody.get_collection().drop()
         mock_plugins.reset()
 
     def test_create(self):
@@ -351,7 +617,8 @@ class TestRepoProfileApplicabilityManager(base.PulpServerTests):
         document = self.collection.find_one()
         self.assertEqual(document['profile_hash'], profile_hash)
         self.assertEqual(document['repo_id'], repo_id)
-        self.assertEqual(document['profile'], profile)
+        # The profile is shared with the unit profiles rather than copied
+        self.assertFalse('profile' in document)
         self.assertEqual(document['applicability'], applicability_data)
 
         # Our applicability object should now have the correct _id attribute
@@ -385,7 +652,7 @@ class TestRepoProfileApplicabilityManager(base.PulpServerTests):
                 expected = a_2
             self.assertEqual(a['profile_hash'], expected.profile_hash)
             self.assertEqual(a['repo_id'], expected.repo_id)
-            self.assertEqual(a['profile'], expected.profile)
+            self.assertEqual(a['profile'], None)
             self.assertEqual(a['applicability'], expected.applicability)
 
     def test_filter_nothing(self):
@@ -418,7 +685,7 @@ class TestRepoProfileApplicabilityManager(base.PulpServerTests):
         # Make sure the object was instantiated correctly
         self.assertEqual(applicability['profile_hash'], a_2.profile_hash)
         self.assertEqual(applicability['repo_id'], a_2.repo_id)
-        self.assertEqual(applicability['profile'], a_2.profile)
+        self.assertEqual(applicability['profile'], None)
         self.assertEqual(applicability['applicability'], a_2.applicability)
 
     def test_get_matches_more_than_one(self):
@@ -561,6 +828,7 @@ class TestRetrieveConsumerApplicability(base.PulpServerTests,
         super(TestRetrieveConsumerApplicability, self).tearDown()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        UnitProfileBody.get_collection().remove()
         RepoProfileApplicability.get_collection().drop()
         Bind.get_collection().drop()
 
@@ -1084,6 +1352,43 @@ class TestRetrieveConsumerApplicability(base.PulpServerTests,
                                'content_type_2': ['unit_3-13.1.0']}}]
         self.assert_equal_ignoring_list_order(applicability, expected_applicability)
 
+    @mock.patch('pulp.server.managers.consumer.bind.factory.consumer_history_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_distributor_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_query_manager')
+    def test_iterate_consumer_applicability(self, *unused_mocks):
+        """
+        Test that consumers are walked in id order a page at a time, honoring the filters.
+        """
+        consumer_ids = ['consumer_3', 'consumer_1', 'consumer_4', 'consumer_2']
+        manager = factory.consumer_manager()
+        profile_manager = ProfileManager()
+        bind_manager = BindManager()
+        for consumer_id in consumer_ids:
+            manager.register(consumer_id)
+            consumer_profile = profile_manager.create(consumer_id, 'content_type',
+                                                      ['unit_1-0.9.1'])
+            bind_manager.bind(consumer_id, 'repo_id', 'distributor_id', False, {})
+        applicability = {'content_type': ['unit_1-0.9.2']}
+        RepoProfileApplicability.objects.create(consumer_profile.profile_hash, 'repo_id',
+                                                consumer_profile.profile, applicability)
+        criteria = Criteria(filters={'id': {'$ne': 'consumer_2'}})
+
+        pages = list(iterate_consumer_applicability(criteria, page_size=2))
+
+        self.assertEqual(len(pages), 2)
+        self.assert_equal_ignoring_list_order(
+            pages[0][0], [{'consumers': ['consumer_1', 'consumer_3'],
+                           'applicability': applicability}])
+        self.assertEqual(pages[0][1], 'consumer_3')
+        self.assertEqual(pages[1], ([{'consumers': ['consumer_4'],
+                                      'applicability': applicability}], None))
+
+        # Resume after a page token
+        pages = list(iterate_consumer_applicability(criteria, page_size=2,
+                                                    page_token='consumer_3'))
+        self.assertEqual(pages, [([{'consumers': ['consumer_4'],
+                                    'applicability': applicability}], None)])
+
 
 class TestAddConsumersToApplicabilityMap(base.PulpServerTests,
                                          base.RecursiveUnorderedListComparisonMixin):
@@ -1145,6 +1450,7 @@ class TestAddProfilesToConsumerMapAndGetHashes(
         super(TestAddProfilesToConsumerMapAndGetHashes, self).tearDown()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        UnitProfileBody.get_collection().remove()
 
     def test__add_profiles_to_consumer_map_and_get_hashes(self):
         """
@@ -19,8 +19,9 @@ import pymongo
 from mock import patch
 
 from pulp.plugins.profiler import Profiler
-from pulp.server.db.model.consumer import Consumer, UnitProfile
-from pulp.server.exceptions import MissingResource
+from pulp.server.db.model.consumer import Consumer, UnitProfile, UnitProfileBody
+from pulp.server.db.model.criteria import Criteria
+from pulp.server.exceptions import InvalidValue, MissingResource, PulpCodedConflictException
 from pulp.server.managers import factory
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -40,18 +41,24 @@ class ProfileManagerTests(base.PulpServerTests):
         super(ProfileManagerTests, self).setUp()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        UnitProfileBody.get_collection().remove()
         mock_plugins.install()
 
     def tearDown(self):
         super(ProfileManagerTests, self).tearDown()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        UnitProfileBody.get_collection().remove()
         mock_plugins.reset()
 
     def populate(self):
         manager = factory.consumer_manager()
         manager.register(self.CONSUMER_ID)
 
+    def body(self, profile):
+        collection = UnitProfileBody.get_collection()
+        return collection.find_one({'profile_hash': UnitProfile.calculate_hash(profile)})
+
     def test_create(self):
         # Setup
         self.populate()
@@ -65,7 +72,8 @@ class ProfileManagerTests(base.PulpServerTests):
         self.assertEquals(len(profiles), 1)
         self.assertEquals(profiles[0]['consumer_id'], self.CONSUMER_ID)
         self.assertEquals(profiles[0]['content_type'], self.TYPE_1)
-        self.assertEquals(profiles[0]['profile'], self.PROFILE_1)
+        self.assertFalse('profile' in profiles[0])
+        self.assertEquals(self.body(self.PROFILE_1)['profile'], self.PROFILE_1)
         expected_hash = UnitProfile.calculate_hash(self.PROFILE_1)
         self.assertEqual(profiles[0]['profile_hash'], expected_hash)
 
@@ -140,10 +148,162 @@ class ProfileManagerTests(base.PulpServerTests):
         self.assertEquals(len(profiles), 1)
         self.assertEquals(profiles[0]['consumer_id'], self.CONSUMER_ID)
         self.assertEquals(profiles[0]['content_type'], self.TYPE_1)
-        self.assertEquals(profiles[0]['profile'], self.PROFILE_2)
+        self.assertFalse('profile' in profiles[0])
+        self.assertEquals(self.body(self.PROFILE_2)['profile'], self.PROFILE_2)
         expected_hash = UnitProfile.calculate_hash(self.PROFILE_2)
         self.assertEqual(profiles[0]['profile_hash'], expected_hash)
 
+    def test_update_unchanged(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        # Test
+        with mock.patch.object(ProfileManager, '_acquire_body') as mock_acquire:
+            profile = manager.update(self.CONSUMER_ID, self.TYPE_1, dict(self.PROFILE_1))
+        # Verify
+        self.assertFalse(mock_acquire.called)
+        self.assertEquals(profile['profile'], self.PROFILE_1)
+        self.assertEquals(self.body(self.PROFILE_1)['refcount'], 1)
+
+    def test_update_releases_previous_body(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        # Test
+        profile = manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_2)
+        # Verify
+        self.assertEquals(profile['profile'], self.PROFILE_2)
+        self.assertEqual(self.body(self.PROFILE_1), None)
+        self.assertEquals(self.body(self.PROFILE_2)['refcount'], 1)
+
+    def test_shared_body(self):
+        # Setup
+        self.populate()
+        factory.consumer_manager().register('other-consumer')
+        manager = factory.consumer_profile_manager()
+        # Test
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        manager.update('other-consumer', self.TYPE_1, self.PROFILE_1)
+        # Verify
+        self.assertEquals(UnitProfileBody.get_collection().find().count(), 1)
+        self.assertEquals(self.body(self.PROFILE_1)['refcount'], 2)
+        profile = manager.get_profile('other-consumer', self.TYPE_1)
+        self.assertEquals(profile['profile'], self.PROFILE_1)
+        manager.delete(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(self.body(self.PROFILE_1)['refcount'], 1)
+        manager.delete('other-consumer', self.TYPE_1)
+        self.assertEqual(self.body(self.PROFILE_1), None)
+
+    def test_remove_orphan_bodies(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        collection = UnitProfileBody.get_collection()
+        orphan = UnitProfileBody(UnitProfile.calculate_hash(self.PROFILE_2), self.PROFILE_2, 0)
+        collection.insert(orphan, safe=True)
+        # Test
+        manager.remove_orphan_bodies()
+        # Verify
+        bodies = list(collection.find())
+        self.assertEquals(len(bodies), 1)
+        self.assertEquals(bodies[0]['profile'], self.PROFILE_1)
+
+    def test_find_by_criteria(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        # Test
+        criteria = Criteria(filters={'consumer_id': self.CONSUMER_ID},
+                            fields=['content_type', 'profile'])
+        profiles = manager.find_by_criteria(criteria)
+        # Verify
+        self.assertEquals(len(profiles), 1)
+        self.assertEquals(profiles[0]['content_type'], self.TYPE_1)
+        self.assertEquals(profiles[0]['profile'], self.PROFILE_1)
+        self.assertEquals(criteria.fields, ['content_type', 'profile'])
+
+    def test_find_by_criteria_profile_filters(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        manager.update(self.CONSUMER_ID, self.TYPE_2, self.PROFILE_3)
+        # Test
+        criteria = Criteria(filters={'profile.name': 'zsh'}, fields=['content_type'])
+        profiles = manager.find_by_criteria(criteria)
+        # Verify
+        self.assertEquals(len(profiles), 1)
+        self.assertEquals(profiles[0]['content_type'], self.TYPE_1)
+        self.assertFalse('profile' in profiles[0])
+        # The profile parts are read from the stored profile
+        criteria = Criteria(filters={'profile.name': 'xxx'}, fields=['profile.path'])
+        profiles = manager.find_by_criteria(criteria)
+        self.assertEquals(len(profiles), 1)
+        self.assertEquals(profiles[0]['profile'], {'path': '/tmp/xxx'})
+
+    def test_find_by_criteria_profile_unsupported(self):
+        manager = factory.consumer_profile_manager()
+        criteria = Criteria(filters={'$or': [{'profile.name': 'zsh'}, {'content_type': 'x'}]})
+        self.assertRaises(InvalidValue, manager.find_by_criteria, criteria)
+        criteria = Criteria(sort=[('profile.name', pymongo.ASCENDING)])
+        self.assertRaises(InvalidValue, manager.find_by_criteria, criteria)
+
+    def test_update_delta(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        base_profile = [self.PROFILE_1, self.PROFILE_3]
+        new_profile = [self.PROFILE_2, self.PROFILE_3]
+        manager.update(self.CONSUMER_ID, self.TYPE_1, base_profile)
+        delta = {'added': [[0, self.PROFILE_2]], 'removed': [self.PROFILE_1]}
+        # Test
+        profile = manager.update_delta(self.CONSUMER_ID, self.TYPE_1,
+                                       UnitProfile.calculate_hash(base_profile), delta,
+                                       UnitProfile.calculate_hash(new_profile))
+        # Verify
+        self.assertEquals(profile['profile'], new_profile)
+        profile = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(profile['profile'], new_profile)
+        self.assertEqual(self.body(base_profile), None)
+
+    def test_update_delta_base_mismatch(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+        delta = {'added': [[1, self.PROFILE_2]], 'removed': []}
+        new_hash = UnitProfile.calculate_hash([self.PROFILE_1, self.PROFILE_2])
+        # Test
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_1, 'other-hash', delta, new_hash)
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_2, UnitProfile.calculate_hash([self.PROFILE_1]), delta,
+                          new_hash)
+        # Verify
+        profile = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(profile['profile'], [self.PROFILE_1])
+
+    def test_update_delta_hash_mismatch(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+        base_hash = UnitProfile.calculate_hash([self.PROFILE_1])
+        # Test
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_1, base_hash, {'added': [[0, self.PROFILE_2]], 'removed': []},
+                          UnitProfile.calculate_hash([self.PROFILE_1, self.PROFILE_2]))
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_1, base_hash, {'added': [], 'removed': [self.PROFILE_2]},
+                          UnitProfile.calculate_hash([]))
+        # Verify
+        profile = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(profile['profile'], [self.PROFILE_1])
+
     def test_update_calls_profiler_update_profile(self):
         """
         Assert that the update() method calls the profiler update_profile() method.
@@ -200,12 +360,14 @@ class ProfileManagerTests(base.PulpServerTests):
         self.assertEquals(len(profiles), 2)
         self.assertEquals(profiles[0]['consumer_id'], self.CONSUMER_ID)
         self.assertEquals(profiles[0]['content_type'], self.TYPE_1)
-        self.assertEquals(profiles[0]['profile'], self.PROFILE_1)
+        self.assertFalse('profile' in profiles[0])
+        self.assertEquals(self.body(self.PROFILE_1)['profile'], self.PROFILE_1)
         expected_hash = UnitProfile.calculate_hash(self.PROFILE_1)
         self.assertEqual(profiles[0]['profile_hash'], expected_hash)
         self.assertEquals(profiles[1]['consumer_id'], self.CONSUMER_ID)
         self.assertEquals(profiles[1]['content_type'], self.TYPE_2)
-        self.assertEquals(profiles[1]['profile'], self.PROFILE_2)
+        self.assertFalse('profile' in profiles[1])
+        self.assertEquals(self.body(self.PROFILE_2)['profile'], self.PROFILE_2)
         expected_hash = UnitProfile.calculate_hash(self.PROFILE_2)
         self.assertEqual(profiles[1]['profile_hash'], expected_hash)
 
@@ -263,7 +425,8 @@ class ProfileManagerTests(base.PulpServerTests):
         self.assertEquals(len(profiles), 1)
         self.assertEquals(profiles[0]['consumer_id'], self.CONSUMER_ID)
         self.assertEquals(profiles[0]['content_type'], self.TYPE_2)
-        self.assertEquals(profiles[0]['profile'], self.PROFILE_2)
+        self.assertFalse('profile' in profiles[0])
+        self.assertEquals(self.body(self.PROFILE_2)['profile'], self.PROFILE_2)
         expected_hash = UnitProfile.calculate_hash(self.PROFILE_2)
         self.assertEqual(profiles[0]['profile_hash'], expected_hash)
 
@@ -283,6 +446,7 @@ class ProfileManagerTests(base.PulpServerTests):
         cursor = collection.find()
         profiles = list(cursor)
         self.assertEquals(len(profiles), 0)
+        self.assertEquals(UnitProfileBody.get_collection().find().count(), 0)
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     def test_consumer_unregister_cleanup(self, *unused):
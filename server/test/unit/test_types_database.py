@@ -60,7 +60,8 @@ class TypesDatabaseTests(base.PulpServerTests):
             collection = types_db.type_units_collection(d.id)
             all_indexes = collection.index_information()
 
-            total_index_count = 1 + 1 + len(d.search_indexes) # _id + unit key + all search
+            # _id + unit key + _last_updated + all search
+            total_index_count = 1 + 1 + 1 + len(d.search_indexes)
             self.assertEqual(total_index_count, len(all_indexes))
 
     def test_update_no_changes(self):
@@ -88,7 +89,8 @@ class TypesDatabaseTests(base.PulpServerTests):
             collection = types_db.type_units_collection(d.id)
             all_indexes = collection.index_information()
 
-            total_index_count = 1 + 1 + len(d.search_indexes) # _id + unit key + all search
+            # _id + unit key + _last_updated + all search
+            total_index_count = 1 + 1 + 1 + len(d.search_indexes)
             self.assertEqual(total_index_count, len(all_indexes))
 
     def test_update_missing_no_error(self):
@@ -116,7 +118,8 @@ class TypesDatabaseTests(base.PulpServerTests):
             collection = types_db.type_units_collection(d.id)
             all_indexes = collection.index_information()
 
-            total_index_count = 1 + 1 + len(d.search_indexes) # _id + unit key + all search
+            # _id + unit key + _last_updated + all search
+            total_index_count = 1 + 1 + 1 + len(d.search_indexes)
             self.assertEqual(total_index_count, len(all_indexes))
 
     def test_update_missing_with_error(self):
@@ -425,6 +428,22 @@ class TypesDatabaseTests(base.PulpServerTests):
         self.assertEqual('compound_2', keys[1][0])
         self.assertEqual(types_db.ASCENDING, keys[1][1])
 
+    def test_update_last_updated_index(self):
+        # Setup
+        type_def = TypeDefinition('rpm', 'RPM', 'RPM Packages', None, None, [])
+
+        # Test
+        types_db._update_last_updated_index(type_def)
+
+        # Verify
+        collection_name = types_db.unit_collection_name(type_def.id)
+        collection = pulp_db.get_collection(collection_name)
+
+        index_dict = collection.index_information()
+
+        self.assertEqual(2, len(index_dict)) # default (_id) + last updated
+        self.assertEqual(index_dict['_last_updated_1']['key'], [('_last_updated', 1)])
+
     def test_drop_indexes(self):
         """
         Tests updating indexes on an existing collection with different indexes correctly changes them.